@@ -0,0 +1,136 @@
+r'''
+Shared executor and concurrency limit used by the asyncio front-end of the fitting and prediction routines.
+'''
+
+# Required imports
+import os
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from .definitions import number_types
+
+__all__ = [
+    'set_async_executor',  # Configuration of the shared executor and concurrency limit
+    'get_async_executor',  # Access to the shared executor
+    'run_async',  # Execution of a blocking call on the shared executor
+]
+
+
+_executor = None
+_owned = False
+_limit = None
+_semaphores = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def set_async_executor(executor=None, max_concurrency=None):
+    r'''
+    Specify the executor on which the asynchronous fits and predictions are run, and the maximum
+    number of them allowed to run at the same time. Calls beyond this limit wait in the event loop,
+    without occupying the executor, until a running call completes.
+
+    :kwarg executor: object. A :code:`concurrent.futures.Executor` instance to use, a thread pool owned by this module is created on first use if not given. (optional)
+
+    :kwarg max_concurrency: int. Maximum number of concurrently running calls, defaults to the number of available processors. (optional)
+
+    :returns: none.
+    '''
+
+    global _executor, _owned, _limit, _semaphores
+    with _lock:
+        if executor is not None:
+            if _owned and _executor is not None and _executor is not executor:
+                _executor.shutdown(wait=False)
+            _executor = executor
+            _owned = False
+        if isinstance(max_concurrency, number_types) and int(max_concurrency) > 0:
+            _limit = int(max_concurrency)
+            if _owned and _executor is not None:
+                _executor.shutdown(wait=False)
+                _executor = None
+        _semaphores = weakref.WeakKeyDictionary()
+
+
+def get_async_executor():
+    r'''
+    Returns the executor on which the asynchronous fits and predictions are run.
+
+    :returns: object. The shared :code:`concurrent.futures.Executor` instance.
+    '''
+
+    global _executor, _owned
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_concurrency(), thread_name_prefix='mkgp')
+            _owned = True
+        return _executor
+
+
+def _concurrency():
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Returns the maximum number of concurrently running calls.
+
+    :returns: int. Concurrency limit.
+    '''
+
+    return _limit if _limit is not None else (os.cpu_count() or 1)
+
+
+def _semaphore(loop):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Returns the semaphore enforcing the concurrency limit within the given event loop.
+
+    :arg loop: object. The running event loop.
+
+    :returns: object. An :code:`asyncio.Semaphore` instance bound to the event loop.
+    '''
+
+    with _lock:
+        sem = _semaphores.get(loop)
+        if sem is None:
+            sem = asyncio.Semaphore(_concurrency())
+            _semaphores[loop] = sem
+    return sem
+
+
+async def run_async(func, *args, cancel_event=None, **kwargs):
+    r'''
+    Runs a blocking call on the shared executor without blocking the event loop, subject to the
+    concurrency limit. If the awaiting task is cancelled, the cancellation event is set such that
+    the call can stop at its next check, and the concurrency slot is only released once the call
+    has actually returned.
+
+    :arg func: callable. The blocking function to run.
+
+    :arg args: Positional arguments passed to the function.
+
+    :kwarg cancel_event: object. A :code:`threading.Event` instance polled by the function to detect cancellation. (optional)
+
+    :arg kwargs: Keyword arguments passed to the function.
+
+    :returns: The return value of the function.
+    '''
+
+    loop = asyncio.get_running_loop()
+    async with _semaphore(loop):
+        cfuture = get_async_executor().submit(func, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(cfuture, loop=loop)
+        except asyncio.CancelledError:
+            if cancel_event is not None:
+                cancel_event.set()
+            if not cfuture.cancel():
+                pending = asyncio.wrap_future(cfuture, loop=loop)
+                try:
+                    await asyncio.wait([pending])
+                except asyncio.CancelledError:
+                    pass
+                if pending.done() and not pending.cancelled():
+                    pending.exception()
+            raise
@@ -234,6 +234,55 @@ class _Kernel():
         return self._hderflag
 
 
+    @property
+    def structure(self):
+        r'''
+        Returns the structure of the covariance matrices produced by the :code:`_Kernel` instance, allowing
+        solvers to handle them without constructing the dense matrices.
+
+        - :code:`'diagonal'`: zero covariance between distinct x-values and between function and derivative values, see :code:`diagonal_values()`.
+        - :code:`'lowrank'`: products of a small number of features, :code:`k(x1, x2) = U(x1) U(x2)^T`, see :code:`factors()`.
+        - :code:`'dense'`: no exploitable structure.
+
+        :returns: str. Structure of the covariance matrices.
+        '''
+
+        return 'dense'
+
+
+    def factors(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the features of a low-rank covariance function, such that :code:`k(x1, x2) = U(x1) U(x2)^T`.
+        The hyperparameter derivative of the covariance function follows as :code:`dU U^T + U dU^T`.
+
+        :arg xx: array. Vector of x-values at which to evaluate the features.
+
+        :kwarg der: int. Order of x derivative of the features, 1 yields the features of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the features. (optional)
+
+        :returns: array. 2D matrix of features with the x-values along the first axis.
+        '''
+
+        raise NotImplementedError(f'{self.name} Kernel object does not have a low-rank structure.')
+
+
+    def diagonal_values(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the diagonal of the covariance matrix of a diagonal covariance function.
+
+        :arg xx: array. Vector of x-values at which to evaluate the diagonal.
+
+        :kwarg der: int. Order of x derivative on both sides of the covariance function, 1 yields the diagonal of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the diagonal. (optional)
+
+        :returns: array. Vector of covariance function evaluations at each x-value with itself.
+        '''
+
+        raise NotImplementedError(f'{self.name} Kernel object does not have a diagonal structure.')
+
+
     @hyperparameters.setter
     def hyperparameters(self, theta):
         r'''
@@ -377,6 +426,29 @@ class _OperatorKernel(_Kernel):
         self._kernel_list = klist if klist is not None else []
 
 
+    def _hyperparameter_owner(self, hder):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Locates the constituent kernel owning a hyperparameter, such that hyperparameter derivatives
+        are only requested from that kernel.
+
+        :arg hder: int. Index of hyperparameter within the concatenated hyperparameter list.
+
+        :returns: (int, int).
+            Index of the owning constituent kernel, index of the hyperparameter within that kernel, both :code:`None` if no kernel owns it.
+        '''
+
+        ihyp = int(hder)
+        if ihyp >= 0:
+            for (ii, kk) in enumerate(self._kernel_list):
+                nhyps = kk.hyperparameters.size
+                if ihyp < nhyps:
+                    return (ii, ihyp)
+                ihyp = ihyp - nhyps
+        return (None, None)
+
+
     @property
     def name(self):
         r'''
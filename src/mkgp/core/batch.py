@@ -0,0 +1,638 @@
+r'''
+Batched Gaussian Process Regression fitting of many independent 1D data sets sharing the same x-values and
+kernel structure, with the linear algebra stacked across the batch.
+'''
+
+# Required imports
+import copy
+import math
+import numpy as np
+from operator import itemgetter
+
+from .definitions import number_types, array_types, default_dtype
+from .kernels import _Kernel
+from .kernels import Sum_Kernel, Product_Kernel, Constant_Kernel, Noise_Kernel, SE_Kernel, RQ_Kernel, Matern_HI_Kernel
+
+__all__ = [
+    'BatchGaussianProcess',  # Batched interpolation class
+]
+
+
+def _batch_hyperparameters(kk, theta):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Applies any bounds enforced by a kernel to a batch of its hyperparameters, identical to
+    the clipping performed when the hyperparameters are stored in the kernel.
+
+    :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :arg theta: array. Matrix of hyperparameters of the kernel, with one set per row.
+
+    :returns: array. Matrix of hyperparameters, with one set per row.
+    '''
+
+    hyps = theta
+    if kk._force_bounds:
+        if isinstance(kk._hyp_lbounds, np.ndarray) and kk._hyp_lbounds.size == hyps.shape[1]:
+            hyps = np.maximum(hyps, kk._hyp_lbounds)
+        if isinstance(kk._hyp_ubounds, np.ndarray) and kk._hyp_ubounds.size == hyps.shape[1]:
+            hyps = np.minimum(hyps, kk._hyp_ubounds)
+    return hyps
+
+
+def _batch_covariance(kk, theta, rr, hder=None):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Evaluates the covariance function for all sets of hyperparameters in the batch at once, by
+    broadcasting the hyperparameters against a single distance matrix. Only the covariance
+    itself and its hyperparameter derivatives are available, for the square exponential,
+    rational quadratic, half-integer Matern, noise and constant kernels and for sums and
+    products of these.
+
+    :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :arg theta: array. Matrix of hyperparameters of the kernel, with one set per row.
+
+    :arg rr: array. Matrix of absolute distances between the input x-values.
+
+    :kwarg hder: int. Index of hyperparameter with which to differentiate the covariance function. (optional)
+
+    :returns: array. Stacked covariance matrices, with the batch along the first axis, :code:`None` if the kernel is not supported.
+    '''
+
+    nb = theta.shape[0]
+    if isinstance(kk, (Sum_Kernel, Product_Kernel)):
+        bounds = np.cumsum([0] + [child.hyperparameters.size for child in kk._kernel_list])
+        (iown, khder) = kk._hyperparameter_owner(hder) if hder is not None else (None, None)
+        if isinstance(kk, Sum_Kernel):
+            covm = np.zeros((nb, ) + rr.shape, dtype=kk._dtype)
+            for (ii, child) in enumerate(kk._kernel_list):
+                if hder is None or ii == iown:
+                    term = _batch_covariance(child, theta[:, bounds[ii]:bounds[ii+1]], rr, khder)
+                    if term is None:
+                        return None
+                    covm = covm + term
+        else:
+            covm = np.ones((nb, ) + rr.shape, dtype=kk._dtype)
+            if hder is not None and iown is None:
+                covm = np.zeros((nb, ) + rr.shape, dtype=kk._dtype)
+            for (ii, child) in enumerate(kk._kernel_list):
+                term = _batch_covariance(child, theta[:, bounds[ii]:bounds[ii+1]], rr, khder if ii == iown else None)
+                if term is None:
+                    return None
+                covm = covm * term
+        return covm
+
+    hyps = _batch_hyperparameters(kk, theta)[:, :, np.newaxis, np.newaxis]
+    covm = None
+    if isinstance(kk, Constant_Kernel):
+        covm = np.full((nb, ) + rr.shape, kk.constants[0] if hder is None else float(hder == 0), dtype=kk._dtype)
+    elif isinstance(kk, Noise_Kernel):
+        n_hyp = hyps[:, 0]
+        covm = np.where(rr == 0.0, np.power(n_hyp, 2.0) if hder is None else 2.0 * n_hyp * float(hder == 0), 0.0)
+    elif isinstance(kk, SE_Kernel):
+        (v_hyp, l_hyp) = (hyps[:, 0], hyps[:, 1])
+        efac = np.exp(-np.power(rr, 2.0) / (2.0 * np.power(l_hyp, 2.0)))
+        if hder is None:
+            covm = np.power(v_hyp, 2.0) * efac
+        elif hder == 0:
+            covm = 2.0 * v_hyp * efac
+        elif hder == 1:
+            covm = np.power(v_hyp, 2.0) * efac * np.power(rr, 2.0) / np.power(l_hyp, 3.0)
+    elif isinstance(kk, RQ_Kernel):
+        (rq_amp, l_hyp, a_hyp) = (hyps[:, 0], hyps[:, 1], hyps[:, 2])
+        rqt = 1.0 + np.power(rr, 2.0) / (2.0 * a_hyp * np.power(l_hyp, 2.0))
+        efac = np.power(rqt, -a_hyp)
+        if hder is None:
+            covm = np.power(rq_amp, 2.0) * efac
+        elif hder == 0:
+            covm = 2.0 * rq_amp * efac
+        elif hder == 1:
+            covm = np.power(rq_amp, 2.0) * efac * np.power(rr / l_hyp, 2.0)
+        elif hder == 2:
+            pfac = (rqt - 1.0) - rqt * np.log(rqt)
+            covm = np.power(rq_amp, 2.0) * efac * pfac / rqt
+    elif isinstance(kk, Matern_HI_Kernel):
+        (mat_amp, mat_hyp) = (hyps[:, 0], hyps[:, 1])
+        nu = kk.constants[0]
+        pp = int(nu)
+        mht = np.sqrt(2.0 * nu) * rr / mat_hyp
+        efac = np.exp(-mht)
+        spre = math.factorial(pp) / math.factorial(2 * pp)
+        sfac = np.zeros(mht.shape, dtype=kk._dtype)
+        for zz in np.arange(0, pp + 1):
+            sfac = sfac + spre * math.factorial(pp + zz) / (math.factorial(zz) * math.factorial(pp - zz)) * np.power(2.0 * mht, pp - zz)
+        if hder is None:
+            covm = np.power(mat_amp, 2.0) * efac * sfac
+        elif hder == 0:
+            covm = 2.0 * mat_amp * efac * sfac
+        elif hder == 1:
+            ofac = np.zeros(mht.shape, dtype=kk._dtype)
+            for zz in np.arange(0, pp):
+                ofac = ofac + spre * math.factorial(pp + zz) / (math.factorial(zz) * math.factorial(pp - zz - 1)) * np.power(2.0 * mht, pp - zz - 1)
+            covm = np.power(mat_amp, 2.0) * efac * (sfac - 2.0 * ofac) / mat_hyp
+    if covm is not None:
+        covm = np.broadcast_to(covm, (nb, ) + rr.shape).astype(kk._dtype)
+    return covm
+
+
+class BatchGaussianProcess():
+    r'''
+    Class containing the data containers, get/set functions and fitting functions required to perform
+    Gaussian process regressions on a batch of independent 1-dimensional data sets, which share identical
+    x-values and kernel structure but differ in their y-values and y-errors. The training covariance
+    matrices of all problems are factorized together with a stacked Cholesky decomposition and the
+    hyperparameter optimization advances all problems in lockstep, removing converged problems from
+    further iterations.
+
+    .. note::
+
+        Unlike :code:`GaussianProcess`, no blending of nearby data points is performed, as this would
+        break the shared x-values. Non-finite y-values or y-errors are instead masked individually per
+        problem, by replacing the corresponding rows and columns of the covariance matrix with identity.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used as the starting point of every problem.
+
+    :arg xdata: array. Vector of x-values shared by all data sets.
+
+    :arg ydata: array. Matrix of y-values, with one data set per row.
+
+    :kwarg yerr: array. Matrix of y-errors, with one data set per row, or vector of y-errors shared by all data sets, assumed to be given as 1 sigma. (optional)
+
+    :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity to reduce volatility. (optional)
+    '''
+
+    def __init__(self, kernel, xdata, ydata, yerr=None, regpar=1.0, dtype=None):
+        r'''
+        Checks and normalizes the batch of data sets.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used as the starting point of every problem.
+
+        :arg xdata: array. Vector of x-values shared by all data sets.
+
+        :arg ydata: array. Matrix of y-values, with one data set per row.
+
+        :kwarg yerr: array. Matrix of y-errors, with one data set per row, or vector of y-errors shared by all data sets. (optional)
+
+        :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity to reduce volatility. (optional)
+
+        :returns: none.
+        '''
+
+        self._dtype = dtype if dtype is not None else default_dtype
+        if not isinstance(kernel, _Kernel):
+            raise TypeError('Batched fit requires a valid _Kernel instance.')
+        if not isinstance(xdata, array_types) or not isinstance(ydata, array_types):
+            raise TypeError('Batched fit requires array-like x-values and y-values.')
+        xx = np.array(xdata, dtype=self._dtype)
+        yy = np.atleast_2d(np.array(ydata, dtype=self._dtype))
+        if xx.ndim != 1:
+            raise ValueError('Batched fit is only available for 1-dimensional x-values.')
+        if yy.ndim != 2 or yy.shape[1] != xx.shape[0]:
+            raise ValueError('Batched y-values must be given as a B x N matrix, where N is the number of x-values.')
+        ye = np.zeros(yy.shape, dtype=self._dtype)
+        if isinstance(yerr, array_types):
+            try:
+                ye = np.broadcast_to(np.array(yerr, dtype=self._dtype), yy.shape).copy()
+            except ValueError:
+                raise ValueError('Batched y-errors must be given as a B x N matrix or a vector of length N.')
+        valid = np.isfinite(yy) & np.isfinite(ye)
+        if np.any(np.sum(valid, axis=1) == 0):
+            raise ValueError('Every data set in the batch must contain at least one finite data point.')
+
+        # Normalization applied per problem, identical to the one used in GaussianProcess
+        myy = np.nanmean(np.where(valid, yy, np.nan), axis=1)
+        yn = np.where(valid, yy - myy[:, np.newaxis], 0.0)
+        sc = np.max(np.abs(yn), axis=1)
+        sc[sc == 0.0] = 1.0
+
+        self._kk = copy.copy(kernel)
+        self._lp = float(regpar) if isinstance(regpar, number_types) and float(regpar) > 0.0 else 1.0
+        self._xx = xx
+        self._valid = valid
+        self._nvalid = np.sum(valid, axis=1)
+        self._myy = myy
+        self._sc = sc
+        self._yn = yn / sc[:, np.newaxis]
+        self._en = np.where(valid, ye / sc[:, np.newaxis], 0.0)
+        self._erms = np.sqrt(np.nanmean(np.power(np.where(np.isfinite(ye), ye, np.nan), 2.0), axis=1))
+        self._theta = np.tile(self._kk.hyperparameters, (yy.shape[0], 1))
+        self._eps = None
+        self._opm = 'grad'
+        self._opp = np.array([1.0e-5])
+        self._imax = 500
+        self._opopts = ['grad', 'adam']
+        self._xF = None
+        self._barF = None
+        self._varF = None
+        self._dbarF = None
+        self._dvarF = None
+        self._lml = None
+        self._nconv = None
+        self._niter = None
+        self._failed = None
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the number of problems in the batch.
+
+        :returns: int. Number of independent data sets.
+        '''
+
+        return self._yn.shape[0]
+
+
+    def set_search_parameters(self, epsilon=None, method=None, spars=None, maxiter=None):
+        r'''
+        Specify the search parameters that are used in the lockstep hyperparameter optimization.
+
+        :kwarg epsilon: float. Convergence criteria for optimization algorithm, set negative to disable. (optional)
+
+        :kwarg method: str or int. Hyperparameter optimization algorithm selection. Choices include::
+                       [:code:`grad`, :code:`adam`] or their respective indices in the list.
+
+        :kwarg spars: array. Parameters for hyperparameter optimization algorithm, defaults depend on chosen method. (optional)
+
+        :kwarg maxiter: int. Maximum number of iterations of the optimization algorithm. (optional)
+
+        :returns: none.
+        '''
+
+        midx = None
+        if isinstance(epsilon, number_types) and float(epsilon) > 0.0:
+            self._eps = float(epsilon)
+        elif isinstance(epsilon, number_types) and float(epsilon) <= 0.0:
+            self._eps = None
+        elif isinstance(epsilon, str):
+            self._eps = None
+        if isinstance(method, str):
+            if method.lower() not in self._opopts:
+                raise ValueError(f'Batched optimization method must be one of {self._opopts}.')
+            midx = self._opopts.index(method.lower())
+        elif isinstance(method, number_types):
+            if int(method) < 0 or int(method) >= len(self._opopts):
+                raise ValueError(f'Batched optimization method must be one of {self._opopts}.')
+            midx = int(method)
+        if midx is not None:
+            self._opm = self._opopts[midx]
+            self._opp = np.array([1.0e-3, 0.9, 0.999], dtype=self._dtype) if self._opm == 'adam' else np.array([1.0e-5], dtype=self._dtype)
+        if isinstance(spars, array_types):
+            for ii in range(len(spars)):
+                if ii < self._opp.size and isinstance(spars[ii], number_types):
+                    self._opp[ii] = float(spars[ii])
+        if isinstance(maxiter, number_types) and int(maxiter) > 0:
+            self._imax = int(maxiter)
+
+
+    def _kernel_matrices(self, theta, x1, x2, der=0, hder=None):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the covariance function for each set of hyperparameters in the batch. Supported kernels
+        are evaluated for the whole batch at once from a single distance matrix, otherwise each distinct
+        set of hyperparameters is evaluated once, such that problems sharing hyperparameters also share
+        the kernel evaluation.
+
+        :arg theta: array. Matrix of hyperparameters, with one set per row.
+
+        :arg x1: array. Vector of x-values along the second axis of the output matrices.
+
+        :arg x2: array. Vector of x-values along the first axis of the output matrices.
+
+        :kwarg der: int. Order of x derivative with which to evaluate the covariance function.
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the covariance function. (optional)
+
+        :returns: array. Stacked covariance matrices, with the batch along the first axis.
+        '''
+
+        if der == 0:
+            rr = np.abs(x1[np.newaxis, :] - x2[:, np.newaxis])
+            mats = _batch_covariance(self._kk, theta, rr, hder=hder)
+            if mats is not None:
+                return mats
+        (unique, inverse) = np.unique(theta, axis=0, return_inverse=True)
+        kk = copy.copy(self._kk)
+        mats = []
+        for ii in range(unique.shape[0]):
+            kk.hyperparameters = unique[ii]
+            mats.append(kk(x1, x2, der=der, hder=hder))
+        return np.stack(mats, axis=0)[inverse.flatten()]
+
+
+    def _factorize(self, theta, idx):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Constructs and factorizes the training covariance matrices of the selected problems with a
+        stacked Cholesky decomposition. Problems for which the factorization fails are flagged by a
+        log-marginal-likelihood of :code:`NaN`.
+
+        :arg theta: array. Matrix of hyperparameters of the selected problems, with one set per row.
+
+        :arg idx: array. Indices of the selected problems within the batch.
+
+        :returns: (array, array, array).
+            Stacked lower Cholesky factors, stacked weight vectors, vector of log-marginal-likelihoods
+            including the regularization component.
+        '''
+
+        valid = self._valid[idx]
+        KK = self._kernel_matrices(theta, self._xx, self._xx)
+        # Masked points are decoupled from the rest and given unit variance and zero value
+        KK = KK * (valid[:, :, np.newaxis] & valid[:, np.newaxis, :])
+        KK = KK + np.eye(self._xx.shape[0], dtype=self._dtype) * np.where(valid, np.power(self._en[idx], 2.0), 1.0)[:, np.newaxis, :]
+        LL = np.full(KK.shape, np.nan, dtype=self._dtype)
+        try:
+            LL = np.linalg.cholesky(KK)
+        except np.linalg.LinAlgError:
+            for ii in range(KK.shape[0]):
+                try:
+                    LL[ii] = np.linalg.cholesky(KK[ii])
+                except np.linalg.LinAlgError:
+                    pass
+        zz = np.linalg.solve(LL, self._yn[idx][:, :, np.newaxis])
+        alpha = np.linalg.solve(np.swapaxes(LL, -1, -2), zz)[..., 0]
+        ldet = 2.0 * np.sum(np.log(np.diagonal(LL, axis1=-2, axis2=-1)), axis=-1)
+        lml = -0.5 * np.sum(np.power(zz[..., 0], 2.0), axis=-1) - 0.5 * self._lp * ldet - 0.5 * self._nvalid[idx] * np.log(2.0 * np.pi)
+        return (LL, alpha, lml)
+
+
+    def _inverse(self, LL):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Computes the stacked inverses of the training covariance matrices from their Cholesky factors.
+
+        :arg LL: array. Stacked lower Cholesky factors.
+
+        :returns: array. Stacked inverse covariance matrices.
+        '''
+
+        eye = np.broadcast_to(np.eye(LL.shape[-1], dtype=self._dtype), LL.shape)
+        LLinv = np.linalg.solve(LL, eye)
+        return np.matmul(np.swapaxes(LLinv, -1, -2), LLinv)
+
+
+    def _grad_lml(self, theta, idx, LL, alpha):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Computes the gradients of the log-marginal-likelihoods of the selected problems with respect to
+        the hyperparameters in logarithmic space.
+
+        :arg theta: array. Matrix of hyperparameters of the selected problems, with one set per row.
+
+        :arg idx: array. Indices of the selected problems within the batch.
+
+        :arg LL: array. Stacked lower Cholesky factors of the selected problems.
+
+        :arg alpha: array. Stacked weight vectors of the selected problems.
+
+        :returns: array. Matrix of log-marginal-likelihood gradients, with one set per row.
+        '''
+
+        valid = self._valid[idx]
+        vmask = valid[:, :, np.newaxis] & valid[:, np.newaxis, :]
+        KKinv = self._inverse(LL)
+        gradlml = np.zeros(theta.shape, dtype=self._dtype)
+        for ii in range(theta.shape[1]):
+            HH = self._kernel_matrices(theta, self._xx, self._xx, hder=ii) * vmask
+            fit = np.einsum('bi,bij,bj->b', alpha, HH, alpha)
+            trace = np.einsum('bij,bji->b', KKinv, HH)
+            gradlml[:, ii] = 0.5 * fit - 0.5 * self._lp * trace
+        return gradlml * np.log(10.0) * theta
+
+
+    def _optimize(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Lockstep hyperparameter optimization algorithm, searching the hyperparameters of all problems
+        in log-space using the selected update rule, identical to the corresponding :code:`GaussianProcess`
+        optimizer. Each problem stops updating once its own convergence criteria is met. Problems for
+        which a step yields a non-finite log-marginal-likelihood are stopped at their last finite point
+        and flagged as failed instead of converged.
+
+        :returns: none.
+        '''
+
+        if not self._kk.is_hderiv_implemented():
+            raise ValueError('Batched optimization requires a kernel with explicit hyperparameter derivatives.')
+        nb = self.size
+        theta_old = np.log10(self._theta)
+        lmlold = itemgetter(2)(self._factorize(self._theta, np.arange(nb)))
+        failed = np.invert(np.isfinite(lmlold))
+        active = np.invert(failed)
+        mold = np.zeros(theta_old.shape, dtype=self._dtype)
+        vold = np.zeros(theta_old.shape, dtype=self._dtype)
+        niter = np.zeros((nb, ), dtype=int)
+        icount = 0
+        while np.any(active) and icount < self._imax:
+            idx = np.where(active)[0]
+            (LL, alpha) = itemgetter(0, 1)(self._factorize(np.power(10.0, theta_old[idx]), idx))
+            gradlml = self._grad_lml(np.power(10.0, theta_old[idx]), idx, LL, alpha)
+            if self._opm == 'adam':
+                (eta, b1, b2) = (self._opp[0], self._opp[1], self._opp[2])
+                mnew = gradlml if icount == 0 else b1 * mold[idx] + (1.0 - b1) * gradlml
+                vnew = np.power(gradlml, 2.0) if icount == 0 else b2 * vold[idx] + (1.0 - b2) * np.power(gradlml, 2.0)
+                theta_step = eta * (mnew / (1.0 - (b1 ** (icount + 1)))) / (np.sqrt(vnew / (1.0 - (b2 ** (icount + 1)))) + 1.0e-8)
+                mold[idx] = mnew
+                vold[idx] = vnew
+            else:
+                theta_step = self._opp[0] * gradlml
+            theta_new = theta_old[idx] + theta_step
+            lmlnew = itemgetter(2)(self._factorize(np.power(10.0, theta_new), idx))
+            good = np.isfinite(lmlnew)
+            dlml = np.abs(lmlold[idx] - lmlnew)
+            # Diverging problems keep their last finite point and drop out of the search
+            theta_old[idx[good]] = theta_new[good]
+            lmlold[idx[good]] = lmlnew[good]
+            niter[idx[good]] = niter[idx[good]] + 1
+            failed[idx[~good]] = True
+            active[idx] = good & (dlml > self._eps)
+            icount = icount + 1
+        if np.any(active):
+            print(f'   Maximum number of iterations performed on batched search for {int(np.sum(active))} problems.')
+        self._theta = self._clip_hyperparameters(np.power(10.0, theta_old))
+        self._nconv = np.invert(active | failed)
+        self._niter = niter
+        self._failed = failed
+        self._lml = lmlold
+
+
+    def _clip_hyperparameters(self, theta):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Applies any bounds enforced by the kernel to the hyperparameters of each problem.
+
+        :arg theta: array. Matrix of hyperparameters, with one set per row.
+
+        :returns: array. Matrix of hyperparameters, as stored by the kernel.
+        '''
+
+        kk = copy.copy(self._kk)
+        out = np.zeros(theta.shape, dtype=self._dtype)
+        for ii in range(theta.shape[0]):
+            kk.hyperparameters = theta[ii]
+            out[ii] = kk.hyperparameters
+        return out
+
+
+    def GPRFit(self, xnew):
+        r'''
+        Main batched GP regression fitting routine. Optimizes the hyperparameters of all problems in
+        lockstep, if a convergence criteria was given, and evaluates the fits and their derivatives at
+        the requested x-values. Problems which cannot be fitted are returned as rows of :code:`NaN`
+        and flagged by :code:`get_failures()`, without affecting the rest of the batch.
+
+        :arg xnew: array. Vector of x-values at which the predicted fits will be evaluated.
+
+        :returns: none.
+        '''
+
+        xn = None
+        if isinstance(xnew, array_types) and len(xnew) > 0:
+            xn = np.array(xnew, dtype=self._dtype)
+        if xn is None or xn.ndim != 1:
+            raise ValueError('A valid vector of prediction x-points must be given.')
+
+        oxn = xn.copy()
+
+        # Adjust overlapping values between shared x-values and prediction vector, as in GaussianProcess
+        overlap = np.isin(xn, self._xx)
+        if np.any(overlap):
+            span = (np.nanmax(xn) - np.nanmin(xn)) if xn.shape[0] > 1 else (np.nanmax(self._xx) - np.nanmin(self._xx))
+            xn[overlap] = xn[overlap] + 1.0e-6 * span
+
+        nb = self.size
+        if self._eps is not None:
+            self._optimize()
+        else:
+            self._nconv = np.full((nb, ), True)
+            self._niter = np.zeros((nb, ), dtype=int)
+            self._failed = np.full((nb, ), False)
+            self._lml = np.full((nb, ), np.nan, dtype=self._dtype)
+        lml = self._lml.copy()
+        idx = np.where(~self._failed)[0]
+        if idx.size > 0:
+            (LL, alpha, lml[idx]) = self._factorize(self._theta[idx], idx)
+            good = np.isfinite(lml[idx])
+            self._failed[idx[~good]] = True
+            (idx, LL, alpha) = (idx[good], LL[good], alpha[good])
+        self._nconv = self._nconv & np.invert(self._failed)
+        if np.any(self._failed):
+            print(f'   Fit failed for problems {np.where(self._failed)[0].tolist()}, check kernel settings and data.')
+
+        barF = np.full((nb, xn.shape[0]), np.nan, dtype=self._dtype)
+        varF = np.full((nb, xn.shape[0]), np.nan, dtype=self._dtype)
+        dbarF = np.full((nb, xn.shape[0]), np.nan, dtype=self._dtype)
+        dvarF = np.full((nb, xn.shape[0]), np.nan, dtype=self._dtype)
+        if idx.size > 0:
+            KKinv = self._inverse(LL)
+            vmask = self._valid[idx][:, :, np.newaxis]
+            for (dd, bar, var) in [(0, barF, varF), (1, dbarF, dvarF)]:
+                ks = self._kernel_matrices(self._theta[idx], xn, self._xx, der=-dd) * vmask
+                kt = np.diagonal(self._kernel_matrices(self._theta[idx], xn, xn, der=2*dd), axis1=-2, axis2=-1)
+                bar[idx] = np.einsum('bnm,bn->bm', ks, alpha)
+                var[idx] = kt - np.einsum('bnm,bnk,bkm->bm', ks, KKinv, ks)
+        self._xF = oxn
+        self._barF = barF * self._sc[:, np.newaxis] + self._myy[:, np.newaxis]
+        self._varF = varF * np.power(self._sc, 2.0)[:, np.newaxis]
+        self._dbarF = dbarF * self._sc[:, np.newaxis]
+        self._dvarF = dvarF * np.power(self._sc, 2.0)[:, np.newaxis]
+        self._lml = lml
+
+
+    def get_gp_x(self):
+        r'''
+        Returns the x-values used in the latest :code:`GPRFit()` call.
+
+        :returns: array. Vector of x-values corresponding to predicted y-values.
+        '''
+
+        return copy.deepcopy(self._xF)
+
+
+    def get_gp_results(self, noise_flag=True):
+        r'''
+        Returns all common predicted values computed in the latest :code:`GPRFit()` call, stacked
+        across the batch. The noise term corresponds to the root-mean-square y-error of each problem,
+        as in :code:`GaussianProcess` fits without heteroscedastic error treatment.
+
+        :kwarg noise_flag: bool. Specifies inclusion of noise term in returned errors. (optional)
+
+        :returns: (array, array, array, array).
+            Matrices in order of y-values, y-errors, dy/dx-values, dy/dx-errors, with one problem per row.
+        '''
+
+        if self._barF is None:
+            return (None, None, None, None)
+        varN = np.power(self._erms, 2.0)[:, np.newaxis] if noise_flag else np.zeros((self.size, 1), dtype=self._dtype)
+        dvarmod = (self._varF + varN) / np.where(self._varF == 0.0, 1.0, self._varF)
+        sigF = np.sqrt(self._varF + varN)
+        dsigF = np.sqrt(dvarmod * self._dvarF)
+        return (self._barF.copy(), sigF, self._dbarF.copy(), dsigF)
+
+
+    def get_gp_lml(self):
+        r'''
+        Returns the log-marginal-likelihoods of the fits in the latest :code:`GPRFit()` call.
+
+        :returns: array. Vector of log-marginal-likelihoods including the regularization component.
+        '''
+
+        return copy.deepcopy(self._lml)
+
+
+    def get_gp_hyperparameters(self):
+        r'''
+        Returns the hyperparameters of every problem, optimized if requested in the latest :code:`GPRFit()` call.
+
+        :returns: array. Matrix of hyperparameters, with one set per row.
+        '''
+
+        return self._theta.copy()
+
+
+    def get_gp_kernels(self):
+        r'''
+        Returns the covariance functions of every problem, optimized if requested in the latest :code:`GPRFit()` call.
+
+        :returns: list. :code:`_Kernel` instances, one per problem.
+        '''
+
+        kernels = []
+        for ii in range(self.size):
+            kk = copy.copy(self._kk)
+            kk.hyperparameters = self._theta[ii]
+            kernels.append(kk)
+        return kernels
+
+
+    def get_convergence(self):
+        r'''
+        Returns the convergence status of the lockstep optimization in the latest :code:`GPRFit()` call.
+
+        :returns: (array, array).
+            Vector of flags indicating converged problems, vector of iterations performed per problem.
+        '''
+
+        return (copy.deepcopy(self._nconv), copy.deepcopy(self._niter))
+
+
+    def get_failures(self):
+        r'''
+        Returns the problems which could not be fitted in the latest :code:`GPRFit()` call, either
+        because the optimization diverged or because the final covariance matrix could not be
+        factorized. The predicted values of these problems are :code:`NaN`.
+
+        :returns: array. Vector of flags indicating failed problems.
+        '''
+
+        return copy.deepcopy(self._failed)
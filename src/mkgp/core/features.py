@@ -0,0 +1,752 @@
+r'''
+Random Fourier feature expansions of stationary covariance functions, and pathwise sampling of Gaussian
+Process Regression posteriors built upon them, which never requires the predictive covariance matrix.
+'''
+
+# Required imports
+import copy
+import numpy as np
+import scipy.linalg as spla
+import scipy.special as spsp
+
+from .definitions import number_types, array_types, default_dtype
+from .kernels import Sum_Kernel, Product_Kernel, SE_Kernel, RQ_Kernel, Matern_HI_Kernel
+from .posterior import GaussianProcessPosterior, CoregionalizedPosterior, _cross_covariance
+
+__all__ = [
+    'RandomFeatures',  # Random Fourier feature expansion of a stationary kernel
+    'PathwiseSampler',  # Posterior function sampler using Matheron's rule
+    'PathwiseSamples',  # Batch of posterior functions evaluable at arbitrary x-values
+    'FeaturePosterior',  # Approximate posterior fitted in random feature weight space
+]
+
+
+def _feature_blocks(kernel, offset=0):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Splits a covariance function into the terms of its sum, each term being a single stationary
+    kernel or a product of them, such that every term receives its own set of features.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :kwarg offset: int. Index of the first hyperparameter of the kernel within the full hyperparameter vector. (optional)
+
+    :returns: list.
+        Terms of the sum, each a list of (kernel, hyperparameter offset) tuples of the multiplied kernels.
+    '''
+
+    if isinstance(kernel, Sum_Kernel):
+        blocks = []
+        for kk in kernel._kernel_list:
+            blocks.extend(_feature_blocks(kk, offset))
+            offset += kk.hyperparameters.size
+        return blocks
+    leaves = kernel._kernel_list if isinstance(kernel, Product_Kernel) else [kernel]
+    block = []
+    for kk in leaves:
+        if not isinstance(kk, (SE_Kernel, RQ_Kernel, Matern_HI_Kernel)):
+            raise TypeError(f'Random feature expansion is only available for SE, RQ, MH kernels and their sums and products, not {kernel.name}.')
+        block.append((kk, offset))
+        offset += kk.hyperparameters.size
+    return [block]
+
+
+def _base_variates(kernel, nfeatures, rng):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Draws the random variates which, combined with the hyperparameters, define the frequencies
+    sampled from the normalized spectral density of a stationary kernel.
+
+    :arg kernel: object. The covariance function, as a :code:`SE_Kernel`, :code:`RQ_Kernel` or :code:`Matern_HI_Kernel` instance.
+
+    :arg nfeatures: int. Number of features.
+
+    :arg rng: object. The :code:`numpy.random.Generator` instance to draw from.
+
+    :returns: tuple. Arrays of random variates.
+    '''
+
+    if isinstance(kernel, RQ_Kernel):
+        # Gamma mixing variates are drawn through their quantiles, such that they vary smoothly with alpha
+        return (rng.standard_normal(nfeatures), np.clip(rng.uniform(size=nfeatures), 1.0e-12, 1.0 - 1.0e-12))
+    if isinstance(kernel, Matern_HI_Kernel):
+        return (rng.standard_t(2.0 * kernel.constants[0], size=nfeatures), )
+    return (rng.standard_normal(nfeatures), )
+
+
+def _frequencies(kernel, variates):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Converts the random variates of a stationary kernel into frequencies for its current
+    hyperparameters, along with the derivatives of the frequencies with respect to them.
+
+    :arg kernel: object. The covariance function, as a :code:`SE_Kernel`, :code:`RQ_Kernel` or :code:`Matern_HI_Kernel` instance.
+
+    :arg variates: tuple. Arrays of random variates, as returned by :code:`_base_variates()`.
+
+    :returns: (array, list).
+        Vector of frequencies, list of frequency derivatives per hyperparameter with None for the amplitude.
+    '''
+
+    hyps = kernel.hyperparameters
+    if isinstance(kernel, RQ_Kernel):
+        # Rational quadratic kernel is a gamma-distributed mixture of square exponential kernels
+        (zz, uu) = variates
+        alpha = hyps[2]
+        step = 1.0e-6 * alpha
+        tau = spsp.gammaincinv(alpha, uu) / alpha
+        dtau = (spsp.gammaincinv(alpha + step, uu) / (alpha + step) - spsp.gammaincinv(alpha - step, uu) / (alpha - step)) / (2.0 * step)
+        omega = zz * np.sqrt(tau) / hyps[1]
+        domega = np.divide(omega * dtau, 2.0 * tau, out=np.zeros_like(omega), where=(tau > 0.0))
+        return (omega, [None, -omega / hyps[1], domega])
+    omega = variates[0] / hyps[1]
+    return (omega, [None, -omega / hyps[1]])
+
+
+def _evaluate_features(xx, omega, phase, amp, der=0):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Evaluates random Fourier features, or their first x derivative, at the input x-values.
+
+    :arg xx: array. Vector of x-values.
+
+    :arg omega: array. Vector of feature frequencies.
+
+    :arg phase: array. Vector of feature phases.
+
+    :arg amp: array. Vector of feature amplitudes.
+
+    :kwarg der: int. Order of x derivative of the features, only 0 and 1 are supported. (optional)
+
+    :returns: array. Feature matrix with the x-values along the first axis and the features along the second axis.
+    '''
+
+    arg = np.outer(xx, omega)
+    arg += phase
+    if int(der) > 0:
+        np.sin(arg, out=arg)
+        arg *= -amp * omega
+    else:
+        np.cos(arg, out=arg)
+        arg *= amp
+    return arg
+
+
+class RandomFeatures():
+    r'''
+    Random Fourier feature expansion of a stationary covariance function of 1-dimensional x-values,
+    such that :code:`k(x1, x2)` is approximated by the inner product of the feature vectors at
+    :code:`x1` and :code:`x2`. Supports the :code:`SE_Kernel`, :code:`RQ_Kernel` and
+    :code:`Matern_HI_Kernel` classes, and :code:`Sum_Kernel` and :code:`Product_Kernel` instances
+    combining them, where each term of a sum receives its own set of features.
+
+    .. note::
+
+        The frequencies are defined by random variates which do not depend on the hyperparameters,
+        such that the features are differentiable with respect to the hyperparameters and that
+        expansions of the same kernel with different hyperparameters share their random numbers.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :kwarg nfeatures: int. Number of features per term of the kernel sum. (optional)
+
+    :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the frequencies and phases. (optional)
+    '''
+
+    def __init__(self, kernel, nfeatures=1024, seed=None, dtype=None):
+        r'''
+        Draws the frequencies and phases of the features.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance.
+
+        :kwarg nfeatures: int. Number of features per term of the kernel sum. (optional)
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the frequencies and phases. (optional)
+
+        :returns: none.
+        '''
+
+        self._dtype = dtype if dtype is not None else default_dtype
+        if not isinstance(nfeatures, number_types) or int(nfeatures) <= 0:
+            raise ValueError('Number of random features must be a positive integer.')
+        nf = int(nfeatures)
+        rng = np.random.default_rng(seed)
+        blocks = _feature_blocks(kernel)
+        nblk = len(blocks)
+        self._nhyp = kernel.hyperparameters.size
+        self._omega = np.zeros((nblk * nf, ), dtype=self._dtype)
+        self._amp = np.zeros((nblk * nf, ), dtype=self._dtype)
+        self._phase = rng.uniform(0.0, 2.0 * np.pi, size=nblk * nf).astype(self._dtype)
+        # Hyperparameter index -> (feature slice, amplitude ratio or frequency derivative)
+        self._hmap = {}
+        for (ii, block) in enumerate(blocks):
+            fs = slice(ii * nf, (ii + 1) * nf)
+            amp = np.sqrt(2.0 / nf)
+            for (kk, offset) in block:
+                (omega, domega) = _frequencies(kk, _base_variates(kk, nf, rng))
+                self._omega[fs] += omega
+                amp *= kk.hyperparameters[0]
+                for (jj, dw) in enumerate(domega):
+                    self._hmap[offset + jj] = (fs, 1.0 / kk.hyperparameters[0] if dw is None else dw.astype(self._dtype))
+            self._amp[fs] = amp
+
+
+    def __call__(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the feature vectors at the input x-values.
+
+        :arg xx: array. Vector of x-values.
+
+        :kwarg der: int. Order of x derivative of the features, only 0 and 1 are supported. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the features. (optional)
+
+        :returns: array. Feature matrix with the x-values along the first axis and the features along the second axis.
+        '''
+
+        xv = np.asarray(xx, dtype=self._dtype)
+        if hder is None:
+            return _evaluate_features(xv, self._omega, self._phase, self._amp, der=der)
+        if not isinstance(hder, number_types) or int(hder) not in self._hmap:
+            raise ValueError(f'Hyperparameter index must be an integer between 0 and {self._nhyp - 1}.')
+        (fs, deriv) = self._hmap[int(hder)]
+        out = np.zeros((xv.size, self._omega.size), dtype=self._dtype)
+        omega = self._omega[fs]
+        amp = self._amp[fs]
+        arg = np.outer(xv, omega)
+        arg += self._phase[fs]
+        if isinstance(deriv, np.ndarray):
+            # Frequency derivative, through the argument of the cosine
+            xdw = np.outer(xv, deriv)
+            if int(der) > 0:
+                out[:, fs] = -amp * (deriv * np.sin(arg) + omega * xdw * np.cos(arg))
+            else:
+                out[:, fs] = -amp * xdw * np.sin(arg)
+        else:
+            # Amplitude derivative, proportional to the features themselves
+            out[:, fs] = deriv * _evaluate_features(xv, omega, self._phase[fs], amp, der=der)
+        return out
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the total number of features.
+
+        :returns: int. Number of features.
+        '''
+
+        return self._omega.size
+
+
+class PathwiseSamples():
+    r'''
+    Batch of functions drawn from a Gaussian process posterior, each represented by the weights
+    of a random feature expansion of a prior function and by the weights of its data correction.
+    Evaluation at any set of x-values costs a number of operations linear in the number of points.
+
+    .. note::
+
+        Instances are created by :code:`PathwiseSampler.draw()`.
+    '''
+
+    def __init__(self, sampler, fweights, uweights, nsamples):
+        r'''
+        Stores the prior and update weights of the drawn functions.
+
+        :arg sampler: object. The :code:`PathwiseSampler` instance which drew the functions.
+
+        :arg fweights: array. Feature weights of the prior functions, one column per function.
+
+        :arg uweights: array. Weights of the data correction, one column per function.
+
+        :arg nsamples: int. Number of drawn functions per output.
+
+        :returns: none.
+        '''
+
+        self._sampler = sampler
+        self._fw = fweights
+        self._uw = uweights
+        self._ns = nsamples
+
+
+    def __call__(self, xnew, der=0, chunk=4096):
+        r'''
+        Evaluates the drawn functions at the input x-values, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the functions will be evaluated.
+
+        :kwarg der: int. Derivative order of output, only 0 and 1 are supported. (optional)
+
+        :kwarg chunk: int. Maximum number of x-values evaluated at once, bounding the size of the intermediate matrices. (optional)
+
+        :returns: array. Function values with the sample index along the first axis and the x-values along the second axis, followed by the outputs for multi-output fits.
+        '''
+
+        sampler = self._sampler
+        if not isinstance(xnew, array_types) or len(xnew) == 0:
+            raise ValueError('A valid vector of prediction x-points must be given.')
+        xn = np.asarray(xnew, dtype=sampler._dtype)
+        if xn.ndim != 1:
+            raise ValueError('Pathwise samples can only be evaluated at 1-dimensional x-values.')
+        dd = 1 if int(der) > 0 else 0
+        nc = int(chunk) if isinstance(chunk, number_types) and int(chunk) > 0 else 4096
+        out = np.empty((xn.size, self._fw.shape[1]), dtype=sampler._dtype)
+        for start in range(0, xn.size, nc):
+            xc = xn[start:start+nc]
+            ks = _cross_covariance(sampler._kk, sampler._xx, sampler._xxd, xc, dd=dd, mask=sampler._mask)
+            out[start:start+xc.size] = sampler._features(xc, der=dd) @ self._fw + ks.T @ self._uw
+        out = np.transpose(out.reshape(xn.size, self._ns, sampler._nout), axes=(1, 0, 2))
+        out *= sampler._sc
+        if dd == 0:
+            out += sampler._myy
+        return out[..., 0] if sampler._single else out
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the number of drawn functions.
+
+        :returns: int. Number of functions per output.
+        '''
+
+        return self._ns
+
+
+class PathwiseSampler():
+    r'''
+    Sampler of functions from the posterior distribution of a Gaussian process fit, following
+    Matheron's rule. Prior functions are drawn from a random feature expansion of the kernel
+    and corrected with the training data through the stored factorization, such that the
+    predictive covariance matrix is never constructed.
+
+    .. note::
+
+        The samples are exact in the update term and approximate only through the finite number
+        of features of the prior functions. The x-values must be 1-dimensional.
+
+    :arg posterior: object. The :code:`GaussianProcessPosterior` instance to sample from.
+
+    :kwarg nfeatures: int. Number of features per constituent kernel. (optional)
+
+    :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the features. (optional)
+    '''
+
+    def __init__(self, posterior, nfeatures=1024, seed=None):
+        r'''
+        Draws the random features and evaluates them at the training points.
+
+        :arg posterior: object. The :code:`GaussianProcessPosterior` instance to sample from.
+
+        :kwarg nfeatures: int. Number of features per constituent kernel. (optional)
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the features. (optional)
+
+        :returns: none.
+        '''
+
+        if not isinstance(posterior, GaussianProcessPosterior) or isinstance(posterior, (CoregionalizedPosterior, FeaturePosterior)):
+            raise TypeError('Pathwise sampling requires an exact single-kernel GaussianProcessPosterior instance.')
+        if posterior._xx.ndim != 1:
+            raise ValueError('Pathwise sampling is only available for 1-dimensional x-values.')
+        self._post = posterior
+        self._dtype = posterior._dtype
+        self._kk = posterior._kk
+        self._xx = posterior._xx
+        self._xxd = posterior._xxd
+        self._mask = posterior._mask
+        self._sc = posterior._sc
+        self._myy = posterior._myy
+        self._single = (posterior._yf.ndim == 1)
+        self._nout = 1 if self._single else posterior._yf.shape[1]
+        self._features = RandomFeatures(self._kk, nfeatures=nfeatures, seed=seed, dtype=self._dtype)
+        phi = np.concatenate((self._features(self._xx), self._features(self._xxd, der=1)), axis=0)
+        if self._mask is not None:
+            phi = phi[self._mask]
+        if phi.shape[0] != posterior._yf.shape[0]:
+            raise ValueError('Pathwise sampling is not available for this training data layout.')
+        self._phi = phi
+        self._yf = posterior._yf.reshape(phi.shape[0], -1)
+        self._yef = posterior._yef.reshape(phi.shape[0], -1)
+
+
+    def draw(self, nsamples, seed=None):
+        r'''
+        Draws a batch of functions from the posterior distribution, at the cost of one solve with
+        the factorized training covariance matrix for the whole batch.
+
+        :arg nsamples: int. Number of functions per output.
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the function weights and noise. (optional)
+
+        :returns: object. The :code:`PathwiseSamples` instance holding the drawn functions.
+        '''
+
+        if not isinstance(nsamples, number_types) or int(nsamples) <= 0:
+            raise ValueError('Number of samples must be a positive integer.')
+        ns = int(nsamples)
+        rng = np.random.default_rng(seed)
+        nrows = self._phi.shape[0]
+        fweights = rng.standard_normal((self._features.size, ns * self._nout), dtype=self._dtype)
+        noise = rng.standard_normal((nrows, ns, self._nout), dtype=self._dtype) * self._yef[:, np.newaxis, :]
+        resid = (self._yf[:, np.newaxis, :] - noise).reshape(nrows, -1) - self._phi @ fweights
+        uweights = self._post.solve(resid)
+        return PathwiseSamples(self, fweights, uweights, ns)
+
+
+class FeaturePosterior(GaussianProcessPosterior):
+    r'''
+    Approximate posterior distribution of a Gaussian process regression problem, where the kernel
+    is replaced by a random Fourier feature expansion of D features, see :code:`RandomFeatures`.
+    The fit is performed on the feature weights, such that only the D x D matrix
+    :code:`A = Phi^T E^(-1) Phi + I` is factorized, at a cost of O(N D^2) instead of O(N^3) for
+    the exact training covariance matrix. The log-marginal-likelihood and its gradient are
+    evaluated with the determinant lemma and the Woodbury identity in the same weight space.
+
+    .. note::
+
+        Only 1-dimensional x-values are supported. Y-errors below :code:`1.0e-6` are raised to
+        that value, as the noise covariance must be invertible. The factorization costs O(D^3),
+        such that the approximation only pays off when the number of data points exceeds D.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance supported by :code:`RandomFeatures`.
+
+    :arg xx: array. Vector of x-values of data to be fitted.
+
+    :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+    :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+    :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+    :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+    :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+    :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+    :kwarg ymean: float or array. Offset removed from the y-values during normalization, one per output if multiple outputs are given.
+
+    :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+
+    :kwarg nfeatures: int. Number of features per term of the kernel sum.
+
+    :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the features.
+    '''
+
+    # Covariance function objects and cached feature matrix, which are not part of the stored state
+    _kernel_attributes = ['_kk', '_rff', '_phi']
+
+    # Smallest y-error used in the weight space fit
+    _error_floor = 1.0e-6
+
+    def __init__(
+        self,
+        kernel,
+        xx,
+        yy,
+        ye,
+        dxx=None,
+        dyy=None,
+        dye=None,
+        regpar=1.0,
+        ymean=0.0,
+        yscale=1.0,
+        nfeatures=1024,
+        seed=0,
+        dtype=None
+    ):
+        r'''
+        Evaluates the features at the training points and factorizes the weight space precision matrix.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance supported by :code:`RandomFeatures`.
+
+        :arg xx: array. Vector of x-values of data to be fitted.
+
+        :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+        :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+        :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+        :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+        :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+        :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+        :kwarg ymean: float or array. Offset removed from the y-values during normalization, one per output if multiple outputs are given.
+
+        :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+
+        :kwarg nfeatures: int. Number of features per term of the kernel sum.
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the features.
+
+        :returns: none.
+        '''
+
+        if xx.ndim != 1:
+            raise ValueError('Random feature regression is only available for 1-dimensional x-values.')
+        self._dtype = dtype if dtype is not None else default_dtype
+        self._kk = copy.copy(kernel)
+        self._lp = float(regpar)
+        self._myy = ymean
+        self._sc = yscale
+        self._set_data(xx, yy, ye, dxx, dyy, dye)
+        xf = self._xf
+        yf = self._yf
+        yef = self._yef
+
+        self._isd = self._derivative_rows()
+        self._rff = RandomFeatures(self._kk, nfeatures=nfeatures, seed=seed, dtype=self._dtype)
+        self._omega = self._rff._omega
+        self._phase = self._rff._phase
+        self._famp = self._rff._amp
+        self._phi = self._features(xf, self._isd)
+
+        # Weight space fit, A = Phi^T E^(-1) Phi + I and w = A^(-1) Phi^T E^(-1) y
+        var = np.clip(yef ** 2.0, self._error_floor ** 2.0, None)
+        self._winv = 1.0 / var
+        pw = self._phi * self._winv[:, np.newaxis]
+        amat = self._phi.T @ pw
+        amat[np.diag_indices_from(amat)] += 1.0
+        self._LL = None
+        self._LA = spla.cholesky(amat, lower=True, check_finite=False)
+        self._wbar = spla.cho_solve((self._LA, True), pw.T @ yf, check_finite=False)
+        self._alpha = self._weighted(yf - self._phi @ self._wbar)
+        self._ldet = 2.0 * np.sum(np.log(np.diag(self._LA))) + np.sum(np.log(var))
+
+        # Log-marginal-likelihood terms are identical to those of the exact posterior
+        fit = np.trace(np.atleast_2d(np.tensordot(yf.T, self._alpha, axes=(-1, 0))))
+        lml = np.squeeze(-0.5 * fit - 0.5 * self._nout * self._lp * self._ldet - 0.5 * self._nout * xf.size * np.log(2.0 * np.pi))
+
+        self._lml = float(lml)
+        self._lmlz = self._null_lml()
+
+
+    def _features(self, xx, isd=None):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the stored features at the input x-values.
+
+        :arg xx: array. Vector of x-values.
+
+        :kwarg isd: array or int. Boolean vector flagging the x-values of derivative data, or derivative order applied to all x-values. (optional)
+
+        :returns: array. Feature matrix with the x-values along the first axis and the features along the second axis.
+        '''
+
+        if not isinstance(isd, np.ndarray):
+            return _evaluate_features(xx, self._omega, self._phase, self._famp, der=isd if isd is not None else 0)
+        phi = _evaluate_features(xx, self._omega, self._phase, self._famp, der=0)
+        if np.any(isd):
+            phi[isd] = _evaluate_features(xx[isd], self._omega, self._phase, self._famp, der=1)
+        return phi
+
+
+    def _feature_derivative(self, hder):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the derivative of the training feature matrix with respect to a hyperparameter.
+
+        :arg hder: int. Index of hyperparameter with which to differentiate the features.
+
+        :returns: array. Derivative of the feature matrix at the training points.
+        '''
+
+        if self._rff is None:
+            raise ValueError('Hyperparameter derivatives require the random features drawn in the fit, which are not stored.')
+        dphi = self._rff(self._xf, der=0, hder=hder)
+        if np.any(self._isd):
+            dphi[self._isd] = self._rff(self._xf[self._isd], der=1, hder=hder)
+        return dphi
+
+
+    def _weighted(self, values):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Multiplies the input by the inverse of the y-error covariance matrix.
+
+        :arg values: array. Vector or matrix with the training data along the first axis.
+
+        :returns: array. Weighted values with the same shape as :code:`values`.
+        '''
+
+        return values * self._winv.reshape(-1, *([1] * (values.ndim - 1)))
+
+
+    def training_covariance(self, hder=None):
+        r'''
+        Constructs the approximate training covariance matrix implied by the features, without
+        the y-error contributions.
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the covariance matrix. (optional)
+
+        :returns: array. 2D covariance matrix of the training data, with invalid data points removed.
+        '''
+
+        if hder is None:
+            return self._phi @ self._phi.T
+        dphi = self._feature_derivative(hder)
+        dkk = dphi @ self._phi.T
+        return dkk + dkk.T
+
+
+    def cross_covariance(self, xn, dd=0):
+        r'''
+        Constructs the approximate cross-covariance matrix between the training data and the prediction points.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: array. Cross-covariance matrix with the training data along the first axis and the prediction points along the last axis.
+        '''
+
+        return self._phi @ self._features(xn, dd).T
+
+
+    def solve(self, rhs):
+        r'''
+        Applies the inverse of the approximate training covariance matrix, including y-errors, to
+        the input, using the Woodbury identity.
+
+        :arg rhs: array. Vector or matrix with the training data along the first axis.
+
+        :returns: array. Solution with the same shape as :code:`rhs`.
+        '''
+
+        wr = self._weighted(rhs)
+        corr = spla.cho_solve((self._LA, True), np.tensordot(self._phi.T, wr, axes=(-1, 0)), check_finite=False)
+        return wr - self._weighted(np.tensordot(self._phi, corr, axes=(-1, 0)))
+
+
+    def _predict(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the normalized predictive mean and full covariance matrix in weight space.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array).
+            Vector of predicted mean values, matrix of predicted variances and covariances.
+        '''
+
+        phin = self._features(xn, dd)
+        vv = spla.solve_triangular(self._LA, phin.T, lower=True, check_finite=False)
+        return (phin @ self._wbar, vv.T @ vv)
+
+
+    def _predict_diagonal(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the normalized predictive mean and only the diagonal of the covariance matrix in weight space.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array).
+            Vector of predicted mean values, vector of predicted variances.
+        '''
+
+        phin = self._features(xn, dd)
+        vv = spla.solve_triangular(self._LA, phin.T, lower=True, check_finite=False)
+        return (phin @ self._wbar, np.einsum('ij,ij->j', vv, vv))
+
+
+    def predict_mean(self, xnew, der=0):
+        r'''
+        Evaluates only the mean of the posterior distribution at the input x-values, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg der: int. Derivative order of output prediction, only 0 and 1 are supported. (optional)
+
+        :returns: array. Vector of predicted mean values.
+        '''
+
+        xn = self._check_input(xnew)
+        dd = 1 if int(der) > 0 else 0
+        barF = self._features(xn, dd) @ self._wbar
+        return barF * self._sc if dd > 0 else barF * self._sc + self._myy
+
+
+    def lml_gradient(self):
+        r'''
+        Computes the gradient of the log-marginal-likelihood with respect to the hyperparameters in
+        linear space, using the derivatives of the features instead of those of the kernel.
+
+        :returns: array. Vector of log-marginal-likelihood derivatives with respect to the hyperparameters including the regularization component.
+        '''
+
+        nrows = self._phi.shape[0]
+        alpha = self._alpha.reshape(nrows, -1)
+        pa = self._phi.T @ alpha
+        # tr(K^(-1) dK) = 2 tr(A^(-1) Phi^T E^(-1) dPhi)
+        mt = spla.cho_solve((self._LA, True), self._weighted(self._phi).T, check_finite=False).T
+        theta = self._kk.hyperparameters
+        gradlml = np.zeros(theta.shape, dtype=self._dtype)
+        for ii in range(gradlml.size):
+            dphi = self._feature_derivative(ii)
+            dfit = 2.0 * np.sum(pa * (dphi.T @ alpha))
+            dtr = 2.0 * np.sum(mt * dphi)
+            gradlml[ii] = 0.5 * dfit - 0.5 * self._nout * self._lp * dtr
+        return gradlml
+
+
+    @classmethod
+    def _from_state(cls, kernel, state):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Restores a posterior from its stored state, re-evaluating the training features from the
+        stored frequencies and phases.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used to construct the stored fit.
+
+        :arg state: dict. Instance attributes, as returned by :code:`_get_state()`.
+
+        :returns: object. The restored posterior instance.
+        '''
+
+        post = super()._from_state(kernel, state)
+        post._rff = None
+        post._phi = post._features(post._xf, post._isd)
+        return post
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the number of valid training points, including derivative data points.
+
+        :returns: int. Number of rows of the training feature matrix.
+        '''
+
+        return int(self._xf.shape[0])
+
+
+    @property
+    def nfeatures(self):
+        r'''
+        Returns the total number of random features.
+
+        :returns: int. Dimension of the weight space.
+        '''
+
+        return int(self._omega.size)
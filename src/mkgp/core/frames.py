@@ -0,0 +1,269 @@
+r'''
+Conversion of long-format pandas DataFrames into many independent Gaussian Process Regression fits, and
+of their results back into tidy DataFrames indexed by the group keys and the prediction x-values.
+'''
+
+# Required imports
+import numpy as np
+import pandas as pd
+
+from .definitions import default_dtype
+from .kernels import _Kernel
+from .batch import BatchGaussianProcess
+from .parallel import run_fits
+
+__all__ = [
+    'split_frame',  # Vectorized split of a DataFrame into per-group data arrays
+    'frame_specs',  # Fit specifications for run_fits from a DataFrame
+    'fit_frame',  # Independent fits of every group in a DataFrame
+    'batch_from_frame',  # Batched fit of groups sharing x-values
+    'results_frame',  # Tidy DataFrame from stacked fit results
+]
+
+
+# Mapping of the set_raw_data arguments onto the default column names
+default_columns = {
+    'xdata': 'x',
+    'ydata': 'y',
+    'xerr': 'xerr',
+    'yerr': 'yerr',
+}
+
+_result_names = ['mean', 'std', 'dmean', 'dstd']
+
+
+def _column_map(frame, columns):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Resolves the mapping of the :code:`set_raw_data` arguments onto the DataFrame columns.
+
+    :arg frame: object. The input DataFrame.
+
+    :arg columns: dict. Mapping of :code:`xdata`, :code:`ydata`, :code:`xerr` and :code:`yerr` onto column names, missing entries take the default names.
+
+    :returns: dict. Mapping restricted to the columns present in the DataFrame.
+    '''
+
+    cmap = dict(default_columns)
+    if isinstance(columns, dict):
+        for key, value in columns.items():
+            if key not in default_columns:
+                raise ValueError(f'Column mapping keys must be within {list(default_columns.keys())}.')
+            cmap[key] = value
+    for key in ['xdata', 'ydata']:
+        if cmap[key] not in frame.columns:
+            raise ValueError(f'Required column {cmap[key]!r} not found in DataFrame.')
+    return {key: value for key, value in cmap.items() if value is not None and value in frame.columns}
+
+
+def _group_codes(frame, by):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Assigns an integer code to every row according to its group, in sorted group order.
+
+    :arg frame: object. The input DataFrame.
+
+    :arg by: str or list. Column names defining the groups.
+
+    :returns: (list, array, object).
+        Group key columns, vector of group codes per row with -1 for rows with missing keys, index of group keys.
+    '''
+
+    keys = [by] if isinstance(by, str) else list(by)
+    if len(keys) == 0:
+        raise ValueError('At least one group key column must be given.')
+    grouped = frame.groupby(keys, sort=True)
+    # Rows with missing group keys are not assigned a group, which yields floating point NaN codes
+    codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    gindex = grouped.size().index
+    return (keys, codes, gindex)
+
+
+def split_frame(frame, by, columns=None, dtype=None):
+    r'''
+    Splits a long-format DataFrame into the data arrays of each group with a single stable sort,
+    such that the arrays of every group are contiguous slices of the sorted columns. Rows with
+    missing group keys are discarded.
+
+    :arg frame: object. The input DataFrame, with one data point per row.
+
+    :arg by: str or list. Column names defining the groups, eg. shot and time window.
+
+    :kwarg columns: dict. Mapping of :code:`xdata`, :code:`ydata`, :code:`xerr` and :code:`yerr` onto column names. (optional)
+
+    :kwarg dtype: object. Data type of the returned arrays, the package default is used if not given. (optional)
+
+    :returns: (object, list).
+        Index of group keys, list of dicts holding the :code:`set_raw_data` arguments of each group.
+    '''
+
+    dt = dtype if dtype is not None else default_dtype
+    cmap = _column_map(frame, columns)
+    (keys, codes, gindex) = _group_codes(frame, by)
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes[order], minlength=len(gindex)))))
+    arrays = {key: frame[col].to_numpy(dtype=dt)[order] for key, col in cmap.items()}
+    groups = []
+    for ii in range(len(gindex)):
+        groups.append({key: arr[bounds[ii]:bounds[ii+1]] for key, arr in arrays.items()})
+    return (gindex, groups)
+
+
+def frame_specs(frame, by, kernel, xnew, columns=None, **settings):
+    r'''
+    Generates one :code:`run_fits()` specification per group of a long-format DataFrame.
+
+    :arg frame: object. The input DataFrame, with one data point per row.
+
+    :arg by: str or list. Column names defining the groups.
+
+    :arg kernel: object or str. The covariance function, as a :code:`_Kernel` instance or kernel codename.
+
+    :arg xnew: array. Vector of x-values at which every fit will be evaluated.
+
+    :kwarg columns: dict. Mapping of :code:`xdata`, :code:`ydata`, :code:`xerr` and :code:`yerr` onto column names. (optional)
+
+    :kwarg settings: Additional entries of the fit specifications, see :code:`run_fits()`.
+
+    :returns: (object, list).
+        Index of group keys, list of fit specifications keyed by group position.
+    '''
+
+    (gindex, groups) = split_frame(frame, by, columns=columns)
+    base = dict(settings)
+    if isinstance(kernel, _Kernel):
+        base['kernel'] = kernel.name
+        base.setdefault('kpars', np.hstack((kernel.hyperparameters, kernel.constants)))
+    else:
+        base['kernel'] = kernel
+    base['xnew'] = np.asarray(xnew, dtype=default_dtype)
+    specs = []
+    for ii, data in enumerate(groups):
+        spec = dict(base)
+        spec.update(data)
+        spec['key'] = ii
+        specs.append(spec)
+    return (gindex, specs)
+
+
+def results_frame(gindex, x, mean, std, dmean, dstd, extra=None):
+    r'''
+    Assembles stacked fit results into a tidy DataFrame, indexed by the group keys and the
+    prediction x-values.
+
+    :arg gindex: object. Index of group keys, one entry per fit.
+
+    :arg x: array or list. Vector of prediction x-values shared by all fits, or list of vectors per fit.
+
+    :arg mean: array or list. Predicted y-values, as a matrix with one fit per row or a list of vectors per fit.
+
+    :arg std: array or list. Predicted y-errors, same layout as :code:`mean`.
+
+    :arg dmean: array or list. Predicted dy/dx-values, same layout as :code:`mean`.
+
+    :arg dstd: array or list. Predicted dy/dx-errors, same layout as :code:`mean`.
+
+    :kwarg extra: dict. Additional per-fit scalar columns, eg. log-marginal-likelihood, broadcast onto every row of the fit. (optional)
+
+    :returns: object. DataFrame with columns :code:`mean`, :code:`std`, :code:`dmean` and :code:`dstd`, and a MultiIndex of the group keys and :code:`x`.
+    '''
+
+    nfit = len(gindex)
+    if isinstance(x, np.ndarray) and x.ndim == 1:
+        counts = np.full((nfit, ), x.size, dtype=int)
+        xx = np.tile(x, nfit)
+    else:
+        counts = np.array([len(xv) for xv in x], dtype=int)
+        xx = np.concatenate([np.asarray(xv) for xv in x]) if nfit > 0 else np.empty((0, ))
+    positions = np.repeat(np.arange(nfit), counts)
+    levels = gindex.to_frame(index=False) if isinstance(gindex, pd.MultiIndex) else pd.DataFrame({gindex.name: gindex.to_numpy()})
+    arrays = [levels[col].to_numpy()[positions] for col in levels.columns]
+    index = pd.MultiIndex.from_arrays(arrays + [xx], names=list(levels.columns) + ['x'])
+    data = {}
+    for name, values in zip(_result_names, [mean, std, dmean, dstd]):
+        data[name] = np.concatenate([np.asarray(vv).flatten() for vv in values]) if nfit > 0 else np.empty((0, ))
+    if isinstance(extra, dict):
+        for name, values in extra.items():
+            data[name] = np.asarray(values)[positions]
+    return pd.DataFrame(data, index=index)
+
+
+def fit_frame(frame, by, kernel, xnew, columns=None, nworkers=0, **settings):
+    r'''
+    Performs an independent :code:`GaussianProcess` fit for every group of a long-format DataFrame,
+    through :code:`run_fits()`, and returns the results as a tidy DataFrame.
+
+    :arg frame: object. The input DataFrame, with one data point per row.
+
+    :arg by: str or list. Column names defining the groups.
+
+    :arg kernel: object or str. The covariance function, as a :code:`_Kernel` instance or kernel codename.
+
+    :arg xnew: array. Vector of x-values at which every fit will be evaluated.
+
+    :kwarg columns: dict. Mapping of :code:`xdata`, :code:`ydata`, :code:`xerr` and :code:`yerr` onto column names. (optional)
+
+    :kwarg nworkers: int. Number of worker processes, zero runs the fits sequentially in the calling process. (optional)
+
+    :kwarg settings: Additional entries of the fit specifications, see :code:`run_fits()`.
+
+    :returns: (object, list).
+        DataFrame of results of the successful fits, see :code:`results_frame()`, and list of error records of the failed fits with their group key.
+    '''
+
+    (gindex, specs) = frame_specs(frame, by, kernel, xnew, columns=columns, **settings)
+    records = sorted(run_fits(specs, nworkers=nworkers), key=lambda record: record['index'])
+    good = [record for record in records if record['status'] == 'ok']
+    failed = []
+    for record in records:
+        if record['status'] != 'ok':
+            record['key'] = gindex[record['index']]
+            failed.append(record)
+    pos = [record['index'] for record in good]
+    outputs = [[record['results'][jj] for record in good] for jj in range(4)]
+    lml = np.array([record['lml'] for record in good], dtype=default_dtype)
+    results = results_frame(gindex[pos], [record['x'] for record in good], *outputs, extra={'lml': lml})
+    return (results, failed)
+
+
+def batch_from_frame(frame, by, kernel, columns=None, regpar=1.0):
+    r'''
+    Builds a :code:`BatchGaussianProcess` instance from a long-format DataFrame in which all groups
+    share the same x-values. The y-values and y-errors are scattered into matrices with one group per
+    row in a single vectorized operation, with missing combinations of group and x-value masked.
+    Rows with missing group keys are discarded, and repeated combinations of group and x-value
+    are rejected.
+
+    :arg frame: object. The input DataFrame, with one data point per row.
+
+    :arg by: str or list. Column names defining the groups.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :kwarg columns: dict. Mapping of :code:`xdata`, :code:`ydata` and :code:`yerr` onto column names. (optional)
+
+    :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity to reduce volatility. (optional)
+
+    :returns: (object, object).
+        Index of group keys, :code:`BatchGaussianProcess` instance with one problem per group.
+    '''
+
+    cmap = _column_map(frame, columns)
+    (keys, codes, gindex) = _group_codes(frame, by)
+    valid = codes >= 0
+    xcol = frame[cmap['xdata']].to_numpy(dtype=default_dtype)[valid]
+    (xx, xpos) = np.unique(xcol, return_inverse=True)
+    rows = codes[valid]
+    cells = rows * xx.size + xpos.flatten()
+    if np.unique(cells).size < cells.size:
+        raise ValueError('Each combination of group and x-value must appear at most once to build a batch.')
+    ydata = np.full((len(gindex), xx.size), np.nan, dtype=default_dtype)
+    ydata[rows, xpos.flatten()] = frame[cmap['ydata']].to_numpy(dtype=default_dtype)[valid]
+    yerr = None
+    if 'yerr' in cmap:
+        yerr = np.full(ydata.shape, np.nan, dtype=default_dtype)
+        yerr[rows, xpos.flatten()] = frame[cmap['yerr']].to_numpy(dtype=default_dtype)[valid]
+    return (gindex, BatchGaussianProcess(kernel, xx, ydata, yerr=yerr, regpar=regpar))
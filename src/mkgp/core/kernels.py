@@ -17,8 +17,9 @@ from .definitions import number_types, array_types
 __all__ = [
     'Sum_Kernel', 'Product_Kernel', 'Symmetric_Kernel',  # Kernel operator classes
     'ND_Sum_Kernel', 'ND_Product_Kernel',  # Multivariate kernel classes
+    'ICM_Kernel',  # Multi-output kernel classes
     'Constant_Kernel', 'Noise_Kernel', 'Linear_Kernel', 'Poly_Order_Kernel', 'SE_Kernel', 'RQ_Kernel',
-    'Matern_HI_Kernel', 'NN_Kernel', 'Gibbs_Kernel',  # Kernel classes
+    'Matern_HI_Kernel', 'NN_Kernel', 'Gibbs_Kernel', 'Coregion_Kernel',  # Kernel classes
     'Constant_WarpingFunction', 'Linear_WarpingFunction', 'IG_WarpingFunction',  # Warping function classes for Gibbs Kernel
 ]
 
@@ -48,13 +49,14 @@ class Sum_Kernel(_OperatorKernel):
         '''
 
         covm = np.full((x1.size, x2.size), np.nan, dtype=self._dtype).T if self._kernel_list is None else np.zeros((x1.size, x2.size), dtype=self._dtype).T
-        ihyp = hder
-        for kk in self._kernel_list:
-            nhyps = kk.hyperparameters.size
-            khder = ihyp if ihyp is not None and ihyp >= 0 and ihyp < nhyps else None
-            covm = covm + kk(x1, x2, der, khder)
-            if ihyp is not None:
-                ihyp = ihyp - nhyps
+        if hder is None:
+            for kk in self._kernel_list:
+                covm = covm + kk(x1, x2, der)
+        else:
+            # Terms not owning the hyperparameter have zero derivative
+            (iown, khder) = self._hyperparameter_owner(hder)
+            if iown is not None:
+                covm = covm + self._kernel_list[iown](x1, x2, der, khder)
         return covm
 
 
@@ -85,6 +87,65 @@ class Sum_Kernel(_OperatorKernel):
         super().__init__('Sum', self.__calc_covm, True, uklist, dtype=dtype)
 
 
+    @property
+    def structure(self):
+        r'''
+        Returns the structure of the covariance matrices, which is shared with the constituent kernels
+        only if they all have the same structure.
+
+        :returns: str. Structure of the covariance matrices, see :code:`_Kernel.structure`.
+        '''
+
+        structs = set([kk.structure for kk in self._kernel_list])
+        return structs.pop() if len(structs) == 1 else 'dense'
+
+
+    def factors(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the features of the low-rank covariance function, by concatenating those of the constituent kernels.
+
+        :arg xx: array. Vector of x-values at which to evaluate the features.
+
+        :kwarg der: int. Order of x derivative of the features, 1 yields the features of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the features. (optional)
+
+        :returns: array. 2D matrix of features with the x-values along the first axis.
+        '''
+
+        if self.structure != 'lowrank':
+            return super().factors(xx, der=der, hder=hder)
+        if hder is None:
+            return np.concatenate([kk.factors(xx, der=der) for kk in self._kernel_list], axis=-1)
+        # Features of terms not owning the hyperparameter have zero derivative
+        (iown, khder) = self._hyperparameter_owner(hder)
+        feats = [kk.factors(xx, der=der, hder=khder) if ii == iown else np.zeros(kk.factors(xx, der=der).shape, dtype=self._dtype) for (ii, kk) in enumerate(self._kernel_list)]
+        return np.concatenate(feats, axis=-1)
+
+
+    def diagonal_values(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the diagonal of the covariance matrix, by summing those of the constituent kernels.
+
+        :arg xx: array. Vector of x-values at which to evaluate the diagonal.
+
+        :kwarg der: int. Order of x derivative on both sides of the covariance function, 1 yields the diagonal of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the diagonal. (optional)
+
+        :returns: array. Vector of covariance function evaluations at each x-value with itself.
+        '''
+
+        if self.structure != 'diagonal':
+            return super().diagonal_values(xx, der=der, hder=hder)
+        if hder is None:
+            return np.sum([kk.diagonal_values(xx, der=der) for kk in self._kernel_list], axis=0)
+        (iown, khder) = self._hyperparameter_owner(hder)
+        if iown is None:
+            return np.zeros((np.atleast_1d(xx).shape[0], ), dtype=self._dtype)
+        return self._kernel_list[iown].diagonal_values(xx, der=der, hder=khder)
+
+
     def __copy__(self):
         r'''
         Implementation-specific copy function, needed for robust hyperparameter optimization routine.
@@ -148,16 +209,18 @@ class Product_Kernel(_OperatorKernel):
                 dermat = np.concatenate((dermat, np.expand_dims(oder, axis=-1)), axis=-1)
             # Reshape such that each row represents one chain rule term
             dermat = dermat.reshape(-1, nks)
+        (iown, khder) = self._hyperparameter_owner(hder) if hder is not None else (None, None)
+        if hder is not None and iown is None:
+            return covm
+        # Product rule only differentiates the owning factor, each factor and derivative order is evaluated once
+        kcache = {}
         for row in np.arange(0, dermat.shape[0]):
             covterm = np.ones((x1.size, x2.size), dtype=self._dtype).T
-            ihyp = hder
             for col in np.arange(0, dermat.shape[1]):
-                kk = self._kernel_list[col]
-                nhyps = kk.hyperparameters.size
-                khder = ihyp if ihyp is not None and ihyp >= 0 and ihyp < nhyps else None
-                covterm = covterm * kk(x1, x2, dermat[row, col], khder)
-                if ihyp is not None:
-                    ihyp = ihyp - nhyps
+                key = (int(col), int(dermat[row, col]))
+                if key not in kcache:
+                    kcache[key] = self._kernel_list[col](x1, x2, key[1], khder if col == iown else None)
+                covterm = covterm * kcache[key]
             covm = covm + covterm
         return covm
 
@@ -189,6 +252,80 @@ class Product_Kernel(_OperatorKernel):
         super().__init__('Prod', self.__calc_covm, True, uklist, dtype=dtype)
 
 
+    @property
+    def structure(self):
+        r'''
+        Returns the structure of the covariance matrices, which is shared with the constituent kernels
+        only if they all have the same structure.
+
+        :returns: str. Structure of the covariance matrices, see :code:`_Kernel.structure`.
+        '''
+
+        structs = set([kk.structure for kk in self._kernel_list])
+        return structs.pop() if len(structs) == 1 else 'dense'
+
+
+    def factors(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the features of the low-rank covariance function, as the row-wise Kronecker products
+        of those of the constituent kernels, applying the product rule for derivative data.
+
+        :arg xx: array. Vector of x-values at which to evaluate the features.
+
+        :kwarg der: int. Order of x derivative of the features, 1 yields the features of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the features. (optional)
+
+        :returns: array. 2D matrix of features with the x-values along the first axis.
+        '''
+
+        if self.structure != 'lowrank':
+            return super().factors(xx, der=der, hder=hder)
+        nks = len(self._kernel_list)
+        # Features are linear in those of each constituent kernel, only the owner is differentiated
+        (iown, khder) = self._hyperparameter_owner(hder) if hder is not None else (None, None)
+        feats = [kk.factors(xx, hder=khder if ii == iown else None) for (ii, kk) in enumerate(self._kernel_list)]
+        dfeats = [kk.factors(xx, der=1, hder=khder if ii == iown else None) for (ii, kk) in enumerate(self._kernel_list)] if der != 0 else []
+        if hder is not None and iown is None:
+            feats[0] = np.zeros(feats[0].shape, dtype=self._dtype)
+            dfeats = [np.zeros(dfeats[0].shape, dtype=self._dtype)] + dfeats[1:] if der != 0 else []
+        terms = [[dfeats[jj] if jj == ii else feats[jj] for jj in range(nks)] for ii in range(nks)] if der != 0 else [feats]
+        uu = None
+        for term in terms:
+            tu = term[0]
+            for fu in term[1:]:
+                tu = (tu[:, :, np.newaxis] * fu[:, np.newaxis, :]).reshape(tu.shape[0], tu.shape[1] * fu.shape[1])
+            uu = tu if uu is None else uu + tu
+        return uu
+
+
+    def diagonal_values(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the diagonal of the covariance matrix, as the product of those of the constituent
+        kernels, applying the product rule for derivative data.
+
+        :arg xx: array. Vector of x-values at which to evaluate the diagonal.
+
+        :kwarg der: int. Order of x derivative on both sides of the covariance function, 1 yields the diagonal of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the diagonal. (optional)
+
+        :returns: array. Vector of covariance function evaluations at each x-value with itself.
+        '''
+
+        if self.structure != 'diagonal':
+            return super().diagonal_values(xx, der=der, hder=hder)
+        (iown, khder) = self._hyperparameter_owner(hder) if hder is not None else (None, None)
+        if hder is not None and iown is None:
+            return np.zeros((np.atleast_1d(xx).shape[0], ), dtype=self._dtype)
+        vals = np.stack([kk.diagonal_values(xx, hder=khder if ii == iown else None) for (ii, kk) in enumerate(self._kernel_list)], axis=0)
+        if der == 0:
+            return np.prod(vals, axis=0)
+        # Mixed function and derivative covariances vanish, leaving one term per differentiated kernel
+        dvals = np.stack([kk.diagonal_values(xx, der=1, hder=khder if ii == iown else None) for (ii, kk) in enumerate(self._kernel_list)], axis=0)
+        return np.sum([np.prod(np.concatenate((vals[:ii], dvals[ii:ii+1], vals[ii+1:]), axis=0), axis=0) for ii in range(vals.shape[0])], axis=0)
+
+
     def __copy__(self):
         r'''
         Implementation-specific copy function, needed for robust hyperparameter optimization routine.
@@ -237,17 +374,16 @@ class ND_Sum_Kernel(_OperatorKernel):
         covm = np.zeros((x2.shape[0], *ishape, x1.shape[0]), dtype=self._dtype)
 
         if x1.size > 0 and x2.size > 0:
+            (iown, khder) = self._hyperparameter_owner(hder) if hder is not None else (None, None)
             for col in np.arange(0, nks):
+                # Dimensions not owning the hyperparameter have zero derivative
+                if hder is not None and col != iown:
+                    continue
                 cshape = [col for ii in range(ad)] if der != 0 else [0]
-                ihyp = hder
                 kk = self._kernel_list[col]
                 x1_col = x1[:, col].flatten()
                 x2_col = x2[:, col].flatten()
-                nhyps = kk.hyperparameters.size
-                khder = ihyp if ihyp is not None and ihyp >= 0 and ihyp < nhyps else None
                 covm[(slice(None), *cshape, slice(None))] += kk(x1_col, x2_col, der, khder)
-                if ihyp is not None:
-                    ihyp = ihyp - nhyps
             if der == 0:
                 covm = covm.reshape(x2.shape[0], x1.shape[0])
 
@@ -352,23 +488,30 @@ class ND_Product_Kernel(_OperatorKernel):
         ishape = [dermat.shape[1] for ii in range(crdmat.shape[1])] if der != 0 else [1]
         covm = np.zeros((x2.shape[0], *ishape, x1.shape[0]), dtype=self._dtype)
 
-        if x1.size > 0 and x2.size > 0:
-            for row in np.arange(0, dermat.shape[0]):
-                covterm = np.ones((x1.shape[0], x2.shape[0]), dtype=self._dtype).T
-                ihyp = hder
-                for col in np.arange(0, dermat.shape[1]):
-                    kk = self._kernel_list[col]
-                    x1_col = x1[:, col].flatten()
-                    x2_col = x2[:, col].flatten()
-                    nhyps = kk.hyperparameters.size
-                    khder = ihyp if ihyp is not None and ihyp >= 0 and ihyp < nhyps else None
-                    covterm = covterm * kk(x1_col, x2_col, dermat[row, col], khder)
-                    if ihyp is not None:
-                        ihyp = ihyp - nhyps
-                if crdmat.shape[0] > row and crdmat[row].shape != (0,):
-                    covm[(slice(None), *crdmat[row], slice(None))] = covterm.copy()
-            if der == 0:
-                covm = covm.reshape(x2.shape[0], x1.shape[0])
+        (iown, khder) = self._hyperparameter_owner(hder) if hder is not None else (None, None)
+        # Hyperparameters not owned by any dimension have zero derivative
+        nrows = min(dermat.shape[0], crdmat.shape[0]) if hder is None or iown is not None else 0
+        if x1.size > 0 and x2.size > 0 and nrows > 0 and crdmat.shape[1] > 0:
+            # Each 1D factor is evaluated once per (dimension, derivative order, hyperparameter derivative)
+            factors = []
+            findex = np.zeros((nrows, dermat.shape[1]), dtype=int)
+            kcache = {}
+            for col in np.arange(0, dermat.shape[1]):
+                kder = khder if col == iown else None
+                for row in np.arange(0, nrows):
+                    key = (int(col), int(dermat[row, col]), kder)
+                    if key not in kcache:
+                        kcache[key] = len(factors)
+                        factors.append(self._kernel_list[col](x1[:, col].flatten(), x2[:, col].flatten(), key[1], kder))
+                    findex[row, col] = kcache[key]
+            factors = np.stack(factors, axis=0)
+            # Chain rule terms are assembled for all rows at once and scattered into their derivative components
+            covterms = factors[findex[:, 0]]
+            for col in np.arange(1, dermat.shape[1]):
+                covterms *= factors[findex[:, col]]
+            covm[(slice(None), *crdmat[:nrows].T, slice(None))] = np.moveaxis(covterms, 0, 1)
+        if der == 0:
+            covm = covm.reshape(x2.shape[0], x1.shape[0])
 
         return covm
 
@@ -444,13 +587,12 @@ class Symmetric_Kernel(_OperatorKernel):
         '''
 
         covm = np.full((x1.size, x2.size), np.nan, dtype=self._dtype).T if self._kernel_list is None else np.zeros((x1.size, x2.size), dtype=self._dtype).T
-        ihyp = hder
-        for kk in self._kernel_list:
-            nhyps = kk.hyperparameters.size
-            khder = ihyp if ihyp is not None and ihyp >= 0 and ihyp < nhyps else None
+        (iown, khder) = self._hyperparameter_owner(hder) if hder is not None else (None, None)
+        for (ii, kk) in enumerate(self._kernel_list):
+            # Kernels not owning the hyperparameter have zero derivative
+            if hder is not None and ii != iown:
+                continue
             covm = covm + 0.5 * kk(x1, x2, der, khder) + 0.5 * kk(-x1, x2, der, khder)
-            if ihyp is not None:
-                ihyp = ihyp - nhyps
         return covm
 
 
@@ -498,6 +640,131 @@ class Symmetric_Kernel(_OperatorKernel):
 
 
 
+class ICM_Kernel(_OperatorKernel):
+    r'''
+    Intrinsic Coregionalization Model Kernel: Implements the covariance between multiple outputs
+    sharing the same inputs as the Kronecker product, B x k, of a learnable output covariance
+    matrix, B, represented by a :code:`Coregion_Kernel` instance, and an input covariance function, k.
+
+    The covariance matrix is returned for the outputs stacked one after the other, such that its
+    dimensions are the number of outputs times those of the input covariance function. When used
+    inside :code:`GaussianProcess`, the Kronecker structure is exploited instead of constructing
+    this full matrix. **Only valid for 1D-input regression!**
+
+    .. note::
+
+        The amplitude of the input covariance function and the output amplitudes of the
+        :code:`Coregion_Kernel` instance are degenerate, so it is recommended to either keep
+        the input amplitude fixed at unity or to constrain one of them with bounds.
+
+    :arg \*args: object. Two :code:`_Kernel` instance arguments, the input covariance function followed by the :code:`Coregion_Kernel` instance. Alternatively, only the input covariance function along with the :code:`nout` argument.
+
+    :kwarg klist: list. Python native list of the two :code:`_Kernel` instances, as specified for the arguments.
+
+    :kwarg nout: int. Number of outputs, only used to create an uncorrelated :code:`Coregion_Kernel` instance if none is given. (optional)
+    '''
+
+    def __calc_covm(self, x1, x2, der=0, hder=None):
+        r'''
+        Implementation-specific covariance function.
+
+        :arg x1: array. Meshgrid of x_1-values at which to evaulate the covariance function.
+
+        :arg x2: array. Meshgrid of x_2-values at which to evaulate the covariance function.
+
+        :kwarg der: int. Order of x derivative with which to evaluate the covariance function, requires explicit implementation. (optional)
+
+        :kwarg hder: int. Order of hyperparameter derivative with which to evaluate the covariance function, requires explicit implementation. (optional)
+
+        :returns: array. Covariance function evaluations at input value pairs using the given derivative settings, for all pairs of outputs. Has dimensions of :code:`x1` and :code:`x2` multiplied by the number of outputs.
+        '''
+
+        kx = self._kernel_list[0]
+        kb = self._kernel_list[1]
+        nx = kx.hyperparameters.size
+        nhyps = nx + kb.hyperparameters.size
+        xhder = hder if hder is not None and hder >= 0 and hder < nx else None
+        bhder = hder - nx if hder is not None and hder >= nx and hder < nhyps else None
+        covm = np.kron(kb.output_covariance(bhder), kx(x1, x2, der, xhder))
+        if hder is not None and xhder is None and bhder is None:
+            covm = np.zeros(covm.shape, dtype=self._dtype)
+        return covm
+
+
+    def __init__(self, *args, **kwargs):
+        r'''
+        Initializes the :code:`ICM_Kernel` instance.
+
+        :arg \*args: object. Two :code:`_Kernel` instance arguments, the input covariance function followed by the :code:`Coregion_Kernel` instance. Alternatively, only the input covariance function along with the :code:`nout` argument.
+
+        :kwarg klist: list. Python native list of the two :code:`_Kernel` instances, as specified for the arguments.
+
+        :kwarg nout: int. Number of outputs, only used to create an uncorrelated :code:`Coregion_Kernel` instance if none is given. (optional)
+
+        :returns: none.
+        '''
+
+        dtype = kwargs.get('dtype', None)
+        klist = kwargs.get('klist')
+        nout = kwargs.get('nout')
+        uklist = list(args) if len(args) > 0 else (list(klist) if isinstance(klist, list) else [])
+        if len(uklist) == 1 and isinstance(nout, number_types):
+            uklist.append(Coregion_Kernel(int(nout), dtype=dtype))
+        if len(uklist) < 2 or not isinstance(uklist[0], _Kernel) or not isinstance(uklist[1], Coregion_Kernel):
+            raise TypeError('Arguments to ICM_Kernel must be a Kernel instance followed by a Coregion_Kernel instance.')
+        if len(uklist) > 2:
+            print('Only the first two kernel arguments are used in ICM_Kernel class, use other operators first.')
+        super().__init__('ICM', self.__calc_covm, uklist[0].is_hderiv_implemented(), uklist[:2], dtype=dtype)
+
+
+    @property
+    def nout(self):
+        r'''
+        Returns the number of outputs described by the :code:`ICM_Kernel` instance.
+
+        :returns: int. Number of outputs.
+        '''
+
+        return self._kernel_list[1].nout
+
+
+    @property
+    def input_kernel(self):
+        r'''
+        Returns the covariance function acting on the inputs.
+
+        :returns: object. Copy of the input :code:`_Kernel` instance.
+        '''
+
+        return copy.copy(self._kernel_list[0])
+
+
+    @property
+    def output_kernel(self):
+        r'''
+        Returns the covariance function acting on the output indices.
+
+        :returns: object. Copy of the :code:`Coregion_Kernel` instance.
+        '''
+
+        return copy.copy(self._kernel_list[1])
+
+
+    def __copy__(self):
+        r'''
+        Implementation-specific copy function, needed for robust hyperparameter optimization routine.
+
+        :returns: object. An exact duplicate of the current instance, which can be modified without affecting the original.
+        '''
+
+        kcopy_list = []
+        for kk in self._kernel_list:
+            kcopy_list.append(copy.copy(kk))
+        kcopy = ICM_Kernel(klist=kcopy_list, dtype=self._dtype)
+        return kcopy
+
+
+
 class Constant_Kernel(_Kernel):
     r'''
     Constant Kernel: always evaluates to a constant value, regardless of input pair.
@@ -563,6 +830,36 @@ class Constant_Kernel(_Kernel):
         super().__init__('C', self.__calc_covm, True, None, csts, dtype=dtype)
 
 
+    @property
+    def structure(self):
+        r'''
+        Returns the structure of the covariance matrices, which are rank-1 for non-negative constant values.
+
+        :returns: str. Structure of the covariance matrices, see :code:`_Kernel.structure`.
+        '''
+
+        return 'lowrank' if self.constants[0] >= 0.0 else 'dense'
+
+
+    def factors(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the single feature of the covariance function, the square root of the constant value.
+
+        :arg xx: array. Vector of x-values at which to evaluate the features.
+
+        :kwarg der: int. Order of x derivative of the features, 1 yields the features of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the features. (optional)
+
+        :returns: array. 2D matrix of features with the x-values along the first axis.
+        '''
+
+        if self.structure != 'lowrank':
+            return super().factors(xx, der=der, hder=hder)
+        cv = np.sqrt(self.constants[0]) if der == 0 and hder is None else 0.0
+        return np.full((np.atleast_1d(xx).shape[0], 1), cv, dtype=self._dtype)
+
+
     def __copy__(self):
         r'''
         Implementation-specific copy function, needed for robust hyperparameter optimization routine.
@@ -655,6 +952,37 @@ class Noise_Kernel(_Kernel):
         super().__init__('n', self.__calc_covm, True, hyps, dtype=dtype)
 
 
+    @property
+    def structure(self):
+        r'''
+        Returns the structure of the covariance matrices, which are diagonal.
+
+        :returns: str. Structure of the covariance matrices, see :code:`_Kernel.structure`.
+        '''
+
+        return 'diagonal'
+
+
+    def diagonal_values(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the diagonal of the covariance matrix, the noise variance for function data and zero for derivative data.
+
+        :arg xx: array. Vector of x-values at which to evaluate the diagonal.
+
+        :kwarg der: int. Order of x derivative on both sides of the covariance function, 1 yields the diagonal of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the diagonal. (optional)
+
+        :returns: array. Vector of covariance function evaluations at each x-value with itself.
+        '''
+
+        n_hyp = self.hyperparameters[0]
+        nv = 0.0
+        if der == 0:
+            nv = n_hyp ** 2.0 if hder is None else (2.0 * n_hyp if hder == 0 else 0.0)
+        return np.full((np.atleast_1d(xx).shape[0], ), nv, dtype=self._dtype)
+
+
     def __copy__(self):
         r'''
         Implementation-specific copy function, needed for robust hyperparameter optimization routine.
@@ -745,6 +1073,37 @@ class Linear_Kernel(_Kernel):
         super().__init__('L', self.__calc_covm, True, hyps, dtype=dtype)
 
 
+    @property
+    def structure(self):
+        r'''
+        Returns the structure of the covariance matrices, which are rank-1.
+
+        :returns: str. Structure of the covariance matrices, see :code:`_Kernel.structure`.
+        '''
+
+        return 'lowrank'
+
+
+    def factors(self, xx, der=0, hder=None):
+        r'''
+        Evaluates the single feature of the covariance function, :code:`a x`, or :code:`a` for derivative data.
+
+        :arg xx: array. Vector of x-values at which to evaluate the features.
+
+        :kwarg der: int. Order of x derivative of the features, 1 yields the features of derivative data. (optional)
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the features. (optional)
+
+        :returns: array. 2D matrix of features with the x-values along the first axis.
+        '''
+
+        xt = np.atleast_1d(np.array(xx, dtype=self._dtype)).reshape(-1, 1)
+        v_hyp = self.hyperparameters[0]
+        if hder is not None:
+            v_hyp = 1.0 if hder == 0 else 0.0
+        return v_hyp * xt if der == 0 else np.full(xt.shape, v_hyp, dtype=self._dtype)
+
+
     def __copy__(self):
         r'''
         Implementation-specific copy function, needed for robust hyperparameter optimization routine.
@@ -1841,6 +2200,158 @@ class Gibbs_Kernel(_Kernel):
 
 
 
+class Coregion_Kernel(_Kernel):
+    r'''
+    Coregionalization Kernel: Covariance function between discrete output indices, given by the
+    matrix B = diag(a) R diag(a), where a are the output amplitudes and R is a correlation matrix.
+    The Cholesky factor of R is parameterized by angles in spherical coordinates, such that B is
+    positive semi-definite for any hyperparameter values. Intended to be used within :code:`ICM_Kernel`.
+
+    The inputs to the covariance function are the output indices, so all x derivatives are zero.
+
+    :arg nout: int. Number of outputs.
+
+    :kwarg amp: array. Hyperparameters representing the amplitude of each output, or a single value for all outputs. (optional)
+
+    :kwarg angles: array. Hyperparameters representing the correlations between outputs, given as nout * (nout - 1) / 2 angles ordered by row of the lower-triangular Cholesky factor. A value of pi / 2 indicates no correlation between the corresponding outputs. (optional)
+    '''
+
+    def __corr_factor(self, hder=None):
+        r'''
+        Constructs the lower-triangular Cholesky factor of the correlation matrix from the angle hyperparameters.
+
+        :kwarg hder: int. Index of angle with which to differentiate the factor. (optional)
+
+        :returns: array. Lower-triangular Cholesky factor of the correlation matrix, or its derivative.
+        '''
+
+        nout = self.nout
+        angles = self.hyperparameters[nout:]
+        factor = np.zeros((nout, nout), dtype=self._dtype)
+        if hder is None:
+            factor[0, 0] = 1.0
+        ioff = 0
+        for ii in range(1, nout):
+            jhder = hder - ioff if hder is not None and hder >= ioff and hder < ioff + ii else None
+            if hder is None or jhder is not None:
+                sprod = 1.0
+                for jj in range(ii):
+                    cfac = -np.sin(angles[ioff+jj]) if jj == jhder else np.cos(angles[ioff+jj])
+                    factor[ii, jj] = sprod * cfac
+                    sprod = sprod * (np.cos(angles[ioff+jj]) if jj == jhder else np.sin(angles[ioff+jj]))
+                factor[ii, ii] = sprod
+                if jhder is not None:
+                    factor[ii, :jhder] = 0.0
+            ioff = ioff + ii
+        return factor
+
+
+    def output_covariance(self, hder=None):
+        r'''
+        Constructs the covariance matrix between the outputs.
+
+        :kwarg hder: int. Order of hyperparameter derivative with which to evaluate the covariance matrix. (optional)
+
+        :returns: array. Output covariance matrix, or its derivative, with dimensions equal to the number of outputs.
+        '''
+
+        nout = self.nout
+        amp = self.hyperparameters[:nout]
+        factor = self.__corr_factor()
+        corr = np.dot(factor, factor.T)
+        covm = amp[:, np.newaxis] * corr * amp[np.newaxis, :]
+        if hder is not None and hder >= 0 and hder < nout:
+            dcovm = np.zeros((nout, nout), dtype=self._dtype)
+            dcovm[hder, :] = dcovm[hder, :] + corr[hder, :] * amp
+            dcovm[:, hder] = dcovm[:, hder] + amp * corr[:, hder]
+            covm = dcovm
+        elif hder is not None and hder >= nout and hder < self.hyperparameters.size:
+            dfactor = self.__corr_factor(hder - nout)
+            dcorr = np.dot(dfactor, factor.T) + np.dot(factor, dfactor.T)
+            covm = amp[:, np.newaxis] * dcorr * amp[np.newaxis, :]
+        elif hder is not None:
+            covm = np.zeros((nout, nout), dtype=self._dtype)
+        return covm
+
+
+    def __calc_covm(self, x1, x2, der=0, hder=None):
+        r'''
+        Implementation-specific covariance function.
+
+        :arg x1: array. Meshgrid of output indices at which to evaulate the covariance function.
+
+        :arg x2: array. Meshgrid of output indices at which to evaulate the covariance function.
+
+        :kwarg der: int. Order of x derivative with which to evaluate the covariance function, always zero if non-zero. (optional)
+
+        :kwarg hder: int. Order of hyperparameter derivative with which to evaluate the covariance function, requires explicit implementation. (optional)
+
+        :returns: array. Covariance function evaluations at input value pairs using the given derivative settings. Has the same dimensions as :code:`x1` and :code:`x2`.
+        '''
+
+        xm1, xm2 = np.meshgrid(x1, x2)
+        covm = np.zeros(xm1.shape, dtype=self._dtype)
+        if der == 0:
+            covm = self.output_covariance(hder)[xm1.astype(int), xm2.astype(int)]
+        return covm
+
+
+    def __init__(self, nout=2, amp=1.0, angles=None, dtype=None):
+        r'''
+        Initializes the :code:`Coregion_Kernel` instance.
+
+        :arg nout: int. Number of outputs.
+
+        :kwarg amp: array. Hyperparameters representing the amplitude of each output, or a single value for all outputs. (optional)
+
+        :kwarg angles: array. Hyperparameters representing the correlations between outputs, given as nout * (nout - 1) / 2 angles ordered by row of the lower-triangular Cholesky factor. (optional)
+
+        :returns: none.
+        '''
+
+        if not isinstance(nout, number_types) or int(nout) < 1:
+            raise ValueError('Number of outputs must be a positive integer.')
+        nn = int(nout)
+        nang = nn * (nn - 1) // 2
+        amps = np.full((nn, ), amp, dtype=float) if isinstance(amp, number_types) else np.array(amp, dtype=float).flatten()
+        angs = np.full((nang, ), 0.5 * np.pi) if angles is None else np.array(angles, dtype=float).flatten()
+        if amps.size != nn or np.any(amps <= 0.0):
+            raise ValueError(f'Amplitude hyperparameters must contain {nn} values greater than 0.')
+        if angs.size != nang or np.any(angs <= 0.0):
+            raise ValueError(f'Angle hyperparameters must contain {nang} values greater than 0.')
+        csts = np.array([nn], dtype=float)
+        super().__init__(f'CR{nn}', self.__calc_covm, True, np.hstack((amps, angs)), csts, dtype=dtype)
+
+
+    @property
+    def nout(self):
+        r'''
+        Returns the number of outputs described by the :code:`Coregion_Kernel` instance.
+
+        :returns: int. Number of outputs.
+        '''
+
+        return int(self._constants[0])
+
+
+    def __copy__(self):
+        r'''
+        Implementation-specific copy function, needed for robust hyperparameter optimization routine.
+
+        :returns: object. An exact duplicate of the current instance, which can be modified without affecting the original.
+        '''
+
+        hyps = self.hyperparameters
+        bnds = self.bounds
+        nout = self.nout
+        kcopy = Coregion_Kernel(nout, hyps[:nout], hyps[nout:], dtype=self._dtype)
+        kcopy.enforce_bounds(self._force_bounds)
+        if bnds is not None:
+            kcopy.bounds = bnds
+        return kcopy
+
+
+
 class Constant_WarpingFunction(_WarpingFunction):
     r'''
     Constant Warping Function for Gibbs Kernel: effectively reduces Gibbs kernel to squared exponential kernel.
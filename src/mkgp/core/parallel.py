@@ -0,0 +1,330 @@
+r'''
+Process-pool driver for running large numbers of independent Gaussian Process Regression fits, with the
+input data arrays passed to the workers through shared memory.
+'''
+
+# Required imports
+import os
+import traceback
+import numpy as np
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from .definitions import number_types, array_types, default_dtype
+from .utils import KernelReconstructor
+from .routines import GaussianProcess
+
+__all__ = [
+    'run_fits',  # Batch execution of independent fits on a process pool
+]
+
+
+# Data arrays of a fit specification which are transferred through shared memory
+_array_keys = ['xdata', 'ydata', 'xerr', 'yerr', 'dxdata', 'dydata', 'dyerr', 'xnew', 'kbounds', 'error_kbounds']
+
+# Environment variables read by the common BLAS / OpenMP runtimes when they are loaded
+_blas_variables = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+# Keeps the thread limits of each worker alive for the lifetime of the process
+_worker_limits = None
+
+
+def _init_worker(nthreads):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Worker initializer, limiting the number of threads used by the BLAS libraries within the worker process.
+    The environment variables only take effect on runtimes not yet loaded, while the runtimes already loaded
+    through the import of this module are limited through :code:`threadpoolctl` when it is available.
+
+    :arg nthreads: int. Maximum number of BLAS threads per worker.
+
+    :returns: none.
+    '''
+
+    global _worker_limits
+    for var in _blas_variables:
+        os.environ[var] = str(nthreads)
+    try:
+        from threadpoolctl import threadpool_limits
+        _worker_limits = threadpool_limits(limits=nthreads)
+    except ImportError:
+        _worker_limits = None
+
+
+def _pack_spec(spec):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Copies the data arrays of a fit specification into a single shared memory block.
+
+    :arg spec: dict. Fit specification, see :code:`run_fits()`.
+
+    :returns: (object, dict, list).
+        Shared memory block, specification without the data arrays, layout of the arrays within the block.
+    '''
+
+    settings = {}
+    arrays = []
+    for key, value in spec.items():
+        if key in _array_keys and isinstance(value, array_types):
+            arrays.append((key, np.ascontiguousarray(value, dtype=default_dtype)))
+        else:
+            settings[key] = value
+    nbytes = sum([arr.nbytes for _, arr in arrays])
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    layout = []
+    offset = 0
+    for key, arr in arrays:
+        view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, offset=offset)
+        view[...] = arr
+        layout.append((key, arr.dtype.str, arr.shape, offset))
+        offset += arr.nbytes
+    return (shm, settings, layout)
+
+
+def _attach(name):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Attaches to an existing shared memory block without taking ownership of it, as the block is
+    released by the parent process once the fit completes.
+
+    :arg name: str. Name of the shared memory block.
+
+    :returns: object. Shared memory block.
+    '''
+
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+    return shm
+
+
+def _configure(spec):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Builds and configures a :code:`GaussianProcess` instance from a fit specification.
+
+    :arg spec: dict. Fit specification, with the data arrays already resolved.
+
+    :returns: object. Configured :code:`GaussianProcess` instance, ready for :code:`GPRFit()`.
+    '''
+
+    kernel = KernelReconstructor(spec.get('kernel'), pars=spec.get('kpars'))
+    if kernel is None:
+        raise ValueError(f'Invalid kernel codename {spec.get("kernel")!r} in fit specification.')
+    gp = GaussianProcess()
+    gp.set_kernel(kernel=kernel, kbounds=spec.get('kbounds'), regpar=spec.get('regpar'))
+    gp.set_raw_data(
+        xdata=spec.get('xdata'),
+        ydata=spec.get('ydata'),
+        xerr=spec.get('xerr'),
+        yerr=spec.get('yerr'),
+        dxdata=spec.get('dxdata'),
+        dydata=spec.get('dydata'),
+        dyerr=spec.get('dyerr')
+    )
+    if isinstance(spec.get('search'), dict):
+        gp.set_search_parameters(**spec['search'])
+    if spec.get('error_kernel') is not None:
+        error_kernel = KernelReconstructor(spec['error_kernel'], pars=spec.get('error_kpars'))
+        if error_kernel is None:
+            raise ValueError(f'Invalid error kernel codename {spec["error_kernel"]!r} in fit specification.')
+        gp.set_error_kernel(
+            kernel=error_kernel,
+            kbounds=spec.get('error_kbounds'),
+            regpar=spec.get('error_regpar'),
+            nrestarts=spec.get('error_nrestarts')
+        )
+        if isinstance(spec.get('error_search'), dict):
+            gp.set_error_search_parameters(**spec['error_search'])
+    if spec.get('warnings') is not None:
+        gp.set_warning_flag(bool(spec['warnings']))
+    return gp
+
+
+def _run_spec(index, key, spec):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Performs a single fit and collects its outputs, converting any exception into an error record.
+
+    :arg index: int. Position of the specification in the input sequence.
+
+    :arg key: object. User-provided identifier of the specification.
+
+    :arg spec: dict. Fit specification, with the data arrays already resolved.
+
+    :returns: dict. Result or error record, see :code:`run_fits()`.
+    '''
+
+    record = {'index': index, 'key': key, 'status': 'ok', 'error': None, 'traceback': None}
+    try:
+        gp = _configure(spec)
+        fit_options = spec.get('fit') if isinstance(spec.get('fit'), dict) else {}
+        gp.GPRFit(spec.get('xnew'), **fit_options)
+        record['x'] = gp.get_gp_x()
+        record['results'] = gp.get_gp_results()
+        record['lml'] = gp.get_gp_lml()
+        record['kernel'] = gp.get_gp_kernel_details()
+        record['error_kernel'] = gp.get_gp_error_kernel_details()
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = f'{type(e).__name__}: {e}'
+        record['traceback'] = traceback.format_exc()
+    return record
+
+
+def _worker(index, key, name, settings, layout):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Worker entry point, reconstructing the data arrays from the shared memory block before fitting.
+
+    :arg index: int. Position of the specification in the input sequence.
+
+    :arg key: object. User-provided identifier of the specification.
+
+    :arg name: str. Name of the shared memory block holding the data arrays.
+
+    :arg settings: dict. Fit specification without the data arrays.
+
+    :arg layout: list. Key, dtype, shape and byte offset of each array within the block.
+
+    :returns: dict. Result or error record, see :code:`run_fits()`.
+    '''
+
+    shm = _attach(name)
+    try:
+        spec = dict(settings)
+        for (akey, dtype, shape, offset) in layout:
+            spec[akey] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        record = _run_spec(index, key, spec)
+        del spec
+    finally:
+        shm.close()
+    return record
+
+
+def _error_record(index, key, exc):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Builds an error record for a fit which failed outside of the worker fitting routine.
+
+    :arg index: int. Position of the specification in the input sequence.
+
+    :arg key: object. User-provided identifier of the specification.
+
+    :arg exc: object. The raised exception.
+
+    :returns: dict. Error record, see :code:`run_fits()`.
+    '''
+
+    tb = ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+    return {'index': index, 'key': key, 'status': 'error', 'error': f'{type(exc).__name__}: {exc}', 'traceback': tb}
+
+
+def run_fits(specs, nworkers=None, blas_threads=1, max_pending=None, context='spawn'):
+    r'''
+    Runs many independent :code:`GaussianProcess` fits on a pool of worker processes, yielding the
+    outcome of each fit in completion order. The data arrays of each specification are placed into
+    a shared memory block which the worker attaches to, avoiding the serialization of the data
+    through the task queue, and the block is released as soon as the fit returns.
+
+    Each fit specification is a dict containing the following keys, of which only :code:`kernel`,
+    :code:`xdata`, :code:`ydata` and :code:`xnew` are required:
+
+    - :code:`key`: identifier returned with the record, defaults to the position in :code:`specs`.
+    - :code:`kernel`, :code:`kpars`, :code:`kbounds`, :code:`regpar`: kernel codename as accepted
+      by :code:`KernelConstructor()`, followed by the arguments of :code:`set_kernel()`.
+    - :code:`xdata`, :code:`ydata`, :code:`xerr`, :code:`yerr`, :code:`dxdata`, :code:`dydata`,
+      :code:`dyerr`: arguments of :code:`set_raw_data()`.
+    - :code:`search`: dict of keyword arguments passed to :code:`set_search_parameters()`.
+    - :code:`error_kernel`, :code:`error_kpars`, :code:`error_kbounds`, :code:`error_regpar`,
+      :code:`error_nrestarts`: error kernel codename followed by the arguments of :code:`set_error_kernel()`.
+    - :code:`error_search`: dict of keyword arguments passed to :code:`set_error_search_parameters()`.
+    - :code:`warnings`: bool passed to :code:`set_warning_flag()`.
+    - :code:`xnew`: vector of x-values at which the fit is evaluated.
+    - :code:`fit`: dict of keyword arguments passed to :code:`GPRFit()`.
+
+    Every yielded record contains the entries :code:`index`, :code:`key`, :code:`status`, which is
+    either :code:`ok` or :code:`error`, :code:`error` and :code:`traceback`. Successful records
+    additionally contain :code:`x`, :code:`results`, :code:`lml`, :code:`kernel` and :code:`error_kernel`,
+    holding the outputs of the corresponding :code:`GaussianProcess` getter functions. Failed fits,
+    including those lost to a crashed worker, are returned as error records and do not stop the batch.
+
+    :arg specs: iterable. Fit specifications, consumed lazily such that only a bounded number of data sets reside in shared memory at any time.
+
+    :kwarg nworkers: int. Number of worker processes, defaults to the number of available processors. Set to zero to run the fits sequentially in the calling process. (optional)
+
+    :kwarg blas_threads: int. Maximum number of BLAS threads used within each worker process, the thread limits of the calling process are not modified. (optional)
+
+    :kwarg max_pending: int. Maximum number of fits submitted to the pool at any time, defaults to twice the number of workers. (optional)
+
+    :kwarg context: str. Start method of the worker processes, passed to :code:`multiprocessing.get_context()`. (optional)
+
+    :returns: generator. Yields one result or error record per fit specification.
+    '''
+
+    nw = int(nworkers) if isinstance(nworkers, number_types) and int(nworkers) >= 0 else (os.cpu_count() or 1)
+    nt = int(blas_threads) if isinstance(blas_threads, number_types) and int(blas_threads) > 0 else 1
+    npend = int(max_pending) if isinstance(max_pending, number_types) and int(max_pending) > 0 else 2 * max(nw, 1)
+
+    if nw == 0:
+        for index, spec in enumerate(specs):
+            key = spec.get('key', index) if isinstance(spec, dict) else index
+            if not isinstance(spec, dict):
+                yield _error_record(index, key, TypeError('Fit specification must be a dict.'))
+                continue
+            yield _run_spec(index, key, spec)
+        return
+
+    # Thread limits are applied by the worker initializer only, the calling process is left untouched
+    pending = {}
+    try:
+        with ProcessPoolExecutor(max_workers=nw, mp_context=multiprocessing.get_context(context), initializer=_init_worker, initargs=(nt, )) as executor:
+            source = enumerate(specs)
+            exhausted = False
+            while not exhausted or pending:
+                while not exhausted and len(pending) < npend:
+                    try:
+                        index, spec = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    key = spec.get('key', index) if isinstance(spec, dict) else index
+                    shm = None
+                    try:
+                        if not isinstance(spec, dict):
+                            raise TypeError('Fit specification must be a dict.')
+                        (shm, settings, layout) = _pack_spec(spec)
+                        settings.pop('key', None)
+                        future = executor.submit(_worker, index, key, shm.name, settings, layout)
+                    except Exception as e:
+                        if shm is not None:
+                            shm.close()
+                            shm.unlink()
+                        yield _error_record(index, key, e)
+                        continue
+                    pending[future] = (index, key, shm)
+                if not pending:
+                    continue
+                done = wait(list(pending.keys()), return_when=FIRST_COMPLETED)[0]
+                for future in done:
+                    (index, key, shm) = pending.pop(future)
+                    shm.close()
+                    shm.unlink()
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        record = _error_record(index, key, e)
+                    yield record
+    finally:
+        for (index, key, shm) in pending.values():
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,1396 @@
+r'''
+Factorized posterior state of a Gaussian Process Regression fit, allowing repeated predictions without
+re-factorizing the training covariance matrix.
+'''
+
+# Required imports
+import copy
+import numpy as np
+import scipy.linalg as spla
+
+from .definitions import number_types, array_types, default_dtype
+from .kernels import Sum_Kernel, ICM_Kernel
+from .utils import diagonal
+from .asynchronous import run_async
+
+__all__ = [
+    'GaussianProcessPosterior',  # Factorized posterior of a Gaussian process fit
+    'CoregionalizedPosterior',  # Multi-output posterior using Kronecker structure
+    'StructuredPosterior',  # Posterior exploiting diagonal and low-rank kernel terms
+]
+
+
+def _cross_covariance(kk, xx, xxd, xn, dd=0, ndim=1, mask=None):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Constructs the cross-covariance matrix between the training data, including derivative data,
+    and the prediction points.
+
+    :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :arg xx: array. Vector of x-values of the training data.
+
+    :arg xxd: array. Vector of x-values of the derivative training data.
+
+    :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+    :kwarg dd: int. Derivative order of output prediction.
+
+    :kwarg ndim: int. Number of dimensions of the x-values.
+
+    :kwarg mask: array. Boolean vector of valid training data points, all points are used if not given.
+
+    :returns: array. Cross-covariance matrix with the training data along the first axis and the prediction points along the last axis.
+    '''
+
+    ksb = kk(xn, xx, der=-dd) if (dd % 2) != 0 else kk(xn, xx, der=dd)
+    ksh = kk(xn, xxd, der=dd+1)
+    if ksb.ndim > 2:
+        ksb = np.squeeze(ksb)
+    if ksh.size == 0:
+        ksh = ksh.reshape(0, *ksb.shape[1:])
+    elif ksh.ndim > ksb.ndim:
+        htr = [ii for ii in range(ksh.ndim)]
+        htr[0] = -1
+        htr[-1] = 0
+        hshape = [ndim for ii in range(ksh.ndim - 3)]
+        ksh = np.transpose(ksh, axes=htr).reshape(xn.shape[0], *hshape, -1)
+        htr = [ii for ii in range(ksh.ndim)]
+        htr[0] = -1
+        htr[-1] = 0
+        ksh = np.transpose(ksh, axes=htr)
+    ks = np.concatenate((ksb, ksh), axis=0)
+    if mask is not None:
+        ks = ks[mask]
+    return ks
+
+
+def _training_covariance(kk, xx, xxd, ndim=1, mask=None, hder=None):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Constructs the full training covariance matrix, including derivative data blocks,
+    without the y-error contributions.
+
+    :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :arg xx: array. Vector of x-values of the training data.
+
+    :arg xxd: array. Vector of x-values of the derivative training data.
+
+    :kwarg ndim: int. Number of dimensions of the x-values.
+
+    :kwarg mask: array. Boolean vector of valid training data points, all points are used if not given.
+
+    :kwarg hder: int. Index of hyperparameter with which to differentiate the covariance matrix. (optional)
+
+    :returns: array. 2D covariance matrix of the training data.
+    '''
+
+    KKb = kk(xx, xx, der=0, hder=hder)
+    KKh1 = kk(xx, xxd, der=1, hder=hder)
+    KKh2 = kk(xxd, xx, der=-1, hder=hder)
+    KKd = kk(xxd, xxd, der=2, hder=hder)
+    if KKb.ndim > 2:
+        KKb = np.squeeze(KKb)
+    if KKh1.ndim > 2:
+        KKh1 = KKh1.T.reshape(xx.shape[0], -1).T
+    if KKh2.ndim > 2:
+        KKh2 = KKh2.reshape(xx.shape[0], -1)
+    if KKd.size == 0:
+        KKd = KKd.reshape(0, 0)
+    if KKd.ndim > 2:
+        KKd = np.transpose(KKd, axes=(1, 0, 2, 3)).reshape(ndim * xxd.shape[0], -1)
+    KK = np.concatenate((np.concatenate((KKb, KKh2), axis=1), np.concatenate((KKh1, KKd), axis=1)), axis=0)
+    if mask is not None:
+        KK = KK[mask, :]
+        KK = KK[:, mask]
+    return KK
+
+
+def _split_terms(kk):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Splits a covariance function into its summed terms, along with the structure of their covariance
+    matrices and the position of their hyperparameters within those of the covariance function.
+
+    :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :returns: list. Tuples of structure, term as :code:`_Kernel` instance and index of its first hyperparameter.
+    '''
+
+    terms = []
+    stack = [(kk, 0)]
+    while len(stack) > 0:
+        (term, offset) = stack.pop(0)
+        struct = term.structure
+        if isinstance(term, Sum_Kernel) and struct == 'dense':
+            offsets = offset + np.cumsum([0] + [child.hyperparameters.size for child in term._kernel_list])
+            stack.extend([(child, int(offsets[ii])) for (ii, child) in enumerate(term._kernel_list)])
+        else:
+            terms.append((struct if struct in ['diagonal', 'lowrank'] else 'dense', term, offset))
+    return terms
+
+
+def _structured_terms(kk):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Splits a covariance function into its summed terms, sorted by the structure of their covariance matrices.
+
+    :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+    :returns: (list, list, list).
+        Terms with dense, diagonal and low-rank covariance matrices, as :code:`_Kernel` instances.
+    '''
+
+    terms = {'dense': [], 'diagonal': [], 'lowrank': []}
+    for (struct, term, offset) in _split_terms(kk):
+        terms[struct].append(term)
+    return (terms['dense'], terms['diagonal'], terms['lowrank'])
+
+
+class GaussianProcessPosterior():
+    r'''
+    Container holding the Cholesky factorization of the training covariance matrix of a
+    Gaussian process regression problem, along with the associated weight vector and
+    log-marginal-likelihood values. Predictions at any set of x-values only require the
+    evaluation of the cross-covariance terms and a triangular solve.
+
+    .. note::
+
+        The training data is expected to be pre-processed (conditioned and normalized)
+        by the :code:`GaussianProcess` class. The normalization constants are stored here
+        such that the predictions are returned in the original units.
+
+    .. note::
+
+        For 1-dimensional x-values, the y-values can be given as a matrix with one output
+        per column. All outputs share the y-errors and therefore the factorization, and the
+        log-marginal-likelihood is summed over the outputs.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used to construct the training covariance matrix.
+
+    :arg xx: array. Vector of x-values of data to be fitted.
+
+    :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+    :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+    :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+    :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+    :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+    :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+    :kwarg ymean: float or array. Offset removed from the y-values during normalization, one per output if multiple outputs are given.
+
+    :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+    '''
+
+    # Covariance function objects, which are not part of the stored state
+    _kernel_attributes = ['_kk']
+
+    def __init__(
+        self,
+        kernel,
+        xx,
+        yy,
+        ye,
+        dxx=None,
+        dyy=None,
+        dye=None,
+        regpar=1.0,
+        ymean=0.0,
+        yscale=1.0,
+        dtype=None
+    ):
+        r'''
+        Constructs and factorizes the training covariance matrix.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used to construct the training covariance matrix.
+
+        :arg xx: array. Vector of x-values of data to be fitted.
+
+        :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+        :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+        :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+        :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+        :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+        :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+        :kwarg ymean: float or array. Offset removed from the y-values during normalization, one per output if multiple outputs are given.
+
+        :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+
+        :returns: none.
+        '''
+
+        self._dtype = dtype if dtype is not None else default_dtype
+        self._kk = copy.copy(kernel)
+        self._lp = float(regpar)
+        self._myy = ymean
+        self._sc = yscale
+
+        self._set_data(xx, yy, ye, dxx, dyy, dye)
+        xf = self._xf
+        yf = self._yf
+        yef = self._yef
+
+        # Algorithm, see theory (located in book specified at top of routines file) for details
+        KK = self.training_covariance()
+        kmat = KK + np.diag(yef.squeeze() ** 2.0)   # Should be fine since kernel output is always 2D
+        self._LL = spla.cholesky(kmat, lower=True)
+        self._alpha = spla.cho_solve((self._LL, True), yf, check_finite=False)
+        self._ldet = 2.0 * np.sum(np.log(np.diag(self._LL)))
+
+        # Log-marginal-likelihood provides an indication of how statistically well the fit describes the training data
+        #    1st term: Describes the goodness of fit for the given data
+        #    2nd term: Penalty for complexity / simplicity of the covariance function
+        #    3rd term: Penalty for the size of given data set
+        #    Multiple outputs sharing the factorization contribute independently to each term
+        fit = np.trace(np.atleast_2d(np.tensordot(yf.T, self._alpha, axes=(-1, 0))))
+        lml = np.squeeze(-0.5 * fit - 0.5 * self._nout * self._lp * self._ldet - 0.5 * self._nout * xf.size * np.log(2.0 * np.pi))
+
+        self._lml = float(lml)
+        self._lmlz = self._null_lml()
+
+
+    def _set_data(self, xx, yy, ye, dxx=None, dyy=None, dye=None):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Concatenates the function and derivative training data and removes invalid data points.
+
+        :arg xx: array. Vector of x-values of data to be fitted.
+
+        :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+        :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+        :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+        :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+        :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+        :returns: none.
+        '''
+
+        # Set up the problem grids for calculating the required matrices from covf
+        dflag = True if dxx is not None and dyy is not None and dye is not None else False
+        self._ndim = xx.shape[1] if xx.ndim > 1 else 1
+        self._xs = xx.shape[1:] if xx.ndim > 1 else []
+        self._ys = yy.shape[1:] if yy.ndim > 1 else []
+        self._nout = yy.shape[1] if xx.ndim == 1 and yy.ndim > 1 else 1
+        self._xx = xx
+        self._xxd = dxx if dflag else np.empty((0, *self._xs), dtype=self._dtype)
+        yyd = dyy if dflag else np.empty((0, *self._ys), dtype=self._dtype)
+        yed = dye if dflag else np.empty((0, *ye.shape[1:]), dtype=self._dtype)
+
+        # Set up the vectors needed for evaluating the final GP
+        reps = yyd.shape[1] if yyd.ndim > 1 else 1
+        yydf = yyd.T.reshape(-1, *self._ys)
+        yedf = yed.T.reshape(-1, *ye.shape[1:])
+        xxdf = np.tile(self._xxd, (reps, 1)).reshape(-1, *self._xs)
+        xf = np.concatenate((xx, xxdf), axis=0)
+        yf = np.concatenate((yy, yydf), axis=0)
+        yef = np.concatenate((ye, yedf), axis=0)
+        mask = np.all(np.isfinite(np.concatenate((yf, yef.reshape(yef.shape[0], -1)), axis=-1)), axis=-1) if yf.ndim > 1 else np.all(np.isfinite(np.stack((yf, yef), axis=-1)), axis=-1)
+        self._mask = mask if np.any(np.invert(mask)) else None
+        if self._mask is not None:
+            xf = xf[mask]
+            yf = yf[mask]
+            yef = yef[mask]
+        self._xf = xf
+        self._yf = yf
+        self._yef = yef
+
+
+    def _null_lml(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Computes the log-marginal-likelihood of the null hypothesis (constant at mean value), which
+        can be used as a normalization factor for general goodness-of-fit metric.
+
+        :returns: float. Log-marginal-likelihood value of null hypothesis.
+        '''
+
+        yf = self._yf
+        yef = self._yef
+        zfilt = (np.abs(yef) >= 1.0e-10)
+        yft = np.zeros((1, *self._ys), dtype=self._dtype)
+        yeft = np.zeros((1, *self._ys), dtype=self._dtype)
+        if np.any(zfilt):
+            yeff = yef[zfilt].reshape(-1, 1) if self._nout > 1 else yef[zfilt]
+            yft = np.power(yf[zfilt] / yeff, 2.0)
+            yeft = 2.0 * np.log(yef[zfilt])
+        lmlz = np.squeeze(-0.5 * np.sum(yft) - 0.5 * self._nout * self._lp * np.sum(yeft) - 0.5 * self._nout * self._xf.size * np.log(2.0 * np.pi))
+        return float(lmlz)
+
+
+    def training_covariance(self, hder=None):
+        r'''
+        Constructs the full training covariance matrix, including derivative data blocks,
+        without the y-error contributions.
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the covariance matrix. (optional)
+
+        :returns: array. 2D covariance matrix of the training data, with invalid data points removed.
+        '''
+
+        return _training_covariance(self._kk, self._xx, self._xxd, ndim=self._ndim, mask=self._mask, hder=hder)
+
+
+    def cross_covariance(self, xn, dd=0):
+        r'''
+        Constructs the cross-covariance matrix between the training data and the prediction points.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: array. Cross-covariance matrix with the training data along the first axis and the prediction points along the last axis.
+        '''
+
+        return _cross_covariance(self._kk, self._xx, self._xxd, xn, dd=dd, ndim=self._ndim, mask=self._mask)
+
+
+    def solve(self, rhs):
+        r'''
+        Applies the inverse of the training covariance matrix, including y-errors, to the input.
+
+        :arg rhs: array. Vector or matrix with the training data along the first axis.
+
+        :returns: array. Solution with the same shape as :code:`rhs`.
+        '''
+
+        # Solve function internal matmul needs matching axis to be axis 1 when ndim > 2
+        swap = (rhs.ndim > 2)
+        bb = np.swapaxes(rhs, 0, 1) if swap else rhs
+        sol = spla.cho_solve((self._LL, True), bb, check_finite=False)
+        # Reverting earlier axis swap for rest of routine
+        return np.swapaxes(sol, 0, 1) if swap else sol
+
+
+    def _cholesky(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Returns the lower Cholesky factor of the training covariance matrix, including y-errors.
+
+        :returns: array. 2D lower triangular matrix.
+        '''
+
+        return self._LL
+
+
+    def _check_input(self, xnew):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Converts and checks the vector of prediction x-values.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :returns: array. Vector of x-values at which the fit will be evaluated.
+        '''
+
+        xn = None
+        if isinstance(xnew, array_types) and len(xnew) > 0:
+            xn = np.array(xnew, dtype=self._dtype)
+        if xn is None:
+            raise ValueError('A valid vector of prediction x-points must be given.')
+        elif xn.ndim != self._xx.ndim:
+            raise ValueError(f'Prediction x-point vector must contain the same number of dimensions as fitted data, which is {self._xx.ndim}.')
+        return xn
+
+
+    def _predict(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the normalized predictive mean and full covariance matrix.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array).
+            Vector of predicted mean values, matrix of predicted variances and covariances.
+        '''
+
+        ks = self.cross_covariance(xn, dd)
+        kt = self._kk(xn, xn, der=2*dd)
+        if kt.ndim > 2:
+            kt = np.squeeze(kt)
+        kv = self.solve(ks)
+
+        barF = np.tensordot(ks.T, self._alpha, axes=(-1, 0))          # Mean function
+        varF = kt - np.tensordot(ks.T, kv, axes=(-1, 0))              # Variance of mean function
+
+        if self._xx.ndim > 1:
+            barF = barF.reshape(xn.shape[0], self._ndim ** dd)
+            varF = varF.reshape(xn.shape[0], barF.shape[-1], barF.shape[-1], xn.shape[0])
+
+        return (barF, varF)
+
+
+    def _predict_diagonal(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the normalized predictive mean and only the diagonal of the covariance matrix,
+        avoiding the matrix product between the cross-covariance terms.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array).
+            Vector of predicted mean values, vector of predicted variances.
+        '''
+
+        ks = self.cross_covariance(xn, dd)
+        kt = self._kk(xn, xn, der=2*dd)
+        if kt.ndim > 2:
+            kt = np.squeeze(kt)
+        kv = self.solve(ks)
+
+        barF = np.tensordot(ks.T, self._alpha, axes=(-1, 0))          # Mean function
+        varF = diagonal(kt) - np.sum(ks * kv, axis=0).T               # Diagonal of variance of mean function
+
+        if self._xx.ndim > 1:
+            barF = barF.reshape(xn.shape[0], self._ndim ** dd)
+            varF = varF.reshape(xn.shape[0], self._ndim ** dd)
+
+        return (barF, varF)
+
+
+    def predict_mean(self, xnew, der=0):
+        r'''
+        Evaluates only the mean of the posterior distribution at the input x-values, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg der: int. Derivative order of output prediction, only 0 and 1 are supported. (optional)
+
+        :returns: array. Vector of predicted mean values.
+        '''
+
+        xn = self._check_input(xnew)
+        dd = 1 if int(der) > 0 else 0
+        ks = self.cross_covariance(xn, dd)
+        barF = np.tensordot(ks.T, self._alpha, axes=(-1, 0))
+        if self._xx.ndim > 1:
+            barF = barF.reshape(xn.shape[0], self._ndim ** dd)
+        return barF * self._sc if dd > 0 else barF * self._sc + self._myy
+
+
+    def predict(self, xnew, der=0, rtn_cov=False):
+        r'''
+        Evaluates the posterior distribution at the input x-values, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg der: int. Derivative order of output prediction, only 0 and 1 are supported. (optional)
+
+        :kwarg rtn_cov: bool. Set as true to return the full predicted covariance matrix instead of the 1 sigma errors. (optional)
+
+        :returns: (array, array).
+            Vector of predicted mean values, vector or matrix of predicted errors.
+        '''
+
+        xn = self._check_input(xnew)
+        dd = 1 if int(der) > 0 else 0
+        barF = None
+        errF = None
+        if rtn_cov:
+            (barF, varF) = self._predict(xn, dd)
+            errF = varF * self._sc ** 2.0
+        else:
+            (barF, varF) = self._predict_diagonal(xn, dd)
+            errF = np.sqrt(varF) * self._sc
+        barF = barF * self._sc if dd > 0 else barF * self._sc + self._myy
+        return (barF, errF)
+
+
+    async def predict_async(self, xnew, der=0, rtn_cov=False):
+        r'''
+        Asynchronous version of :code:`predict()`, running the evaluation on the shared executor
+        configured through :code:`set_async_executor()` such that the event loop is not blocked.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg der: int. Derivative order of output prediction, only 0 and 1 are supported. (optional)
+
+        :kwarg rtn_cov: bool. Set as true to return the full predicted covariance matrix instead of the 1 sigma errors. (optional)
+
+        :returns: (array, array).
+            Vector of predicted mean values, vector or matrix of predicted errors.
+        '''
+
+        return await run_async(self.predict, xnew, der=der, rtn_cov=rtn_cov)
+
+
+    def _derivative_rows(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Flags the training data rows which hold derivative data, which follow the function data rows.
+
+        :returns: array. Boolean vector with one entry per valid training data row.
+        '''
+
+        nrows = self._mask.size if self._mask is not None else self._yf.shape[0]
+        isd = np.arange(nrows) >= self._xx.shape[0]
+        return isd[self._mask] if self._mask is not None else isd
+
+
+    def _cv_folds(self, folds=None):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Converts the fold specification into index vectors of the held-out training data rows.
+
+        :kwarg folds: int or array. Number of folds, with rows assigned to folds in turn, or vector of fold labels per valid training data row. Leave-one-out if not given. (optional)
+
+        :returns: list. Index vectors of each fold, or :code:`None` for leave-one-out.
+        '''
+
+        nrows = self._yf.shape[0]
+        if folds is None:
+            return None
+        if isinstance(folds, number_types):
+            nf = int(folds)
+            if nf < 2 or nf > nrows:
+                raise ValueError(f'Number of cross-validation folds must be between 2 and the number of training points, which is {nrows}.')
+            return [np.arange(ii, nrows, nf) for ii in range(nf)] if nf < nrows else None
+        if isinstance(folds, array_types) and len(folds) == nrows:
+            (labels, inverse) = np.unique(np.asarray(folds), return_inverse=True)
+            if labels.size < 2:
+                raise ValueError('Cross-validation fold labels must define at least 2 folds.')
+            order = np.argsort(inverse, kind='stable')
+            bounds = np.cumsum(np.bincount(inverse))[:-1]
+            return np.split(order, bounds)
+        raise ValueError(f'Cross-validation folds must be given as a number or as a vector of {nrows} fold labels.')
+
+
+    def _cv_inverse(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Computes the inverse of the training covariance matrix, including y-errors, required by the
+        closed-form cross-validation expressions.
+
+        :returns: array. 2D inverse training covariance matrix.
+        '''
+
+        return self.solve(np.eye(self._yf.shape[0], dtype=self._dtype))
+
+
+    def _cv_blocks(self, kinv, folds):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Factorizes the diagonal blocks of the inverse training covariance matrix belonging to each fold,
+        whose inverses are the predictive covariance matrices of the held-out data.
+
+        :arg kinv: array. 2D inverse training covariance matrix.
+
+        :arg folds: list. Index vectors of each fold.
+
+        :returns: list. Lower Cholesky factor of the inverse covariance block of each fold.
+        '''
+
+        return [spla.cholesky(kinv[np.ix_(idx, idx)], lower=True, check_finite=False) for idx in folds]
+
+
+    def cross_validate(self, folds=None):
+        r'''
+        Evaluates the cross-validation predictive distributions of the training data in closed form,
+        from the inverse training covariance matrix and the weight vector, without refitting. The
+        predictive distribution of each held-out fold is given by :code:`mu = y - B^(-1) alpha` and
+        :code:`cov = B^(-1)`, with :code:`B` the diagonal block of the inverse training covariance
+        matrix belonging to the fold.
+
+        .. note::
+
+            Hyperparameters are not re-optimized for each fold. Derivative data rows are included
+            in the folds as any other training data row.
+
+        :kwarg folds: int or array. Number of folds, with rows assigned to folds in turn, or vector of fold labels per valid training data row. Leave-one-out if not given. (optional)
+
+        :returns: (array, array, array).
+            Vector of held-out predictive mean values, vector of held-out predictive 1 sigma errors including the y-errors,
+            vector of log predictive densities of each fold, in the original units of the data.
+        '''
+
+        fidx = self._cv_folds(folds)
+        nrows = self._yf.shape[0]
+        kinv = self._cv_inverse()
+        alpha = self._alpha.reshape(nrows, -1)
+        if fidx is None:
+            kd = np.diag(kinv).copy()
+            corr = alpha / kd[:, np.newaxis]
+            varF = 1.0 / kd
+            logp = -0.5 * np.sum(alpha * corr, axis=-1) + 0.5 * self._nout * np.log(kd)
+            sizes = np.ones((nrows, ), dtype=int)
+        else:
+            corr = np.zeros(alpha.shape, dtype=self._dtype)
+            varF = np.zeros((nrows, ), dtype=self._dtype)
+            logp = np.zeros((len(fidx), ), dtype=self._dtype)
+            for (ii, (idx, LB)) in enumerate(zip(fidx, self._cv_blocks(kinv, fidx))):
+                corr[idx] = spla.cho_solve((LB, True), alpha[idx], check_finite=False)
+                varF[idx] = np.sum(np.power(spla.solve_triangular(LB, np.eye(idx.size, dtype=self._dtype), lower=True, check_finite=False), 2.0), axis=0)
+                logp[ii] = -0.5 * np.sum(alpha[idx] * corr[idx]) + self._nout * np.sum(np.log(np.diag(LB)))
+            sizes = np.array([idx.size for idx in fidx])
+        logp -= 0.5 * self._nout * sizes * np.log(2.0 * np.pi * self._sc ** 2.0)
+        barF = (self._yf - corr.reshape(self._yf.shape)) * self._sc
+        isf = np.invert(self._derivative_rows())
+        barF[isf] += self._myy
+        return (barF, np.sqrt(varF) * self._sc, logp)
+
+
+    def cv_log_predictive(self, folds=None):
+        r'''
+        Computes the total cross-validation log predictive density of the training data, which can be
+        used instead of the log-marginal-likelihood for model selection, see :code:`cross_validate()`.
+
+        :kwarg folds: int or array. Number of folds, with rows assigned to folds in turn, or vector of fold labels per valid training data row. Leave-one-out if not given. (optional)
+
+        :returns: float. Sum of the log predictive densities of all folds.
+        '''
+
+        return float(np.sum(self.cross_validate(folds)[2]))
+
+
+    def cv_gradient(self, folds=None):
+        r'''
+        Computes the gradient of the total cross-validation log predictive density with respect to the
+        hyperparameters in linear space, using the derivatives of the inverse training covariance matrix.
+
+        :kwarg folds: int or array. Number of folds, with rows assigned to folds in turn, or vector of fold labels per valid training data row. Leave-one-out if not given. (optional)
+
+        :returns: array. Vector of cross-validation log predictive density derivatives with respect to the hyperparameters.
+        '''
+
+        fidx = self._cv_folds(folds)
+        nrows = self._yf.shape[0]
+        kinv = self._cv_inverse()
+        alpha = self._alpha.reshape(nrows, -1)
+        if fidx is None:
+            kd = np.diag(kinv)
+            corr = alpha / kd[:, np.newaxis]
+        else:
+            blocks = self._cv_blocks(kinv, fidx)
+            corr = [spla.cho_solve((LB, True), alpha[idx], check_finite=False) for (idx, LB) in zip(fidx, blocks)]
+            binv = [spla.cho_solve((LB, True), np.eye(idx.size, dtype=self._dtype), check_finite=False) for (idx, LB) in zip(fidx, blocks)]
+        theta = self._kk.hyperparameters
+        gradcv = np.zeros(theta.shape, dtype=self._dtype).flatten()
+        for ii in range(gradcv.size):
+            # Derivatives of the weights and of the inverse covariance blocks are -K^(-1) dK alpha and -K^(-1) dK K^(-1)
+            WW = kinv @ self.training_covariance(hder=ii)
+            za = WW @ alpha
+            if fidx is None:
+                pd = np.sum(WW * kinv, axis=1)
+                gradcv[ii] = np.sum(corr * za) - 0.5 * np.sum(corr ** 2.0 * pd[:, np.newaxis]) - 0.5 * self._nout * np.sum(pd / kd)
+            else:
+                PP = WW @ kinv
+                for (idx, cc, bi) in zip(fidx, corr, binv):
+                    pb = PP[np.ix_(idx, idx)]
+                    gradcv[ii] += np.sum(cc * za[idx]) - 0.5 * np.sum(cc * (pb @ cc)) - 0.5 * self._nout * np.sum(bi * pb)
+        return gradcv
+
+
+    def _get_state(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Collects the stored factorization, training data and normalization constants, such that
+        the posterior can be restored without repeating the factorization.
+
+        :returns: dict. Instance attributes, excluding the covariance function objects.
+        '''
+
+        return {key: value for key, value in self.__dict__.items() if key not in self._kernel_attributes}
+
+
+    @classmethod
+    def _from_state(cls, kernel, state):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Restores a posterior from its stored state, without repeating the factorization.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used to construct the stored factorization.
+
+        :arg state: dict. Instance attributes, as returned by :code:`_get_state()`.
+
+        :returns: object. The restored posterior instance.
+        '''
+
+        post = cls.__new__(cls)
+        post.__dict__.update(state)
+        post._kk = copy.copy(kernel)
+        return post
+
+
+    @property
+    def kernel(self):
+        r'''
+        Returns the covariance function used to construct the posterior.
+
+        :returns: object. Copy of the :code:`_Kernel` instance used in the factorization.
+        '''
+
+        return copy.copy(self._kk)
+
+
+    @property
+    def regpar(self):
+        r'''
+        Returns the regularization parameter used in the log-marginal-likelihood.
+
+        :returns: float. Regularization parameter value.
+        '''
+
+        return self._lp
+
+
+    @property
+    def lml(self):
+        r'''
+        Returns the log-marginal-likelihood of the training data, including the regularization component.
+
+        :returns: float. Log-marginal-likelihood value.
+        '''
+
+        return self._lml
+
+
+    @property
+    def null_lml(self):
+        r'''
+        Returns the log-marginal-likelihood of the null hypothesis on the training data.
+
+        :returns: float. Log-marginal-likelihood value of null hypothesis.
+        '''
+
+        return self._lmlz
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the number of valid training points, including derivative data points.
+
+        :returns: int. Dimension of the factorized training covariance matrix.
+        '''
+
+        return int(self._LL.shape[0])
+
+
+    @property
+    def nout(self):
+        r'''
+        Returns the number of outputs sharing the factorized training covariance matrix.
+
+        :returns: int. Number of columns of the y-values, 1 for single output regression.
+        '''
+
+        return self._nout
+
+
+
+class CoregionalizedPosterior(GaussianProcessPosterior):
+    r'''
+    Container holding the eigendecompositions required to evaluate a multi-output Gaussian process
+    regression problem with an :code:`ICM_Kernel` instance, where all outputs share the same x-values
+    and y-errors. The training covariance matrix, B x K + I x E, is never constructed, as it can be
+    inverted using the eigendecompositions of B and of the whitened input covariance matrix,
+    E^(-1/2) K E^(-1/2). This costs about as much as a single-output fit, plus the decomposition
+    of the output covariance matrix.
+
+    .. note::
+
+        Derivative data is not supported and all y-errors must be strictly positive.
+
+    :arg kernel: object. The covariance function, as an :code:`ICM_Kernel` instance.
+
+    :arg xx: array. Vector of x-values of data to be fitted.
+
+    :arg yy: array. Matrix of normalized y-values of data to be fitted, with one output per column.
+
+    :arg ye: array. Vector of normalized y-errors of data to be fitted, shared by all outputs, assumed to be given as 1 sigma.
+
+    :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+    :kwarg ymean: array. Offsets removed from the y-values of each output during normalization.
+
+    :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+    '''
+
+    # Covariance function objects, which are not part of the stored state
+    _kernel_attributes = ['_kk', '_kx', '_kb']
+
+    def __init__(
+        self,
+        kernel,
+        xx,
+        yy,
+        ye,
+        dxx=None,
+        dyy=None,
+        dye=None,
+        regpar=1.0,
+        ymean=0.0,
+        yscale=1.0,
+        dtype=None
+    ):
+        r'''
+        Decomposes the output and whitened input covariance matrices.
+
+        :arg kernel: object. The covariance function, as an :code:`ICM_Kernel` instance.
+
+        :arg xx: array. Vector of x-values of data to be fitted.
+
+        :arg yy: array. Matrix of normalized y-values of data to be fitted, with one output per column.
+
+        :arg ye: array. Vector of normalized y-errors of data to be fitted, shared by all outputs, assumed to be given as 1 sigma.
+
+        :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+        :kwarg ymean: array. Offsets removed from the y-values of each output during normalization.
+
+        :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+
+        :returns: none.
+        '''
+
+        if not isinstance(kernel, ICM_Kernel):
+            raise TypeError('Coregionalized posterior requires an ICM_Kernel instance.')
+        if dxx is not None and dyy is not None and dye is not None:
+            raise ValueError('Derivative data is not supported for coregionalized regression.')
+        if xx.ndim != 1 or yy.ndim != 2 or yy.shape[1] != kernel.nout:
+            raise ValueError(f'Coregionalized regression requires 1D x-values and a matrix of y-values with {kernel.nout} columns.')
+        self._dtype = dtype if dtype is not None else default_dtype
+        self._kk = copy.copy(kernel)
+        self._kx = kernel.input_kernel
+        self._kb = kernel.output_kernel
+        self._lp = float(regpar)
+        self._myy = ymean
+        self._sc = yscale
+        self._ndim = 1
+        self._xs = []
+        self._ys = yy.shape[1:]
+        self._nout = yy.shape[1]
+        self._xxd = np.empty((0, ), dtype=self._dtype)
+        self._LL = None
+
+        mask = np.all(np.isfinite(np.concatenate((yy, ye.reshape(-1, 1)), axis=-1)), axis=-1)
+        self._mask = None
+        xf = xx[mask]
+        yf = yy[mask]
+        yef = ye.flatten()[mask]
+        if np.any(yef <= 0.0):
+            raise ValueError('Coregionalized regression requires strictly positive y-errors.')
+        self._xx = xf
+        self._xf = xf
+        self._yf = yf
+        self._yef = yef
+
+        # Whitening by the y-errors maps the noise term onto the identity, preserving the Kronecker structure
+        self._ww = 1.0 / yef
+        self._KK = self._kx(xf, xf, der=0)
+        self._BB = self._kb.output_covariance()
+        (lk, self._QK) = spla.eigh(self._ww[:, np.newaxis] * self._KK * self._ww[np.newaxis, :])
+        (lb, self._QB) = spla.eigh(self._BB)
+        self._lk = np.clip(lk, 0.0, None)
+        self._lb = np.clip(lb, 0.0, None)
+        self._SS = np.outer(self._lk, self._lb) + 1.0
+        self._alpha = self.solve(yf)
+        self._ldet = np.sum(np.log(self._SS)) + 2.0 * self._nout * np.sum(np.log(yef))
+
+        lml = -0.5 * np.sum(yf * self._alpha) - 0.5 * self._lp * self._ldet - 0.5 * self._nout * xf.size * np.log(2.0 * np.pi)
+
+        # Null hypothesis is identical to independent outputs
+        yft = np.power(yf / yef[:, np.newaxis], 2.0)
+        yeft = 2.0 * np.log(yef)
+        lmlz = -0.5 * np.sum(yft) - 0.5 * self._nout * self._lp * np.sum(yeft) - 0.5 * self._nout * xf.size * np.log(2.0 * np.pi)
+
+        self._lml = float(lml)
+        self._lmlz = float(lmlz)
+
+
+    def training_covariance(self, hder=None):
+        r'''
+        Constructs the full training covariance matrix of all outputs, stacked one after
+        the other, without the y-error contributions. Only intended for diagnostics.
+
+        :kwarg hder: int. Index of hyperparameter with which to differentiate the covariance matrix. (optional)
+
+        :returns: array. 2D covariance matrix of the training data, with invalid data points removed.
+        '''
+
+        return self._kk(self._xf, self._xf, der=0, hder=hder)
+
+
+    def cross_covariance(self, xn, dd=0):
+        r'''
+        Constructs the input cross-covariance matrix between the training data and the prediction points,
+        which is shared by all pairs of outputs up to the factors in the output covariance matrix.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: array. Cross-covariance matrix with the training data along the first axis and the prediction points along the last axis.
+        '''
+
+        return self._kx(xn, self._xf, der=-dd) if (dd % 2) != 0 else self._kx(xn, self._xf, der=dd)
+
+
+    def solve(self, rhs):
+        r'''
+        Applies the inverse of the training covariance matrix, including y-errors, to the input.
+
+        :arg rhs: array. Matrix with the training data along the first axis and the outputs along the second axis.
+
+        :returns: array. Solution with the same shape as :code:`rhs`.
+        '''
+
+        ww = self._ww.reshape(-1, *([1] * (rhs.ndim - 1)))
+        rot = np.tensordot(self._QK.T, ww * rhs, axes=(-1, 0))
+        rot = np.moveaxis(np.tensordot(np.moveaxis(rot, 1, -1), self._QB, axes=(-1, 0)), -1, 1)
+        sol = rot / self._SS.reshape(*self._SS.shape, *([1] * (rhs.ndim - 2)))
+        sol = np.moveaxis(np.tensordot(np.moveaxis(sol, 1, -1), self._QB.T, axes=(-1, 0)), -1, 1)
+        return ww * np.tensordot(self._QK, sol, axes=(-1, 0))
+
+
+    def _cv_inverse(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Closed-form cross-validation is not available, as the outputs of each point are not independent training data rows.
+
+        :returns: none.
+        '''
+
+        raise TypeError('Closed-form cross-validation is not available for coregionalized posteriors.')
+
+
+    def _projections(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the cross-covariance terms and their projection onto the eigenvectors of the whitened input covariance matrix.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array, array).
+            Cross-covariance matrix, its projection, output eigenvectors scaled by their eigenvalues.
+        '''
+
+        ks = self.cross_covariance(xn, dd)
+        pp = np.dot(self._QK.T, self._ww[:, np.newaxis] * ks)
+        gg = self._lb[:, np.newaxis] * self._QB.T
+        return (ks, pp, gg)
+
+
+    def _predict(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the normalized predictive mean and full covariance matrix of all outputs.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array).
+            Matrix of predicted mean values with one output per column, N x K x K x N matrix of predicted variances and covariances.
+        '''
+
+        (ks, pp, gg) = self._projections(xn, dd)
+        kt = self._kx(xn, xn, der=2*dd)
+        barF = np.dot(np.dot(ks.T, self._alpha), self._BB)
+        aa = np.einsum('nm,nb,np->bmp', pp, 1.0 / self._SS, pp)
+        varF = self._BB[np.newaxis, :, :, np.newaxis] * kt[:, np.newaxis, np.newaxis, :] - np.einsum('bk,bl,bmp->mklp', gg, gg, aa)
+        return (barF, varF)
+
+
+    def _predict_diagonal(self, xn, dd=0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the normalized predictive mean and only the variance of each output at each point.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg dd: int. Derivative order of output prediction.
+
+        :returns: (array, array).
+            Matrix of predicted mean values, matrix of predicted variances, with one output per column.
+        '''
+
+        (ks, pp, gg) = self._projections(xn, dd)
+        kt = self._kx(xn, xn, der=2*dd)
+        barF = np.dot(np.dot(ks.T, self._alpha), self._BB)
+        varF = diagonal(kt)[:, np.newaxis] * np.diag(self._BB)[np.newaxis, :] - np.einsum('bk,nb,nm->mk', np.power(gg, 2.0), 1.0 / self._SS, np.power(pp, 2.0))
+        return (barF, varF)
+
+
+    def predict_mean(self, xnew, der=0):
+        r'''
+        Evaluates only the mean of the posterior distribution at the input x-values, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg der: int. Derivative order of output prediction, only 0 and 1 are supported. (optional)
+
+        :returns: array. Matrix of predicted mean values, with one output per column.
+        '''
+
+        xn = self._check_input(xnew)
+        dd = 1 if int(der) > 0 else 0
+        barF = np.dot(np.dot(self.cross_covariance(xn, dd).T, self._alpha), self._BB)
+        return barF * self._sc if dd > 0 else barF * self._sc + self._myy
+
+
+    @classmethod
+    def _from_state(cls, kernel, state):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Restores a posterior from its stored state, without repeating the eigendecompositions.
+
+        :arg kernel: object. The covariance function, as an :code:`ICM_Kernel` instance, used to construct the stored decompositions.
+
+        :arg state: dict. Instance attributes, as returned by :code:`_get_state()`.
+
+        :returns: object. The restored posterior instance.
+        '''
+
+        if not isinstance(kernel, ICM_Kernel):
+            raise TypeError('Coregionalized posterior requires an ICM_Kernel instance.')
+        post = super()._from_state(kernel, state)
+        post._kx = kernel.input_kernel
+        post._kb = kernel.output_kernel
+        return post
+
+
+    def lml_gradient(self):
+        r'''
+        Computes the gradient of the log-marginal-likelihood with respect to the hyperparameters in linear space,
+        using the eigendecompositions to evaluate the trace terms.
+
+        :returns: array. Vector of log-marginal-likelihood derivatives with respect to the hyperparameters including the regularization component.
+        '''
+
+        nx = self._kx.hyperparameters.size
+        nb = self._kb.hyperparameters.size
+        gradlml = np.zeros((nx + nb, ), dtype=self._dtype)
+        for ii in range(nx):
+            HH = self._kx(self._xf, self._xf, der=0, hder=ii)
+            fit = np.sum(self._alpha * np.dot(np.dot(HH, self._alpha), self._BB))
+            hdiag = np.einsum('in,ij,jn->n', self._QK, self._ww[:, np.newaxis] * HH * self._ww[np.newaxis, :], self._QK)
+            trace = np.sum(hdiag[:, np.newaxis] * self._lb[np.newaxis, :] / self._SS)
+            gradlml[ii] = 0.5 * fit - 0.5 * self._lp * trace
+        for jj in range(nb):
+            HB = self._kb.output_covariance(hder=jj)
+            fit = np.sum(self._alpha * np.dot(np.dot(self._KK, self._alpha), HB))
+            hdiag = np.einsum('in,ij,jn->n', self._QB, HB, self._QB)
+            trace = np.sum(self._lk[:, np.newaxis] * hdiag[np.newaxis, :] / self._SS)
+            gradlml[nx+jj] = 0.5 * fit - 0.5 * self._lp * trace
+        return gradlml
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the number of valid training points, summed over all outputs.
+
+        :returns: int. Dimension of the implicit training covariance matrix.
+        '''
+
+        return int(self._xf.shape[0] * self._nout)
+
+
+
+class StructuredPosterior(GaussianProcessPosterior):
+    r'''
+    Container holding the factorization of a training covariance matrix split according to the
+    structure of the summed kernel terms, :code:`K + E = S + U U^T`. The diagonal terms are folded
+    with the y-errors into :code:`S`, along with the dense terms if any, while the low-rank terms
+    are represented by their features :code:`U` and applied through the Woodbury identity. Without
+    dense terms, no N x N matrix is constructed or factorized.
+
+    .. note::
+
+        The dense covariance matrix is only constructed on request, for hyperparameter derivatives,
+        cross-validation or predictor export. Diagonal terms are treated as dense if x-values are
+        repeated, and all terms are treated as dense if the diagonal is not strictly positive
+        without dense terms. Only 1-dimensional x-values are supported.
+
+    :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used to construct the training covariance matrix.
+
+    :arg xx: array. Vector of x-values of data to be fitted.
+
+    :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+    :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+    :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+    :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+    :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+    :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+    :kwarg ymean: float or array. Offset removed from the y-values during normalization, one per output if multiple outputs are given.
+
+    :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+    '''
+
+    def __init__(
+        self,
+        kernel,
+        xx,
+        yy,
+        ye,
+        dxx=None,
+        dyy=None,
+        dye=None,
+        regpar=1.0,
+        ymean=0.0,
+        yscale=1.0,
+        dtype=None
+    ):
+        r'''
+        Constructs and factorizes the structured training covariance matrix.
+
+        :arg kernel: object. The covariance function, as a :code:`_Kernel` instance, used to construct the training covariance matrix.
+
+        :arg xx: array. Vector of x-values of data to be fitted.
+
+        :arg yy: array. Vector of normalized y-values of data to be fitted, or matrix with one output per column.
+
+        :arg ye: array. Vector of normalized y-errors of data to be fitted, assumed to be given as 1 sigma.
+
+        :kwarg dxx: array. Vector of x-values of derivative data to be included in fit. (optional)
+
+        :kwarg dyy: array. Vector of normalized dy-values of derivative data to be included in fit. (optional)
+
+        :kwarg dye: array. Vector of normalized dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. (optional)
+
+        :kwarg regpar: float. Regularization parameter, multiplies penalty term for kernel complexity in log-marginal-likelihood.
+
+        :kwarg ymean: float or array. Offset removed from the y-values during normalization, one per output if multiple outputs are given.
+
+        :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+
+        :returns: none.
+        '''
+
+        if xx.ndim != 1:
+            raise ValueError('Structured posterior is only available for 1-dimensional x-values.')
+        self._dtype = dtype if dtype is not None else default_dtype
+        self._kk = copy.copy(kernel)
+        self._lp = float(regpar)
+        self._myy = ymean
+        self._sc = yscale
+
+        self._set_data(xx, yy, ye, dxx, dyy, dye)
+        xf = self._xf
+        yf = self._yf
+        npts = xf.shape[0]
+
+        (dense, diags, lowrank) = _structured_terms(self._kk)
+        if self._repeated():
+            dense = dense + diags
+            diags = []
+        sdiag = np.power(self._yef.flatten(), 2.0)
+        for kk in diags:
+            sdiag = sdiag + self._rows(kk.diagonal_values)
+        UU = np.concatenate([self._rows(kk.factors) for kk in lowrank], axis=-1) if len(lowrank) > 0 else np.empty((npts, 0), dtype=self._dtype)
+        KK = None
+        if len(dense) > 0:
+            KK = np.sum([_training_covariance(kk, self._xx, self._xxd, mask=self._mask) for kk in dense], axis=0)
+        if (KK is None and not np.all(sdiag > 0.0)) or UU.shape[1] >= npts:
+            KK = UU @ UU.T if KK is None else KK + UU @ UU.T
+            UU = np.empty((npts, 0), dtype=self._dtype)
+
+        # Algorithm, see theory (located in book specified at top of routines file) for details
+        self._sdiag = sdiag
+        self._LL = spla.cholesky(KK + np.diag(sdiag), lower=True) if KK is not None else None
+        self._UU = UU
+        self._SU = UU
+        self._LC = np.empty((0, 0), dtype=self._dtype)
+        if UU.shape[1] > 0:
+            self._SU = self._solve_base(UU)
+            self._LC = spla.cholesky(np.eye(UU.shape[1], dtype=self._dtype) + UU.T @ self._SU, lower=True)
+        self._alpha = self.solve(yf)
+        ldets = 2.0 * np.sum(np.log(np.diag(self._LL))) if self._LL is not None else np.sum(np.log(sdiag))
+        self._ldet = ldets + 2.0 * np.sum(np.log(np.diag(self._LC)))
+
+        # Log-marginal-likelihood terms, see GaussianProcessPosterior
+        fit = np.trace(np.atleast_2d(np.tensordot(yf.T, self._alpha, axes=(-1, 0))))
+        lml = np.squeeze(-0.5 * fit - 0.5 * self._nout * self._lp * self._ldet - 0.5 * self._nout * xf.size * np.log(2.0 * np.pi))
+
+        self._lml = float(lml)
+        self._lmlz = self._null_lml()
+
+
+    def _rows(self, func):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates a structure function of a kernel term on the function and derivative training data rows.
+
+        :arg func: callable. Bound :code:`factors()` or :code:`diagonal_values()` method of a :code:`_Kernel` instance.
+
+        :returns: array. Evaluations with the valid training data rows along the first axis.
+        '''
+
+        vals = np.concatenate((func(self._xx), func(self._xxd, der=1)), axis=0)
+        return vals[self._mask] if self._mask is not None else vals
+
+
+    def _repeated(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Checks for repeated x-values, as zero covariance between distinct x-values only yields a
+        diagonal matrix for unique x-values.
+
+        :returns: bool. True if the function or derivative training data contains repeated x-values.
+        '''
+
+        return bool(np.unique(self._xx).size < self._xx.size or np.unique(self._xxd).size < self._xxd.size)
+
+
+    def _solve_base(self, rhs):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Applies the inverse of the dense and diagonal part of the training covariance matrix to the input.
+
+        :arg rhs: array. 2D matrix with the training data along the first axis.
+
+        :returns: array. Solution with the same shape as :code:`rhs`.
+        '''
+
+        if self._LL is not None:
+            return spla.cho_solve((self._LL, True), rhs, check_finite=False)
+        return rhs / self._sdiag[:, np.newaxis]
+
+
+    def solve(self, rhs):
+        r'''
+        Applies the inverse of the training covariance matrix, including y-errors, to the input.
+
+        :arg rhs: array. Vector or matrix with the training data along the first axis.
+
+        :returns: array. Solution with the same shape as :code:`rhs`.
+        '''
+
+        bb = rhs.reshape(rhs.shape[0], -1)
+        sol = self._solve_base(bb)
+        if self._UU.shape[1] > 0:
+            # Contractions along contiguous axes keep each column independent of the number of columns solved together
+            zz = spla.cho_solve((self._LC, True), np.einsum('nr,mn->rm', self._UU, np.ascontiguousarray(sol.T)), check_finite=False)
+            sol = sol - np.einsum('nr,mr->nm', self._SU, np.ascontiguousarray(zz.T))
+        return sol.reshape(rhs.shape)
+
+
+    def _cholesky(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Returns the lower Cholesky factor of the training covariance matrix, including y-errors,
+        which is only constructed here if the factorization holds structured terms.
+
+        :returns: array. 2D lower triangular matrix.
+        '''
+
+        if self._LL is not None and self._UU.shape[1] == 0:
+            return self._LL
+        kmat = self.training_covariance() + np.diag(np.power(self._yef.flatten(), 2.0))
+        return spla.cholesky(kmat, lower=True)
+
+
+    def lml_gradient(self):
+        r'''
+        Computes the gradient of the log-marginal-likelihood with respect to the hyperparameters in linear space,
+        from the hyperparameter derivatives of each summed kernel term. The derivatives of diagonal terms are
+        diagonal and those of low-rank terms are :code:`dU U^T + U dU^T`, such that the trace terms only require
+        the diagonal of the inverse training covariance matrix and its product with the features, both obtained
+        through the Woodbury identity. The dense inverse is only computed if the factorization holds dense terms.
+
+        :returns: array. Vector of log-marginal-likelihood derivatives with respect to the hyperparameters including the regularization component.
+        '''
+
+        alpha = self._alpha.reshape(self._alpha.shape[0], -1)
+        repeated = self._repeated()
+        kinv = self.solve(np.eye(self.size, dtype=self._dtype)) if self._LL is not None else None
+        kdiag = diagonal(kinv) if kinv is not None else None
+        if kinv is None:
+            kdiag = 1.0 / self._sdiag
+            if self._UU.shape[1] > 0:
+                CS = spla.solve_triangular(self._LC, self._SU.T, lower=True, check_finite=False)
+                kdiag = kdiag - np.sum(np.power(CS, 2.0), axis=0)
+
+        gradlml = np.zeros(self._kk.hyperparameters.shape, dtype=self._dtype).flatten()
+        for (struct, term, offset) in _split_terms(self._kk):
+            for ii in range(term.hyperparameters.size):
+                if struct == 'diagonal' and not repeated:
+                    hdiag = self._rows(lambda xx, der=0: term.diagonal_values(xx, der=der, hder=ii))
+                    fit = np.sum(hdiag[:, np.newaxis] * np.power(alpha, 2.0))
+                    trace = np.sum(hdiag * kdiag)
+                elif struct == 'lowrank':
+                    UU = self._rows(term.factors)
+                    HU = self._rows(lambda xx, der=0: term.factors(xx, der=der, hder=ii))
+                    fit = 2.0 * np.sum(np.dot(HU.T, alpha) * np.dot(UU.T, alpha))
+                    trace = 2.0 * np.sum(self.solve(UU) * HU)
+                else:
+                    HH = _training_covariance(term, self._xx, self._xxd, mask=self._mask, hder=ii)
+                    fit = np.sum(alpha * np.dot(HH, alpha))
+                    trace = np.sum(kinv * HH)
+                gradlml[offset+ii] = 0.5 * fit - 0.5 * self._nout * self._lp * trace
+        return gradlml
+
+
+    @property
+    def rank(self):
+        r'''
+        Returns the number of features of the low-rank terms applied through the Woodbury identity.
+
+        :returns: int. Rank of the low-rank correction to the factorized matrix.
+        '''
+
+        return int(self._UU.shape[1])
+
+
+    @property
+    def size(self):
+        r'''
+        Returns the number of valid training points, including derivative data points.
+
+        :returns: int. Dimension of the implicit training covariance matrix.
+        '''
+
+        return int(self._xf.shape[0])
@@ -0,0 +1,186 @@
+r'''
+Minimal exported form of a fitted Gaussian Process Regression model, holding only the quantities needed
+to evaluate the posterior mean and standard deviation at arbitrary x-values.
+'''
+
+# Required imports
+import copy
+import numpy as np
+import scipy.linalg as spla
+
+from .definitions import number_types, array_types
+from .utils import KernelReconstructor
+from .posterior import GaussianProcessPosterior, CoregionalizedPosterior, _cross_covariance
+from .features import FeaturePosterior
+
+__all__ = [
+    'Predictor',  # Lightweight picklable evaluator of the posterior mean and std
+]
+
+
+class Predictor():
+    r'''
+    Evaluator of the posterior mean and standard deviation of a fitted model, independent of the
+    :code:`GaussianProcess` instance which produced it. Only the training inputs, the weight vector,
+    a factor of the inverse training covariance matrix, the kernel and the normalization constants
+    are retained, and the kernel is pickled as its codename and parameters, such that the object is
+    cheap to send to worker processes.
+
+    .. note::
+
+        With a truncated rank, the inverse training covariance matrix used in the variance is
+        replaced by its projection onto the leading eigenvectors of the training covariance matrix.
+        The predicted mean is unaffected, while the predicted errors can only be overestimated.
+
+    :arg posterior: object. The :code:`GaussianProcessPosterior` instance to export.
+
+    :kwarg rank: int. Number of leading eigenpairs retained in the variance factor, the full Cholesky factor is kept if not given. (optional)
+
+    :kwarg chunk: int. Maximum number of prediction points evaluated at once, bounding the size of the intermediate cross-covariance matrices. (optional)
+    '''
+
+    def __init__(self, posterior, rank=None, chunk=1024):
+        r'''
+        Extracts the required quantities from the posterior distribution.
+
+        :arg posterior: object. The :code:`GaussianProcessPosterior` instance to export.
+
+        :kwarg rank: int. Number of leading eigenpairs retained in the variance factor, the full Cholesky factor is kept if not given. (optional)
+
+        :kwarg chunk: int. Maximum number of prediction points evaluated at once. (optional)
+
+        :returns: none.
+        '''
+
+        if not isinstance(posterior, GaussianProcessPosterior):
+            raise TypeError('Predictor export requires a valid GaussianProcessPosterior instance.')
+        if isinstance(posterior, CoregionalizedPosterior):
+            raise TypeError('Predictor export is not available for coregionalized posteriors.')
+        if isinstance(posterior, FeaturePosterior):
+            raise TypeError('Predictor export is not available for random feature posteriors.')
+        self._dtype = posterior._dtype
+        self._kk = copy.copy(posterior._kk)
+        self._ndim = posterior._ndim
+        self._xx = posterior._xx
+        self._xxd = posterior._xxd
+        self._mask = posterior._mask
+        self._alpha = posterior._alpha
+        self._myy = posterior._myy
+        self._sc = posterior._sc
+        self._chunk = int(chunk) if isinstance(chunk, number_types) and int(chunk) > 0 else 1024
+        self._rank = None
+        self._factor = posterior._cholesky()
+        if isinstance(rank, number_types) and 0 < int(rank) < self._factor.shape[0]:
+            nn = self._factor.shape[0]
+            kmat = self._factor @ self._factor.T
+            (ev, evec) = spla.eigh(kmat, subset_by_index=[nn - int(rank), nn - 1])
+            self._rank = int(rank)
+            self._factor = evec / np.sqrt(ev)
+
+
+    def __getstate__(self):
+        r'''
+        Replaces the covariance function by its codename and parameters for pickling.
+
+        :returns: dict. Instance attributes.
+        '''
+
+        state = self.__dict__.copy()
+        kk = state.pop('_kk')
+        state['_kname'] = kk.name
+        state['_kpars'] = np.hstack((kk.hyperparameters, kk.constants))
+        return state
+
+
+    def __setstate__(self, state):
+        r'''
+        Reconstructs the covariance function after unpickling.
+
+        :arg state: dict. Instance attributes, as returned by :code:`__getstate__()`.
+
+        :returns: none.
+        '''
+
+        state = dict(state)
+        kname = state.pop('_kname')
+        kpars = state.pop('_kpars')
+        self.__dict__.update(state)
+        self._kk = KernelReconstructor(kname, pars=kpars, dtype=self._dtype)
+
+
+    def _variance_reduction(self, ks):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Computes the reduction of the prior variance due to the training data.
+
+        :arg ks: array. Cross-covariance matrix with the training data along the first axis.
+
+        :returns: array. Vector of variance reductions at the prediction points.
+        '''
+
+        if self._rank is not None:
+            vv = self._factor.T @ ks
+        else:
+            vv = spla.solve_triangular(self._factor, ks, lower=True, check_finite=False)
+        return np.einsum('ij,ij->j', vv, vv)
+
+
+    def __call__(self, xnew, rtn_std=True):
+        r'''
+        Evaluates the posterior distribution at the input x-values, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg rtn_std: bool. Set as false to return only the predicted mean values. (optional)
+
+        :returns: (array, array) or array.
+            Vector of predicted mean values, vector of predicted 1 sigma errors of the latent function, without the y-error contributions.
+        '''
+
+        if not isinstance(xnew, array_types) or len(xnew) == 0:
+            raise ValueError('A valid vector of prediction x-points must be given.')
+        xn = np.asarray(xnew, dtype=self._dtype)
+        if xn.ndim != self._xx.ndim:
+            raise ValueError(f'Prediction x-point vector must contain the same number of dimensions as fitted data, which is {self._xx.ndim}.')
+        npts = xn.shape[0]
+        barF = np.empty((npts, *self._alpha.shape[1:]), dtype=self._dtype)
+        errF = np.empty((npts, ), dtype=self._dtype) if rtn_std else None
+        for start in range(0, npts, self._chunk):
+            xc = xn[start:start+self._chunk]
+            ks = _cross_covariance(self._kk, self._xx, self._xxd, xc, dd=0, ndim=self._ndim, mask=self._mask)
+            barF[start:start+xc.shape[0]] = np.tensordot(ks.T, self._alpha, axes=(-1, 0))
+            if rtn_std:
+                kt = self._kk(xc, xc, der=0)
+                if kt.ndim > 2:
+                    kt = np.squeeze(kt)
+                varF = np.diag(kt) - self._variance_reduction(ks)
+                errF[start:start+xc.shape[0]] = np.sqrt(np.clip(varF, 0.0, None))
+        barF *= self._sc
+        barF += self._myy
+        if not rtn_std:
+            return barF
+        errF *= self._sc
+        return (barF, errF)
+
+
+    @property
+    def kernel(self):
+        r'''
+        Returns the covariance function used to construct the predictor.
+
+        :returns: object. The :code:`_Kernel` instance.
+        '''
+
+        return copy.copy(self._kk)
+
+
+    @property
+    def rank(self):
+        r'''
+        Returns the number of retained eigenpairs of the variance factor.
+
+        :returns: int. Rank of the variance factor, equal to the number of training points if not truncated.
+        '''
+
+        return self._rank if self._rank is not None else self._factor.shape[0]
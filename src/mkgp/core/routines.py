@@ -4,16 +4,23 @@ Routine class for Gaussian Process Regression fitting of 1D data with errorbars.
 '''
 
 # Required imports
-import warnings
 import copy
+import threading
+import contextlib
 import numpy as np
+from concurrent.futures import CancelledError
 import scipy.linalg as spla
-import scipy.stats as spst
 from operator import itemgetter
 
 from .definitions import number_types, array_types, default_dtype
-from .utils import diagonal, diagonalize
-from .kernels import _Kernel, _WarpingFunction
+from .utils import diagonal, StructuredCovariance, readonly_array, is_dataset
+from .kernels import _Kernel, _WarpingFunction, ICM_Kernel
+from .posterior import GaussianProcessPosterior, CoregionalizedPosterior, StructuredPosterior, _structured_terms
+from .predictor import Predictor
+from .asynchronous import run_async
+from .sampling import PosteriorSampler
+from .features import PathwiseSampler, FeaturePosterior
+from .sweep import NoiseSweep
 
 __all__ = [
     'GaussianProcess',  # Main interpolation class
@@ -64,6 +71,11 @@ class GaussianProcess():
         self._edh = 1.0e-2
         self._ikk = None
         self._imax = 500
+        self._solver = 'exact'
+        self._nfeat = 1024
+        self._fseed = 0
+        self._objective = 'lml'
+        self._nfolds = 10
         self._xF = None
         self._estF = None
         self._barF = None
@@ -78,13 +90,52 @@ class GaussianProcess():
         self._dvarE = None
         self._varN = None
         self._dvarN = None
+        self._post = None
+        self._epost = None
+        self._samplers = {}
+        self._erms = None
+        self._xFeval = None
         self._gpxe = None
         self._gpye = None
         self._egpye = None
         self._nikk = None
         self._niekk = None
         self._fwarn = False
+        self._fview = False
+        self._flazy = False
+        self._cancel = None
+        self._lock = threading.RLock()
         self._opopts = ['grad', 'mom', 'nag', 'adagrad', 'adadelta', 'adam', 'adamax', 'nadam']
+        self._solvers = ['exact', 'rff']
+        self._objectives = ['lml', 'loo', 'kfold']
+
+
+    def __getstate__(self):
+        r'''
+        Returns the instance state for copying and pickling, without the fit lock.
+        '''
+
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        state['_cancel'] = None
+        return state
+
+
+    def __setstate__(self, state):
+        r'''
+        Restores the instance state from copying and pickling, with a new fit lock.
+        '''
+
+        self.__dict__.update(state)
+        self.__dict__.setdefault('_samplers', {})
+        self.__dict__.setdefault('_solver', 'exact')
+        self.__dict__.setdefault('_nfeat', 1024)
+        self.__dict__.setdefault('_fseed', 0)
+        self.__dict__.setdefault('_solvers', ['exact', 'rff'])
+        self.__dict__.setdefault('_objective', 'lml')
+        self.__dict__.setdefault('_nfolds', 10)
+        self.__dict__.setdefault('_objectives', ['lml', 'loo', 'kfold'])
+        self._lock = threading.RLock()
 
 
     def __eq__(self, other):
@@ -180,9 +231,22 @@ class GaussianProcess():
         Specify the raw data that the Gaussian process regression will be performed on.
         Performs some consistency checks between the input raw data to ensure validity.
 
+        .. note::
+
+            For 1-dimensional x-values, multiple outputs measured at the same x-values and with the
+            same y-errors can be fitted jointly by giving the y-values as a matrix with one output per
+            column. All outputs then share a single kernel and factorization, the log-marginal-likelihood
+            is summed over the outputs, and the results are returned with one output per column.
+
+        .. note::
+
+            The data is stored as read-only arrays. Memory-mapped arrays and arrays which are
+            already read-only are stored without copying, such that large data sets are not
+            duplicated in memory, while all other inputs are copied.
+
         :kwarg xdata: array. Vector of x-values of data points to be fitted.
 
-        :kwarg ydata: array. Vector of y-values of data points to be fitted.
+        :kwarg ydata: array. Vector of y-values of data points to be fitted, or matrix with one output per column.
 
         :kwarg xerr: array. Vector of x-errors of data points to be fitted, assumed to be Gaussian noise specified at 1 sigma. (optional)
 
@@ -198,14 +262,14 @@ class GaussianProcess():
         '''
 
         altered = False
-        if isinstance(xdata, array_types) and len(xdata) > 0:
-            self._xx = np.array(xdata, dtype=self._dtype)
+        if self._is_data(xdata):
+            self._xx = readonly_array(xdata, dtype=self._dtype)
             altered = True
         #elif isinstance(xdata, np.ndarray) and xdata.size > 0:
         #    self._xx = xdata.flatten()
         #    altered = True
-        if isinstance(xerr, array_types) and len(xerr) > 0:
-            self._xe = np.array(xerr, dtype=self._dtype)
+        if self._is_data(xerr):
+            self._xe = readonly_array(xerr, dtype=self._dtype)
             altered = True
         #elif isinstance(xerr, np.ndarray) and xerr.size > 0:
         #    self._xe = xerr.flatten()
@@ -213,14 +277,14 @@ class GaussianProcess():
         elif isinstance(xerr, str):
             self._xe = None
             altered = True
-        if isinstance(ydata, array_types) and len(ydata) > 0:
-            self._yy = np.array(ydata, dtype=self._dtype)
+        if self._is_data(ydata):
+            self._yy = readonly_array(ydata, dtype=self._dtype)
             altered = True
         #elif isinstance(ydata, np.ndarray) and ydata.size > 0:
         #    self._yy = ydata.flatten()
         #    altered = True
-        if isinstance(yerr, array_types) and len(yerr) > 0:
-            self._ye = np.array(yerr, dtype=self._dtype)
+        if self._is_data(yerr):
+            self._ye = readonly_array(yerr, dtype=self._dtype)
             altered = True
         #elif isinstance(yerr, np.ndarray) and yerr.size > 0:
         #    self._ye = yerr.flatten()
@@ -228,11 +292,11 @@ class GaussianProcess():
         elif isinstance(yerr, str):
             self._ye = None
             altered = True
-        if isinstance(dxdata, array_types) and len(dxdata) > 0:
+        if self._is_data(dxdata):
             #temp = np.array([])
             #for item in dxdata:
             #    temp = np.append(temp, item) if item is not None else np.append(temp, np.nan)
-            self._dxx = np.array(dxdata, dtype=self._dtype) # temp.flatten()
+            self._dxx = readonly_array(dxdata, dtype=self._dtype) # temp.flatten()
             altered = True
         #elif isinstance(dxdata, np.ndarray) and dxdata.size > 0:
         #    self._dxx = dxdata.flatten()
@@ -240,11 +304,11 @@ class GaussianProcess():
         elif isinstance(dxdata, str):
             self._dxx = None
             altered = True
-        if isinstance(dydata, array_types) and len(dydata) > 0:
+        if self._is_data(dydata):
             #temp = np.array([])
             #for item in dydata:
             #    temp = np.append(temp, item) if item is not None else np.append(temp, np.nan)
-            self._dyy = np.array(dydata, dtype=self._dtype) # temp.flatten()
+            self._dyy = readonly_array(dydata, dtype=self._dtype) # temp.flatten()
             altered = True
         #elif isinstance(dydata, np.ndarray) and dydata.size > 0:
         #    self._dyy = dydata.flatten()
@@ -252,11 +316,11 @@ class GaussianProcess():
         elif isinstance(dydata, str):
             self._dyy = None
             altered = True
-        if isinstance(dyerr, array_types) and len(dyerr) > 0:
+        if self._is_data(dyerr):
             #temp = np.array([])
             #for item in dyerr:
             #    temp = np.append(temp, item) if item is not None else np.append(temp, np.nan)
-            self._dye = np.array(dyerr, dtype=self._dtype) # temp.flatten()
+            self._dye = readonly_array(dyerr, dtype=self._dtype) # temp.flatten()
             altered = True
         #elif isinstance(dyerr, np.ndarray) and dyerr.size > 0:
         #    self._dye = dyerr.flatten()
@@ -454,6 +518,73 @@ class GaussianProcess():
             self._imax = int(maxiter) if int(maxiter) > 50 else 50
 
 
+    def set_solver(self, solver=None, nfeatures=None, seed=None):
+        r'''
+        Specify the solver that the Gaussian process regression will use to factorize the training data,
+        to evaluate the log-marginal-likelihood and its gradient, and to make predictions.
+
+        .. note::
+
+            The :code:`'rff'` solver replaces the kernel by a random Fourier feature expansion, see
+            :code:`FeaturePosterior`, and only supports :code:`SE_Kernel`, :code:`RQ_Kernel` and
+            :code:`Matern_HI_Kernel` instances and their sums and products. It is only applied to
+            fits of 1-dimensional x-values, others always use the exact solver. The same features are
+            drawn for every evaluation within the hyperparameter optimization.
+
+        :kwarg solver: str. Solver selection, choices include: ['exact', 'rff']. (optional)
+
+        :kwarg nfeatures: int. Number of random features per term of the kernel sum, only used by the :code:`'rff'` solver, default is 1024. (optional)
+
+        :kwarg seed: int. Seed used to draw the random features, only used by the :code:`'rff'` solver, default is 0. (optional)
+
+        :returns: none.
+        '''
+
+        if isinstance(solver, str) and solver.lower() in self._solvers:
+            self._solver = solver.lower()
+        if isinstance(nfeatures, number_types) and int(nfeatures) > 0:
+            self._nfeat = int(nfeatures)
+        if isinstance(seed, number_types):
+            self._fseed = int(seed)
+
+
+    def set_objective(self, objective=None, folds=None):
+        r'''
+        Specify the objective function that the hyperparameter optimization will maximize.
+
+        .. note::
+
+            The cross-validation objectives are the sum of the log predictive densities of held-out
+            data, evaluated in closed form from a single factorization, see
+            :code:`GaussianProcessPosterior.cross_validate()`. They are less sensitive to kernel
+            misspecification than the log-marginal-likelihood, but ignore the regularization parameter.
+            The reported log-marginal-likelihood of the fit is unaffected by this choice.
+
+        :kwarg objective: str. Objective selection, choices include: ['lml', 'loo', 'kfold'], for the log-marginal-likelihood, leave-one-out or k-fold cross-validation. (optional)
+
+        :kwarg folds: int. Number of folds used by the :code:`'kfold'` objective, with data points assigned to folds in turn, default is 10. Must not exceed the number of training points, which is checked when the fit starts. (optional)
+
+        :returns: none.
+        '''
+
+        if isinstance(objective, str) and objective.lower() in self._objectives:
+            self._objective = objective.lower()
+        if isinstance(folds, number_types) and int(folds) > 1:
+            self._nfolds = int(folds)
+
+
+    def _cv_folds(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Returns the fold specification of the selected cross-validation objective.
+
+        :returns: int. Number of folds, or :code:`None` for leave-one-out.
+        '''
+
+        return self._nfolds if self._objective == 'kfold' else None
+
+
     def set_error_search_parameters(self, epsilon=None, method=None, spars=None, sdiff=None):
         r'''
         Specify the search parameters that the Gaussian process regression will use for the error function.
@@ -569,6 +700,197 @@ class GaussianProcess():
         self._fwarn = True if flag else False
 
 
+    def set_view_flag(self, flag=True):
+        r'''
+        Specify the return of read-only views of the stored arrays
+        from the getter functions, instead of deep copies. The views
+        are disabled by default but calling this function will
+        enable them by default.
+
+        .. note::
+
+            Results stored by :code:`GPRFit()` are never modified
+            in-place, as subsequent calls replace the stored arrays.
+            Views obtained before such a call remain valid and
+            continue to refer to the previous results.
+
+        :kwarg flag: bool. Flag to toggle return of read-only views.
+
+        :returns: none.
+        '''
+
+        self._fview = True if flag else False
+
+
+    def set_lazy_flag(self, flag=True):
+        r'''
+        Specify the deferred evaluation of the secondary outputs of
+        :code:`GPRFit()`, ie. the derivative predictions and the
+        in-sample estimate used in the goodness-of-fit metrics. These
+        are then computed from the stored posterior on the first call
+        to a getter requiring them, and cached afterwards. The deferral
+        is disabled by default but calling this function will enable
+        it by default.
+
+        :kwarg flag: bool. Flag to toggle lazy evaluation of fit outputs.
+
+        :returns: none.
+        '''
+
+        self._flazy = True if flag else False
+
+
+    @contextlib.contextmanager
+    def _fit_scope(self, cancel=None):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Context in which the fitting and sampling routines run. Holds the instance lock, such that
+        concurrent calls on the same instance are serialized while separate instances can be fitted
+        from different threads, and suppresses the floating-point runtime warnings for the calling
+        thread only, unless enabled with :code:`set_warning_flag()`.
+
+        :kwarg cancel: object. A :code:`threading.Event` instance polled by the optimizers, only installed while the lock is held by this context. (optional)
+
+        :returns: none.
+        '''
+
+        with self._lock:
+            previous = self._cancel
+            if cancel is not None:
+                # Bound to the lock holder, such that a queued call cannot replace the event of a running one
+                self._cancel = cancel
+            try:
+                if self._fwarn:
+                    yield
+                else:
+                    with np.errstate(all='ignore'):
+                        yield
+            finally:
+                self._cancel = previous
+
+
+    def _run_cancellable(self, cancel, func, *args, **kwargs):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Runs a fitting routine with a cancellation event bound to this call, see :code:`fit_async()`.
+
+        :arg cancel: object. A :code:`threading.Event` instance set when the call is cancelled.
+
+        :arg func: callable. The fitting routine to run.
+
+        :arg args: Positional arguments passed to the fitting routine.
+
+        :arg kwargs: Keyword arguments passed to the fitting routine.
+
+        :returns: The return value of the fitting routine.
+        '''
+
+        with self._fit_scope(cancel=cancel):
+            self._check_cancelled()
+            return func(*args, **kwargs)
+
+
+    @staticmethod
+    def _is_data(value):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Checks whether an input to the data set functions is a non-empty array-like object or
+        on-disk dataset, as accepted by :code:`readonly_array()`.
+
+        :arg value: object. Input to be checked.
+
+        :returns: bool. True if the input contains data.
+        '''
+
+        return (isinstance(value, array_types) or is_dataset(value)) and len(value) > 0
+
+
+    def _check_cancelled(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Checks whether the fit currently running through :code:`fit_async()` was cancelled, called
+        between the iterations of the hyperparameter optimizers.
+
+        :returns: none.
+        '''
+
+        if self._cancel is not None and self._cancel.is_set():
+            raise CancelledError('Fit cancelled during hyperparameter optimization.')
+
+
+    def _get_output(self, value):
+        r'''
+        Returns a stored object either as a deep copy or, if enabled
+        via :code:`set_view_flag()`, as a read-only view.
+
+        :arg value: object. Stored array or other object to be returned.
+
+        :returns: object. Deep copy or read-only view of the stored object.
+        '''
+
+        if self._fview and isinstance(value, np.ndarray):
+            view = value.view()
+            view.flags.writeable = False
+            return view
+        return copy.deepcopy(value)
+
+
+    @staticmethod
+    def _freeze(value):
+        r'''
+        Marks a stored array as read-only, guaranteeing that views
+        passed to the user are never modified in-place.
+
+        :arg value: array. Array to be stored.
+
+        :returns: array. Same array, marked as read-only.
+        '''
+
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        return value
+
+
+    def _noise_variance(self, err, var):
+        r'''
+        Squares the predicted y-errors and arranges them as the diagonal of the given covariance
+        matrix, repeating them across the outputs of a coregionalized fit if necessary.
+
+        :arg err: array. Vector of predicted y-errors, or :code:`None` if no noise is present.
+
+        :arg var: array. Covariance matrix onto whose diagonal the noise variances are mapped.
+
+        :returns: array. Noise variances with the same shape as the diagonal of :code:`var`.
+        '''
+
+        vshape = diagonal(var).shape
+        if err is None:
+            return np.zeros(vshape, dtype=self._dtype)
+        nvar = np.power(err, 2.0)
+        if nvar.size != int(np.prod(vshape)):
+            nvar = np.broadcast_to(nvar.reshape(vshape[0], *([1] * (len(vshape) - 1))), vshape).copy()
+        return nvar
+
+
+    def _expand_outputs(self, value):
+        r'''
+        Repeats a vector of values shared by all outputs of a multi-output fit, such
+        as the 1 sigma errors, along a trailing output axis.
+
+        :arg value: array. Vector of values at the predicted x-values.
+
+        :returns: array. Matrix with one column per output, or the unchanged input for single output fits.
+        '''
+
+        if isinstance(value, np.ndarray) and value.ndim == 1 and isinstance(self._post, GaussianProcessPosterior) and self._post.nout > 1:
+            value = np.repeat(value[:, np.newaxis], self._post.nout, axis=1)
+        return value
+
+
     def reset_error_kernel(self):
         r'''
         Resets error kernel and associated settings to an empty
@@ -601,13 +923,13 @@ class GaussianProcess():
             Vectors in order of x-values, y-values, x-errors, y-errors, derivative x-values, dy/dx-values, dy/dx-errors.
         '''
 
-        rxx = copy.deepcopy(self._xx)
-        ryy = copy.deepcopy(self._yy)
-        rxe = copy.deepcopy(self._xe)
-        rye = copy.deepcopy(self._ye)
-        rdxx = copy.deepcopy(self._dxx)
-        rdyy = copy.deepcopy(self._dyy)
-        rdye = copy.deepcopy(self._dye)
+        rxx = self._get_output(self._xx)
+        ryy = self._get_output(self._yy)
+        rxe = self._get_output(self._xe)
+        rye = self._get_output(self._ye)
+        rdxx = self._get_output(self._dxx)
+        rdyy = self._get_output(self._dyy)
+        rdye = self._get_output(self._dye)
         return (rxx, ryy, rxe, rye, rdxx, rdyy, rdye)
 
 
@@ -626,9 +948,9 @@ class GaussianProcess():
             Vectors in order of x-values, y-values, y-errors, derivative x-values, dy/dx-values, dy/dx-errors.
         '''
 
-        pxx = copy.deepcopy(self._xx)
-        pyy = copy.deepcopy(self._yy)
-        pye = copy.deepcopy(self._ye)
+        pxx = self._get_output(self._xx)
+        pyy = self._get_output(self._yy)
+        pye = self._get_output(self._ye)
         if isinstance(pxx, np.ndarray) and isinstance(pyy, np.ndarray):
             rxe = self._xe if self._xe is not None else np.zeros(pxx.shape, dtype=self._dtype)
             rye = self._ye if self._gpye is None else self._gpye
@@ -639,9 +961,9 @@ class GaussianProcess():
             cn = 5.0e-3 if self._cn is None else self._cn
             (pxx, pxe, pyy, pye, nn) = self._condition_data(self._xx, rxe, self._yy, rye, lb, ub, cn)
         # Actually these should be conditioned as well (for next version?)
-        dxx = copy.deepcopy(self._dxx)
-        dyy = copy.deepcopy(self._dyy)
-        dye = copy.deepcopy(self._dye)
+        dxx = self._get_output(self._dxx)
+        dyy = self._get_output(self._dyy)
+        dye = self._get_output(self._dye)
         return (pxx, pyy, pye, dxx, dyy, dye)
 
 
@@ -652,7 +974,7 @@ class GaussianProcess():
         :returns: array. Vector of x-values corresponding to predicted y-values.
         '''
 
-        return copy.deepcopy(self._xF)
+        return self._get_output(self._xF)
 
 
     def get_gp_regpar(self):
@@ -682,10 +1004,34 @@ class GaussianProcess():
         :returns: array. Vector of predicted y-values from fit.
         '''
 
-        return copy.deepcopy(self._barF)
+        return self._get_output(self._barF)
 
 
     # TODO: Place process noise fraction on GPRFit() level and remove the argument from these functions, currently introduces inconsistencies in statistics
+    def get_gp_covariance(self, noise_flag=True, noise_mult=None):
+        r'''
+        Returns the covariance matrix of the y-values computed in the latest
+        :code:`GPRFit()` call as a structured container, keeping the process
+        covariance and the noise variances separate until a dense matrix is
+        requested.
+
+        :kwarg noise_flag: bool. Specifies inclusion of noise term in returned covariance. Only operates on diagonal elements. (optional)
+
+        :kwarg noise_mult: float. Noise term multiplier to introduce known bias or covariance in data, must be greater than or equal to zero. (optional)
+
+        :returns: object. :code:`StructuredCovariance` instance of predicted y-values from fit.
+        '''
+
+        cov = None
+        if self._varF is not None:
+            varN = None
+            if self._varN is not None and noise_flag:
+                nfac = float(noise_mult) ** 2.0 if isinstance(noise_mult, number_types) and float(noise_mult) >= 0.0 else 1.0
+                varN = nfac * self._varN
+            cov = StructuredCovariance(dense=self._varF, diag=varN, dtype=self._dtype)
+        return cov
+
+
     def get_gp_variance(self, noise_flag=True, noise_mult=None):
         r'''
         Returns the full covariance matrix of the y-values computed in the latest
@@ -695,13 +1041,14 @@ class GaussianProcess():
 
         :kwarg noise_mult: float. Noise term multiplier to introduce known bias or covariance in data, must be greater than or equal to zero. (optional)
 
-        :returns: array. 2D meshgrid array containing full covariance matrix of predicted y-values from fit.
+        :returns: array. 2D meshgrid array containing full covariance matrix of predicted y-values from fit, shared by all outputs of a multi-output fit.
         '''
 
-        varF = copy.deepcopy(self._varF)
-        if varF is not None and self._varN is not None and noise_flag:
-            nfac = float(noise_mult) ** 2.0 if isinstance(noise_mult, number_types) and float(noise_mult) >= 0.0 else 1.0
-            varF = varF + nfac * self._varN
+        varF = None
+        if self._varF is not None and self._varN is not None and noise_flag:
+            varF = self.get_gp_covariance(noise_flag=noise_flag, noise_mult=noise_mult).todense()
+        elif self._varF is not None:
+            varF = self._get_output(self._varF)
         return varF
 
 
@@ -718,9 +1065,9 @@ class GaussianProcess():
         '''
 
         sigF = None
-        varF = self.get_gp_variance(noise_flag=noise_flag, noise_mult=noise_mult)
-        if varF is not None:
-            sigF = np.sqrt(diagonal(varF)) # np.sqrt(np.diag(varF))
+        cov = self.get_gp_covariance(noise_flag=noise_flag, noise_mult=noise_mult)
+        if cov is not None:
+            sigF = self._expand_outputs(np.sqrt(cov.diagonal()))
         return sigF
 
 
@@ -731,7 +1078,31 @@ class GaussianProcess():
         :returns: array. Vector of predicted dy/dx-values from fit, if requested in fit call.
         '''
 
-        return copy.deepcopy(self._dbarF)
+        self._evaluate_derivatives()
+        return self._get_output(self._dbarF)
+
+
+    def _drv_noise_scaling(self, noise_flag=True, process_noise_fraction=None):
+        r'''
+        Computes the pointwise ratio between the noisy and noiseless variances of
+        the y-values, used to rescale the dy/dx-value variances. Zero noiseless
+        variances are treated as one, as in the dense formulation.
+
+        :kwarg noise_flag: bool. Specifies inclusion of noise term in the ratio. (optional)
+
+        :kwarg process_noise_fraction: float. Specify split between process noise and observation noise in data, must be between zero and one. (optional)
+
+        :returns: (array, float).
+            Diagonal variance scaling factors and multiplier for the dy/dx-value noise variances.
+        '''
+
+        var_denom = diagonal(self._varF, dtype=self._dtype)
+        var_numer = self.get_gp_covariance(noise_flag=noise_flag, noise_mult=process_noise_fraction).diagonal()
+        dvarmod = var_numer / np.where(var_denom == 0.0, 1.0, var_denom)
+        nfac = 0.0
+        if self._dvarN is not None and noise_flag:
+            nfac = float(process_noise_fraction) ** 2.0 if isinstance(process_noise_fraction, number_types) and float(process_noise_fraction) >= 0.0 and float(process_noise_fraction) <= 1.0 else 1.0
+        return (dvarmod, nfac)
 
 
     def get_gp_drv_variance(self, noise_flag=True, process_noise_fraction=None):
@@ -746,17 +1117,21 @@ class GaussianProcess():
         :returns: array. 2D meshgrid array containing full covariance matrix for predicted dy/dx-values from fit, if requested in fit call.
         '''
 
-        dvarF = copy.deepcopy(self._dvarF)
-        if dvarF is not None:
-            dvar_numer = self.get_gp_variance(noise_flag=noise_flag, noise_mult=process_noise_fraction)
-            dvar_denom = self.get_gp_variance(noise_flag=False)
-            dvar_denom[dvar_denom == 0.0] = 1.0
-            dvarmod = dvar_numer / dvar_denom
-            if self._dvarN is not None and noise_flag:
-                nfac = float(process_noise_fraction) ** 2.0 if isinstance(process_noise_fraction, number_types) and float(process_noise_fraction) >= 0.0 and float(process_noise_fraction) <= 1.0 else 1.0
-                dvarF = dvarmod * dvarF + nfac * self._dvarN
+        self._evaluate_derivatives()
+        dvarF = None
+        if self._dvarF is not None:
+            (dvarmod, nfac) = self._drv_noise_scaling(noise_flag=noise_flag, process_noise_fraction=process_noise_fraction)
+            # Off-diagonal ratios are unity, except where the noiseless covariance vanishes
+            scale = np.where(self._varF == 0.0, 0.0, 1.0)
+            ii = np.arange(scale.shape[0])
+            if scale[ii, ..., ii].size == dvarmod.size:
+                scale[ii, ..., ii] = dvarmod.reshape(scale[ii, ..., ii].shape)
             else:
-                dvarF = dvarmod * dvarF
+                # Coregionalized outputs only rescale their own variances, not the covariances between outputs
+                kk = np.arange(dvarmod.shape[-1])
+                scale[ii[:, np.newaxis], kk, kk, ii[:, np.newaxis]] = dvarmod
+            dvarN = nfac * self._dvarN if nfac > 0.0 else None
+            dvarF = StructuredCovariance(dense=scale * self._dvarF, diag=dvarN, dtype=self._dtype).todense()
         return dvarF
 
 
@@ -773,10 +1148,14 @@ class GaussianProcess():
         :returns: array. 1D array containing 1 sigma errors of predicted dy/dx-values from fit, if requested in fit call.
         '''
 
+        self._evaluate_derivatives()
         dsigF = None
-        dvarF = self.get_gp_drv_variance(noise_flag=noise_flag, process_noise_fraction=process_noise_fraction)
-        if dvarF is not None:
-            dsigF = np.sqrt(diagonal(dvarF)) # np.sqrt(np.diag(dvarF))
+        if self._dvarF is not None:
+            (dvarmod, nfac) = self._drv_noise_scaling(noise_flag=noise_flag, process_noise_fraction=process_noise_fraction)
+            dvarF = dvarmod * diagonal(self._dvarF, dtype=self._dtype)
+            if nfac > 0.0:
+                dvarF = dvarF + nfac * self._dvarN
+            dsigF = self._expand_outputs(np.sqrt(dvarF))
         return dsigF
 
 
@@ -828,9 +1207,11 @@ class GaussianProcess():
 
         :returns: float. R-squared value.
         '''
+
+        self._evaluate_estimate()
         r2 = None
         if self._xF is not None and self._estF is not None:
-            myy = np.nanmean(self._yy)
+            myy = np.nanmean(self._yy, axis=0)
             sstot = np.sum(np.power(self._yy - myy, 2.0))
             ssres = np.sum(np.power(self._yy - self._estF, 2.0))
             r2 = 1.0 - (ssres / sstot)
@@ -845,9 +1226,10 @@ class GaussianProcess():
         :returns: float. Adjusted R-squared value.
         '''
 
+        self._evaluate_estimate()
         adjr2 = None
         if self._xF is not None and self._estF is not None:
-            myy = np.nanmean(self._yy)
+            myy = np.nanmean(self._yy, axis=0)
             sstot = np.sum(np.power(self._yy - myy, 2.0))
             ssres = np.sum(np.power(self._yy - self._estF, 2.0))
             kpars = np.hstack((self._kk.hyperparameters, self._kk.constants))
@@ -873,6 +1255,39 @@ class GaussianProcess():
         return genr2
 
 
+    def get_gp_cross_validation(self, folds=None):
+        r'''
+        Evaluates the cross-validation predictive distributions of the training data in closed form, using
+        the factorization of the latest :code:`GPRFit()` call, see :code:`GaussianProcessPosterior.cross_validate()`.
+        Data points with large deviations from their held-out predictions are candidate outliers.
+
+        :kwarg folds: int or array. Number of folds, with data points assigned to folds in turn, or vector of fold labels per valid data point. Leave-one-out if not given. (optional)
+
+        :returns: (array, array, array).
+            Vector of held-out predictive mean values, vector of held-out predictive 1 sigma errors including the y-errors,
+            vector of log predictive densities of each fold.
+        '''
+
+        cv = None
+        if isinstance(self._post, GaussianProcessPosterior):
+            cv = self._post.cross_validate(folds)
+        return cv
+
+
+    def get_gp_noise_sweep(self):
+        r'''
+        Returns an evaluator of the fit from the latest :code:`GPRFit()` call for arbitrary multipliers on the
+        y-errors and regularization parameters, without refitting, see :code:`NoiseSweep`. The hyperparameters
+        are kept at their values from the fit.
+
+        :returns: object. The :code:`NoiseSweep` instance.
+        '''
+
+        if not isinstance(self._post, GaussianProcessPosterior):
+            raise ValueError('Run GPRFit() before attempting to sweep the y-error scale.')
+        return NoiseSweep(self._post)
+
+
     def get_gp_input_kernel(self):
         r'''
         Returns the original input kernel, with settings retained from before the
@@ -912,6 +1327,34 @@ class GaussianProcess():
         return (kname, kpars, krpar)
 
 
+    def get_gp_posterior(self):
+        r'''
+        Returns the posterior distribution determined in the latest :code:`GPRFit()` call, which can be
+        evaluated at arbitrary x-values without re-fitting, see :code:`GaussianProcessPosterior`.
+
+        :returns: object. The :code:`GaussianProcessPosterior` instance from the latest :code:`GPRFit()` call.
+        '''
+
+        return self._post
+
+
+    def export_predictor(self, rank=None, chunk=1024):
+        r'''
+        Exports the posterior distribution determined in the latest :code:`GPRFit()` call as a minimal
+        picklable evaluator of the mean and 1 sigma errors, see :code:`Predictor`.
+
+        :kwarg rank: int. Number of leading eigenpairs retained in the variance factor, the full Cholesky factor is kept if not given. (optional)
+
+        :kwarg chunk: int. Maximum number of prediction points evaluated at once. (optional)
+
+        :returns: object. The :code:`Predictor` instance.
+        '''
+
+        if self._post is None:
+            raise ValueError('A fit must be performed before exporting a predictor.')
+        return Predictor(self._post, rank=rank, chunk=chunk)
+
+
     def get_gp_error_kernel(self):
         r'''
         Returns the optimized error kernel determined in the latest :code:`GPRFit()` call.
@@ -953,7 +1396,7 @@ class GaussianProcess():
         :returns: array. Vector of predicted y-values from fit.
         '''
 
-        return copy.deepcopy(self._barE)
+        return self._get_output(self._barE)
 
 
     def get_error_gp_variance(self):
@@ -970,7 +1413,7 @@ class GaussianProcess():
         :returns: array. 2D meshgrid array containing full covariance matrix of predicted y-values from fit.
         '''
 
-        return copy.deepcopy(self._varE)
+        return self._get_output(self._varE)
 
 
     def get_error_gp_std(self):
@@ -988,9 +1431,8 @@ class GaussianProcess():
         '''
 
         sigE = None
-        varE = self.get_error_gp_variance()
-        if varE is not None:
-            sigE = np.sqrt(diagonal(varE)) # np.sqrt(np.diag(varE))
+        if self._varE is not None:
+            sigE = np.sqrt(diagonal(self._varE)) # np.sqrt(np.diag(varE))
         return sigE
 
 
@@ -1019,12 +1461,53 @@ class GaussianProcess():
         #    xn = xnew.flatten()
         barE = None
         if xn is not None and self._gpye is not None and self._egpye is not None:
-            barE = itemgetter(0)(self.__basic_fit(xn, kernel=self._ekk, ydata=self._gpye, yerr=self._egpye, epsilon='None'))
+            if not isinstance(self._epost, GaussianProcessPosterior):
+                self._make_error_posterior()
+            barE = self._epost.predict_mean(xn)
             if enforce_positive:
                 barE = np.abs(barE)
         return barE
 
 
+    def _make_posterior(self, kk, lp, xx, yy, ye, dxx, dyy, dye, ymean=0.0, yscale=1.0):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Constructs the posterior distribution with the solver matching the kernel and the solver settings.
+
+        :arg kk: object. The covariance function, as a :code:`_Kernel` instance.
+
+        :arg lp: float. Regularization parameter, larger values effectively enforce smoother / flatter fits.
+
+        :arg xx: array. Vector of x-values of data to be fitted.
+
+        :arg yy: array. Vector of y-values of data to be fitted. Must have same dimensions as :code:`xx`.
+
+        :arg ye: array. Vector of y-errors of data to be fitted, assumed to be given as 1 sigma. Must have same dimensions as :code:`xx`.
+
+        :arg dxx: array. Vector of x-values of derivative data to be included in fit. Set to an empty list to specify no data.
+
+        :arg dyy: array. Vector of dy-values of derivative data to be included in fit. Must have same dimensions as :code:`dxx` if given.
+
+        :arg dye: array. Vector of dy-errors of derivative data to be included in fit, assumed to be given as 1 sigma. Must have same dimensions as :code:`dxx` if given.
+
+        :kwarg ymean: float or array. Offset removed from the y-values during normalization.
+
+        :kwarg yscale: float. Scaling factor applied to the y-values and y-errors during normalization.
+
+        :returns: object. The :code:`GaussianProcessPosterior` instance.
+        '''
+
+        if isinstance(kk, ICM_Kernel):
+            return CoregionalizedPosterior(kk, xx, yy, ye, dxx, dyy, dye, regpar=lp, ymean=ymean, yscale=yscale, dtype=self._dtype)
+        if self._solver == 'rff' and xx.ndim == 1:
+            return FeaturePosterior(kk, xx, yy, ye, dxx, dyy, dye, regpar=lp, ymean=ymean, yscale=yscale, nfeatures=self._nfeat, seed=self._fseed, dtype=self._dtype)
+        (dense, diags, lowrank) = _structured_terms(kk)
+        if xx.ndim == 1 and (len(diags) > 0 or len(lowrank) > 0):
+            return StructuredPosterior(kk, xx, yy, ye, dxx, dyy, dye, regpar=lp, ymean=ymean, yscale=yscale, dtype=self._dtype)
+        return GaussianProcessPosterior(kk, xx, yy, ye, dxx, dyy, dye, regpar=lp, ymean=ymean, yscale=yscale, dtype=self._dtype)
+
+
     def _gp_base_alg(self, xn, kk, lp, xx, yy, ye, dxx, dyy, dye, dd):
         r'''
         **INTERNAL FUNCTION** - Use main call functions!!!
@@ -1058,131 +1541,18 @@ class GaussianProcess():
 
         :arg dd: int. Derivative order of output prediction.
 
-        :returns: (array, array, float).
+        :returns: (array, array, float, float).
             Vector of predicted mean values, matrix of predicted variances and covariances,
-            log-marginal-likelihood of prediction including the regularization component.
+            log-marginal-likelihood of prediction including the regularization component, or cross-validation
+            log predictive density if selected in :code:`set_objective()`, log-marginal-likelihood of null hypothesis.
         '''
 
-        # Set up the problem grids for calculating the required matrices from covf
-        dflag = True if dxx is not None and dyy is not None and dye is not None else False
-        ndim = xx.shape[1] if xx.ndim > 1 else 1
-        xs = xx.shape[1:] if xx.ndim > 1 else []
-        ys = yy.shape[1:] if yy.ndim > 1 else []
-        xxd = dxx if dflag else np.empty((0, *xs), dtype=self._dtype)
-        yyd = dyy if dflag else np.empty((0, *ys), dtype=self._dtype)
-        yed = dye if dflag else np.empty((0, *ys), dtype=self._dtype)
+        # Algorithm, see theory (located in book specified at top of file) for details
+        post = self._make_posterior(kk, lp, xx, yy, ye, dxx, dyy, dye)
+        (barF, varF) = post._predict(xn, dd)
+        lml = post.lml if self._objective == 'lml' else post.cv_log_predictive(self._cv_folds())
 
-        # Set up the vectors needed for evaluating the final GP
-        reps = yyd.shape[1] if yyd.ndim > 1 else 1
-        yydf = yyd.T.reshape(-1, *ys)
-        yedf = yed.T.reshape(-1, *ys)
-        xxdf = np.tile(xxd, (reps, 1)).reshape(-1, *xs)
-        xf = np.concatenate((xx, xxdf), axis=0)
-        yf = np.concatenate((yy, yydf), axis=0)
-        yef = np.concatenate((ye, yedf), axis=0)
-        mask = np.all(np.isfinite(np.concatenate((yf, yef), axis=-1)), axis=-1) if yf.ndim > 1 else np.all(np.isfinite(np.stack((yf, yef), axis=-1)), axis=-1)
-        #kmask = np.all([np.tile(mask.flatten(), (mask.size, 1)), np.tile(mask.flatten(), (mask.size, 1)).T], axis=0)
-        if np.any(np.invert(mask)):
-            xf = xf[mask]
-            yf = yf[mask]
-            yef = yef[mask]
-
-        # Move meshgridding into kernel structure
-        #(x1, x2) = np.meshgrid(xx, xx)
-        #(x1h1, x2h1) = np.meshgrid(xx, xxd)
-        #(x1h2, x2h2) = np.meshgrid(xxd, xx)
-        #(x1d, x2d) = np.meshgrid(xxd, xxd)
-        #(xs1, xs2) = np.meshgrid(xn, xx)
-        #(xs1h, xs2h) = np.meshgrid(xn, xxd)
-        #(xt1, xt2) = np.meshgrid(xn, xn)
-
-        # Algorithm, see theory (located in book specified at top of file) for details
-        KKb = kk(xx, xx, der=0) # kk(x1, x2, der=0)
-        KKh1 = kk(xx, xxd, der=1) # kk(x1h1, x2h1, der=1)
-        KKh2 = kk(xxd, xx, der=-1) # kk(x1h2, x2h2, der=-1)
-        KKd = kk(xxd, xxd, der=2) # kk(x1d, x2d, der=2)
-        if KKb.ndim > 2:
-            KKb = np.squeeze(KKb)
-        if KKh1.ndim > 2:
-            KKh1 = KKh1.T.reshape(xx.shape[0], -1).T
-        if KKh2.ndim > 2:
-            KKh2 = KKh2.reshape(xx.shape[0], -1)
-        if KKd.size == 0:
-            KKd = KKd.reshape(0, 0)
-        if KKd.ndim > 2:
-            KKd = np.transpose(KKd, axes=(1, 0, 2, 3)).reshape(ndim * xxd.shape[0], -1)
-        #KK = np.vstack((np.hstack((KKb, KKh2)), np.hstack((KKh1, KKd))))
-        KK = np.concatenate((np.concatenate((KKb, KKh2), axis=1), np.concatenate((KKh1, KKd), axis=1)), axis=0)
-        if np.any(np.invert(mask)):
-            KK = KK[mask, :]
-            KK = KK[:, mask]
-
-        ksb = kk(xn, xx, der=-dd) if (dd % 2) != 0 else kk(xn, xx, der=dd) # kk(xs1, xs2, der=-dd) if dd == 1 else kk(xs1, xs2, der=dd)
-        ksh = kk(xn, xxd, der=dd+1) # kk(xs1h, xs2h, der=dd+1)
-        if ksb.ndim > 2:
-            ksb = np.squeeze(ksb)
-        if ksh.size == 0:
-            ksh = ksh.reshape(0, *ksb.shape[1:])
-        elif ksh.ndim > ksb.ndim:
-            htr = [ii for ii in range(ksh.ndim)]
-            htr[0] = -1
-            htr[-1] = 0
-            hshape = [ndim for ii in range(ksh.ndim - 3)]
-            ksh = np.transpose(ksh, axes=htr).reshape(xn.shape[0], *hshape, -1)
-            htr = [ii for ii in range(ksh.ndim)]
-            htr[0] = -1
-            htr[-1] = 0
-            ksh = np.transpose(ksh, axes=htr)
-        ks = np.concatenate((ksb, ksh), axis=0) # np.vstack((ksb, ksh))
-        kt = kk(xn, xn, der=2*dd) # kk(xt1, xt2, der=2*dd)
-        if np.any(np.invert(mask)):
-            ks = ks[mask]
-        if kt.ndim > 2:
-            kt = np.squeeze(kt)
-        kernel = KK + np.diag(yef.squeeze() ** 2.0)   # Should be fine since kernel output is always 2D
-
-        # Solve function internal matmul needs matching axis to be axis 1 when ndim > 2
-        if ks.ndim > 2:
-            ks = np.swapaxes(ks, 0, 1)
-        cholesky_flag = True
-        if cholesky_flag:
-            LL = spla.cholesky(kernel, lower=True)
-            alpha = spla.cho_solve((LL, True), yf, check_finite=False)
-            kv = spla.cho_solve((LL, True), ks, check_finite=False)
-            ldet = 2.0 * np.sum(np.log(np.diag(LL)))
-        else:
-            alpha = spla.solve(kernel, yf, check_finite=False)
-            kv = spla.solve(kernel, ks, check_finite=False)
-            ldet = np.log(spla.det(kernel))
-        # Reverting earlier axis swap for rest of routine
-        if ks.ndim > 2:
-            ks = np.swapaxes(ks, 0, 1)
-            kv = np.swapaxes(kv, 0, 1)
-
-        barF = np.tensordot(ks.T, alpha, axes=(-1, 0))          # Mean function
-        varF = kt - np.tensordot(ks.T, kv, axes=(-1, 0))        # Variance of mean function
-
-        # Log-marginal-likelihood provides an indication of how statistically well the fit describes the training data
-        #    1st term: Describes the goodness of fit for the given data
-        #    2nd term: Penalty for complexity / simplicity of the covariance function
-        #    3rd term: Penalty for the size of given data set
-        lml = np.squeeze(-0.5 * np.tensordot(yf.T, alpha, axes=(-1, 0)) - 0.5 * lp * ldet - 0.5 * xf.size * np.log(2.0 * np.pi))
-
-        # Log-marginal-likelihood of the null hypothesis (constant at mean value),
-        # can be used as a normalization factor for general goodness-of-fit metric
-        zfilt = (np.abs(yef) >= 1.0e-10)
-        yft = np.zeros((1, *ys), dtype=self._dtype)
-        yeft = np.zeros((1, *ys), dtype=self._dtype)
-        if np.any(zfilt):
-            yft = np.power(yf[zfilt] / yef[zfilt], 2.0)
-            yeft = 2.0 * np.log(yef[zfilt])
-        lmlz = np.squeeze(-0.5 * np.sum(yft) - 0.5 * lp * np.sum(yeft) - 0.5 * xf.size * np.log(2.0 * np.pi))
-
-        if xx.ndim > 1:
-            barF = barF.reshape(xn.shape[0], ndim ** dd)
-            varF = varF.reshape(xn.shape[0], barF.shape[-1], barF.shape[-1], xn.shape[0])
-
-        return (barF, varF, float(lml), float(lmlz))
+        return (barF, varF, lml, post.null_lml)
 
 
     #TODO: True to its name, it is still only valid for 1D-input regression
@@ -1335,6 +1705,19 @@ class GaussianProcess():
         :returns: array. Vector of log-marginal-likelihood derivatives with respect to the hyperparameters including the regularization component.
         '''
 
+        # Cross-validation objectives are differentiated through the inverse training covariance matrix
+        if self._objective != 'lml':
+            return self._make_posterior(kk, lp, xx, yy, ye, dxx, dyy, dye).cv_gradient(self._cv_folds())
+
+        # Coregionalized kernels and random feature expansions are never constructed as dense matrices
+        if isinstance(kk, ICM_Kernel) or (self._solver == 'rff' and xx.ndim == 1):
+            return self._make_posterior(kk, lp, xx, yy, ye, dxx, dyy, dye).lml_gradient()
+
+        # Diagonal and low-rank kernel terms are differentiated without constructing their dense matrices
+        (dense, diags, lowrank) = _structured_terms(kk)
+        if xx.ndim == 1 and (len(diags) > 0 or len(lowrank) > 0):
+            return self._make_posterior(kk, lp, xx, yy, ye, dxx, dyy, dye).lml_gradient()
+
         # Set up the problem grids for calculating the required matrices from covf
         theta = kk.hyperparameters
         dflag = True if dxx is not None and dyy is not None and dye is not None else False
@@ -1343,16 +1726,17 @@ class GaussianProcess():
         ys = yy.shape[1:] if yy.ndim > 1 else []
         xxd = dxx if dflag else np.empty((0, *xs), dtype=self._dtype)
         yyd = dyy if dflag else np.empty((0, *ys), dtype=self._dtype)
-        yed = dye if dflag else np.empty((0, *ys), dtype=self._dtype)
+        yed = dye if dflag else np.empty((0, *ye.shape[1:]), dtype=self._dtype)
 
         reps = yyd.shape[1] if yyd.ndim > 1 else 1
         yydf = yyd.T.reshape(-1, *ys)
-        yedf = yed.T.reshape(-1, *ys)
+        yedf = yed.T.reshape(-1, *ye.shape[1:])
         xxdf = np.tile(xxd, (reps, 1)).reshape(-1, *xs)
         xf = np.concatenate((xx, xxdf), axis=0)
         yf = np.concatenate((yy, yydf), axis=0)
         yef = np.concatenate((ye, yedf), axis=0)
-        mask = np.all(np.isfinite(np.concatenate((yf, yef), axis=-1)), axis=-1) if yf.ndim > 1 else np.all(np.isfinite(np.stack((yf, yef), axis=-1)), axis=-1)
+        nout = yy.shape[1] if xx.ndim == 1 and yy.ndim > 1 else 1
+        mask = np.all(np.isfinite(np.concatenate((yf, yef.reshape(yef.shape[0], -1)), axis=-1)), axis=-1) if yf.ndim > 1 else np.all(np.isfinite(np.stack((yf, yef), axis=-1)), axis=-1)
         #kmask = np.all([np.tile(mask.flatten(), (mask.size, 1)), np.tile(mask.flatten(), (mask.size, 1)).T], axis=0)
         if np.any(np.invert(mask)):
             xf = xf[mask]
@@ -1420,7 +1804,8 @@ class GaussianProcess():
                 QQ = spla.cho_solve((LL, True), HH, check_finite=False)
             else:
                 QQ = spla.solve(kernel, HH, check_finite=False)
-            gradlml[ii] = np.squeeze(0.5 * np.tensordot(PP, alpha, axes=(-1, 0)) - 0.5 * lp * np.sum(diagonal(QQ)))
+            fit = np.trace(np.atleast_2d(np.tensordot(PP, alpha, axes=(-1, 0))))
+            gradlml[ii] = np.squeeze(0.5 * fit - 0.5 * nout * lp * np.sum(diagonal(QQ)))
 
         return gradlml
 
@@ -1476,6 +1861,7 @@ class GaussianProcess():
         dlml = eps + 1.0
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -1549,6 +1935,7 @@ class GaussianProcess():
         dlml = eps + 1.0
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -1630,6 +2017,7 @@ class GaussianProcess():
         dlml = eps + 1.0
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             newkk.hyperparameters = np.power(10.0, theta_new)
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
@@ -1704,6 +2092,7 @@ class GaussianProcess():
         gold = np.zeros(theta_base.shape, dtype=self._dtype)
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -1782,6 +2171,7 @@ class GaussianProcess():
         gold = np.zeros(theta_base.shape, dtype=self._dtype)
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -1864,6 +2254,7 @@ class GaussianProcess():
         vold = None
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -1945,6 +2336,7 @@ class GaussianProcess():
         vold = None
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -2027,6 +2419,7 @@ class GaussianProcess():
         vold = None
         icount = 0
         while dlml > eps and icount < self._imax:
+            self._check_cancelled()
             if newkk.is_hderiv_implemented():
                 # Hyperparameter derivatives computed in linear space
                 gradlml_lin = self._gp_grad_lml(newkk, lp, xx, yy, ye, dxx, dyy, dye)
@@ -2074,11 +2467,23 @@ class GaussianProcess():
         :returns: (array, array, array, array, array).
             Vectors in order of conditioned x-values, conditioned x-errors, conditioned y-values, conditioned y-errors,
             number of data points blended into corresponding index.
+
+        .. note::
+
+            For 1-dimensional x-values with multiple outputs, given as a matrix of y-values with one output per
+            column, the y-errors are shared by all outputs. Data points with any invalid output are removed and
+            the largest blended y-error across the outputs is retained, such that the y-errors remain shared.
         '''
 
+        multi = (xx.ndim == 1 and yy.ndim > 1)
+        if multi and ye.ndim < yy.ndim:
+            ye = np.tile(ye.reshape(-1, 1), (1, yy.shape[1]))
         good = np.full((xx.shape[0], ), True)
         if not allow_nan:
-            gg = np.concatenate((np.atleast_2d(xx), np.atleast_2d(yy)), axis=-1) if xx.ndim > 1 else np.stack((np.atleast_1d(xx), np.atleast_1d(yy)), axis=-1)
+            if multi:
+                gg = np.concatenate((xx.reshape(-1, 1), yy), axis=-1)
+            else:
+                gg = np.concatenate((np.atleast_2d(xx), np.atleast_2d(yy)), axis=-1) if xx.ndim > 1 else np.stack((np.atleast_1d(xx), np.atleast_1d(yy)), axis=-1)
             good = np.all(np.isfinite(gg), axis=-1)
         xe = xe[good] if xe.shape == xx.shape else np.tile(xe[0], (xx[good].shape[0], 1))
         ye = ye[good] if ye.shape == yy.shape else np.tile(ye[0], (yy[good].shape[0], 1))
@@ -2127,6 +2532,8 @@ class GaussianProcess():
                 cxe = np.concatenate((cxe, np.atleast_1d(xe[ii]).reshape(1, *cxs)), axis=0)
                 cyy = np.concatenate((cyy, np.atleast_1d(yy[ii]).reshape(1, *cys)), axis=0)
                 cye = np.concatenate((cye, np.atleast_1d(ye[ii]).reshape(1, *cys)), axis=0)
+        if multi:
+            cye = np.max(cye, axis=-1)
         cxx = cxx * xsc
         cxe = cxe * xsc
         cyy = cyy * ysc
@@ -2134,6 +2541,35 @@ class GaussianProcess():
         return (cxx, cxe, cyy, cye, nn)
 
 
+    def _offset_overlapping_points(self, xn, xspan=None):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Shifts the prediction points which coincide exactly with the input data points, to avoid
+        NaN values in the final prediction. The input vector is modified in-place.
+
+        :arg xn: array. Vector of x-values at which the fit will be evaluated.
+
+        :kwarg xspan: array. Range of the full prediction vector, used to set the offset when :code:`xn` is only a subset of it. (optional)
+
+        :returns: array. Vector of x-values with overlapping points shifted.
+        '''
+
+        for xref in [self._xx, self._dxx]:
+            if xref is not None and xref.shape[0] > 0:
+                span = xspan
+                if span is None:
+                    span = (np.nanmax(xn, axis=0) - np.nanmin(xn, axis=0)) if xn.shape[0] > 1 else (np.nanmax(xref, axis=0) - np.nanmin(xref, axis=0))
+                epsx = 1.0e-6 * span
+                if xn.ndim > 1:
+                    overlap = np.any(np.all(xn.reshape(xn.shape[0], 1, -1) == xref.reshape(1, xref.shape[0], -1), axis=-1), axis=-1)
+                else:
+                    overlap = np.isin(xn, xref)
+                if np.any(overlap):
+                    xn[overlap, ...] = xn[overlap] + epsx
+        return xn
+
+
     def __basic_fit(
         self,
         xnew,
@@ -2196,20 +2632,23 @@ class GaussianProcess():
 
         :kwarg rtn_cov: bool. Set as true to return the full predicted covariance matrix instead of the 1 sigma errors. (optional)
 
-        :returns: (array, array, float, object).
+        :returns: (array, array, float, float, object, object).
             Vector of predicted mean values, vector or matrix of predicted errors, log-marginal-likelihood of fit
-            including the regularization component, final :code:`_Kernel` instance with optimized hyperparameters if performed.
+            including the regularization component, log-marginal-likelihood of null hypothesis, final :code:`_Kernel`
+            instance with optimized hyperparameters if performed, :code:`GaussianProcessPosterior` instance holding
+            the factorized training covariance matrix.
         '''
 
         xn = None
         kk = copy.copy(self._kk)
         lp = self._lp
-        xx = copy.deepcopy(self._xx)
-        yy = copy.deepcopy(self._yy)
-        ye = copy.deepcopy(self._ye) if self._gpye is None else copy.deepcopy(self._gpye)
-        dxx = copy.deepcopy(self._dxx)
-        dyy = copy.deepcopy(self._dyy)
-        dye = copy.deepcopy(self._dye)
+        # Stored data is read-only and never modified in-place, no copies required
+        xx = self._xx
+        yy = self._yy
+        ye = self._ye if self._gpye is None else self._gpye
+        dxx = self._dxx
+        dyy = self._dyy
+        dye = self._dye
         eps = self._eps
         opm = self._opm
         opp = copy.deepcopy(self._opp)
@@ -2226,43 +2665,43 @@ class GaussianProcess():
             kk = copy.copy(kernel)
         if isinstance(regpar, number_types) and float(regpar) > 0.0:
             lp = float(regpar)
-        if isinstance(xdata, array_types) and len(xdata) > 0:
-            xx = np.array(xdata, dtype=self._dtype)
+        if self._is_data(xdata):
+            xx = readonly_array(xdata, dtype=self._dtype)
         #elif isinstance(xdata, np.ndarray) and xdata.size > 0:
         #    xx = xdata.flatten()
-        if isinstance(ydata, array_types) and len(ydata) > 0:
-            yy = np.array(ydata, dtype=self._dtype)
+        if self._is_data(ydata):
+            yy = readonly_array(ydata, dtype=self._dtype)
         #elif isinstance(ydata, np.ndarray) and ydata.size > 0:
         #    yy = ydata.flatten()
-        if isinstance(yerr, array_types) and len(yerr) > 0:
-            ye = np.array(yerr, dtype=self._dtype)
+        if self._is_data(yerr):
+            ye = readonly_array(yerr, dtype=self._dtype)
         #elif isinstance(yerr, np.ndarray) and yerr.size > 0:
         #    ye = yerr.flatten()
         elif isinstance(yerr, str):
             ye = None
-        if isinstance(dxdata, array_types) and len(dxdata) > 0:
+        if self._is_data(dxdata):
             #temp = np.array([])
             #for item in dxdata:
             #    temp = np.append(temp, item) if item is not None else np.append(temp, np.nan)
-            dxx = np.array(dxdata, dtype=self._dtype) # temp.flatten()
+            dxx = readonly_array(dxdata, dtype=self._dtype) # temp.flatten()
         #elif isinstance(dxdata, np.ndarray) and dxdata.size > 0:
         #    dxx = dxdata.flatten()
         elif isinstance(dxdata, str):
             dxx = None
-        if isinstance(dydata, array_types) and len(dydata) > 0:
+        if self._is_data(dydata):
             #temp = np.array([])
             #for item in dydata:
             #    temp = np.append(temp, item) if item is not None else np.append(temp, np.nan)
-            dyy = np.array(dydata, dtype=self._dtype) # temp.flatten()
+            dyy = readonly_array(dydata, dtype=self._dtype) # temp.flatten()
         #elif isinstance(dydata, np.ndarray) and dydata.size > 0:
         #    dyy = dydata.flatten()
         elif isinstance(dydata, str):
             dyy = None
-        if isinstance(dyerr, array_types) and len(dyerr) > 0:
+        if self._is_data(dyerr):
             #temp = np.array([])
             #for item in dyerr:
             #    temp = np.append(temp, item) if item is not None else np.append(temp, np.nan)
-            dye = np.array(dyerr, dtype=self._dtype) # temp.flatten()
+            dye = readonly_array(dyerr, dtype=self._dtype) # temp.flatten()
         #elif isinstance(dyerr, np.ndarray) and dyerr.size > 0:
         #    dye = dyerr.flatten()
         elif isinstance(dyerr, str):
@@ -2352,6 +2791,7 @@ class GaussianProcess():
         lml = None
         lmlz = None
         nkk = None
+        post = None
         if xx is not None and yy is not None and xx.shape[0] == yy.shape[0] and xn is not None and isinstance(kk, _Kernel):
             # Remove all data and associated data that contain NaNs
             if ye is None:
@@ -2359,8 +2799,12 @@ class GaussianProcess():
                 ye = np.zeros((1, *ys), dtype=self._dtype)
             xs = xx.shape[1:] if xx.ndim > 1 else []
             xe = np.zeros((1, *xs), dtype=self._dtype)
+            multi = (xx.ndim == 1 and yy.ndim > 1)
+            if multi and dxx is not None:
+                raise ValueError('Derivative data is not supported for multi-output regression.')
             (xx, xe, yy, ye, nn) = self._condition_data(xx, xe, yy, ye, lb, ub, cn)
-            myy = np.mean(yy)
+            # Multiple outputs share the y-error scaling and only differ by their offsets
+            myy = np.mean(yy, axis=0) if multi else np.mean(yy)
             yy = yy - myy
             sc = np.nanmax(np.abs(yy))
             if sc == 0.0:
@@ -2379,6 +2823,11 @@ class GaussianProcess():
                 dye = dye / sc
             dd = 1 if do_drv else 0
             nkk = copy.copy(kk)
+            if eps is not None and not do_drv and self._objective == 'kfold':
+                # Fold assignment is checked against the conditioned data before the optimizer starts
+                ntrain = yy.shape[0] + (int(np.count_nonzero(np.isfinite(dyy) & np.isfinite(dye))) if dnn is not None else 0)
+                if self._nfolds > ntrain:
+                    raise ValueError(f'Number of cross-validation folds must be between 2 and the number of training points, which is {ntrain}.')
             if eps is not None and not do_drv:
                 if opm == 'mom' and opp.size > 1:
                     (nkk, lml) = self._gp_momentum_optimizer(nkk, lp, xx, yy, ye, dxx, dyy, dye, eps, opp[0], opp[1], dh)
@@ -2396,13 +2845,16 @@ class GaussianProcess():
                     (nkk, lml) = self._gp_nadam_optimizer(nkk, lp, xx, yy, ye, dxx, dyy, dye, eps, opp[0], opp[1], opp[2], dh)
                 elif opm == 'grad' and opp.size > 0:
                     (nkk, lml) = self._gp_grad_optimizer(nkk, lp, xx, yy, ye, dxx, dyy, dye, eps, opp[0], dh)
-            (barF, varF, lml, lmlz) = self._gp_base_alg(xn, nkk, lp, xx, yy, ye, dxx, dyy, dye, dd)
+            post = self._make_posterior(nkk, lp, xx, yy, ye, dxx, dyy, dye, ymean=myy, yscale=sc)
+            (barF, varF) = post._predict(xn, dd)
+            lml = post.lml
+            lmlz = post.null_lml
             barF = barF * sc if do_drv else barF * sc + myy
             varF = varF * sc**2.0
             errF = varF if rtn_cov else np.sqrt(diagonal(varF)) # np.sqrt(np.diag(varF))
         else:
             raise ValueError('Check GP inputs to make sure they are valid.')
-        return (barF, errF, lml, lmlz, nkk)
+        return (barF, errF, lml, lmlz, nkk, post)
 
 
     def __brute_derivative(
@@ -2525,9 +2977,10 @@ class GaussianProcess():
             enr = self._enr if self._enr is not None else 0
             elml = None
             ekk = None
+            rpost = None
             xs = self._xx.shape[1:] if self._xx.ndim > 1 else []
             xntest = np.zeros((1, *xs), dtype=self._dtype)
-            ye = copy.deepcopy(self._ye) if self._gpye is None else copy.deepcopy(self._gpye)
+            ye = self._ye if self._gpye is None else self._gpye
             #aye = np.full(ye.shape, np.nanmax([0.2 * np.mean(np.abs(ye)), 1.0e-3 * np.nanmax(np.abs(self._yy))]), dtype=self._dtype)
             esh = (ye.shape[0], 1) if ye.ndim > 1 else ye.shape[0]
             aye = np.tile(np.nanmax([0.2 * np.mean(np.abs(ye), axis=0), 1.0e-3 * np.nanmax(np.abs(self._yy), axis=0)], axis=0), esh)
@@ -2540,8 +2993,9 @@ class GaussianProcess():
                 ekk = copy.copy(self._ekk)
                 ekkvec = []
                 elmlvec = []
+                rpostvec = []
                 try:
-                    (elml, ekk) = itemgetter(2, 4)(self.__basic_fit(
+                    (elml, ekk, rpost) = itemgetter(2, 4, 5)(self.__basic_fit(
                         xntest,
                         kernel=ekk,
                         regpar=elp,
@@ -2570,15 +3024,17 @@ class GaussianProcess():
 #                    ))
                     ekkvec.append(copy.copy(ekk))
                     elmlvec.append(elml)
+                    rpostvec.append(rpost)
                 except (ValueError, np.linalg.LinAlgError):
                     ekkvec.append(None)
                     elmlvec.append(np.nan)
+                    rpostvec.append(None)
                 for jj in range(enr):
                     ekb = np.log10(self._ekk.bounds)
                     etheta = np.abs(ekb[1, :] - ekb[0, :]).flatten() * np.random.random_sample((ekb.shape[1], )) + np.nanmin(ekb, axis=0).flatten()
                     ekk.hyperparameters = np.power(10.0, etheta)
                     try:
-                        (elml, ekk) = itemgetter(2, 4)(self.__basic_fit(
+                        (elml, ekk, rpost) = itemgetter(2, 4, 5)(self.__basic_fit(
                             xntest,
                             kernel=ekk,
                             regpar=elp,
@@ -2607,20 +3063,23 @@ class GaussianProcess():
 #                        ))
                         ekkvec.append(copy.copy(ekk))
                         elmlvec.append(elml)
+                        rpostvec.append(rpost)
                     except (ValueError, np.linalg.LinAlgError):
                         ekkvec.append(None)
                         elmlvec.append(np.nan)
+                        rpostvec.append(None)
                 eimaxv = np.where(elmlvec == np.nanmax(elmlvec))[0]
                 if len(eimaxv) > 0:
                     eimax = eimaxv[0]
                     ekk = ekkvec[eimax]
+                    rpost = rpostvec[eimax]
                     self._ekk = copy.copy(ekkvec[eimax])
                 else:
                     raise ValueError('None of the error fit attempts converged. Please change error kernel settings and try again.')
             elif self._eeps is not None and self._egpye is None:
                 elp = self._elp
                 ekk = copy.copy(self._ekk)
-                (elml, ekk) = itemgetter(2, 4)(self.__basic_fit(
+                (elml, ekk, rpost) = itemgetter(2, 4, 5)(self.__basic_fit(
                     xntest,
                     kernel=ekk,
                     regpar=elp,
@@ -2651,17 +3110,21 @@ class GaussianProcess():
             if isinstance(self._ekk, _Kernel):
                 epsx = 1.0e-8 * (np.nanmax(self._xx, axis=0) - np.nanmin(self._xx, axis=0)) if self._xx.shape[0] > 1 else 1.0e-8 * np.ones(self._xx.shape, dtype=self._dtype)
                 xntest = self._xx.copy() + epsx
-                tgpye = itemgetter(0)(self.__basic_fit(
-                    xntest,
-                    kernel=self._ekk,
-                    regpar=self._elp,
-                    ydata=ye,
-                    yerr=aye,
-                    dxdata='None',
-                    dydata='None',
-                    dyerr='None',
-                    epsilon='None'
-                ))
+                # Posterior from optimization already holds the factorized raw error covariance
+                if isinstance(rpost, GaussianProcessPosterior):
+                    tgpye = rpost.predict_mean(xntest)
+                else:
+                    tgpye = itemgetter(0)(self.__basic_fit(
+                        xntest,
+                        kernel=self._ekk,
+                        regpar=self._elp,
+                        ydata=ye,
+                        yerr=aye,
+                        dxdata='None',
+                        dydata='None',
+                        dyerr='None',
+                        epsilon='None'
+                    ))
 #                self._gpye = itemgetter(0)(self.__basic_fit(
 #                    xntest,
 #                    kernel=self._ekk,
@@ -2672,12 +3135,39 @@ class GaussianProcess():
 #                    dyerr=adye,
 #                    epsilon='None'
 #                ))
-                self._gpye = np.abs(tgpye)
+                self._gpye = self._freeze(np.abs(tgpye))
                 self._egpye = aye.copy()
+                self._make_error_posterior()
         else:
             raise ValueError('Check input y-errors to make sure they are valid.')
 
 
+    def _make_error_posterior(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Factorizes the error kernel over the modified y-errors and stores the resulting
+        posterior, which is reused for all subsequent evaluations of the error function.
+
+        :returns: none.
+        '''
+
+        self._epost = None
+        if self._gpye is not None and self._egpye is not None:
+            xs = self._xx.shape[1:] if self._xx.ndim > 1 else []
+            xntest = np.zeros((1, *xs), dtype=self._dtype)
+            self._epost = itemgetter(5)(self.__basic_fit(
+                xntest,
+                kernel=self._ekk,
+                ydata=self._gpye,
+                yerr=self._egpye,
+                dxdata='None',
+                dydata='None',
+                dyerr='None',
+                epsilon='None'
+            ))
+
+
     def make_NIGP_errors(self, nrestarts=0, hsgp_flag=False):
         r'''
         Calculates a vector of modified y-errors based on input x-errors and a test model
@@ -2784,13 +3274,52 @@ class GaussianProcess():
                 cxe[nfilt] = 0.0
                 cye[nfilt] = 0.0
                 csh = (cye.shape[0], 1) if cye.ndim > 1 else cye.shape[0]
-                self._gpye = np.sqrt((cye ** 2.0) + ((cxe * dbarF) ** 2.0))
+                self._gpye = self._freeze(np.sqrt((cye ** 2.0) + ((cxe * dbarF) ** 2.0)))
+                self._epost = None
                 if not hsgp_flag:
                     self._egpye = np.tile(np.nanmax([0.2 * np.mean(np.abs(self._gpye), axis=0), 1.0e-3 * np.nanmax(np.abs(self._yy), axis=0)]), csh)
         else:
             raise ValueError('Check input x-errors to make sure they are valid.')
 
 
+    def _evaluate_estimate(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the fit at the input x-values from the stored posterior and stores
+        the result, unless already present from the latest :code:`GPRFit()` call.
+
+        :returns: none.
+        '''
+
+        if self._estF is None and self._post is not None and self._xx is not None:
+            with self._fit_scope():
+                self._estF = self._freeze(self._post.predict_mean(self._xx + 1.0e-10))
+
+
+    def _evaluate_derivatives(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the derivative of the fit and of the error fit from the stored
+        posteriors and stores the results, unless already present from the latest
+        :code:`GPRFit()` call.
+
+        :returns: none.
+        '''
+
+        if self._dbarF is None and self._post is not None and self._xFeval is not None:
+            with self._fit_scope():
+                if self._dbarE is None and self._epost is not None:
+                    (dbarE, dvarE) = self._epost.predict(self._xFeval, der=1, rtn_cov=True)
+                    self._dbarE = self._freeze(dbarE)
+                    self._dvarE = self._freeze(dvarE)
+                (dbarF, dvarF) = self._post.predict(self._xFeval, der=1, rtn_cov=True)
+                self._dbarF = self._freeze(dbarF)
+                self._dvarF = self._freeze(dvarF)
+                self._dvarN = self._freeze(self._noise_variance(self._dbarE, self._dvarF))
+
+
     def GPRFit(
         self,
         xnew,
@@ -2832,70 +3361,50 @@ class GaussianProcess():
             raise ValueError('A valid vector of prediction x-points must be given.')
         elif xn.ndim != self._xx.ndim:
             raise ValueError(f'Prediction x-point vector must contain the same number of dimensions as fitted data, which is {self._xx.ndim}.')
+        if self._xx.ndim == 1 and self._yy is not None and self._yy.ndim > 1:
+            if nigp_flag or (hsgp_flag and isinstance(self._ekk, _Kernel)):
+                raise ValueError('Heteroscedastic and noisy-input error models are not supported for multi-output regression.')
+            if self._ye is not None and self._ye.ndim > 1:
+                raise ValueError('Multi-output regression requires a single vector of y-errors shared by all outputs.')
         oxn = copy.deepcopy(xn)
 
-        if not self._fwarn:
-            warnings.filterwarnings('ignore', category=RuntimeWarning)
-
-        barF = None
-        varF = None
-        lml = None
-        lmlz = None
-        nkk = None
-        estF = None
-        if nigp_flag:
-            self.make_NIGP_errors(nr, hsgp_flag=hsgp_flag)
-        if hsgp_flag:
-            self.make_HSGP_errors()
-        if self._gpye is None:
-            hsgp_flag = False
-            nigp_flag = False
-            self._gpye = copy.deepcopy(self._ye)
-            self._egpye = None
-
-        # These loops adjust overlapping values between raw data vector and requested prediction vector, to avoid NaN values in final prediction
-        if self._xx is not None:
-            epsx = 1.0e-6 * (np.nanmax(xn, axis=0) - np.nanmin(xn, axis=0)) if xn.shape[0] > 1 else 1.0e-6 * (np.nanmax(self._xx, axis=0) - np.nanmin(self._xx, axis=0))
-            for xi in range(xn.shape[0]):
-                for rxi in range(self._xx.shape[0]):
-                    if np.all(xn[xi] == self._xx[rxi]):
-                        xn[xi, ...] = xn[xi] + epsx
-        if self._dxx is not None:
-            epsx = 1.0e-6 * (np.nanmax(xn, axis=0) - np.nanmin(xn, axis=0)) if xn.shape[0] > 1 else 1.0e-6 * (np.nanmax(self._dxx, axis=0) - np.nanmin(self._dxx, axis=0))
-            for xi in range(0, xn.shape[0]):
-                for rxi in range(self._dxx.shape[0]):
-                    if np.all(xn[xi] == self._dxx[rxi]):
-                        xn[xi, ...] = xn[xi] + epsx
-
-        if self._egpye is not None:
-            edye = None
-            if self._dye is not None:
-                esh = (self._dye.shape[0], 1) if self._dye.ndim > 1 else self._dye.shape[0]
-                edye = np.tile(np.nanmax([0.2 * np.mean(np.abs(self._dye), axis=0), 1.0e-3 * np.nanmax(np.abs(self._dyy), axis=0)], axis=0), esh)
-            if edye is not None:
-                edye[edye < 1.0e-2] = 1.0e-2
-            (self._barE, self._varE) = itemgetter(0, 1)(self.__basic_fit(
-                xn,
-                kernel=self._ekk,
-                ydata=self._gpye,
-                yerr=self._egpye,
-                dxdata='None',
-                dydata='None',
-                dyerr='None',
-                epsilon='None',
-                rtn_cov=True
-            ))
-            (self._dbarE, self._dvarE) = itemgetter(0, 1)(self.__basic_fit(
-                xn,
-                kernel=self._ekk,
-                ydata=self._gpye,
-                yerr=self._egpye,
-                dxdata='None',
-                dydata='None',
-                dyerr='None',
-                do_drv=True,
-                rtn_cov=True
-            ))
+        with self._fit_scope():
+            barF = None
+            varF = None
+            lml = None
+            lmlz = None
+            nkk = None
+            post = None
+            epost = None
+            erms = None
+            if nigp_flag:
+                self.make_NIGP_errors(nr, hsgp_flag=hsgp_flag)
+            if hsgp_flag:
+                self.make_HSGP_errors()
+            if self._gpye is None:
+                hsgp_flag = False
+                nigp_flag = False
+                self._gpye = self._ye
+                self._egpye = None
+
+            # Adjust overlapping values between raw data vector and requested prediction vector, to avoid NaN values in final prediction
+            xn = self._offset_overlapping_points(xn)
+
+            if self._egpye is not None:
+                edye = None
+                if self._dye is not None:
+                    esh = (self._dye.shape[0], 1) if self._dye.ndim > 1 else self._dye.shape[0]
+                    edye = np.tile(np.nanmax([0.2 * np.mean(np.abs(self._dye), axis=0), 1.0e-3 * np.nanmax(np.abs(self._dyy), axis=0)], axis=0), esh)
+                if edye is not None:
+                    edye[edye < 1.0e-2] = 1.0e-2
+                if not isinstance(self._epost, GaussianProcessPosterior):
+                    self._make_error_posterior()
+                epost = self._epost
+                (barE, varE) = epost.predict(xn, rtn_cov=True)
+                self._barE = self._freeze(barE)
+                self._varE = self._freeze(varE)
+                self._dbarE = None
+                self._dvarE = None
 #            (self._barE, self._varE) = itemgetter(0, 1)(self.__basic_fit(
 #                xn,
 #                kernel=self._ekk,
@@ -2960,38 +3469,24 @@ class GaussianProcess():
 #                else:
 #                    ddbarE[nx] = float(np.mean(ddbarEt[ivec-nsum:ivec+nsum+1]))
 #            self._ddbarE = ddbarE.copy()
-        else:
-            tsh = (xn.shape[0], 1) if self._ye.ndim > 1 else xn.shape[0]
-            temp = np.tile(np.sqrt(np.nanmean(np.power(self._ye, 2.0), axis=0)), tsh) if self._ye is not None else None
-            if self._gpye is not None:
-                temp = np.tile(np.sqrt(np.nanmean(np.power(self._gpye, 2.0), axis=0)), tsh)
-            self._barE = copy.deepcopy(temp) if temp is not None else None
-            self._varE = np.zeros(xn.shape) if self._barE is not None else None
-            self._dbarE = np.zeros(xn.shape) if self._barE is not None else None
-            self._dvarE = np.zeros(xn.shape) if self._barE is not None else None
+            else:
+                tsh = (xn.shape[0], 1) if self._ye.ndim > 1 else xn.shape[0]
+                erms = np.sqrt(np.nanmean(np.power(self._ye, 2.0), axis=0)) if self._ye is not None else None
+                if self._gpye is not None:
+                    erms = np.sqrt(np.nanmean(np.power(self._gpye, 2.0), axis=0))
+                temp = np.tile(erms, tsh) if erms is not None else None
+                self._barE = self._freeze(temp)
+                self._varE = self._freeze(np.zeros(xn.shape)) if self._barE is not None else None
+                self._dbarE = self._freeze(np.zeros(xn.shape)) if self._barE is not None else None
+                self._dvarE = self._freeze(np.zeros(xn.shape)) if self._barE is not None else None
 #            self._ddbarE = np.zeros(xn.shape) if self._barE is not None else None
 
-        if isinstance(self._kk, _Kernel) and self._kk.bounds is not None and nr > 0:
-            xs = self._xx.shape[1:] if self._xx.ndim > 1 else []
-            xntest = np.zeros((1, *xs), dtype=self._dtype)
-            tkk = copy.copy(self._kk)
-            kkvec = []
-            lmlvec = []
-            try:
-                (tlml, tkk) = itemgetter(2, 4)(self.__basic_fit(
-                    xntest,
-                    kernel=tkk
-                ))
-                kkvec.append(copy.copy(tkk))
-                lmlvec.append(tlml)
-            except (ValueError, np.linalg.LinAlgError):
-                kkvec.append(None)
-                lmlvec.append(np.nan)
-            for ii in range(nr):
-#                kb = self._kb
-                kb = np.log10(self._kk.bounds)
-                theta = np.abs(kb[1, :] - kb[0, :]).flatten() * np.random.random_sample((kb.shape[1], )) + np.nanmin(kb, axis=0).flatten()
-                tkk.hyperparameters = np.power(10.0, theta)
+            if isinstance(self._kk, _Kernel) and self._kk.bounds is not None and nr > 0:
+                xs = self._xx.shape[1:] if self._xx.ndim > 1 else []
+                xntest = np.zeros((1, *xs), dtype=self._dtype)
+                tkk = copy.copy(self._kk)
+                kkvec = []
+                lmlvec = []
                 try:
                     (tlml, tkk) = itemgetter(2, 4)(self.__basic_fit(
                         xntest,
@@ -3002,61 +3497,299 @@ class GaussianProcess():
                 except (ValueError, np.linalg.LinAlgError):
                     kkvec.append(None)
                     lmlvec.append(np.nan)
-            imaxv = np.where(lmlvec == np.nanmax(lmlvec))[0]
-            if len(imaxv) > 0:
-                imax = imaxv[0]
-                (barF, varF, lml, lmlz, nkk) = self.__basic_fit(
+                for ii in range(nr):
+#                kb = self._kb
+                    kb = np.log10(self._kk.bounds)
+                    theta = np.abs(kb[1, :] - kb[0, :]).flatten() * np.random.random_sample((kb.shape[1], )) + np.nanmin(kb, axis=0).flatten()
+                    tkk.hyperparameters = np.power(10.0, theta)
+                    try:
+                        (tlml, tkk) = itemgetter(2, 4)(self.__basic_fit(
+                            xntest,
+                            kernel=tkk
+                        ))
+                        kkvec.append(copy.copy(tkk))
+                        lmlvec.append(tlml)
+                    except (ValueError, np.linalg.LinAlgError):
+                        kkvec.append(None)
+                        lmlvec.append(np.nan)
+                imaxv = np.where(lmlvec == np.nanmax(lmlvec))[0]
+                if len(imaxv) > 0:
+                    imax = imaxv[0]
+                    (barF, varF, lml, lmlz, nkk, post) = self.__basic_fit(
+                        xn,
+                        kernel=kkvec[imax],
+                        epsilon='None',
+                        rtn_cov=True
+                    )
+                else:
+                    raise ValueError('None of the fit attempts converged. Please adjust kernel settings and try again.')
+            elif isinstance(self._kk, _Kernel):
+                (barF, varF, lml, lmlz, nkk, post) = self.__basic_fit(
                     xn,
-                    kernel=kkvec[imax],
-                    epsilon='None',
                     rtn_cov=True
                 )
-                estF = itemgetter(0)(self.__basic_fit(
-                    self._xx + 1.0e-10,
-                    kernel=kkvec[imax],
-                    epsilon='None',
-                    rtn_cov=True
-                ))
-            else:
-                raise ValueError('None of the fit attempts converged. Please adjust kernel settings and try again.')
-        elif isinstance(self._kk, _Kernel):
-            (barF, varF, lml, lmlz, nkk) = self.__basic_fit(
-                xn,
-                rtn_cov=True
-            )
-            estF = itemgetter(0)(self.__basic_fit(
-                self._xx + 1.0e-10,
-                kernel=nkk,
-                epsilon='None',
-                rtn_cov=True
-            ))
 
-        if barF is not None and isinstance(nkk, _Kernel):
-            self._xF = copy.deepcopy(oxn)
-            self._barF = copy.deepcopy(barF)
-            self._varF = copy.deepcopy(varF) if varF is not None else None
-            self._estF = copy.deepcopy(estF) if estF is not None else None
-            self._lml = lml
-            self._nulllml = lmlz
-            self._kk = copy.copy(nkk) if isinstance(nkk, _Kernel) else None
-            (dbarF, dvarF) = itemgetter(0, 1)(self.__basic_fit(
-                xn,
-                do_drv=True,
-                rtn_cov=True
-            ))
-            self._dbarF = copy.deepcopy(dbarF) if dbarF is not None else None
-            self._dvarF = copy.deepcopy(dvarF) if dvarF is not None else None
-            self._varN = diagonalize(np.power(self._barE, 2.0), full=False) if self._barE is not None else diagonalize(np.zeros(self._xF.shape), full=False)
-            self._dvarN = diagonalize(np.power(self._dbarE, 2.0), full=False) if self._dbarE is not None else diagonalize(np.zeros(self._xF.shape), full=False)
-
-            # It seems that the second derivative term is not necessary, should be used to refine the mathematics!
+            if barF is not None and isinstance(nkk, _Kernel):
+                self._xF = self._freeze(oxn)
+                self._barF = self._freeze(barF)
+                self._varF = self._freeze(varF)
+                self._estF = None
+                self._lml = lml
+                self._nulllml = lmlz
+                self._kk = copy.copy(nkk) if isinstance(nkk, _Kernel) else None
+                self._post = post
+                self._epost = epost
+                self._erms = erms
+                self._xFeval = self._freeze(xn)
+                self._dbarF = None
+                self._dvarF = None
+                self._samplers = {}
+                self._varN = self._freeze(self._noise_variance(self._barE, self._varF))
+                self._dvarN = None
+                if not self._flazy:
+                    self._evaluate_estimate()
+                    self._evaluate_derivatives()
+
+                # It seems that the second derivative term is not necessary, should be used to refine the mathematics!
 #            ddfac = copy.deepcopy(self._ddbarE) if self._ddbarE is not None else 0.0
 #            self._dvarN = np.diag(2.0 * (np.power(self._dbarE, 2.0) + np.abs(self._barE * ddfac))) if self._dbarE is not None else None
-        else:
-            raise ValueError('Check GP inputs to make sure they are valid.')
+            else:
+                raise ValueError('Check GP inputs to make sure they are valid.')
+
+
+    async def fit_async(
+        self,
+        xnew,
+        hsgp_flag=True,
+        nigp_flag=False,
+        nrestarts=None
+    ):
+        r'''
+        Asynchronous version of :code:`GPRFit()`, running the fit on the shared executor configured
+        through :code:`set_async_executor()` such that the event loop is not blocked. The number of
+        concurrently running fits and predictions is bounded by the concurrency limit of that executor.
+
+        .. note::
+
+            Cancelling the awaiting task stops the fit at the next iteration of the hyperparameter
+            optimizer, after which the stored results are left in an unspecified state. The task
+            only finishes cancelling once the fit has stopped.
+
+        :arg xnew: array. Vector of x-values at which the predicted fit will be evaluated.
+
+        :kwarg hsgp_flag: bool. Set as true to perform Gaussian Process regression fit with proper propagation of y-errors. Default is :code:`True`. (optional)
+
+        :kwarg nigp_flag: bool. Set as true to perform Gaussian Process regression fit with proper propagation of x-errors. Default is :code:`False`. (optional)
+
+        :kwarg nrestarts: int. Number of kernel restarts using uniform randomized hyperparameter values within the provided hyperparameter bounds. (optional)
+
+        :returns: none.
+        '''
+
+        event = threading.Event()
+        await run_async(self._run_cancellable, event, self.GPRFit, xnew, hsgp_flag=hsgp_flag, nigp_flag=nigp_flag, nrestarts=nrestarts, cancel_event=event)
+
+
+    def predict_chunks(
+        self,
+        xnew,
+        chunk_size=None,
+        memory_limit=None,
+        noise_flag=True,
+        process_noise_fraction=None,
+        out=None
+    ):
+        r'''
+        Evaluates the fit determined in the latest :code:`GPRFit()` call over an arbitrarily large vector
+        of x-values, in chunks, re-using the factorized training covariance matrix. Only the diagonals of
+        the predictive covariance matrices are computed, such that the peak memory usage scales with the
+        chunk size instead of the length of the prediction vector.
+
+        .. note::
+
+            The validity of the inputs is checked upon calling this function, but the evaluation is only
+            performed as the returned generator is consumed.
+
+        :arg xnew: array. Vector of x-values at which the predicted fit will be evaluated, can be a :code:`np.memmap` instance.
+
+        :kwarg chunk_size: int. Number of x-values evaluated per chunk, default is 1024. (optional)
+
+        :kwarg memory_limit: float. Approximate memory budget in bytes used to determine the chunk size, ignored if :code:`chunk_size` is given. (optional)
+
+        :kwarg noise_flag: bool. Specifies inclusion of noise term in returned errors. (optional)
+
+        :kwarg process_noise_fraction: float. Specify split between process noise and observation noise in data, must be between zero and one. (optional)
+
+        :kwarg out: array. Sequence of output arrays for the y-values, y-errors, dy/dx-values and dy/dx-errors, in that order, with the same length as :code:`xnew`. Results are written into these arrays as the chunks are evaluated, individual entries can be :code:`None` and arrays can be :code:`np.memmap` instances. (optional)
+
+        :returns: generator. Yields tuples of (array, array, array, array, array) in order of x-values, y-values, y-errors, dy/dx-values, dy/dx-errors for each chunk.
+        '''
+
+        if not isinstance(self._post, GaussianProcessPosterior):
+            raise ValueError('A successful GPRFit() call must be performed before evaluating the fit in chunks.')
+        xn = None
+        if isinstance(xnew, np.ndarray) and xnew.size > 0:
+            xn = xnew
+        elif isinstance(xnew, array_types) and len(xnew) > 0:
+            xn = np.array(xnew, dtype=self._dtype)
+        if xn is None:
+            raise ValueError('A valid vector of prediction x-points must be given.')
+        elif xn.ndim != self._xx.ndim:
+            raise ValueError(f'Prediction x-point vector must contain the same number of dimensions as fitted data, which is {self._xx.ndim}.')
+        npts = xn.shape[0]
+        nc = 1024
+        if isinstance(chunk_size, number_types) and int(chunk_size) > 0:
+            nc = int(chunk_size)
+        elif isinstance(memory_limit, number_types) and float(memory_limit) > 0.0:
+            # Cross-covariance terms scale with N x C and prior covariance terms scale with C x C, including derivative components
+            ndim = xn.shape[1] if xn.ndim > 1 else 1
+            isz = float(np.dtype(self._dtype).itemsize)
+            aa = 2.0 * isz * ndim ** 2
+            bb = 4.0 * isz * self._post.size * ndim
+            nc = max(int((-bb + np.sqrt(bb ** 2 + 4.0 * aa * float(memory_limit))) / (2.0 * aa)), 1)
+        outputs = [None, None, None, None]
+        if isinstance(out, (list, tuple)):
+            for ii in range(min(len(out), len(outputs))):
+                if out[ii] is not None:
+                    if not isinstance(out[ii], np.ndarray) or out[ii].shape[0] != npts:
+                        raise ValueError(f'Output arrays must be given as arrays with a first dimension of length {npts}.')
+                    outputs[ii] = out[ii]
+        elif out is not None:
+            raise TypeError('Output arrays must be given as a list or tuple of arrays.')
+        xspan = np.nanmax(xn, axis=0) - np.nanmin(xn, axis=0) if npts > 1 else None
+        return self._iter_chunks(xn, nc, xspan, noise_flag, process_noise_fraction, outputs)
+
+
+    def _iter_chunks(self, xn, nc, xspan, noise_flag, process_noise_fraction, outputs):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Generator performing the chunked evaluation of the fit, see :code:`predict_chunks()`.
+
+        :arg xn: array. Vector of x-values at which the predicted fit will be evaluated.
+
+        :arg nc: int. Number of x-values evaluated per chunk.
+
+        :arg xspan: array. Range of the full prediction vector, used to offset prediction points overlapping with the data.
+
+        :arg noise_flag: bool. Specifies inclusion of noise term in returned errors.
+
+        :arg process_noise_fraction: float. Specify split between process noise and observation noise in data.
+
+        :arg outputs: list. Output arrays for the y-values, y-errors, dy/dx-values and dy/dx-errors, entries can be :code:`None`.
+
+        :returns: generator. Yields tuples of (array, array, array, array, array) for each chunk.
+        '''
+
+        post = self._post
+        sc = post._sc
+        nnum = float(process_noise_fraction) ** 2.0 if isinstance(process_noise_fraction, number_types) and float(process_noise_fraction) >= 0.0 else 1.0
+        nder = float(process_noise_fraction) ** 2.0 if isinstance(process_noise_fraction, number_types) and float(process_noise_fraction) >= 0.0 and float(process_noise_fraction) <= 1.0 else 1.0
+        for ii in range(0, xn.shape[0], nc):
+            xc = np.array(xn[ii:ii+nc], dtype=self._dtype)
+            xp = self._offset_overlapping_points(xc.copy(), xspan=xspan)
+            (barF, varF) = post._predict_diagonal(xp, 0)
+            (dbarF, dvarF) = post._predict_diagonal(xp, 1)
+            barF = barF * sc + post._myy
+            varF = varF * sc ** 2.0
+            dbarF = dbarF * sc
+            dvarF = dvarF * sc ** 2.0
+            barE = None
+            dbarE = None
+            if isinstance(self._epost, GaussianProcessPosterior):
+                barE = self._epost.predict_mean(xp)
+                dbarE = self._epost.predict_mean(xp, der=1)
+            elif self._erms is not None:
+                tsh = (xp.shape[0], 1) if np.ndim(self._erms) > 0 else xp.shape[0]
+                barE = np.tile(self._erms, tsh)
+                dbarE = np.zeros(barE.shape, dtype=self._dtype)
+            varN = np.zeros(varF.shape, dtype=self._dtype)
+            dvarN = np.zeros(dvarF.shape, dtype=self._dtype)
+            if barE is not None and noise_flag:
+                varN = np.power(barE, 2.0).reshape(varF.shape[0], -1) if varF.ndim > 1 else np.power(barE, 2.0).reshape(varF.shape[0])
+                dvarN = np.power(dbarE, 2.0).reshape(dvarF.shape[0], -1) if dvarF.ndim > 1 else np.power(dbarE, 2.0).reshape(dvarF.shape[0])
+            denom = np.where(varF == 0.0, 1.0, varF)
+            dvarmod = (varF + nnum * varN) / denom
+            sigF = self._expand_outputs(np.sqrt(varF + varN))
+            dsigF = self._expand_outputs(np.sqrt(dvarmod * dvarF + nder * dvarN))
+            results = (barF, sigF, dbarF, dsigF)
+            for jj in range(len(outputs)):
+                if outputs[jj] is not None:
+                    outputs[jj][ii:ii+xc.shape[0]] = results[jj].reshape(outputs[jj][ii:ii+xc.shape[0]].shape)
+            yield (xc, *results)
+
+
+    def predict(
+        self,
+        xnew,
+        chunk_size=None,
+        memory_limit=None,
+        noise_flag=True,
+        process_noise_fraction=None
+    ):
+        r'''
+        Evaluates the fit determined in the latest :code:`GPRFit()` call at the input x-values, without
+        re-fitting or storing the results. Evaluation is performed in chunks, see :code:`predict_chunks()`.
+
+        :arg xnew: array. Vector of x-values at which the predicted fit will be evaluated.
 
-        if not self._fwarn:
-            warnings.filterwarnings('default', category=RuntimeWarning)
+        :kwarg chunk_size: int. Number of x-values evaluated per chunk, default is 1024. (optional)
+
+        :kwarg memory_limit: float. Approximate memory budget in bytes used to determine the chunk size, ignored if :code:`chunk_size` is given. (optional)
+
+        :kwarg noise_flag: bool. Specifies inclusion of noise term in returned errors. (optional)
+
+        :kwarg process_noise_fraction: float. Specify split between process noise and observation noise in data, must be between zero and one. (optional)
+
+        :returns: (array, array, array, array).
+            Vectors in order of y-values, y-errors, dy/dx-values, dy/dx-errors.
+        '''
+
+        results = [[], [], [], []]
+        for chunk in self.predict_chunks(xnew, chunk_size=chunk_size, memory_limit=memory_limit, noise_flag=noise_flag, process_noise_fraction=process_noise_fraction):
+            for jj in range(len(results)):
+                results[jj].append(chunk[jj + 1])
+        return tuple([np.concatenate(rr, axis=0) for rr in results])
+
+
+    def get_gp_sampler(self, derivative=False, actual_noise=False, without_noise=False):
+        r'''
+        Returns a sampler of the predictive distribution computed in the latest :code:`GPRFit()` call,
+        see :code:`PosteriorSampler`. The predictive covariance matrix is only factorized the first
+        time a given combination of options is requested after each fit.
+
+        :kwarg derivative: bool. Set as true to sample the dy/dx-values instead of the y-values. (optional)
+
+        :kwarg actual_noise: bool. Specifies inclusion of noise term in returned variance as actual Gaussian noise. Only operates on diagonal elements. (optional)
+
+        :kwarg without_noise: bool. Specifies complete exclusion of noise term in returned variance. Only operates on diagonal elements. (optional)
+
+        :returns: object. The :code:`PosteriorSampler` instance.
+        '''
+
+        if self._xF is None or self._barF is None or self._varF is None:
+            raise ValueError('Run GPRFit() before attempting to sample the GP.')
+        noise_flag = actual_noise if not without_noise else False
+        mult_flag = not actual_noise if not without_noise else False
+        key = (bool(derivative), bool(noise_flag), bool(mult_flag))
+        sampler = self._samplers.get(key)
+        if sampler is None:
+            with self._fit_scope():
+                if derivative:
+                    mu = self.get_gp_drv_mean()
+                    var = self.get_gp_drv_variance(noise_flag=noise_flag)
+                    (numer, denom) = (self.get_gp_drv_std(noise_flag=mult_flag), self.get_gp_drv_std(noise_flag=False))
+                else:
+                    mu = self.get_gp_mean()
+                    var = self.get_gp_variance(noise_flag=noise_flag)
+                    (numer, denom) = (self.get_gp_std(noise_flag=mult_flag), self.get_gp_std(noise_flag=False))
+                if mu is None or var is None:
+                    raise ValueError('Run GPRFit() before attempting to sample the GP.')
+                # Points without noiseless variance have no deviations to rescale, treated as one as in _drv_noise_scaling
+                mult = numer / np.where(denom == 0.0, 1.0, denom)
+                sampler = PosteriorSampler(mu, var, scale=mult, dtype=self._dtype)
+            self._samplers[key] = sampler
+        return sampler
 
 
     def sample_GP(
@@ -3064,7 +3797,8 @@ class GaussianProcess():
         nsamples,
         actual_noise=False,
         without_noise=False,
-        simple_out=False
+        simple_out=False,
+        seed=None
     ):
         r'''
         Samples Gaussian process posterior on data for predictive functions.
@@ -3079,6 +3813,8 @@ class GaussianProcess():
 
         :kwarg simple_out: bool. Set as true to average over all samples and return only the mean and standard deviation. (optional)
 
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to generate the samples. (optional)
+
         :returns: array. Rows containing sampled fit evaluated at xnew used in latest :code:`GPRFit()`. If :code:`simple_out = True`, row 0 is the mean and row 1 is the 1 sigma error.
         '''
 
@@ -3091,36 +3827,16 @@ class GaussianProcess():
         if isinstance(nsamples, number_types) and int(nsamples) > 0:
             ns = int(nsamples)
 
-        if not self._fwarn:
-            warnings.filterwarnings('ignore', category=RuntimeWarning)
-
-        samples = None
-        if ns > 0:
-            noise_flag = actual_noise if not without_noise else False
-            mu = self.get_gp_mean()
-            var = self.get_gp_variance(noise_flag=noise_flag)
-            orig_size = mu.shape
-            if mu.ndim > 1:
-                mu = np.transpose(mu).flatten()
-            if var.ndim > 2:
-                var = np.transpose(var, axes=(1, 0, 2, 3)).reshape(var.shape[0] * var.shape[1], var.shape[-2] * var.shape[-1])
-            mult_flag = not actual_noise if not without_noise else False
-            mult = self.get_gp_std(noise_flag=mult_flag) / self.get_gp_std(noise_flag=False)
-            if mult.ndim > 1:
-                mult = np.transpose(mult).flatten()
-            mult = np.expand_dims(mult, axis=0)
-            samples = spst.multivariate_normal.rvs(mean=mu, cov=var, size=ns)
-            samples = mult * (samples - mu) + mu
-            samples = samples.reshape(-1, *orig_size)
-            if samples is not None and simple_out:
-                mean = np.nanmean(samples, axis=0)
-                std = np.nanstd(samples, axis=0)
-                samples = np.stack((mean, std), axis=0)
-        else:
-            raise ValueError('Check inputs to sampler to make sure they are valid.')
-
-        if not self._fwarn:
-            warnings.filterwarnings('default', category=RuntimeWarning)
+        with self._fit_scope():
+            samples = None
+            if ns > 0:
+                samples = self.get_gp_sampler(actual_noise=actual_noise, without_noise=without_noise).draw(ns, seed=seed)
+                if simple_out:
+                    mean = np.nanmean(samples, axis=0)
+                    std = np.nanstd(samples, axis=0)
+                    samples = np.stack((mean, std), axis=0)
+            else:
+                raise ValueError('Check inputs to sampler to make sure they are valid.')
 
         return samples
 
@@ -3130,7 +3846,8 @@ class GaussianProcess():
         nsamples,
         actual_noise=False,
         without_noise=False,
-        simple_out=False
+        simple_out=False,
+        seed=None
     ):
         r'''
         Samples Gaussian process posterior on data for predictive functions.
@@ -3145,10 +3862,13 @@ class GaussianProcess():
 
         :kwarg simple_out: bool. Set as true to average over all samples and return only the mean and standard deviation. (optional)
 
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to generate the samples. (optional)
+
         :returns: array. Rows containing sampled fit evaluated at xnew used in latest :code:`GPRFit()`. If :code:`simple_out = True`, row 0 is the mean and row 1 is the 1 sigma error.
         '''
 
         # Check instantiation of output class variables
+        self._evaluate_derivatives()
         if self._xF is None or self._dbarF is None or self._dvarF is None:
             raise ValueError('Run GPRFit() before attempting to sample the GP.')
 
@@ -3157,31 +3877,41 @@ class GaussianProcess():
         if isinstance(nsamples, number_types) and int(nsamples) > 0:
             ns = int(nsamples)
 
-        if not self._fwarn:
-            warnings.filterwarnings('ignore', category=RuntimeWarning)
-
-        samples = None
-        if ns > 0:
-            noise_flag = actual_noise if not without_noise else False
-            mu = self.get_gp_drv_mean()
-            var = self.get_gp_drv_variance(noise_flag=noise_flag)
-            mult_flag = not actual_noise if not without_noise else False
-            mult = self.get_gp_drv_std(noise_flag=mult_flag) / self.get_gp_drv_std(noise_flag=False)
-            samples = spst.multivariate_normal.rvs(mean=mu, cov=var, size=ns)
-            samples = mult * (samples - mu) + mu
-            if samples is not None and simple_out:
-                mean = np.nanmean(samples, axis=0)
-                std = np.nanstd(samples, axis=0)
-                samples = np.vstack((mean, std))
-        else:
-            raise ValueError('Check inputs to sampler to make sure they are valid.')
-
-        if not self._fwarn:
-            warnings.filterwarnings('default', category=RuntimeWarning)
+        with self._fit_scope():
+            samples = None
+            if ns > 0:
+                samples = self.get_gp_sampler(derivative=True, actual_noise=actual_noise, without_noise=without_noise).draw(ns, seed=seed)
+                if simple_out:
+                    mean = np.nanmean(samples, axis=0)
+                    std = np.nanstd(samples, axis=0)
+                    samples = np.stack((mean, std), axis=0)
+            else:
+                raise ValueError('Check inputs to sampler to make sure they are valid.')
 
         return samples
 
 
+    def sample_GP_paths(self, nsamples, nfeatures=1024, seed=None):
+        r'''
+        Draws functions from the posterior distribution of the latest :code:`GPRFit()` call, which
+        can be evaluated jointly at arbitrary x-values without constructing the predictive
+        covariance matrix, see :code:`PathwiseSampler`. The samples exclude the noise term.
+
+        :arg nsamples: int. Number of functions to draw from the posterior distribution.
+
+        :kwarg nfeatures: int. Number of random features per constituent kernel used to represent the prior functions. (optional)
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to draw the features and functions. (optional)
+
+        :returns: object. The :code:`PathwiseSamples` instance, called with a vector of x-values to evaluate the functions.
+        '''
+
+        if self._post is None:
+            raise ValueError('Run GPRFit() before attempting to sample the GP.')
+        rng = np.random.default_rng(seed)
+        return PathwiseSampler(self._post, nfeatures=nfeatures, seed=rng).draw(nsamples, seed=rng)
+
+
     def MCMC_posterior_sampling(self, nsamples):
         r'''
         Performs Monte Carlo Markov chain based posterior analysis over hyperparameters,
@@ -3210,112 +3940,107 @@ class GaussianProcess():
         if isinstance(nsamples, number_types) and int(nsamples) > 0:
             ns = int(nsamples)
 
-        if not self._fwarn:
-            warnings.filterwarnings('ignore', category=RuntimeWarning)
-
-        sbarM = None
-        ssigM = None
-        sdbarM = None
-        sdsigM = None
-        if isinstance(self._kk, _Kernel) and ns > 0:
-            olml = self._lml
-            otheta = np.log10(self._kk.hyperparameters)
-            tlml = olml
-            theta = otheta.copy()
-            step = np.ones(theta.shape)
-            flagvec = [True] * theta.size
-            for ihyp in range(theta.size):
-                xs = self._xx.shape[1:] if self._xx.ndim > 1 else []
-                xntest = np.zeros((1, *xs), dtype=self._dtype)
-                iflag = flagvec[ihyp]
-                while iflag:
-                    tkk = copy.copy(self._kk)
-                    theta_step = np.zeros(theta.shape, dtype=self._dtype)
-                    theta_step[ihyp] = step[ihyp]
-                    theta_new = theta + theta_step
-                    tkk.hyperparameters = np.power(10.0, theta_new)
-                    ulml = None
-                    try:
-                        ulml = itemgetter(2)(self.__basic_fit(
-                            xntest,
-                            kernel=tkk,
-                            epsilon='None'
-                        ))
-                    except (ValueError, np.linalg.linalg.LinAlgError):
-                        ulml = tlml - 3.0
-                    theta_new = theta - theta_step
-                    tkk.hyperparameters = np.power(10.0, theta_new)
-                    llml = None
-                    try:
-                        llml = itemgetter(2)(self.__basic_fit(
-                            xntest,
-                            kernel=tkk,
-                            epsilon='None'
-                        ))
-                    except (ValueError, np.linalg.linalg.LinAlgError):
-                        llml = tlml - 3.0
-                    if (ulml - tlml) >= -2.0 or (llml - tlml) >= -2.0:
-                        iflag = False
-                    else:
-                        step[ihyp] = 0.5 * step[ihyp]
-                flagvec[ihyp] = iflag
-            nkk = copy.copy(self._kk)
-            for ii in range(ns):
-                theta_prop = theta.copy()
-                accept = False
-                xntest = np.zeros((1, *xs), dtype=self._dtype)
-                nlml = tlml
-                jj = 0
-                kk = 0
-                while not accept:
-                    jj = jj + 1
-                    rstep = np.random.normal(0.0, 0.5 * step)
-                    theta_prop = theta_prop + rstep
-                    nkk.hyperparameters = np.power(10.0, theta_prop)
-                    try:
-                        nlml = itemgetter(2)(self.__basic_fit(
-                            xntest,
-                            kernel=nkk,
-                            epsilon='None'
-                        ))
-                        if (nlml - tlml) > 0.0:
-                            accept = True
+        with self._fit_scope():
+            sbarM = None
+            ssigM = None
+            sdbarM = None
+            sdsigM = None
+            if isinstance(self._kk, _Kernel) and ns > 0:
+                olml = self._lml
+                otheta = np.log10(self._kk.hyperparameters)
+                tlml = olml
+                theta = otheta.copy()
+                step = np.ones(theta.shape)
+                flagvec = [True] * theta.size
+                for ihyp in range(theta.size):
+                    xs = self._xx.shape[1:] if self._xx.ndim > 1 else []
+                    xntest = np.zeros((1, *xs), dtype=self._dtype)
+                    iflag = flagvec[ihyp]
+                    while iflag:
+                        tkk = copy.copy(self._kk)
+                        theta_step = np.zeros(theta.shape, dtype=self._dtype)
+                        theta_step[ihyp] = step[ihyp]
+                        theta_new = theta + theta_step
+                        tkk.hyperparameters = np.power(10.0, theta_new)
+                        ulml = None
+                        try:
+                            ulml = itemgetter(2)(self.__basic_fit(
+                                xntest,
+                                kernel=tkk,
+                                epsilon='None'
+                            ))
+                        except (ValueError, np.linalg.linalg.LinAlgError):
+                            ulml = tlml - 3.0
+                        theta_new = theta - theta_step
+                        tkk.hyperparameters = np.power(10.0, theta_new)
+                        llml = None
+                        try:
+                            llml = itemgetter(2)(self.__basic_fit(
+                                xntest,
+                                kernel=tkk,
+                                epsilon='None'
+                            ))
+                        except (ValueError, np.linalg.linalg.LinAlgError):
+                            llml = tlml - 3.0
+                        if (ulml - tlml) >= -2.0 or (llml - tlml) >= -2.0:
+                            iflag = False
                         else:
-                            accept = True if np.power(10.0, nlml - tlml) >= np.random.uniform() else False
-                    except (ValueError, np.linalg.linalg.LinAlgError):
-                        accept = False
-                    if jj > 100:
-                        step = 0.9 * step
-                        jj = 0
-                        kk = kk + 1
-                    if kk > 100:
-                        theta_prop = otheta.copy()
-                        tlml = olml
-                        kk = 0
-                tlml = nlml
-                theta = theta_prop.copy()
-                xn = self._xF.copy()
-                nkk.hyperparameters = np.power(10.0, theta)
-                (barF, sigF, tlml, tlmlz, nkk) = self.__basic_fit(
-                    xn,
-                    kernel=nkk,
-                    epsilon='None'
-                )
-                sbarM = barF.copy() if sbarM is None else np.vstack((sbarM, barF))
-                ssigM = sigF.copy() if ssigM is None else np.vstack((ssigM, sigF))
-                (dbarF, dsigF) = itemgetter(0, 1)(self.__basic_fit(
-                    xn,
-                    kernel=nkk,
-                    epsilon='None',
-                    do_drv=True
-                ))
-                sdbarM = dbarF.copy() if sdbarM is None else np.vstack((sdbarM, dbarF))
-                sdsigM = dsigF.copy() if sdsigM is None else np.vstack((sdsigM, dsigF))
-        else:
-            raise ValueError('Check inputs to sampler to make sure they are valid.')
-
-        if not self._fwarn:
-            warnings.filterwarnings('default', category=RuntimeWarning)
+                            step[ihyp] = 0.5 * step[ihyp]
+                    flagvec[ihyp] = iflag
+                nkk = copy.copy(self._kk)
+                for ii in range(ns):
+                    theta_prop = theta.copy()
+                    accept = False
+                    xntest = np.zeros((1, *xs), dtype=self._dtype)
+                    nlml = tlml
+                    jj = 0
+                    kk = 0
+                    while not accept:
+                        jj = jj + 1
+                        rstep = np.random.normal(0.0, 0.5 * step)
+                        theta_prop = theta_prop + rstep
+                        nkk.hyperparameters = np.power(10.0, theta_prop)
+                        try:
+                            nlml = itemgetter(2)(self.__basic_fit(
+                                xntest,
+                                kernel=nkk,
+                                epsilon='None'
+                            ))
+                            if (nlml - tlml) > 0.0:
+                                accept = True
+                            else:
+                                accept = True if np.power(10.0, nlml - tlml) >= np.random.uniform() else False
+                        except (ValueError, np.linalg.linalg.LinAlgError):
+                            accept = False
+                        if jj > 100:
+                            step = 0.9 * step
+                            jj = 0
+                            kk = kk + 1
+                        if kk > 100:
+                            theta_prop = otheta.copy()
+                            tlml = olml
+                            kk = 0
+                    tlml = nlml
+                    theta = theta_prop.copy()
+                    xn = self._xF.copy()
+                    nkk.hyperparameters = np.power(10.0, theta)
+                    (barF, sigF, tlml, tlmlz, nkk) = itemgetter(0, 1, 2, 3, 4)(self.__basic_fit(
+                        xn,
+                        kernel=nkk,
+                        epsilon='None'
+                    ))
+                    sbarM = barF.copy() if sbarM is None else np.vstack((sbarM, barF))
+                    ssigM = sigF.copy() if ssigM is None else np.vstack((ssigM, sigF))
+                    (dbarF, dsigF) = itemgetter(0, 1)(self.__basic_fit(
+                        xn,
+                        kernel=nkk,
+                        epsilon='None',
+                        do_drv=True
+                    ))
+                    sdbarM = dbarF.copy() if sdbarM is None else np.vstack((sdbarM, dbarF))
+                    sdsigM = dsigF.copy() if sdsigM is None else np.vstack((sdsigM, dsigF))
+            else:
+                raise ValueError('Check inputs to sampler to make sure they are valid.')
 
         return (sbarM, ssigM, sdbarM, sdsigM)
 
@@ -0,0 +1,221 @@
+r'''
+Sampling of Gaussian Process Regression predictive distributions, factorizing the predictive covariance
+matrix once such that any number of draws only requires matrix products.
+'''
+
+# Required imports
+import numpy as np
+import scipy.linalg as spla
+
+from .definitions import number_types, default_dtype
+
+__all__ = [
+    'PosteriorSampler',  # Reusable factorized sampler of a predictive distribution
+]
+
+
+def _jittered_cholesky(cov, jitter=None, max_tries=8):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Computes the lower Cholesky factor of a covariance matrix, adding an increasing multiple of
+    the identity matrix to the diagonal whenever the matrix is not numerically positive-definite.
+
+    :arg cov: array. 2D covariance matrix.
+
+    :kwarg jitter: float. Initial diagonal addition relative to the mean diagonal element, used after the unmodified matrix fails. (optional)
+
+    :kwarg max_tries: int. Maximum number of jitter escalations, each one multiplying the jitter by ten. (optional)
+
+    :returns: (array, float).
+        Lower Cholesky factor, absolute diagonal addition which was required.
+    '''
+
+    try:
+        return (spla.cholesky(cov, lower=True, check_finite=False), 0.0)
+    except np.linalg.LinAlgError:
+        pass
+    dmean = float(np.mean(np.abs(np.diag(cov)))) if cov.shape[0] > 0 else 0.0
+    base = dmean if dmean > 0.0 else 1.0
+    eps = float(jitter) if isinstance(jitter, number_types) and float(jitter) > 0.0 else 1.0e-12
+    eye = np.eye(cov.shape[0], dtype=cov.dtype)
+    for ii in range(int(max_tries)):
+        added = eps * base
+        try:
+            return (spla.cholesky(cov + added * eye, lower=True, check_finite=False), added)
+        except np.linalg.LinAlgError:
+            eps *= 10.0
+    raise ValueError('Predictive covariance matrix could not be factorized, even with added diagonal jitter.')
+
+
+class PosteriorSampler():
+    r'''
+    Sampler of a multivariate normal predictive distribution, holding the Cholesky factor of its
+    covariance matrix. Each batch of draws is generated as :code:`mu + L @ z`, with :code:`z` drawn
+    from a seeded :code:`numpy.random.Generator`, without factorizing the covariance matrix again.
+
+    .. note::
+
+        For multi-output fits sharing a covariance matrix, the mean is given with one output per
+        column and all outputs are drawn with the same factor. Covariance matrices with the 4D
+        layout of coregionalized or multi-dimensional fits are flattened before factorization,
+        and the draws are returned in the layout of the mean.
+
+    :arg mean: array. Predicted mean values, with the prediction points along the first axis.
+
+    :arg covariance: array. Predicted covariance matrix, either 2D or in the 4D layout returned by :code:`GaussianProcess.get_gp_variance()`.
+
+    :kwarg scale: array. Multipliers applied to the deviations from the mean, same shape as :code:`mean`. (optional)
+
+    :kwarg jitter: float. Initial diagonal addition, relative to the mean variance, used if the covariance matrix is not numerically positive-definite. (optional)
+    '''
+
+    def __init__(self, mean, covariance, scale=None, jitter=None, dtype=None):
+        r'''
+        Factorizes the predictive covariance matrix.
+
+        :arg mean: array. Predicted mean values, with the prediction points along the first axis.
+
+        :arg covariance: array. Predicted covariance matrix, either 2D or in the 4D layout returned by :code:`GaussianProcess.get_gp_variance()`.
+
+        :kwarg scale: array. Multipliers applied to the deviations from the mean, same shape as :code:`mean`. (optional)
+
+        :kwarg jitter: float. Initial diagonal addition, relative to the mean variance, used if the covariance matrix is not numerically positive-definite. (optional)
+
+        :returns: none.
+        '''
+
+        self._dtype = dtype if dtype is not None else default_dtype
+        mu = np.asarray(mean, dtype=self._dtype)
+        cov = np.asarray(covariance, dtype=self._dtype)
+        self._shape = mu.shape
+        self._blocks = None
+        if cov.ndim > 2:
+            # Points and components are flattened component-major, matching the covariance layout
+            self._blocks = cov.shape[1]
+            cov = np.transpose(cov, axes=(1, 0, 2, 3)).reshape(cov.shape[0] * cov.shape[1], -1)
+        if cov.ndim != 2 or cov.shape[0] != cov.shape[1]:
+            raise ValueError('Predictive covariance matrix must be square.')
+        sc = np.broadcast_to(np.asarray(scale, dtype=self._dtype), mu.shape) if scale is not None else np.ones(mu.shape, dtype=self._dtype)
+        self._mean = self._flatten(mu, cov.shape[0])
+        self._scale = self._flatten(sc, cov.shape[0])
+        (self._LL, self._jitter) = _jittered_cholesky(cov, jitter=jitter)
+
+
+    def _flatten(self, values, npts):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Rearranges values with the layout of the mean into a matrix with the factorized points
+        along the first axis and the outputs sharing the factor along the second axis.
+
+        :arg values: array. Values with the layout of the mean.
+
+        :arg npts: int. Number of rows of the factorized covariance matrix.
+
+        :returns: array. 2D rearranged values.
+        '''
+
+        if self._blocks is not None:
+            values = np.transpose(values.reshape(values.shape[0], self._blocks)).reshape(-1, 1)
+        if values.size % npts != 0:
+            raise ValueError('Predicted mean values are inconsistent with the covariance matrix.')
+        return np.ascontiguousarray(values.reshape(npts, -1))
+
+
+    def _restore(self, draws):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Rearranges a batch of draws into the layout of the mean.
+
+        :arg draws: array. Draws with shape (samples, points, outputs).
+
+        :returns: array. Draws with the sample index along the first axis, followed by the layout of the mean.
+        '''
+
+        ns = draws.shape[0]
+        if self._blocks is not None:
+            draws = np.transpose(draws.reshape(ns, self._blocks, -1), axes=(0, 2, 1))
+        return draws.reshape(ns, *self._shape)
+
+
+    def draw(self, nsamples, seed=None):
+        r'''
+        Generates a batch of draws from the predictive distribution.
+
+        :arg nsamples: int. Number of draws.
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to generate the standard normal variates. (optional)
+
+        :returns: array. Draws with the sample index along the first axis, followed by the layout of the mean.
+        '''
+
+        if not isinstance(nsamples, number_types) or int(nsamples) <= 0:
+            raise ValueError('Number of samples must be a positive integer.')
+        ns = int(nsamples)
+        rng = np.random.default_rng(seed)
+        (npts, nout) = self._mean.shape
+        zz = rng.standard_normal((npts, ns * nout), dtype=self._dtype)
+        dev = (self._LL @ zz).reshape(npts, ns, nout).transpose(1, 0, 2)
+        dev *= self._scale
+        dev += self._mean
+        return self._restore(dev)
+
+
+    def stream(self, nsamples, chunk=1024, seed=None):
+        r'''
+        Generates draws from the predictive distribution in batches, bounding the memory required
+        for large numbers of draws.
+
+        :arg nsamples: int. Total number of draws.
+
+        :kwarg chunk: int. Maximum number of draws per batch. (optional)
+
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, shared by all batches. (optional)
+
+        :returns: generator. Yields arrays of draws, see :code:`draw()`.
+        '''
+
+        if not isinstance(nsamples, number_types) or int(nsamples) <= 0:
+            raise ValueError('Number of samples must be a positive integer.')
+        nc = int(chunk) if isinstance(chunk, number_types) and int(chunk) > 0 else 1024
+        rng = np.random.default_rng(seed)
+        remaining = int(nsamples)
+        while remaining > 0:
+            ns = min(nc, remaining)
+            yield self.draw(ns, seed=rng)
+            remaining -= ns
+
+
+    @property
+    def mean(self):
+        r'''
+        Returns the mean of the predictive distribution.
+
+        :returns: array. Predicted mean values, in the layout given at construction.
+        '''
+
+        return self._restore(self._mean[np.newaxis, ...])[0]
+
+
+    @property
+    def factor(self):
+        r'''
+        Returns the lower Cholesky factor of the predictive covariance matrix.
+
+        :returns: array. 2D lower triangular matrix.
+        '''
+
+        return self._LL
+
+
+    @property
+    def jitter(self):
+        r'''
+        Returns the diagonal addition required to factorize the predictive covariance matrix.
+
+        :returns: float. Absolute diagonal addition, zero if none was required.
+        '''
+
+        return self._jitter
@@ -0,0 +1,497 @@
+r'''
+Local prediction service for fitted Gaussian Process Regression models, coalescing concurrent requests
+from multiple client processes into batched evaluations of the stored models.
+'''
+
+# Required imports
+import os
+import time
+import queue
+import threading
+import collections
+from concurrent.futures import Future
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+
+from .definitions import number_types
+from .storage import load_model
+
+__all__ = [
+    'PredictionServer',  # Micro-batching prediction service over a local socket
+    'PredictionClient',  # Connection to a running prediction service
+]
+
+
+class PredictionServer():
+    r'''
+    Prediction service listening on a local address, either a Unix socket path or a Windows named
+    pipe, which evaluates models written by :code:`save_model()`. The models are loaded on first use
+    into a bounded least-recently-used cache, as :code:`Predictor` instances. Requests for the same
+    model arriving within the latency window are concatenated and evaluated in a single call, such
+    that the cross-covariance matrix of the whole batch is constructed at once.
+
+    .. note::
+
+        Requests are transferred as pickled objects, so the service only accepts clients presenting
+        its authentication key. A random key is generated if none is given, which is available from
+        :code:`authkey` and must be passed on to the clients. A Unix socket is additionally only
+        accessible to the owner of the service.
+
+    :arg address: str. Path of the Unix socket, or name of the Windows named pipe, to listen on.
+
+    :kwarg capacity: int. Maximum number of models held in the cache. (optional)
+
+    :kwarg window: float. Time in seconds to wait for further requests after the first request of a batch. (optional)
+
+    :kwarg max_batch: int. Maximum number of prediction points evaluated in a single batch. (optional)
+
+    :kwarg rank: int. Number of leading eigenpairs retained in the variance factor of the loaded models, see :code:`Predictor`. (optional)
+
+    :kwarg authkey: bytes. Authentication key required from the connecting clients, a random key is generated if not given. (optional)
+    '''
+
+    def __init__(self, address, capacity=8, window=2.0e-3, max_batch=4096, rank=None, authkey=None):
+        r'''
+        Initializes the service without listening on the address.
+
+        :arg address: str. Path of the Unix socket, or name of the Windows named pipe, to listen on.
+
+        :kwarg capacity: int. Maximum number of models held in the cache. (optional)
+
+        :kwarg window: float. Time in seconds to wait for further requests after the first request of a batch. (optional)
+
+        :kwarg max_batch: int. Maximum number of prediction points evaluated in a single batch. (optional)
+
+        :kwarg rank: int. Number of leading eigenpairs retained in the variance factor of the loaded models. (optional)
+
+        :kwarg authkey: bytes. Authentication key required from the connecting clients, a random key is generated if not given. (optional)
+
+        :returns: none.
+        '''
+
+        if not isinstance(address, str):
+            raise TypeError('Prediction server address must be a Unix socket path or named pipe.')
+        if authkey is not None and not isinstance(authkey, bytes):
+            raise TypeError('Prediction server authentication key must be given as bytes.')
+        self._address = address
+        self._capacity = int(capacity) if isinstance(capacity, number_types) and int(capacity) > 0 else 8
+        self._window = float(window) if isinstance(window, number_types) and float(window) >= 0.0 else 2.0e-3
+        self._max_batch = int(max_batch) if isinstance(max_batch, number_types) and int(max_batch) > 0 else 4096
+        self._rank = rank
+        self._authkey = authkey if authkey is not None else os.urandom(32)
+        self._models = collections.OrderedDict()
+        self._queue = queue.Queue()
+        self._listener = None
+        self._threads = []
+        self._connections = set()
+        self._running = threading.Event()
+        self._lock = threading.Lock()
+        self._latency = collections.deque(maxlen=4096)
+        self._counts = collections.Counter()
+        self._started = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    @property
+    def authkey(self):
+        r'''
+        Returns the authentication key required from the connecting clients.
+
+        :returns: bytes. The authentication key.
+        '''
+
+        return self._authkey
+
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+    def start(self):
+        r'''
+        Starts listening on the address and serving requests in background threads.
+
+        :returns: none.
+        '''
+
+        if self._running.is_set():
+            return
+        self._listener = Listener(self._address, authkey=self._authkey)
+        if os.path.exists(self._address):
+            # Restricts a Unix socket to the owner, named pipes are not files
+            os.chmod(self._address, 0o600)
+        self._running.set()
+        self._started = time.perf_counter()
+        for target in [self._accept_loop, self._batch_loop]:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+
+    def serve_forever(self):
+        r'''
+        Starts the service and blocks until :code:`close()` is called from another thread.
+
+        :returns: none.
+        '''
+
+        self.start()
+        while self._running.is_set():
+            time.sleep(0.1)
+
+
+    def close(self):
+        r'''
+        Stops accepting connections, fails the pending requests and closes all client connections.
+
+        :returns: none.
+        '''
+
+        with self._lock:
+            if not self._running.is_set():
+                return
+            # Requests are only queued while holding the lock, so none can follow the sentinel
+            self._running.clear()
+            self._queue.put(None)
+        try:
+            # Wakes up the blocking accept call, which then sees the cleared flag
+            Client(self._address, authkey=self._authkey).close()
+        except OSError:
+            pass
+        try:
+            self._listener.close()
+        except OSError:
+            pass
+        with self._lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        if not any(thread.is_alive() for thread in self._threads):
+            self._drain()
+        self._threads = []
+
+
+    def _accept_loop(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Accepts client connections and serves each one in its own thread.
+
+        :returns: none.
+        '''
+
+        while self._running.is_set():
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError:
+                continue
+            except (OSError, EOFError):
+                break
+            if not self._running.is_set():
+                conn.close()
+                break
+            with self._lock:
+                self._connections.add(conn)
+            threading.Thread(target=self._serve_connection, args=(conn, ), daemon=True).start()
+
+
+    def _serve_connection(self, conn):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Answers the requests of a single client connection, in order.
+
+        :arg conn: object. The :code:`multiprocessing.connection.Connection` instance of the client.
+
+        :returns: none.
+        '''
+
+        try:
+            while self._running.is_set():
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    break
+                try:
+                    reply = ('ok', self._handle(request))
+                except Exception as e:
+                    reply = ('error', f'{type(e).__name__}: {e}')
+                conn.send(reply)
+        except (OSError, BrokenPipeError):
+            pass
+        finally:
+            with self._lock:
+                self._connections.discard(conn)
+            conn.close()
+
+
+    def _handle(self, request):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Dispatches a single request, waiting for the batched evaluation of prediction requests.
+
+        :arg request: tuple. Request name followed by its arguments.
+
+        :returns: The response payload.
+        '''
+
+        if not isinstance(request, tuple) or len(request) == 0:
+            raise ValueError('Malformed request.')
+        if request[0] == 'predict' and len(request) == 3:
+            xn = np.asarray(request[2])
+            if xn.ndim < 1 or xn.shape[0] == 0:
+                raise ValueError('A valid vector of prediction x-points must be given.')
+            future = Future()
+            with self._lock:
+                if not self._running.is_set():
+                    raise ValueError('Prediction server is shutting down.')
+                self._queue.put((str(request[1]), xn, future, time.perf_counter()))
+            return future.result()
+        if request[0] == 'stats':
+            return self.stats()
+        raise ValueError(f'Unknown request {request[0]!r}.')
+
+
+    def _get_predictor(self, path):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Returns the predictor of a stored model, loading it into the cache if necessary.
+
+        :arg path: str. Path of the stored model.
+
+        :returns: object. The :code:`Predictor` instance of the model.
+        '''
+
+        with self._lock:
+            predictor = self._models.get(path)
+            if predictor is not None:
+                self._models.move_to_end(path)
+                self._counts['cache_hits'] += 1
+                return predictor
+            self._counts['cache_misses'] += 1
+        predictor = load_model(path).export_predictor(rank=self._rank)
+        with self._lock:
+            self._models[path] = predictor
+            while len(self._models) > self._capacity:
+                self._models.popitem(last=False)
+                self._counts['cache_evictions'] += 1
+        return predictor
+
+
+    def _collect(self, first):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Gathers the requests arriving within the latency window following the first request.
+
+        :arg first: tuple. The first request of the batch.
+
+        :returns: (list, bool).
+            List of pending requests, flag indicating that the service is stopping.
+        '''
+
+        pending = [first]
+        npts = first[1].shape[0]
+        stop = False
+        deadline = time.perf_counter() + self._window
+        while npts < self._max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0.0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            pending.append(item)
+            npts += item[1].shape[0]
+        return (pending, stop)
+
+
+    def _batch_loop(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates the queued requests, one concatenated batch per model.
+
+        :returns: none.
+        '''
+
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                break
+            (pending, stop) = self._collect(first)
+            groups = collections.OrderedDict()
+            for item in pending:
+                groups.setdefault(item[0], []).append(item)
+            for path, items in groups.items():
+                self._evaluate(path, items)
+        self._drain()
+
+
+    def _drain(self):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Fails all requests remaining in the queue once the service is stopping.
+
+        :returns: none.
+        '''
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and not item[2].done():
+                item[2].set_exception(ValueError('Prediction server is shutting down.'))
+
+
+    def _evaluate(self, path, items):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Evaluates all requests for a single model in one call and distributes the results.
+
+        :arg path: str. Path of the stored model.
+
+        :arg items: list. Pending requests for the model.
+
+        :returns: none.
+        '''
+
+        try:
+            predictor = self._get_predictor(path)
+            xn = np.concatenate([item[1] for item in items], axis=0)
+            (barF, errF) = predictor(xn)
+        except Exception as e:
+            for item in items:
+                item[2].set_exception(e)
+            return
+        bounds = np.cumsum([0] + [item[1].shape[0] for item in items])
+        done = time.perf_counter()
+        with self._lock:
+            self._counts['batches'] += 1
+            self._counts['requests'] += len(items)
+            self._counts['points'] += int(bounds[-1])
+            self._latency.extend([done - item[3] for item in items])
+        for ii, item in enumerate(items):
+            item[2].set_result((barF[bounds[ii]:bounds[ii+1]], errF[bounds[ii]:bounds[ii+1]]))
+
+
+    def stats(self):
+        r'''
+        Returns the throughput, latency and cache statistics of the service.
+
+        :returns: dict. Counters of requests, batches, points and cache operations, request throughput in 1/s and latency percentiles in s over the most recent requests.
+        '''
+
+        with self._lock:
+            latency = np.array(self._latency)
+            out = {key: int(self._counts[key]) for key in ['requests', 'batches', 'points', 'cache_hits', 'cache_misses', 'cache_evictions']}
+            out['models'] = list(self._models.keys())
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        out['uptime'] = elapsed
+        out['throughput'] = out['requests'] / elapsed if elapsed > 0.0 else 0.0
+        out['mean_batch_size'] = out['requests'] / out['batches'] if out['batches'] > 0 else 0.0
+        out['latency_mean'] = float(np.mean(latency)) if latency.size > 0 else None
+        out['latency_p50'] = float(np.percentile(latency, 50.0)) if latency.size > 0 else None
+        out['latency_p99'] = float(np.percentile(latency, 99.0)) if latency.size > 0 else None
+        return out
+
+
+class PredictionClient():
+    r'''
+    Connection to a :code:`PredictionServer` instance running on the same host. Each connection
+    handles one request at a time, concurrent callers should use separate connections.
+
+    :arg address: str. Path of the Unix socket, or name of the Windows named pipe, of the service.
+
+    :kwarg authkey: bytes. Authentication key expected by the service, see :code:`PredictionServer.authkey`. (optional)
+    '''
+
+    def __init__(self, address, authkey=None):
+        r'''
+        Connects to the service.
+
+        :arg address: str. Path of the Unix socket, or name of the Windows named pipe, of the service.
+
+        :kwarg authkey: bytes. Authentication key expected by the service, see :code:`PredictionServer.authkey`. (optional)
+
+        :returns: none.
+        '''
+
+        self._conn = Client(address, authkey=authkey)
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+    def _request(self, *request):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Sends a request and waits for its reply.
+
+        :arg request: Request name followed by its arguments.
+
+        :returns: The response payload.
+        '''
+
+        self._conn.send(request)
+        (status, payload) = self._conn.recv()
+        if status != 'ok':
+            raise ValueError(f'Prediction server error: {payload}')
+        return payload
+
+
+    def predict(self, model, xnew):
+        r'''
+        Evaluates a stored model at the input x-values.
+
+        :arg model: str. Path of the stored model, as written by :code:`save_model()`, as seen by the service.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :returns: (array, array).
+            Vector of predicted mean values, vector of predicted 1 sigma errors.
+        '''
+
+        return self._request('predict', os.path.abspath(model), np.asarray(xnew))
+
+
+    def stats(self):
+        r'''
+        Returns the throughput, latency and cache statistics of the service, see :code:`PredictionServer.stats()`.
+
+        :returns: dict. Service statistics.
+        '''
+
+        return self._request('stats')
+
+
+    def close(self):
+        r'''
+        Closes the connection.
+
+        :returns: none.
+        '''
+
+        self._conn.close()
@@ -143,21 +143,28 @@ class SimplifiedGaussianProcess(GaussianProcess):
         return self.get_gp_results(noise_flag=self._include_noise)
 
 
-    def sample(self, xnew, derivative=False):
+    def sample(self, xnew, derivative=False, seed=None):
         r'''
         Provides a more intuitive function for sampling the
         predictive distribution. Only provides one sample
         per call, unlike the more complex function in the
-        main class.
+        main class. The fit is only re-evaluated if the
+        x-values differ from those of the latest call, such
+        that repeated calls reuse the factorized predictive
+        covariance matrix.
 
         :arg xnew: array. Vector of x-values corresponding to points where GPR results should be evaulated at.
 
         :kwarg derivative: bool. Flag to indicate sampling of fit derivative instead of the fit. (optional)
 
+        :kwarg seed: int or object. Seed, or :code:`numpy.random.Generator` instance, used to generate the sample. (optional)
+
         :returns: array. Vector of y-values corresponding to a random sample of the GPR predictive distribution.
         '''
-        self.__call__(xnew)
+        xF = self.get_gp_x()
+        if xF is None or np.shape(xnew) != xF.shape or not np.array_equal(np.asarray(xnew), xF):
+            self.__call__(xnew)
         remove_noise = not self._include_noise
-        output = self.sample_GP(1, actual_noise=False, without_noise=remove_noise) if not derivative else self.sample_GP_derivative(1, actual_noise=False, without_noise=remove_noise)
-        return output
+        output = self.sample_GP(1, actual_noise=False, without_noise=remove_noise, seed=seed) if not derivative else self.sample_GP_derivative(1, actual_noise=False, without_noise=remove_noise, seed=seed)
+        return output[0]
 
@@ -0,0 +1,756 @@
+r'''
+Versioned binary storage of fitted Gaussian Process Regression models, allowing them to be reloaded
+and evaluated at new x-values without repeating the fit.
+'''
+
+# Required imports
+import os
+import numpy as np
+import tables
+
+from .. import __version__
+from .definitions import number_types
+from .kernels import _Kernel
+from .utils import KernelReconstructor
+from .posterior import GaussianProcessPosterior, CoregionalizedPosterior, StructuredPosterior
+from .features import FeaturePosterior
+from .routines import GaussianProcess
+from .batch import BatchGaussianProcess
+
+__all__ = [
+    'save_model',  # Write a fitted model to a .npz or HDF5 file
+    'load_model',  # Read a fitted model from a .npz or HDF5 file
+    'FitResultStore',  # Appendable HDF5 store of fit results
+]
+
+
+# Identifier and version of the model layout, incremented whenever the stored fields change incompatibly
+model_format = 'mkgp-model'
+model_version = 1
+
+_hdf5_extensions = ['.h5', '.hdf5', '.hdf']
+
+# Kernel, data, normalization and result attributes of GaussianProcess needed to predict without refitting
+_kernel_attributes = ['_kk', '_ikk', '_ekk', '_nikk', '_niekk']
+_state_attributes = [
+    '_dtype', '_lp', '_elp', '_kb', '_ekb',
+    '_xx', '_xe', '_yy', '_ye', '_dxx', '_dyy', '_dye',
+    '_gpxe', '_gpye', '_egpye', '_erms',
+    '_xF', '_xFeval', '_estF', '_barF', '_varF', '_dbarF', '_dvarF',
+    '_barE', '_varE', '_dbarE', '_dvarE', '_varN', '_dvarN',
+    '_lml', '_nulllml', '_fview', '_flazy',
+]
+_result_attributes = [
+    '_xF', '_xFeval', '_estF', '_barF', '_varF', '_dbarF', '_dvarF',
+    '_barE', '_varE', '_dbarE', '_dvarE', '_varN', '_dvarN',
+]
+_posterior_attributes = ['_post', '_epost']
+_posterior_classes = [GaussianProcessPosterior, CoregionalizedPosterior, FeaturePosterior, StructuredPosterior]
+
+# Attributes which are stored as integer arrays but used as shape tuples
+_tuple_attributes = ['_xs', '_ys']
+
+
+def _encode(value):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Converts a stored attribute into an array suitable for both storage formats.
+
+    :arg value: object. Attribute value, either an array, a scalar, a string, a shape tuple or a NumPy data type.
+
+    :returns: array. Encoded value.
+    '''
+
+    if isinstance(value, type) and issubclass(value, np.generic):
+        return np.array(np.dtype(value).str)
+    if isinstance(value, (list, tuple)):
+        return np.array(value, dtype=int)
+    return np.asarray(value)
+
+
+def _decode(name, value):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Reverts the conversion applied by :code:`_encode()`.
+
+    :arg name: str. Attribute name.
+
+    :arg value: array. Encoded value.
+
+    :returns: object. Attribute value.
+    '''
+
+    if value.dtype.kind == 'S':
+        value = value.astype(str)
+    if name == '_dtype':
+        return np.dtype(str(value)).type
+    if name in _tuple_attributes:
+        return tuple([int(v) for v in value.flatten()])
+    if value.ndim == 0:
+        return value.item()
+    return value
+
+
+def _kernel_entries(prefix, kernel):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Converts a kernel into its codename and parameter vector entries.
+
+    :arg prefix: str. Path of the kernel entries.
+
+    :arg kernel: object. The :code:`_Kernel` instance to store.
+
+    :returns: dict. Entries describing the kernel.
+    '''
+
+    pars = np.hstack((kernel.hyperparameters, kernel.constants))
+    return {prefix + '/name': np.array(kernel.name), prefix + '/pars': pars}
+
+
+def _kernel_from_entries(prefix, entries, dtype=None):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Reconstructs a kernel from its codename and parameter vector entries.
+
+    :arg prefix: str. Path of the kernel entries.
+
+    :arg entries: dict. All entries read from the model file.
+
+    :kwarg dtype: type. Floating point data type of the reconstructed kernel. (optional)
+
+    :returns: object. The reconstructed :code:`_Kernel` instance, or :code:`None` if not stored.
+    '''
+
+    if prefix + '/name' not in entries:
+        return None
+    name = _decode('name', entries[prefix + '/name'])
+    kernel = KernelReconstructor(name, pars=entries.get(prefix + '/pars'), dtype=dtype)
+    if not isinstance(kernel, _Kernel):
+        raise ValueError(f'Stored kernel codename {name!r} could not be reconstructed.')
+    return kernel
+
+
+def _collect_entries(gp):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Flattens the state of a fitted :code:`GaussianProcess` instance into named arrays.
+
+    :arg gp: object. The fitted :code:`GaussianProcess` instance.
+
+    :returns: dict. Entries keyed by their path within the model file.
+    '''
+
+    entries = {
+        'meta/format': np.array(model_format),
+        'meta/version': np.array(model_version),
+        'meta/mkgp_version': np.array(__version__),
+    }
+    for attr in _kernel_attributes:
+        kernel = getattr(gp, attr, None)
+        if isinstance(kernel, _Kernel):
+            entries.update(_kernel_entries('kernels/' + attr, kernel))
+    for attr in _state_attributes:
+        value = getattr(gp, attr, None)
+        if value is not None:
+            entries['gp/' + attr] = _encode(value)
+    for attr in _posterior_attributes:
+        post = getattr(gp, attr, None)
+        if isinstance(post, GaussianProcessPosterior):
+            prefix = 'posteriors/' + attr
+            entries[prefix + '/type'] = np.array(type(post).__name__)
+            entries.update(_kernel_entries(prefix + '/kernel', post.kernel))
+            unset = []
+            for key, value in post._get_state().items():
+                if value is not None:
+                    entries[prefix + '/state/' + key] = _encode(value)
+                else:
+                    unset.append(key)
+            if len(unset) > 0:
+                entries[prefix + '/unset'] = np.array(unset)
+    return entries
+
+
+def _write_npz(path, entries, compress):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Writes the model entries into a NumPy archive.
+
+    :arg path: str. Output file path.
+
+    :arg entries: dict. Entries keyed by their path within the model file.
+
+    :arg compress: bool. Specifies compression of the archive.
+
+    :returns: none.
+    '''
+
+    with open(path, 'wb') as ff:
+        if compress:
+            np.savez_compressed(ff, **entries)
+        else:
+            np.savez(ff, **entries)
+
+
+def _read_npz(path):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Reads the model entries from a NumPy archive.
+
+    :arg path: str. Input file path.
+
+    :returns: dict. Entries keyed by their path within the model file.
+    '''
+
+    with np.load(path, allow_pickle=False) as data:
+        return {key: data[key] for key in data.files}
+
+
+def _write_hdf5(path, entries, compress):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Writes the model entries into an HDF5 file, with one group per path component.
+
+    :arg path: str. Output file path.
+
+    :arg entries: dict. Entries keyed by their path within the model file.
+
+    :arg compress: bool. Specifies compression of the non-empty arrays.
+
+    :returns: none.
+    '''
+
+    filters = tables.Filters(complevel=5, complib='zlib') if compress else None
+    with tables.open_file(path, mode='w', title=model_format) as ff:
+        for key, value in entries.items():
+            (where, name) = ('/' + key).rsplit('/', 1)
+            where = where if where else '/'
+            data = value.astype(np.bytes_) if value.dtype.kind == 'U' else value
+            if filters is not None and data.ndim > 0 and data.size > 0:
+                ff.create_carray(where, name, obj=data, filters=filters, createparents=True)
+            else:
+                ff.create_array(where, name, obj=data, createparents=True)
+
+
+def _read_hdf5(path):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Reads the model entries from an HDF5 file.
+
+    :arg path: str. Input file path.
+
+    :returns: dict. Entries keyed by their path within the model file.
+    '''
+
+    entries = {}
+    with tables.open_file(path, mode='r') as ff:
+        for node in ff.walk_nodes('/', classname='Array'):
+            entries[node._v_pathname.lstrip('/')] = np.asarray(node.read())
+    return entries
+
+
+def _is_hdf5(path, fmt):
+    r'''
+    **INTERNAL FUNCTION** - Use main call functions!!!
+
+    Determines the storage format from the explicit selection or the file extension.
+
+    :arg path: str. File path.
+
+    :arg fmt: str. Explicit format selection, either :code:`npz` or :code:`hdf5`. (optional)
+
+    :returns: bool. True if the HDF5 format is selected.
+    '''
+
+    if isinstance(fmt, str):
+        if fmt.lower() not in ['npz', 'hdf5', 'h5']:
+            raise ValueError('Model format must be either npz or hdf5.')
+        return fmt.lower() in ['hdf5', 'h5']
+    return os.path.splitext(str(path))[1].lower() in _hdf5_extensions
+
+
+def save_model(gp, path, fmt=None, compress=False):
+    r'''
+    Writes a fitted :code:`GaussianProcess` instance into a versioned binary file, containing the
+    kernel specifications, the raw and conditioned training data, the factorized posteriors of the
+    fit and of the error model, including their normalization constants, and the results of the
+    latest :code:`GPRFit()` call.
+
+    :arg gp: object. The :code:`GaussianProcess` instance, after a successful :code:`GPRFit()` call.
+
+    :arg path: str. Output file path, the HDF5 format is selected for extensions :code:`.h5`, :code:`.hdf5` and :code:`.hdf`.
+
+    :kwarg fmt: str. Explicit format selection, either :code:`npz` or :code:`hdf5`, overrides the file extension. (optional)
+
+    :kwarg compress: bool. Specifies compression of the stored arrays, at the expense of slower reading and writing. (optional)
+
+    :returns: none.
+    '''
+
+    if not isinstance(gp, GaussianProcess):
+        raise TypeError('Model storage requires a GaussianProcess instance.')
+    if not isinstance(gp.get_gp_posterior(), GaussianProcessPosterior):
+        raise ValueError('Run GPRFit() before attempting to save the model.')
+    entries = _collect_entries(gp)
+    if _is_hdf5(path, fmt):
+        _write_hdf5(path, entries, compress)
+    else:
+        _write_npz(path, entries, compress)
+
+
+def load_model(path, fmt=None):
+    r'''
+    Reads a model written by :code:`save_model()` and returns a :code:`GaussianProcess` instance
+    which is immediately ready for :code:`predict()`, the sampling functions and the getter
+    functions, without refitting or refactorizing the training covariance matrix.
+
+    :arg path: str. Input file path, the HDF5 format is selected for extensions :code:`.h5`, :code:`.hdf5` and :code:`.hdf`.
+
+    :kwarg fmt: str. Explicit format selection, either :code:`npz` or :code:`hdf5`, overrides the file extension. (optional)
+
+    :returns: object. The restored :code:`GaussianProcess` instance.
+    '''
+
+    entries = _read_hdf5(path) if _is_hdf5(path, fmt) else _read_npz(path)
+    if 'meta/format' not in entries or _decode('format', entries['meta/format']) != model_format:
+        raise ValueError(f'File {path} does not contain a stored model.')
+    version = int(_decode('version', entries['meta/version']))
+    if version > model_version:
+        raise ValueError(f'Stored model version {version} is newer than the supported version {model_version}.')
+
+    dtype = _decode('_dtype', entries['gp/_dtype']) if 'gp/_dtype' in entries else None
+    gp = GaussianProcess(dtype=dtype)
+    for attr in _kernel_attributes:
+        setattr(gp, attr, _kernel_from_entries('kernels/' + attr, entries, dtype=dtype))
+    for attr in _state_attributes:
+        key = 'gp/' + attr
+        value = _decode(attr, entries[key]) if key in entries else None
+        setattr(gp, attr, gp._freeze(value) if attr in _result_attributes else value)
+    classes = {cls.__name__: cls for cls in _posterior_classes}
+    for attr in _posterior_attributes:
+        prefix = 'posteriors/' + attr
+        post = None
+        if prefix + '/type' in entries:
+            cname = _decode('class', entries[prefix + '/type'])
+            if cname not in classes:
+                raise ValueError(f'Stored posterior class {cname!r} is not recognized.')
+            kernel = _kernel_from_entries(prefix + '/kernel', entries, dtype=dtype)
+            spfx = prefix + '/state/'
+            state = {key[len(spfx):]: _decode(key[len(spfx):], value) for key, value in entries.items() if key.startswith(spfx)}
+            if prefix + '/unset' in entries:
+                state.update({str(key): None for key in _decode('unset', entries[prefix + '/unset']).flatten()})
+            post = classes[cname]._from_state(kernel, state)
+        setattr(gp, attr, post)
+    return gp
+
+
+class _FitIndex(tables.IsDescription):
+    r'''
+    Row layout of the index table of :code:`FitResultStore`, locating the values of each fit within the flat datasets.
+    '''
+
+    fit_id = tables.StringCol(64, pos=0)
+    start = tables.Int64Col(pos=1)
+    npts = tables.Int32Col(pos=2)
+    hstart = tables.Int64Col(pos=3)
+    nhyp = tables.Int32Col(pos=4)
+    cstart = tables.Int64Col(pos=5)
+    lml = tables.Float64Col(pos=6)
+    r2 = tables.Float64Col(pos=7)
+
+
+class FitResultStore():
+    r'''
+    Appendable HDF5 store for the results of many independent 1D fits, keyed by a fit ID. The values of
+    all fits are concatenated into chunked, compressed and extendable datasets, one per quantity, with
+    an index table locating the values of each fit. Fits are therefore appended in bulk with a single
+    write per dataset, irrespective of the number of fits, and any single fit can be read back without
+    loading the others.
+
+    .. note::
+
+        Each fit is described by its prediction x-values, mean, error, derivative mean and derivative
+        error vectors, its hyperparameters, its log-marginal-likelihood and R-squared value, and
+        optionally its full predicted covariance matrix. Fits may have different prediction x-values.
+
+    :arg path: str. Path of the HDF5 file.
+
+    :kwarg mode: str. File access mode, either :code:`r`, :code:`a` or :code:`w`. (optional)
+
+    :kwarg covariance: bool. Specifies storage of the full covariance matrices, these are omitted by default as their size grows quadratically. (optional)
+
+    :kwarg complevel: int. Compression level between 0 and 9, 0 disables compression. (optional)
+
+    :kwarg expected_fits: int. Expected number of fits in the store, used to size the chunks. (optional)
+
+    :kwarg expected_points: int. Expected number of prediction x-values per fit, used to size the chunks. (optional)
+    '''
+
+    _datasets = ['x', 'mean', 'std', 'dmean', 'dstd']
+
+    def __init__(self, path, mode='a', covariance=False, complevel=5, expected_fits=10000, expected_points=100):
+        r'''
+        Opens the HDF5 file, creating the datasets if they are not yet present.
+
+        :arg path: str. Path of the HDF5 file.
+
+        :kwarg mode: str. File access mode, either :code:`r`, :code:`a` or :code:`w`. (optional)
+
+        :kwarg covariance: bool. Specifies storage of the full covariance matrices. (optional)
+
+        :kwarg complevel: int. Compression level between 0 and 9, 0 disables compression. (optional)
+
+        :kwarg expected_fits: int. Expected number of fits in the store, used to size the chunks. (optional)
+
+        :kwarg expected_points: int. Expected number of prediction x-values per fit, used to size the chunks. (optional)
+
+        :returns: none.
+        '''
+
+        if mode not in ['r', 'a', 'w']:
+            raise ValueError('Result store mode must be one of r, a or w.')
+        self._file = tables.open_file(path, mode=mode)
+        self._fcov = True if covariance else False
+        root = self._file.root
+        if 'index' not in root:
+            if mode == 'r':
+                self._file.close()
+                raise ValueError(f'File {path} does not contain a fit result store.')
+            filters = tables.Filters(complevel=int(complevel), complib='blosc:lz4', shuffle=True) if int(complevel) > 0 else None
+            nfit = max(int(expected_fits), 1)
+            npts = max(int(expected_points), 1)
+            root._v_attrs.format = 'mkgp-results'
+            root._v_attrs.version = 1
+            self._file.create_table(root, 'index', _FitIndex, filters=filters, expectedrows=nfit)
+            for name in self._datasets:
+                self._file.create_earray(root, name, tables.Float64Atom(), shape=(0, ), filters=filters, expectedrows=nfit * npts)
+            self._file.create_earray(root, 'hyperparameters', tables.Float64Atom(), shape=(0, ), filters=filters, expectedrows=nfit * 4)
+            self._file.create_earray(root, 'covariance', tables.Float64Atom(), shape=(0, ), filters=filters, expectedrows=nfit * npts * npts if self._fcov else nfit)
+        self._index = self._file.root.index
+        fit_ids = self._index.col('fit_id') if self._index.nrows > 0 else []
+        self._rows = {fid.decode(): ii for ii, fid in enumerate(fit_ids)}
+
+
+    def __enter__(self):
+        r'''
+        Enables use as a context manager, closing the file on exit.
+        '''
+
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        r'''
+        Closes the file when leaving the context.
+        '''
+
+        self.close()
+
+
+    def __len__(self):
+        r'''
+        Returns the number of stored fits.
+        '''
+
+        return len(self._rows)
+
+
+    def __contains__(self, fit_id):
+        r'''
+        Checks whether a fit ID is present in the store.
+        '''
+
+        return str(fit_id) in self._rows
+
+
+    @property
+    def fit_ids(self):
+        r'''
+        Returns the IDs of all stored fits, in order of insertion.
+
+        :returns: list. Fit IDs.
+        '''
+
+        return sorted(self._rows, key=self._rows.get)
+
+
+    def flush(self):
+        r'''
+        Writes any buffered data to disk.
+
+        :returns: none.
+        '''
+
+        self._file.flush()
+
+
+    def close(self):
+        r'''
+        Writes any buffered data to disk and closes the HDF5 file.
+
+        :returns: none.
+        '''
+
+        if self._file.isopen:
+            self._file.close()
+
+
+    def append_many(self, fit_ids, x, mean, std, dmean, dstd, hyperparameters=None, lml=None, r2=None, covariance=None):
+        r'''
+        Appends the results of multiple fits with a single write per dataset.
+
+        :arg fit_ids: list. Unique IDs of the fits, converted to strings of at most 64 characters.
+
+        :arg x: list or array. Prediction x-values of each fit, or a single vector shared by all fits.
+
+        :arg mean: list or array. Predicted y-values of each fit, with one fit per row if given as a matrix.
+
+        :arg std: list or array. Predicted y-errors of each fit, same layout as :code:`mean`.
+
+        :arg dmean: list or array. Predicted dy/dx-values of each fit, same layout as :code:`mean`.
+
+        :arg dstd: list or array. Predicted dy/dx-errors of each fit, same layout as :code:`mean`.
+
+        :kwarg hyperparameters: list or array. Hyperparameters of each fit, with one fit per row if given as a matrix. (optional)
+
+        :kwarg lml: array. Log-marginal-likelihood of each fit. (optional)
+
+        :kwarg r2: array. R-squared value of each fit. (optional)
+
+        :kwarg covariance: list or array. Predicted covariance matrix of each fit, ignored unless covariance storage was requested. (optional)
+
+        :returns: none.
+        '''
+
+        ids = [str(fid) for fid in fit_ids]
+        nfit = len(ids)
+        if nfit == 0:
+            return
+        if len(set(ids)) != nfit or any([fid in self._rows for fid in ids]):
+            raise ValueError('Fit IDs must be unique within the result store.')
+        if any([len(fid.encode()) > 64 for fid in ids]):
+            raise ValueError('Fit IDs must not exceed 64 characters.')
+        shared = isinstance(x, np.ndarray) and x.ndim == 1
+        xlist = [np.asarray(x, dtype=np.float64)] * nfit if shared else [np.asarray(xx, dtype=np.float64).flatten() for xx in x]
+        values = [[np.asarray(vv, dtype=np.float64).flatten() for vv in val] for val in [mean, std, dmean, dstd]]
+        if len(xlist) != nfit or any([len(val) != nfit for val in values]):
+            raise ValueError('Result vectors must be given for every fit ID.')
+        npts = np.array([xx.size for xx in xlist], dtype=np.int64)
+        for val in values:
+            if not np.all(np.array([vv.size for vv in val]) == npts):
+                raise ValueError('Result vectors must have the same length as the corresponding x-values.')
+        hyps = [np.asarray(hh, dtype=np.float64).flatten() for hh in hyperparameters] if hyperparameters is not None else [np.zeros((0, ))] * nfit
+        nhyp = np.array([hh.size for hh in hyps], dtype=np.int64)
+        covs = None
+        ncov = np.zeros((nfit, ), dtype=np.int64)
+        if self._fcov and covariance is not None:
+            covs = [np.asarray(cc, dtype=np.float64).flatten() for cc in covariance]
+            ncov = np.array([cc.size for cc in covs], dtype=np.int64)
+            if not np.all(ncov == npts ** 2):
+                raise ValueError('Covariance matrices must be square with the same size as the corresponding x-values.')
+
+        start = self._file.root.x.nrows + np.concatenate(([0], np.cumsum(npts)[:-1]))
+        hstart = self._file.root.hyperparameters.nrows + np.concatenate(([0], np.cumsum(nhyp)[:-1]))
+        cstart = self._file.root.covariance.nrows + np.concatenate(([0], np.cumsum(ncov)[:-1])) if covs is not None else np.full((nfit, ), -1, dtype=np.int64)
+        rows = np.zeros((nfit, ), dtype=self._index.dtype)
+        rows['fit_id'] = [fid.encode() for fid in ids]
+        rows['start'] = start
+        rows['npts'] = npts
+        rows['hstart'] = hstart
+        rows['nhyp'] = nhyp
+        rows['cstart'] = cstart
+        rows['lml'] = np.asarray(lml, dtype=np.float64) if lml is not None else np.nan
+        rows['r2'] = np.asarray(r2, dtype=np.float64) if r2 is not None else np.nan
+
+        self._file.root.x.append(np.concatenate(xlist))
+        for name, val in zip(self._datasets[1:], values):
+            getattr(self._file.root, name).append(np.concatenate(val))
+        if np.sum(nhyp) > 0:
+            self._file.root.hyperparameters.append(np.concatenate(hyps))
+        if covs is not None:
+            self._file.root.covariance.append(np.concatenate(covs))
+        nrow = self._index.nrows
+        self._index.append(rows)
+        self._rows.update({fid: nrow + ii for ii, fid in enumerate(ids)})
+
+
+    def append(self, fit_id, x, mean, std, dmean, dstd, hyperparameters=None, lml=None, r2=None, covariance=None):
+        r'''
+        Appends the results of a single fit, see :code:`append_many()`.
+
+        :arg fit_id: str. Unique ID of the fit.
+
+        :arg x: array. Vector of prediction x-values.
+
+        :arg mean: array. Vector of predicted y-values.
+
+        :arg std: array. Vector of predicted y-errors.
+
+        :arg dmean: array. Vector of predicted dy/dx-values.
+
+        :arg dstd: array. Vector of predicted dy/dx-errors.
+
+        :kwarg hyperparameters: array. Vector of hyperparameters. (optional)
+
+        :kwarg lml: float. Log-marginal-likelihood. (optional)
+
+        :kwarg r2: float. R-squared value. (optional)
+
+        :kwarg covariance: array. Predicted covariance matrix, ignored unless covariance storage was requested. (optional)
+
+        :returns: none.
+        '''
+
+        self.append_many(
+            [fit_id],
+            [x],
+            [mean],
+            [std],
+            [dmean],
+            [dstd],
+            hyperparameters=[hyperparameters] if hyperparameters is not None else None,
+            lml=[lml if lml is not None else np.nan],
+            r2=[r2 if r2 is not None else np.nan],
+            covariance=[covariance] if covariance is not None else None
+        )
+
+
+    def append_fit(self, fit_id, gp):
+        r'''
+        Appends the results of the latest :code:`GPRFit()` call of a single :code:`GaussianProcess` instance.
+
+        :arg fit_id: str. Unique ID of the fit.
+
+        :arg gp: object. The fitted :code:`GaussianProcess` instance.
+
+        :returns: none.
+        '''
+
+        if not isinstance(gp, GaussianProcess):
+            raise TypeError('Fit results must be taken from a GaussianProcess instance.')
+        (mean, std, dmean, dstd) = gp.get_gp_results()
+        kernel = gp.get_gp_kernel()
+        self.append(
+            fit_id,
+            gp.get_gp_x(),
+            mean,
+            std,
+            dmean,
+            dstd,
+            hyperparameters=kernel.hyperparameters if isinstance(kernel, _Kernel) else None,
+            lml=gp.get_gp_lml(),
+            r2=gp.get_gp_r2(),
+            covariance=gp.get_gp_variance() if self._fcov else None
+        )
+
+
+    def append_batch(self, fit_ids, batch):
+        r'''
+        Appends the results of all problems of a fitted :code:`BatchGaussianProcess` instance.
+
+        :arg fit_ids: list. Unique IDs of the fits, one per problem in the batch.
+
+        :arg batch: object. The fitted :code:`BatchGaussianProcess` instance.
+
+        :returns: none.
+        '''
+
+        if not isinstance(batch, BatchGaussianProcess):
+            raise TypeError('Batch results must be taken from a BatchGaussianProcess instance.')
+        (mean, std, dmean, dstd) = batch.get_gp_results()
+        if mean is None:
+            raise ValueError('Run GPRFit() before storing the batch results.')
+        self.append_many(fit_ids, batch.get_gp_x(), mean, std, dmean, dstd, hyperparameters=batch.get_gp_hyperparameters(), lml=batch.get_gp_lml())
+
+
+    def append_records(self, records):
+        r'''
+        Appends the successful records yielded by :code:`run_fits()`, keyed by their :code:`key` entry.
+        Error records are skipped.
+
+        :arg records: iterable. Result records, as yielded by :code:`run_fits()`.
+
+        :returns: list. Error records which were not stored.
+        '''
+
+        failed = []
+        ids = []
+        outputs = [[], [], [], [], [], [], []]
+        for record in records:
+            if record.get('status') != 'ok':
+                failed.append(record)
+                continue
+            ids.append(record['key'])
+            outputs[0].append(record['x'])
+            for jj in range(4):
+                outputs[jj + 1].append(record['results'][jj])
+            outputs[5].append(record['kernel'][1] if record['kernel'][1] is not None else np.zeros((0, )))
+            outputs[6].append(record['lml'])
+        self.append_many(ids, outputs[0], outputs[1], outputs[2], outputs[3], outputs[4], hyperparameters=outputs[5], lml=outputs[6])
+        return failed
+
+
+    def read(self, fit_id, xmin=None, xmax=None):
+        r'''
+        Reads the results of a single fit, optionally restricted to a range of x-values.
+
+        :arg fit_id: str. ID of the fit.
+
+        :kwarg xmin: float. Lower bound of the returned x-values. (optional)
+
+        :kwarg xmax: float. Upper bound of the returned x-values. (optional)
+
+        :returns: dict. Entries :code:`x`, :code:`mean`, :code:`std`, :code:`dmean`, :code:`dstd`, :code:`hyperparameters`, :code:`lml`, :code:`r2` and :code:`covariance`, the latter being :code:`None` if not stored.
+        '''
+
+        fid = str(fit_id)
+        if fid not in self._rows:
+            raise KeyError(f'Fit ID {fid} not found in result store.')
+        row = self._index[self._rows[fid]]
+        (start, npts) = (int(row['start']), int(row['npts']))
+        xx = self._file.root.x.read(start, start + npts)
+        filt = np.full(xx.shape, True)
+        if isinstance(xmin, number_types):
+            filt &= (xx >= float(xmin))
+        if isinstance(xmax, number_types):
+            filt &= (xx <= float(xmax))
+        sel = np.where(filt)[0]
+        (lo, hi) = (int(sel[0]), int(sel[-1]) + 1) if sel.size > 0 else (0, 0)
+        out = {'x': xx[lo:hi][filt[lo:hi]]}
+        for name in self._datasets[1:]:
+            out[name] = getattr(self._file.root, name).read(start + lo, start + hi)[filt[lo:hi]]
+        (hstart, nhyp) = (int(row['hstart']), int(row['nhyp']))
+        out['hyperparameters'] = self._file.root.hyperparameters.read(hstart, hstart + nhyp)
+        out['lml'] = float(row['lml'])
+        out['r2'] = float(row['r2'])
+        out['covariance'] = None
+        if int(row['cstart']) >= 0:
+            cstart = int(row['cstart'])
+            cov = self._file.root.covariance.read(cstart, cstart + npts * npts).reshape(npts, npts)
+            out['covariance'] = cov[np.ix_(sel, sel)]
+        return out
+
+
+    def read_many(self, fit_ids=None, xmin=None, xmax=None):
+        r'''
+        Reads the results of multiple fits, see :code:`read()`.
+
+        :kwarg fit_ids: list. IDs of the fits, defaults to all stored fits. (optional)
+
+        :kwarg xmin: float. Lower bound of the returned x-values. (optional)
+
+        :kwarg xmax: float. Upper bound of the returned x-values. (optional)
+
+        :returns: dict. Results of each fit, keyed by fit ID.
+        '''
+
+        ids = self.fit_ids if fit_ids is None else [str(fid) for fid in fit_ids]
+        return {fid: self.read(fid, xmin=xmin, xmax=xmax) for fid in ids}
@@ -0,0 +1,167 @@
+r'''
+Sweeps of the y-error scale and of the regularization parameter of a fitted Gaussian Process Regression
+model, built on a single eigendecomposition of the whitened training covariance matrix.
+'''
+
+# Required imports
+import numpy as np
+import scipy.linalg as spla
+
+from .definitions import number_types, array_types
+from .posterior import GaussianProcessPosterior, CoregionalizedPosterior
+from .features import FeaturePosterior
+
+__all__ = [
+    'NoiseSweep',  # Evaluator of fits over many y-error scales and regularization parameters
+]
+
+
+class NoiseSweep():
+    r'''
+    Evaluator of the log-marginal-likelihood, predictions and leave-one-out metrics of a fitted
+    model, for any number of multipliers on its y-errors and of regularization parameters. The
+    noise-free training covariance matrix, whitened by the y-errors, is eigendecomposed once as
+    :code:`E^(-1/2) K E^(-1/2) = Q L Q^T`, such that :code:`K + c^2 E` is inverted for any scale
+    :code:`c` by rescaling the eigenvalues. Each scale then costs O(N) for the log-marginal-likelihood
+    and O(N^2) for the predictions and leave-one-out metrics, instead of a new factorization.
+
+    .. note::
+
+        The regularization parameter only enters the log-marginal-likelihood. With homoscedastic
+        errors, a scale :code:`c` corresponds to the noise variance :code:`(c * ye)^2`. All y-errors
+        must be strictly positive and the x-values must be 1-dimensional.
+
+    :arg posterior: object. The :code:`GaussianProcessPosterior` instance of the fit.
+    '''
+
+    def __init__(self, posterior):
+        r'''
+        Eigendecomposes the whitened training covariance matrix of the fit.
+
+        :arg posterior: object. The :code:`GaussianProcessPosterior` instance of the fit.
+
+        :returns: none.
+        '''
+
+        if not isinstance(posterior, GaussianProcessPosterior) or isinstance(posterior, (CoregionalizedPosterior, FeaturePosterior)):
+            raise TypeError('Noise sweeps require an exact single-kernel GaussianProcessPosterior instance.')
+        if posterior._xx.ndim != 1:
+            raise ValueError('Noise sweeps are only available for 1-dimensional x-values.')
+        yef = posterior._yef
+        if not np.all(yef > 0.0):
+            raise ValueError('Noise sweeps require strictly positive y-errors.')
+        self._post = posterior
+        self._dtype = posterior._dtype
+        ww = 1.0 / yef
+        kw = posterior.training_covariance() * np.outer(ww, ww)
+        (ev, QQ) = spla.eigh(kw, check_finite=False)
+        self._ev = np.clip(ev, 0.0, None)
+        self._WQ = ww[:, np.newaxis] * QQ
+        self._yt = np.tensordot(self._WQ.T, posterior._yf, axes=(-1, 0)).reshape(ev.size, -1)
+        self._ldete = 2.0 * np.sum(np.log(yef))
+
+
+    def _check_scales(self, scales):
+        r'''
+        **INTERNAL FUNCTION** - Use main call functions!!!
+
+        Converts and checks the y-error multipliers, and computes the corresponding eigenvalues of the
+        whitened training covariance matrix including y-errors.
+
+        :arg scales: float or array. Multipliers applied to the y-errors.
+
+        :returns: (array, array).
+            Vector of y-error multipliers, matrix of shifted eigenvalues with one row per multiplier.
+        '''
+
+        if not isinstance(scales, (number_types, array_types)):
+            raise ValueError('Y-error scales must be given as a number or a vector of numbers.')
+        sc = np.atleast_1d(np.asarray(scales, dtype=self._dtype)).flatten()
+        if sc.size == 0 or not np.all(sc > 0.0):
+            raise ValueError('Y-error scales must be strictly positive.')
+        return (sc, self._ev[np.newaxis, :] + np.power(sc, 2.0)[:, np.newaxis])
+
+
+    def lml(self, scales, regpar=None):
+        r'''
+        Evaluates the log-marginal-likelihood for each combination of y-error multiplier and regularization parameter.
+
+        :arg scales: float or array. Multipliers applied to the y-errors.
+
+        :kwarg regpar: float or array. Regularization parameters, the one of the fit is used if not given. (optional)
+
+        :returns: array. Log-marginal-likelihood values with the multipliers along the first axis and the regularization parameters along the second axis.
+        '''
+
+        (sc, den) = self._check_scales(scales)
+        lp = np.atleast_1d(np.asarray(regpar if regpar is not None else self._post._lp, dtype=self._dtype)).flatten()
+        if lp.size == 0 or not np.all(lp > 0.0):
+            raise ValueError('Regularization parameters must be strictly positive.')
+        post = self._post
+        fit = np.sum(np.sum(np.power(self._yt, 2.0), axis=-1)[np.newaxis, :] / den, axis=-1)
+        ldet = np.sum(np.log(den), axis=-1) + self._ldete
+        lml = -0.5 * fit[:, np.newaxis] - 0.5 * post._nout * np.outer(ldet, lp) - 0.5 * post._nout * post._xf.size * np.log(2.0 * np.pi)
+        return lml
+
+
+    def predict(self, xnew, scales, der=0):
+        r'''
+        Evaluates the posterior distribution at the input x-values for each y-error multiplier, in the original units of the data.
+
+        :arg xnew: array. Vector of x-values at which the fit will be evaluated.
+
+        :arg scales: float or array. Multipliers applied to the y-errors.
+
+        :kwarg der: int. Derivative order of output prediction, only 0 and 1 are supported. (optional)
+
+        :returns: (array, array).
+            Predicted mean values and predicted 1 sigma errors of the latent function, with the multipliers along the first axis and the x-values along the second axis.
+        '''
+
+        post = self._post
+        xn = post._check_input(xnew)
+        dd = 1 if int(der) > 0 else 0
+        (sc, den) = self._check_scales(scales)
+        ks = post.cross_covariance(xn, dd)
+        kt = np.diag(post._kk(xn, xn, der=2*dd))
+        kq = self._WQ.T @ ks
+        barF = np.einsum('nm,snk->smk', kq, self._yt[np.newaxis, :, :] / den[:, :, np.newaxis])
+        varF = kt[np.newaxis, :] - (1.0 / den) @ np.power(kq, 2.0)
+        barF = barF.reshape(sc.size, xn.shape[0], *post._yf.shape[1:]) * post._sc
+        if dd == 0:
+            barF += post._myy
+        return (barF, np.sqrt(np.clip(varF, 0.0, None)) * post._sc)
+
+
+    def cross_validate(self, scales):
+        r'''
+        Evaluates the leave-one-out predictive distributions of the training data for each y-error multiplier,
+        in the original units of the data, see :code:`GaussianProcessPosterior.cross_validate()`.
+
+        :arg scales: float or array. Multipliers applied to the y-errors.
+
+        :returns: (array, array, array).
+            Held-out predictive mean values, held-out predictive 1 sigma errors including the y-errors,
+            log predictive densities of each data point, with the multipliers along the first axis.
+        '''
+
+        post = self._post
+        (sc, den) = self._check_scales(scales)
+        kd = (1.0 / den) @ np.power(self._WQ, 2.0).T
+        alpha = np.einsum('nj,sjk->snk', self._WQ, self._yt[np.newaxis, :, :] / den[:, :, np.newaxis])
+        corr = alpha / kd[:, :, np.newaxis]
+        logp = -0.5 * np.sum(alpha * corr, axis=-1) + 0.5 * post._nout * np.log(kd) - 0.5 * post._nout * np.log(2.0 * np.pi * post._sc ** 2.0)
+        barF = (post._yf[np.newaxis, ...] - corr.reshape(sc.size, *post._yf.shape)) * post._sc
+        barF[:, np.invert(post._derivative_rows())] += post._myy
+        return (barF, np.sqrt(1.0 / kd) * post._sc, logp)
+
+
+    @property
+    def eigenvalues(self):
+        r'''
+        Returns the eigenvalues of the training covariance matrix whitened by the y-errors.
+
+        :returns: array. Vector of eigenvalues in ascending order.
+        '''
+
+        return self._ev
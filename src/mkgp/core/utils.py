@@ -18,11 +18,13 @@ from .kernels import (
     Matern_HI_Kernel,
     NN_Kernel,
     Gibbs_Kernel,
+    Coregion_Kernel,
     Sum_Kernel,
     Product_Kernel,
     Symmetric_Kernel,
     ND_Sum_Kernel,
     ND_Product_Kernel,
+    ICM_Kernel,
     Constant_WarpingFunction,
     Linear_WarpingFunction,
     IG_WarpingFunction,
@@ -30,6 +32,8 @@ from .kernels import (
 
 __all__ = [
     'KernelConstructor', 'KernelReconstructor',  # Kernel construction functions
+    'StructuredCovariance',  # Covariance matrix container
+    'readonly_array', 'is_dataset',  # Data ingestion functions
 ]
 
 
@@ -76,6 +80,8 @@ def KernelConstructor(name, dtype=None):
                 kernel = ND_Sum_Kernel(klist=kklist, dtype=dtype)
             elif re.search(r'^NProd$', m.group(1)):
                 kernel = ND_Product_Kernel(klist=kklist, dtype=dtype)
+            elif re.search(r'^ICM$', m.group(1)):
+                kernel = ICM_Kernel(klist=kklist, dtype=dtype)
         else:
             if re.search(r'^C$', name):
                 kernel = Constant_Kernel(dtype=dtype)
@@ -93,6 +99,8 @@ def KernelConstructor(name, dtype=None):
                 kernel = Matern_HI_Kernel(dtype=dtype)
             elif re.search(r'^NN$', name):
                 kernel = NN_Kernel(dtype=dtype)
+            elif re.search(r'^CR[0-9]+$', name):
+                kernel = Coregion_Kernel(int(name[2:]), dtype=dtype)
             elif re.search(r'^Gw', name):
                 wname = re.search(r'^Gw(.*)$', name).group(1)
                 wfunc = None
@@ -143,6 +151,45 @@ def KernelReconstructor(name, pars=None, dtype=None):
     return kernel
 
 
+def is_dataset(data):
+    r'''
+    Function to identify on-disk array datasets, such as PyTables arrays, which expose
+    their contents through a :code:`read()` method instead of the buffer protocol.
+
+    :arg data: object. The object to check.
+
+    :returns: bool. True if the object is a readable array dataset.
+    '''
+
+    return (not isinstance(data, np.ndarray)) and hasattr(data, 'read') and hasattr(data, 'shape') and hasattr(data, 'dtype')
+
+
+def readonly_array(data, dtype=None):
+    r'''
+    Function to convert input data into a read-only array. Data which is already a C-contiguous
+    array of the requested type is only shared without copying if it is an :code:`np.memmap`
+    instance or a read-only array, such that memory-mapped data remains backed by the mapped
+    file and is shared with other processes through the page cache. Writable in-memory arrays
+    are copied, as the caller could otherwise modify the stored data afterwards. On-disk
+    datasets are read into memory once.
+
+    :arg data: array. The input data, as an array, memory map, list, tuple or on-disk dataset.
+
+    :returns: array. Read-only view of memory-mapped or read-only data, otherwise a read-only copy of the data.
+    '''
+
+    dt = dtype if dtype is not None else default_dtype
+    if is_dataset(data):
+        data = data.read()
+    arr = np.require(data, dtype=dt, requirements=['C'])
+    shared = isinstance(data, np.ndarray) and np.shares_memory(arr, data)
+    if shared and data.flags.writeable and not isinstance(data, np.memmap):
+        arr = arr.copy()
+    arr = arr.view(np.ndarray)
+    arr.flags.writeable = False
+    return arr
+
+
 def diagonal(matrix, dtype=None):
     r'''
     Function to compute diagonal of N x [D x ...] x N matrix.
@@ -153,16 +200,14 @@ def diagonal(matrix, dtype=None):
     mat = None
     diag = None
     if isinstance(matrix, array_types):
-        mat = np.array(matrix, dtype=dt)
+        mat = np.asarray(matrix, dtype=dt)
     if mat is not None and mat.ndim > 1 and mat.shape[0] == mat.shape[-1]:
-        if mat.ndim > 2:
-            diag = np.zeros((mat.shape[0], mat.shape[1]), dtype=dt)
-            for ii in range(mat.shape[0]):
-                for jj in range(mat.shape[1]):
-                    index = [jj] * (mat.ndim - 2)
-                    diag[ii, jj] = mat[(ii, *index, ii)]
-        else:
-            diag = np.diag(mat)
+        # Repeated einsum indices return a strided view, no copy or loops required
+        inner = 'j' * (mat.ndim - 2)
+        target = 'ij' if mat.ndim > 2 else 'i'
+        diag = np.einsum('i' + inner + 'i->' + target, mat)
+        if diag.base is not None:
+            diag.setflags(write=False)
     return diag
 
 
@@ -183,17 +228,154 @@ def diagonalize(diagonal, full=True, dtype=None):
             ndim = len(half_shape)
             dshape = half_shape + half_shape[::-1]
             mat = np.zeros((diag.shape[0], *dshape, diag.shape[0]), dtype=dt)
-            for ii in range(mat.shape[0]):
-                for jj in range(mat.shape[1]):
-                    element = [jj] * (2 * ndim)
-                    mat[(ii, *element, ii)] = diag[ii, jj]
+            ii = np.arange(diag.shape[0])[:, np.newaxis]
+            jj = np.arange(diag.shape[1])[np.newaxis, :]
+            mat[(ii, *([jj] * (2 * ndim)), ii)] = diag
         elif diag.ndim == 1:
-            if full:
-                dshape = [diag.shape[0]] + [diag.shape[0]]
-                mat = np.zeros(dshape, dtype=dt)
-                for ii in range(mat.shape[0]):
-                    element = [ii] * mat.shape[0]
-                    mat[(..., *element)] = diag[ii]
-            else:
-                mat = np.diag(diag)
+            mat = np.diag(diag)
     return mat
+
+
+class StructuredCovariance():
+    r'''
+    Container for N x [D x D] x N covariance matrices composed of a dense
+    part, a diagonal part and a low-rank part, only constructing the full
+    dense matrix when explicitly requested.
+
+    :kwarg dense: array. Dense N x [D x D] x N covariance component, stored by reference. (optional)
+
+    :kwarg diag: array. Vector (N) or matrix (N x D) of diagonal covariance components, ie. noise variances. (optional)
+
+    :kwarg factors: array. Low-rank factor matrix U of shape N x [D x] R, contributing U U^T to the covariance. (optional)
+
+    :kwarg dtype: dtype. Floating point data type of the output arrays.
+    '''
+
+    def __init__(self, dense=None, diag=None, factors=None, dtype=None):
+        r'''
+        Checks the consistency of the covariance components, which are stored without constructing the dense matrix.
+
+        :kwarg dense: array. Dense N x [D x D] x N covariance component, stored by reference. (optional)
+
+        :kwarg diag: array. Vector (N) or matrix (N x D) of diagonal covariance components, ie. noise variances. (optional)
+
+        :kwarg factors: array. Low-rank factor matrix U of shape N x [D x] R, contributing U U^T to the covariance. (optional)
+
+        :kwarg dtype: dtype. Floating point data type of the output arrays.
+
+        :returns: none.
+        '''
+
+        self._dtype = dtype if dtype is not None else default_dtype
+        self._dense = np.asarray(dense, dtype=self._dtype) if dense is not None else None
+        self._diag = np.asarray(diag, dtype=self._dtype) if diag is not None else None
+        self._factors = np.asarray(factors, dtype=self._dtype) if factors is not None else None
+        dshape = None
+        if self._dense is not None:
+            if self._dense.ndim not in [2, 4] or self._dense.shape[0] != self._dense.shape[-1]:
+                raise ValueError('Dense covariance component must be an N x N or N x D x D x N matrix.')
+            dshape = self._dense.shape[:-1] if self._dense.ndim == 2 else self._dense.shape[:2]
+        elif self._diag is not None:
+            dshape = self._diag.shape
+        elif self._factors is not None:
+            dshape = self._factors.shape[:-1]
+        if dshape is None:
+            raise ValueError('At least one covariance component must be provided.')
+        if self._diag is not None:
+            if self._diag.size != int(np.prod(dshape)):
+                raise ValueError('Diagonal covariance component does not match size of covariance matrix.')
+            self._diag = self._diag.reshape(dshape)
+        if self._factors is not None and self._factors.shape[:-1] != tuple(dshape):
+            raise ValueError('Low-rank covariance factors do not match size of covariance matrix.')
+        self._dshape = tuple(dshape)
+
+
+    @property
+    def shape(self):
+        r'''
+        Returns the shape of the covariance matrix represented by the components.
+
+        :returns: tuple. (N, N) or (N, D, D, N) shape of the dense covariance matrix.
+        '''
+
+        dshape = self._dshape
+        return (dshape[0], dshape[1], dshape[1], dshape[0]) if len(dshape) > 1 else (dshape[0], dshape[0])
+
+
+    @property
+    def ndim(self):
+        r'''
+        Returns the number of dimensions of the covariance matrix represented by the components.
+
+        :returns: int. Number of dimensions of the dense covariance matrix.
+        '''
+
+        return len(self.shape)
+
+
+    @property
+    def dtype(self):
+        r'''
+        Returns the floating point data type of the output arrays.
+
+        :returns: dtype. Data type of the dense covariance matrix.
+        '''
+
+        return np.dtype(self._dtype)
+
+
+    def diagonal(self):
+        r'''
+        Computes the diagonal of the covariance matrix without constructing
+        the dense matrix, scaling linearly with the number of points.
+
+        :returns: array. Vector (N) or matrix (N x D) containing the diagonal elements of the covariance matrix.
+        '''
+
+        diag = np.zeros(self._dshape, dtype=self._dtype)
+        if self._dense is not None:
+            diag += diagonal(self._dense, dtype=self._dtype)
+        if self._diag is not None:
+            diag += self._diag
+        if self._factors is not None:
+            diag += np.sum(np.power(self._factors, 2.0), axis=-1)
+        return diag
+
+
+    def todense(self):
+        r'''
+        Constructs the full dense covariance matrix from its components.
+
+        :returns: array. N x N or N x D x D x N covariance matrix, as a newly allocated array.
+        '''
+
+        mat = self._dense.copy() if self._dense is not None else np.zeros(self.shape, dtype=self._dtype)
+        if self._diag is not None:
+            ii = np.arange(self._dshape[0])
+            if len(self._dshape) > 1:
+                ii = ii[:, np.newaxis]
+                jj = np.arange(self._dshape[1])[np.newaxis, :]
+                mat[ii, jj, jj, ii] += self._diag
+            else:
+                mat[ii, ii] += self._diag
+        if self._factors is not None:
+            if self._factors.ndim > 2:
+                mat += np.einsum('iar,jbr->iabj', self._factors, self._factors)
+            else:
+                mat += np.dot(self._factors, self._factors.T)
+        return mat
+
+
+    def __array__(self, dtype=None, copy=None):
+        r'''
+        Constructs the full dense covariance matrix on conversion with :code:`np.asarray()`.
+
+        :kwarg dtype: dtype. Data type of the returned array, the stored data type is used if not given. (optional)
+
+        :kwarg copy: bool. Copy flag of the NumPy array protocol, a new array is always returned. (optional)
+
+        :returns: array. N x N or N x D x D x N covariance matrix.
+        '''
+
+        mat = self.todense()
+        return mat.astype(dtype, copy=False) if dtype is not None else mat
@@ -20,6 +20,8 @@ from mkgp.core.kernels import (
     Product_Kernel,
     ND_Sum_Kernel,
     ND_Product_Kernel,
+    ICM_Kernel,
+    Coregion_Kernel,
     Constant_WarpingFunction,
     Linear_WarpingFunction,
     IG_WarpingFunction,
@@ -96,6 +98,14 @@ def sum_kernel(se_kernel,noise_kernel):
 def product_kernel(linear_kernel):
     return Product_Kernel(linear_kernel, linear_kernel)
 
+@pytest.fixture(scope='module')
+def coregion_kernel():
+    return Coregion_Kernel(2, [1.0, 2.0], [np.pi / 3.0])
+
+@pytest.fixture(scope='module')
+def icm_kernel(se_kernel,coregion_kernel):
+    return ICM_Kernel(se_kernel, coregion_kernel)
+
 @pytest.fixture(scope='module')
 def linear_test_data():
     # Made to follow y = 1.9 * x with x_error = N(0,0.02) and y_error = N(0,0.2)
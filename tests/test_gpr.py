@@ -1,8 +1,26 @@
 #!/usr/bin/env python
 
+import os
 import pytest
+import copy
+import pickle
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import AuthenticationError
 import numpy as np
+import pandas as pd
 from operator import itemgetter
+from mkgp.core.routines import GaussianProcess
+from mkgp.core.asynchronous import set_async_executor
+from mkgp.core.batch import BatchGaussianProcess
+from mkgp.core.parallel import run_fits
+from mkgp.core.storage import save_model, load_model, FitResultStore
+from mkgp.core.server import PredictionServer, PredictionClient
+from mkgp.core.frames import split_frame, fit_frame, batch_from_frame, results_frame
+from mkgp.core.kernels import Sum_Kernel, Product_Kernel, ICM_Kernel, Coregion_Kernel, SE_Kernel, RQ_Kernel, Matern_HI_Kernel, Noise_Kernel
+from mkgp.core.features import FeaturePosterior
+from mkgp.core.posterior import GaussianProcessPosterior, StructuredPosterior
 
 
 def check_gp_results(results,cmean=None,cstd=None,cdmean=None,cdstd=None,rtol=1.0e-5,atol=1.0e-8):
@@ -40,6 +58,9 @@ class TestGPRUninitialized(object):
     def test_empty_variance(self,empty_gpr_object):
         assert empty_gpr_object.get_gp_variance() is None
 
+    def test_empty_covariance(self,empty_gpr_object):
+        assert empty_gpr_object.get_gp_covariance() is None
+
     def test_empty_std(self,empty_gpr_object):
         assert empty_gpr_object.get_gp_std() is None
 
@@ -100,6 +121,9 @@ class TestGPRUninitialized(object):
     def test_empty_gp_sampling(self,empty_gpr_object):
         pytest.raises(ValueError,empty_gpr_object.sample_GP_derivative,1)
 
+    def test_empty_chunked_prediction(self,empty_gpr_object):
+        pytest.raises(ValueError,empty_gpr_object.predict_chunks,[0.0])
+
 
 @pytest.mark.evaluation
 @pytest.mark.usefixtures("unoptimized_gpr_object","linear_kernel","linear_test_data","rq_kernel")
@@ -133,9 +157,56 @@ class TestGPREvaluation(object):
     def test_non_existant_error_function_without_optimization(self,unoptimized_gpr_object):
         assert unoptimized_gpr_object.eval_error_function([0.0]) is None
 
+    def test_structured_covariance(self,unoptimized_gpr_object,linear_test_data):
+        ref_targets = itemgetter(2)(linear_test_data)
+        covariance = unoptimized_gpr_object.get_gp_covariance(noise_flag=True)
+        dense = covariance.todense()
+        assert dense.shape == covariance.shape
+        assert np.allclose(np.diag(dense),covariance.diagonal())
+        assert np.all(np.isclose(np.sqrt(covariance.diagonal()),ref_targets[1,:]))
+        assert np.all(dense == unoptimized_gpr_object.get_gp_variance(noise_flag=True))
+        assert np.all(unoptimized_gpr_object.get_gp_covariance(noise_flag=False).diagonal() < covariance.diagonal())
+
+    def test_read_only_views(self,unoptimized_gpr_object):
+        mean = unoptimized_gpr_object.get_gp_mean()
+        unoptimized_gpr_object.set_view_flag(True)
+        try:
+            view = unoptimized_gpr_object.get_gp_mean()
+            variance = unoptimized_gpr_object.get_gp_variance(noise_flag=False)
+        finally:
+            unoptimized_gpr_object.set_view_flag(False)
+        assert mean.flags.writeable
+        assert not view.flags.writeable and not variance.flags.writeable
+        assert np.shares_memory(view,unoptimized_gpr_object._barF) and np.all(view == mean)
+        with pytest.raises(ValueError):
+            view[0] = 0.0
+
+    def test_lazy_evaluation(self,unoptimized_gpr_object,linear_test_data):
+        (xpredict,ref_targets) = itemgetter(1,2)(linear_test_data)
+        r2 = unoptimized_gpr_object.get_gp_r2()
+        unoptimized_gpr_object.set_lazy_flag(True)
+        try:
+            unoptimized_gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        finally:
+            unoptimized_gpr_object.set_lazy_flag(False)
+        assert unoptimized_gpr_object._dbarF is None and unoptimized_gpr_object._estF is None
+        assert check_gp_results(unoptimized_gpr_object.get_gp_results(),ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+        assert np.isclose(unoptimized_gpr_object.get_gp_r2(),r2)
+
     def test_sampling(self,unoptimized_gpr_object):
         assert unoptimized_gpr_object.sample_GP(self.n_samples).shape == (self.n_samples,31)
 
+    def test_sampler_reuses_factorization(self,unoptimized_gpr_object):
+        sampler = unoptimized_gpr_object.get_gp_sampler()
+        assert unoptimized_gpr_object.get_gp_sampler() is sampler
+        assert np.all(unoptimized_gpr_object.sample_GP(self.n_samples,seed=3) == sampler.draw(self.n_samples,seed=3))
+        chunks = [chunk.shape[0] for chunk in sampler.stream(2*self.n_samples+1,chunk=self.n_samples,seed=3)]
+        assert chunks == [self.n_samples,self.n_samples,1]
+        stats = sampler.draw(self.n_stat_samples,seed=4)
+        assert np.allclose(np.mean(stats,axis=0),unoptimized_gpr_object.get_gp_mean(),atol=5.0e-3)
+        valid = unoptimized_gpr_object.get_gp_std(noise_flag=False) > 0.0
+        assert np.allclose(np.std(stats,axis=0)[valid],unoptimized_gpr_object.get_gp_std(noise_flag=True)[valid],rtol=5.0e-2)
+
 #   Test not yet operational, something strange in the neighbourhood
 #    def test_sampling_statistics(self,unoptimized_gpr_object):
 #        stats = unoptimized_gpr_object.sample_GP(self.n_stat_samples,simple_out=True)
@@ -150,6 +221,13 @@ class TestGPREvaluation(object):
         assert check_gp_results(unoptimized_gpr_object.get_gp_results(),hs_targets[0,:],hs_targets[1,:],hs_targets[2,:],hs_targets[3,:])
         assert np.isclose(unoptimized_gpr_object.get_gp_lml(),hs_lml) and np.isclose(unoptimized_gpr_object.get_gp_null_lml(),hs_null_lml)
 
+    def test_error_function_reuses_error_posterior(self,unoptimized_gpr_object,linear_test_data):
+        xpredict = itemgetter(1)(linear_test_data)
+        error_posterior = unoptimized_gpr_object._epost
+        assert error_posterior is not None
+        assert np.all(np.isclose(unoptimized_gpr_object.eval_error_function(xpredict),np.abs(unoptimized_gpr_object.get_error_gp_mean())))
+        assert unoptimized_gpr_object._epost is error_posterior
+
     def test_eval_noisy_input_without_optimization(self,unoptimized_gpr_object,linear_test_data,rq_kernel):
         (xpredict,ni_targets,ni_lml,ni_null_lml) = itemgetter(1,8,9,10)(linear_test_data)
         unoptimized_gpr_object.set_error_kernel(kernel=rq_kernel,regpar=1.0)
@@ -169,6 +247,577 @@ class TestGPREvaluation(object):
         assert np.isclose(unoptimized_gpr_object.get_gp_lml(),xy_lml) and np.isclose(unoptimized_gpr_object.get_gp_null_lml(),xy_null_lml)
 
 
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("unoptimized_gpr_object","linear_test_data")
+class TestGPRChunkedEvaluation(object):
+
+    def test_chunked_evaluation(self,unoptimized_gpr_object,linear_test_data):
+        (xpredict,ref_targets) = itemgetter(1,2)(linear_test_data)
+        unoptimized_gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        chunks = list(unoptimized_gpr_object.predict_chunks(xpredict,chunk_size=4))
+        results = tuple([np.concatenate([chunk[ii] for chunk in chunks]) for ii in range(1,5)])
+        assert len(chunks) == 8
+        assert np.all(np.concatenate([chunk[0] for chunk in chunks]) == xpredict)
+        assert check_gp_results(results,ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+
+    def test_chunked_evaluation_equivalence(self,unoptimized_gpr_object):
+        xpredict = unoptimized_gpr_object.get_gp_x()
+        results = unoptimized_gpr_object.predict(xpredict,chunk_size=5,process_noise_fraction=0.5)
+        ref_results = unoptimized_gpr_object.get_gp_results(process_noise_fraction=0.5)
+        assert check_gp_results(results,*ref_results,rtol=1.0e-10,atol=1.0e-12)
+
+    def test_chunked_evaluation_into_memmap(self,unoptimized_gpr_object,linear_test_data,tmp_path):
+        (xpredict,ref_targets) = itemgetter(1,2)(linear_test_data)
+        outputs = [np.memmap(tmp_path / f'output_{ii}.dat',dtype=np.float64,mode='w+',shape=xpredict.shape) for ii in range(4)]
+        for chunk in unoptimized_gpr_object.predict_chunks(xpredict,memory_limit=2.0e3,out=outputs):
+            assert chunk[0].size < xpredict.size
+        assert check_gp_results(outputs,ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("linear_kernel","linear_test_data")
+class TestGPRBatchEvaluation(object):
+
+    def test_batch_eval_without_optimization(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        ydata = np.vstack((gpr_input[1,:],-gpr_input[1,:]))
+        batch_object = BatchGaussianProcess(linear_kernel,gpr_input[0,:],ydata,yerr=gpr_input[2,:])
+        assert batch_object.GPRFit(xpredict) is None
+        (out_mean,out_std,out_derivative_mean,out_derivative_std) = batch_object.get_gp_results()
+        assert out_mean.shape == (2,xpredict.size)
+        assert check_gp_results([out_mean[0],out_std[0],out_derivative_mean[0],out_derivative_std[0]],ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+        assert check_gp_results([out_mean[1],out_std[1],out_derivative_mean[1],out_derivative_std[1]],-ref_targets[0,:],ref_targets[1,:],-ref_targets[2,:],ref_targets[3,:])
+
+    def test_batch_eval_with_masked_points(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict) = itemgetter(0,1)(linear_test_data)
+        ydata = np.atleast_2d(gpr_input[1,:].copy())
+        ydata[0,3] = np.nan
+        batch_object = BatchGaussianProcess(linear_kernel,gpr_input[0,:],ydata,yerr=gpr_input[2,:])
+        batch_object.GPRFit(xpredict)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=ydata[0],yerr=gpr_input[2,:])
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        ref_targets = gpr_object.get_gp_results()
+        out_results = [out[0] for out in batch_object.get_gp_results()]
+        assert check_gp_results(out_results,ref_targets[0],ref_targets[1],ref_targets[2],ref_targets[3])
+
+    def test_batch_vectorized_kernel_matrices(self,linear_test_data):
+        (gpr_input,xpredict) = itemgetter(0,1)(linear_test_data)
+        kernel = Sum_Kernel(Product_Kernel(SE_Kernel(1.0,0.5),Matern_HI_Kernel(1.0,0.4,2.5)),RQ_Kernel(0.5,1.0,2.0),Noise_Kernel(0.1))
+        ydata = np.vstack((gpr_input[1,:],-gpr_input[1,:],0.5*gpr_input[1,:]))
+        batch_object = BatchGaussianProcess(kernel,gpr_input[0,:],ydata,yerr=gpr_input[2,:])
+        theta = kernel.hyperparameters * np.array([[1.0],[1.2],[0.7]])
+        for hder in [None] + list(range(theta.shape[1])):
+            out_matrices = batch_object._kernel_matrices(theta,xpredict,gpr_input[0,:],hder=hder)
+            for ii in range(theta.shape[0]):
+                kcopy = copy.copy(kernel)
+                kcopy.hyperparameters = theta[ii]
+                assert np.allclose(out_matrices[ii],kcopy(xpredict,gpr_input[0,:],hder=hder),rtol=1.0e-10,atol=1.0e-12)
+
+    def test_batch_diverging_problem(self):
+        xvalues = np.linspace(0.0,1.0,30)
+        yerrors = np.full(xvalues.shape,0.05)
+        ydata = np.vstack((np.sin(np.pi*xvalues),np.sin(2.0*np.pi*xvalues),-np.sin(np.pi*xvalues)))
+        batch_object = BatchGaussianProcess(SE_Kernel(1.0,0.5),xvalues,ydata,yerr=yerrors)
+        batch_object.set_search_parameters(epsilon=1.0e-3,method='grad',spars=[0.5])
+        with np.errstate(all='ignore'):
+            batch_object.GPRFit(np.linspace(0.0,1.0,11))
+        assert np.all(batch_object.get_failures() == np.array([False,True,False]))
+        assert np.all(itemgetter(0)(batch_object.get_convergence()) == np.array([True,False,True]))
+        assert np.all(np.isfinite(batch_object.get_gp_hyperparameters()))
+        assert np.all(np.isfinite(batch_object.get_gp_lml()))
+        for out in batch_object.get_gp_results():
+            assert np.all(np.isnan(out[1])) and np.all(np.isfinite(out[[0,2]]))
+        ref_object = BatchGaussianProcess(SE_Kernel(1.0,0.5),xvalues,ydata[[0,2]],yerr=yerrors)
+        ref_object.set_search_parameters(epsilon=1.0e-3,method='grad',spars=[0.5])
+        ref_object.GPRFit(np.linspace(0.0,1.0,11))
+        for (out,ref) in zip(batch_object.get_gp_results(),ref_object.get_gp_results()):
+            assert np.allclose(out[[0,2]],ref,rtol=1.0e-10)
+
+    def test_batch_invalid_data(self,linear_kernel,linear_test_data):
+        gpr_input = itemgetter(0)(linear_test_data)
+        with pytest.raises(ValueError):
+            BatchGaussianProcess(linear_kernel,gpr_input[0,:],gpr_input[1,:-1])
+
+    def test_process_pool_driver(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        base_spec = {
+            'kernel': linear_kernel.name,
+            'kpars': linear_kernel.hyperparameters,
+            'xdata': gpr_input[0,:],
+            'yerr': gpr_input[2,:],
+            'xnew': xpredict,
+            'fit': {'hsgp_flag': False, 'nigp_flag': False},
+        }
+        specs = [dict(base_spec,key='pos',ydata=gpr_input[1,:]), dict(base_spec,key='neg',ydata=-gpr_input[1,:]), dict(base_spec,key='bad',kernel='XX',ydata=gpr_input[1,:])]
+        environ = dict(os.environ)
+        records = {}
+        for record in run_fits(specs,nworkers=1,blas_threads=1):
+            assert dict(os.environ) == environ
+            records[record['key']] = record
+        assert records['pos']['status'] == 'ok' and records['neg']['status'] == 'ok'
+        assert check_gp_results(records['pos']['results'],ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+        assert check_gp_results(records['neg']['results'],-ref_targets[0,:],ref_targets[1,:],-ref_targets[2,:],ref_targets[3,:])
+        assert records['bad']['status'] == 'error' and records['bad']['error'].startswith('ValueError')
+
+    def test_dataframe_ingestion_and_export(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        npts = gpr_input.shape[1]
+        frame = pd.DataFrame({
+            'shot': np.repeat([2,1],npts),
+            'time': np.zeros(2*npts),
+            'x': np.tile(gpr_input[0,:],2),
+            'y': np.hstack((-gpr_input[1,:],gpr_input[1,:])),
+            'sigma': np.tile(gpr_input[2,:],2),
+        }).sample(frac=1.0,random_state=1)
+        columns = {'yerr': 'sigma'}
+        (results,failed) = fit_frame(frame,['shot','time'],linear_kernel,xpredict,columns=columns,fit={'hsgp_flag': False, 'nigp_flag': False})
+        assert len(failed) == 0
+        assert list(results.index.names) == ['shot','time','x']
+        pos = results.loc[(1,0.0)]
+        neg = results.loc[(2,0.0)]
+        assert check_gp_results([pos[name].to_numpy() for name in ['mean','std','dmean','dstd']],ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+        assert check_gp_results([neg[name].to_numpy() for name in ['mean','std','dmean','dstd']],-ref_targets[0,:],ref_targets[1,:],-ref_targets[2,:],ref_targets[3,:])
+        (gindex,batch_object) = batch_from_frame(frame,['shot','time'],linear_kernel,columns=columns)
+        batch_object.GPRFit(xpredict)
+        batch_results = results_frame(gindex,batch_object.get_gp_x(),*batch_object.get_gp_results())
+        assert np.all(np.isclose(batch_results['mean'].to_numpy(),results['mean'].to_numpy()))
+
+    def test_dataframe_missing_keys_and_duplicates(self,linear_kernel,linear_test_data):
+        gpr_input = itemgetter(0)(linear_test_data)
+        npts = gpr_input.shape[1]
+        frame = pd.DataFrame({
+            'shot': np.concatenate((np.repeat([0.0,1.0],npts),[np.nan])),
+            'x': np.concatenate((np.tile(gpr_input[0,:],2),[0.0])),
+            'y': np.concatenate((gpr_input[1,:],-gpr_input[1,:],[1.0e3])),
+            'yerr': np.concatenate((np.tile(gpr_input[2,:],2),[1.0])),
+        })
+        (gindex,groups) = split_frame(frame,'shot')
+        assert list(gindex) == [0.0,1.0]
+        assert all(group['ydata'].size == npts for group in groups)
+        (gindex,batch_object) = batch_from_frame(frame,'shot',linear_kernel)
+        assert list(gindex) == [0.0,1.0]
+        assert np.all(batch_object._valid) and np.isclose(np.max(np.abs(batch_object._yn*batch_object._sc[:,np.newaxis])),np.max(np.abs(gpr_input[1,:]-np.mean(gpr_input[1,:]))))
+        duplicated = pd.concat([frame,frame.iloc[:1].assign(y=99.0)])
+        with pytest.raises(ValueError):
+            batch_from_frame(duplicated,'shot',linear_kernel)
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("linear_kernel","se_kernel","linear_test_data","gaussian_test_data")
+class TestGPRAsyncEvaluation(object):
+
+    def test_async_eval_without_optimization(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=gpr_input[1,:],yerr=gpr_input[2,:])
+        asyncio.run(gpr_object.fit_async(xpredict,hsgp_flag=False,nigp_flag=False))
+        assert check_gp_results(gpr_object.get_gp_results(),ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+        (out_mean,out_std) = asyncio.run(gpr_object.get_gp_posterior().predict_async(xpredict))
+        assert np.all(np.isclose(out_mean,ref_targets[0,:]))
+
+    def test_threaded_fits_on_separate_instances(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        filters = list(warnings.filters)
+        def fit(sign):
+            gpr_object = GaussianProcess()
+            gpr_object.set_kernel(kernel=linear_kernel)
+            gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=sign*gpr_input[1,:],yerr=gpr_input[2,:])
+            gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+            return gpr_object.get_gp_results()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            outputs = list(executor.map(fit,[1.0,-1.0,1.0,-1.0]))
+        for sign,output in zip([1.0,-1.0,1.0,-1.0],outputs):
+            assert check_gp_results(output,sign*ref_targets[0,:],ref_targets[1,:],sign*ref_targets[2,:],ref_targets[3,:])
+        assert list(warnings.filters) == filters
+
+    def test_async_cancellation(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=se_kernel)
+        gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors)
+        gpr_object.set_search_parameters(epsilon=1.0e-300,method='adam',maxiter=1000000)
+        async def cancelled_fit():
+            task = asyncio.ensure_future(gpr_object.fit_async(np.linspace(-1.0,1.0,5),hsgp_flag=False))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            await task
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(cancelled_fit())
+
+    def test_async_cancellation_of_queued_fit(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=se_kernel)
+        gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors)
+        gpr_object.set_search_parameters(epsilon=1.0e-300,method='adam',maxiter=2000)
+        set_async_executor(max_concurrency=4)
+        async def overlapping_fits():
+            first = asyncio.ensure_future(gpr_object.fit_async(np.linspace(-1.0,1.0,5),hsgp_flag=False))
+            await asyncio.sleep(0.1)
+            second = asyncio.ensure_future(gpr_object.fit_async(np.linspace(-1.0,1.0,5),hsgp_flag=False))
+            await asyncio.sleep(0.1)
+            second.cancel()
+            await first
+            with pytest.raises(asyncio.CancelledError):
+                await second
+        try:
+            asyncio.run(overlapping_fits())
+        finally:
+            set_async_executor(max_concurrency=os.cpu_count() or 1)
+        assert gpr_object._cancel is None
+        assert np.all(np.isfinite(gpr_object.get_gp_results()[0]))
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("unoptimized_gpr_object","linear_kernel","linear_test_data")
+class TestGPRModelStorage(object):
+
+    @pytest.mark.parametrize("filename",["model.npz","model.h5"])
+    def test_save_and_load_model(self,unoptimized_gpr_object,linear_test_data,tmp_path,filename):
+        xpredict = itemgetter(1)(linear_test_data)
+        gpr_object = copy.deepcopy(unoptimized_gpr_object)
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=True)
+        save_model(gpr_object,str(tmp_path / filename))
+        loaded_object = load_model(str(tmp_path / filename))
+        assert loaded_object.get_gp_kernel() == gpr_object.get_gp_kernel()
+        assert np.isclose(loaded_object.get_gp_lml(),gpr_object.get_gp_lml())
+        assert all(np.all(np.isclose(out,ref)) for out,ref in zip(loaded_object.get_gp_results(),gpr_object.get_gp_results()))
+        xtest = 0.5 * xpredict + 0.01
+        assert all(np.all(np.isclose(out,ref)) for out,ref in zip(loaded_object.predict(xtest),gpr_object.predict(xtest)))
+
+    def test_result_store_batch_append_and_partial_read(self,linear_kernel,linear_test_data,tmp_path):
+        (gpr_input,xpredict) = itemgetter(0,1)(linear_test_data)
+        batch_object = BatchGaussianProcess(linear_kernel,gpr_input[0,:],np.vstack((gpr_input[1,:],-gpr_input[1,:])),yerr=gpr_input[2,:])
+        batch_object.GPRFit(xpredict)
+        ref_results = batch_object.get_gp_results()
+        with FitResultStore(str(tmp_path / "results.h5"),mode='w') as store:
+            store.append_batch(['pos','neg'],batch_object)
+            with pytest.raises(ValueError):
+                store.append_batch(['pos','other'],batch_object)
+        with FitResultStore(str(tmp_path / "results.h5"),mode='r') as store:
+            assert store.fit_ids == ['pos','neg']
+            result = store.read('neg',xmin=0.0)
+            filt = (xpredict >= 0.0)
+            assert np.all(np.isclose(result['x'],xpredict[filt]))
+            assert np.all(np.isclose(result['mean'],ref_results[0][1][filt]))
+            assert np.all(np.isclose(result['dstd'],ref_results[3][1][filt]))
+            assert np.isclose(result['lml'],batch_object.get_gp_lml()[1])
+            assert result['covariance'] is None
+
+    def test_memory_mapped_ingestion(self,linear_kernel,linear_test_data,tmp_path):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        np.save(str(tmp_path / "xdata.npy"),gpr_input[0,:])
+        np.save(str(tmp_path / "ydata.npy"),gpr_input[1,:])
+        xmap = np.load(str(tmp_path / "xdata.npy"),mmap_mode='r')
+        ymap = np.load(str(tmp_path / "ydata.npy"),mmap_mode='r')
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_raw_data(xdata=xmap,ydata=ymap,yerr=gpr_input[2,:])
+        (xraw,yraw) = (gpr_object._xx,gpr_object._yy)
+        assert np.shares_memory(xraw,xmap) and np.shares_memory(yraw,ymap)
+        assert not xraw.flags.writeable and not yraw.flags.writeable
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        assert check_gp_results(gpr_object.get_gp_results(),ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+
+    def test_writable_input_is_copied(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets) = itemgetter(0,1,2)(linear_test_data)
+        xdata = gpr_input[0,:].copy()
+        ydata = gpr_input[1,:].copy()
+        xdata.flags.writeable = False
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_raw_data(xdata=xdata,ydata=ydata,yerr=gpr_input[2,:])
+        assert np.shares_memory(gpr_object._xx,xdata)
+        assert not np.shares_memory(gpr_object._yy,ydata)
+        ydata[:] = 100.0
+        assert np.allclose(gpr_object._yy,gpr_input[1,:])
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        assert check_gp_results(gpr_object.get_gp_results(),ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+
+    def test_exported_predictor(self,unoptimized_gpr_object,linear_test_data):
+        (xpredict,ref_targets) = itemgetter(1,2)(linear_test_data)
+        unoptimized_gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        predictor = pickle.loads(pickle.dumps(unoptimized_gpr_object.export_predictor(chunk=7)))
+        (out_mean,out_std) = predictor(xpredict)
+        assert check_gp_results([out_mean,out_std],ref_targets[0,:],unoptimized_gpr_object.get_gp_std(noise_flag=False))
+        assert np.all(predictor(xpredict,rtn_std=False) == out_mean)
+        truncated = unoptimized_gpr_object.export_predictor(rank=2)
+        (low_mean,low_std) = truncated(xpredict)
+        assert truncated.rank == 2
+        assert np.allclose(low_mean,out_mean) and np.all(low_std >= out_std * (1.0 - 1.0e-8))
+
+    def test_prediction_server(self,unoptimized_gpr_object,linear_test_data,tmp_path):
+        xpredict = itemgetter(1)(linear_test_data)
+        unoptimized_gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        model = str(tmp_path / "model.npz")
+        save_model(unoptimized_gpr_object,model)
+        address = str(tmp_path / "server.sock")
+        with PredictionServer(address,capacity=1,window=0.05) as server:
+            assert (os.stat(address).st_mode & 0o777) == 0o600
+            def query(xchunk):
+                with PredictionClient(address,authkey=server.authkey) as client:
+                    return client.predict(model,xchunk)
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                outputs = list(executor.map(query,np.array_split(xpredict,4)))
+            with pytest.raises(AuthenticationError):
+                with PredictionClient(address,authkey=b'invalid') as client:
+                    client.stats()
+            with PredictionClient(address,authkey=server.authkey) as client:
+                with pytest.raises(ValueError):
+                    client.predict(str(tmp_path / "missing.npz"),xpredict)
+                stats = client.stats()
+        with pytest.raises(ValueError):
+            server._handle(('predict',model,xpredict))
+        (ref_mean,ref_std) = unoptimized_gpr_object.get_gp_posterior().predict(xpredict)
+        assert np.allclose(np.concatenate([out[0] for out in outputs]),ref_mean)
+        assert np.allclose(np.concatenate([out[1] for out in outputs]),ref_std)
+        assert stats['requests'] == 4 and stats['points'] == xpredict.size
+        assert stats['batches'] < stats['requests'] and stats['models'] == [model]
+
+    def test_save_requires_fit(self,tmp_path):
+        with pytest.raises(ValueError):
+            save_model(GaussianProcess(),str(tmp_path / "model.npz"))
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("se_kernel","rq_kernel","linear_kernel","gaussian_test_data")
+class TestGPRPathwiseSampling(object):
+
+    @pytest.mark.parametrize("kernel_name",["se_kernel","rq_kernel"])
+    def test_pathwise_sample_statistics(self,kernel_name,gaussian_test_data,request):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        xpredict = np.linspace(-1.0,1.0,41)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=request.getfixturevalue(kernel_name))
+        gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors,dxdata=[0.0],dydata=[0.0],dyerr=[0.0])
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        paths = gpr_object.sample_GP_paths(4000,nfeatures=2000,seed=5)
+        samples = paths(xpredict)
+        assert samples.shape == (4000,xpredict.size)
+        assert np.allclose(np.mean(samples,axis=0),gpr_object.get_gp_mean(),atol=1.0e-2)
+        assert np.allclose(np.std(samples,axis=0),gpr_object.get_gp_std(noise_flag=False),rtol=2.0e-1,atol=1.0e-2)
+        assert np.allclose(paths(np.array([0.0]),der=1),0.0,atol=1.0e-6)
+        assert np.all(paths(xpredict[::2]) == samples[:,::2])
+
+    def test_pathwise_unsupported_kernel(self,linear_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors)
+        gpr_object.GPRFit(xvalues,hsgp_flag=False,nigp_flag=False)
+        with pytest.raises(TypeError):
+            gpr_object.sample_GP_paths(10)
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("se_kernel","gaussian_test_data")
+class TestGPRFeatureSolver(object):
+
+    def test_feature_solver_converges_to_exact(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        xpredict = np.linspace(-1.0,1.0,21)
+        results = []
+        for (solver,nfeatures) in [('exact',None),('rff',32),('rff',2048)]:
+            gpr_object = GaussianProcess()
+            gpr_object.set_kernel(kernel=se_kernel)
+            gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors,dxdata=[0.0],dydata=[0.0],dyerr=[0.0])
+            gpr_object.set_search_parameters(epsilon='None')
+            gpr_object.set_solver(solver=solver,nfeatures=nfeatures,seed=2)
+            gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+            results.append((gpr_object.get_gp_mean(),gpr_object.get_gp_std(noise_flag=False),gpr_object.get_gp_drv_mean(),gpr_object.get_gp_lml()))
+        assert isinstance(gpr_object.get_gp_posterior(),FeaturePosterior)
+        coarse = [np.max(np.abs(value - exact)) for (value,exact) in zip(results[1],results[0])]
+        fine = [np.max(np.abs(value - exact)) for (value,exact) in zip(results[2],results[0])]
+        assert np.all(np.array(fine) < np.array(coarse))
+        assert check_gp_results(results[2],*results[0][:3],rtol=0.0,atol=5.0e-2)
+        assert np.isclose(results[2][3],results[0][3],atol=5.0e-2)
+
+    def test_feature_solver_gradient(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_solver(solver='rff',nfeatures=256,seed=1)
+        grad_lml = gpr_object._gp_grad_lml(se_kernel,1.0,xvalues,yvalues,yerrors,np.array([0.0]),np.array([0.0]),np.array([0.1])) * np.log(10.0) * se_kernel.hyperparameters
+        brute_grad_lml = gpr_object._gp_brute_grad_lml(se_kernel,1.0,xvalues,yvalues,yerrors,np.array([0.0]),np.array([0.0]),np.array([0.1]),1.0e-5)
+        assert np.all(np.isclose(grad_lml,brute_grad_lml,rtol=1.0e-5))
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("se_kernel","gaussian_test_data")
+class TestGPRCrossValidation(object):
+
+    @pytest.mark.parametrize("folds",[None,4])
+    def test_cross_validation_matches_refits(self,folds,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        post = GaussianProcessPosterior(se_kernel,xvalues,yvalues,yerrors,ymean=0.2,yscale=2.0)
+        (cv_mean,cv_std,cv_logp) = post.cross_validate(folds)
+        nfolds = xvalues.size if folds is None else folds
+        for ii in range(nfolds):
+            held = np.arange(ii,xvalues.size,nfolds)
+            kept = np.setdiff1d(np.arange(xvalues.size),held)
+            refit = GaussianProcessPosterior(se_kernel,xvalues[kept],yvalues[kept],yerrors[kept],ymean=0.2,yscale=2.0)
+            (mean,cov) = refit.predict(xvalues[held],rtn_cov=True)
+            cov = cov + np.diag((2.0 * yerrors[held]) ** 2.0)
+            resid = 2.0 * yvalues[held] + 0.2 - mean
+            logp = -0.5 * resid @ np.linalg.solve(cov,resid) - 0.5 * np.linalg.slogdet(2.0 * np.pi * cov)[1]
+            assert np.allclose(cv_mean[held],mean)
+            assert np.allclose(cv_std[held],np.sqrt(np.diag(cov)))
+            assert np.isclose(cv_logp[ii],logp)
+
+    @pytest.mark.parametrize("objective",["loo","kfold"])
+    def test_cross_validation_objective_gradient(self,objective,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_objective(objective=objective,folds=5)
+        grad_cv = gpr_object._gp_grad_lml(se_kernel,1.0,xvalues,yvalues,yerrors,None,None,None) * np.log(10.0) * se_kernel.hyperparameters
+        brute_grad_cv = gpr_object._gp_brute_grad_lml(se_kernel,1.0,xvalues,yvalues,yerrors,None,None,None,1.0e-5)
+        assert np.all(np.isclose(grad_cv,brute_grad_cv,rtol=1.0e-5))
+        cv_logp = []
+        for selected in [objective,'lml']:
+            gpr_object.set_objective(objective=selected)
+            gpr_object.set_kernel(kernel=se_kernel,kbounds=[[1.0e-1,1.0e-1],[1.0e1,1.0e0]])
+            gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors)
+            gpr_object.set_search_parameters(epsilon=1.0e-5,method='adam',spars=[1.0e-1,0.4,0.8])
+            gpr_object.GPRFit(xvalues,hsgp_flag=False,nigp_flag=False)
+            cv_logp.append(np.sum(gpr_object.get_gp_cross_validation(folds=5 if objective == 'kfold' else None)[2]))
+        assert cv_logp[0] > cv_logp[1]
+
+    def test_kfold_objective_rejects_excess_folds(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_objective(objective='kfold',folds=xvalues.size+1)
+        gpr_object.set_kernel(kernel=se_kernel)
+        gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors)
+        gpr_object.set_search_parameters(epsilon=1.0e-5,method='adam',spars=[1.0e-1,0.4,0.8])
+        with pytest.raises(ValueError,match='folds'):
+            gpr_object.GPRFit(xvalues,hsgp_flag=False,nigp_flag=False)
+        gpr_object.set_objective(folds=xvalues.size)
+        assert gpr_object.GPRFit(xvalues,hsgp_flag=False,nigp_flag=False) is None
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("se_kernel","gaussian_test_data")
+class TestGPRNoiseSweep(object):
+
+    def test_noise_sweep_matches_refits(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        xpredict = np.linspace(-1.0,1.0,11)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=se_kernel)
+        gpr_object.set_raw_data(xdata=xvalues,ydata=yvalues,yerr=yerrors,dxdata=[0.0],dydata=[0.0],dyerr=[0.01])
+        gpr_object.set_search_parameters(epsilon='None')
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        post = gpr_object.get_gp_posterior()
+        sweep = gpr_object.get_gp_noise_sweep()
+        scales = np.array([0.5,1.0,4.0])
+        regpars = np.array([1.0,3.0])
+        lml = sweep.lml(scales,regpar=regpars)
+        (mean,std) = sweep.predict(xpredict,scales,der=1)
+        (cv_mean,cv_std,cv_logp) = sweep.cross_validate(scales)
+        assert lml.shape == (scales.size,regpars.size)
+        assert np.allclose(sweep.predict(xpredict,1.0)[0][0],gpr_object.get_gp_mean())
+        for (ii,scale) in enumerate(scales):
+            for (jj,regpar) in enumerate(regpars):
+                refit = GaussianProcessPosterior(post.kernel,post._xx,post._yf[:-1],scale*post._yef[:-1],post._xxd,post._yf[-1:],scale*post._yef[-1:],regpar=regpar,ymean=post._myy,yscale=post._sc)
+                assert np.isclose(lml[ii,jj],refit.lml)
+            assert check_gp_results((mean[ii],std[ii]),*refit.predict(xpredict,der=1))
+            assert check_gp_results((cv_mean[ii],cv_std[ii]),*refit.cross_validate()[:2])
+            assert np.allclose(cv_logp[ii],refit.cross_validate()[2])
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("linear_kernel","constant_kernel","noise_kernel","se_kernel","linear_test_data")
+class TestGPRStructuredPosterior(object):
+
+    @pytest.mark.parametrize("kernel_names",[("linear_kernel","constant_kernel","noise_kernel"),("se_kernel","linear_kernel","noise_kernel")])
+    def test_structured_posterior_matches_dense(self,kernel_names,linear_test_data,request):
+        gpr_input = itemgetter(0)(linear_test_data)
+        kernel = Sum_Kernel(klist=[copy.copy(request.getfixturevalue(name)) for name in kernel_names])
+        xpredict = np.linspace(-1.0,1.0,11)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=kernel)
+        gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=gpr_input[1,:],yerr=gpr_input[2,:],dxdata=[0.0],dydata=[1.9],dyerr=[0.1])
+        gpr_object.set_search_parameters(epsilon='None')
+        gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        post = gpr_object.get_gp_posterior()
+        dense = GaussianProcessPosterior(post.kernel,post._xx,post._yf[:-1],post._yef[:-1],post._xxd,post._yf[-1:],post._yef[-1:],ymean=post._myy,yscale=post._sc)
+        assert isinstance(post,StructuredPosterior)
+        assert post.rank == (2 if kernel_names[0] == "linear_kernel" else 1)
+        assert (post._LL is None) == (kernel_names[0] == "linear_kernel")
+        assert np.isclose(post.lml,dense.lml)
+        for der in [0,1]:
+            assert check_gp_results(post.predict(xpredict,der=der),*dense.predict(xpredict,der=der))
+        assert np.allclose(post.predict(xpredict,rtn_cov=True)[1],dense.predict(xpredict,rtn_cov=True)[1])
+        assert np.allclose(gpr_object.export_predictor()(xpredict)[1],dense.predict(xpredict)[1])
+        grad_lml = gpr_object._gp_grad_lml(kernel,1.0,post._xx,post._yf[:-1],post._yef[:-1],None,None,None) * np.log(10.0) * kernel.hyperparameters
+        brute_grad_lml = gpr_object._gp_brute_grad_lml(kernel,1.0,post._xx,post._yf[:-1],post._yef[:-1],None,None,None,1.0e-5)
+        assert np.allclose(grad_lml,brute_grad_lml,rtol=1.0e-5)
+
+
+@pytest.mark.evaluation
+@pytest.mark.usefixtures("linear_kernel","linear_test_data","se_kernel","rq_kernel","gaussian_test_data")
+class TestGPRMultiOutputEvaluation(object):
+
+    def test_multi_output_eval_without_optimization(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict,ref_targets,ref_lml,ref_null_lml) = itemgetter(0,1,2,3,4)(linear_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=np.stack((gpr_input[1,:],-gpr_input[1,:]),axis=-1),yerr=gpr_input[2,:],xerr=gpr_input[3,:])
+        assert gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False) is None
+        (out_mean,out_std,out_derivative_mean,out_derivative_std) = gpr_object.get_gp_results()
+        assert out_mean.shape == (xpredict.size,2) and out_std.shape == (xpredict.size,2)
+        assert check_gp_results([out_mean[:,0],out_std[:,0],out_derivative_mean[:,0],out_derivative_std[:,0]],ref_targets[0,:],ref_targets[1,:],ref_targets[2,:],ref_targets[3,:])
+        assert check_gp_results([out_mean[:,1],out_std[:,1],out_derivative_mean[:,1],out_derivative_std[:,1]],-ref_targets[0,:],ref_targets[1,:],-ref_targets[2,:],ref_targets[3,:])
+        assert np.isclose(gpr_object.get_gp_lml(),2.0*ref_lml)
+        assert np.isclose(gpr_object.get_gp_null_lml(),2.0*ref_null_lml)
+        assert gpr_object.sample_GP(3).shape == (3,xpredict.size,2)
+
+    def test_multi_output_gradient(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        ydata = np.stack((yvalues,0.5*yvalues+0.1*np.cos(3.0*xvalues)),axis=-1)
+        gpr_object = GaussianProcess()
+        grad_lml = gpr_object._gp_grad_lml(se_kernel,1.0,xvalues,ydata,yerrors,None,None,None) * np.log(10.0) * se_kernel.hyperparameters
+        brute_grad_lml = gpr_object._gp_brute_grad_lml(se_kernel,1.0,xvalues,ydata,yerrors,None,None,None,1.0e-5)
+        assert np.all(np.isclose(grad_lml,brute_grad_lml,rtol=1.0e-6))
+
+    def test_multi_output_rejects_error_models(self,linear_kernel,rq_kernel,linear_test_data):
+        (gpr_input,xpredict) = itemgetter(0,1)(linear_test_data)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=linear_kernel)
+        gpr_object.set_error_kernel(kernel=rq_kernel)
+        gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=np.stack((gpr_input[1,:],gpr_input[1,:]),axis=-1),yerr=gpr_input[2,:])
+        with pytest.raises(ValueError):
+            gpr_object.GPRFit(xpredict)
+
+    def test_coregionalized_eval_matches_independent_outputs(self,linear_kernel,linear_test_data):
+        (gpr_input,xpredict) = itemgetter(0,1)(linear_test_data)
+        ydata = np.stack((gpr_input[1,:],-gpr_input[1,:]),axis=-1)
+        ref_object = GaussianProcess()
+        ref_object.set_kernel(kernel=linear_kernel)
+        ref_object.set_raw_data(xdata=gpr_input[0,:],ydata=ydata,yerr=gpr_input[2,:])
+        ref_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False)
+        gpr_object = GaussianProcess()
+        gpr_object.set_kernel(kernel=ICM_Kernel(linear_kernel,Coregion_Kernel(2,[1.0,1.0],[0.5*np.pi])))
+        gpr_object.set_raw_data(xdata=gpr_input[0,:],ydata=ydata,yerr=gpr_input[2,:])
+        assert gpr_object.GPRFit(xpredict,hsgp_flag=False,nigp_flag=False) is None
+        out_results = gpr_object.get_gp_results()
+        ref_results = ref_object.get_gp_results()
+        assert all(np.all(np.isclose(out,ref)) for out,ref in zip(out_results,ref_results))
+        assert np.isclose(gpr_object.get_gp_lml(),ref_object.get_gp_lml())
+        assert gpr_object.get_gp_variance().shape == (xpredict.size,2,2,xpredict.size)
+
+    def test_coregionalized_gradient(self,se_kernel,gaussian_test_data):
+        (xvalues,yvalues,yerrors) = itemgetter(0,2,3)(gaussian_test_data)
+        ydata = np.stack((yvalues,0.5*yvalues+0.1*np.cos(3.0*xvalues)),axis=-1)
+        icm_kernel = ICM_Kernel(se_kernel,Coregion_Kernel(2,[1.0,0.5],[1.0]))
+        gpr_object = GaussianProcess()
+        grad_lml = gpr_object._gp_grad_lml(icm_kernel,1.0,xvalues,ydata,yerrors,None,None,None) * np.log(10.0) * icm_kernel.hyperparameters
+        brute_grad_lml = gpr_object._gp_brute_grad_lml(icm_kernel,1.0,xvalues,ydata,yerrors,None,None,None,1.0e-5)
+        assert np.all(np.isclose(grad_lml,brute_grad_lml,rtol=1.0e-5))
+
+
 @pytest.mark.simple_version
 @pytest.mark.usefixtures("simplified_unoptimized_gpr_object","unoptimized_gpr_object","linear_test_data")
 class TestGPRSimplifiedVersion(object):
@@ -290,6 +939,20 @@ class TestGPROptimization(object):
         assert isinstance(out_derivative_mean,np.ndarray) and np.all(np.isfinite(out_derivative_mean))
         assert isinstance(out_derivative_std,np.ndarray) and np.all(np.isfinite(out_derivative_std))
 
+    def test_batch_lockstep_optimizer(self,preoptimization_gpr_object,rq_kernel):
+        (xvalues,yvalues,yerrors) = itemgetter(0,1,3)(preoptimization_gpr_object.get_raw_data())
+        ydata = np.vstack((yvalues,0.5*yvalues+0.1))
+        batch_object = BatchGaussianProcess(rq_kernel,xvalues,ydata,yerr=yerrors)
+        batch_object.set_search_parameters(epsilon=1.0e-2,method='grad',spars=[1.0e-5])
+        batch_object.GPRFit(self.xtest)
+        assert np.all(itemgetter(0)(batch_object.get_convergence()))
+        out_results = batch_object.get_gp_results()
+        preoptimization_gpr_object.set_search_parameters(epsilon=1.0e-2,method='grad',spars=[1.0e-5])
+        preoptimization_gpr_object.GPRFit(self.xtest,hsgp_flag=False,nigp_flag=False)
+        ref_targets = preoptimization_gpr_object.get_gp_results()
+        assert np.all(np.isclose(batch_object.get_gp_hyperparameters()[0],preoptimization_gpr_object.get_gp_kernel().hyperparameters,rtol=1.0e-6))
+        assert check_gp_results([out[0] for out in out_results],ref_targets[0],ref_targets[1],ref_targets[2],ref_targets[3],rtol=1.0e-6)
+
     def test_heteroscedastic_with_optimization_and_restarts(self,preoptimization_gpr_object,rq_kernel):
         preoptimization_gpr_object.set_kernel(kernel=rq_kernel,kbounds=self.rq_kbounds,regpar=1.0)
         preoptimization_gpr_object.set_error_kernel(kernel=rq_kernel,kbounds=self.rq_kbounds,regpar=2.0,nrestarts=5)
@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 
 import pytest
+import copy
 import numpy as np
 from mkgp.core.baseclasses import _Kernel
+from mkgp.core.kernels import Sum_Kernel, Product_Kernel, ND_Sum_Kernel, ND_Product_Kernel, Symmetric_Kernel, Noise_Kernel, Linear_Kernel, SE_Kernel
 from mkgp.core.utils import KernelConstructor, KernelReconstructor
 
 
@@ -403,9 +405,9 @@ class TestSumOperationKernel():
     ref_dcov = np.atleast_2d([[0.0, 0.54134113295], [-0.54134113295, 0.0]])
     ref_ddcov = np.atleast_2d([[4.0, -1.62402339884], [-1.62402339884, 4.0]])
     ref_hdcov = [
-        np.atleast_2d([[3.0, 0.27067056647], [0.27067056647, 3.0]]),
-        np.atleast_2d([[1.0, 1.08268226589], [1.08268226589, 1.0]]),
-        np.atleast_2d([[3.0, 0.13533528324], [0.13533528324, 3.0]]),
+        np.atleast_2d([[2.0, 0.27067056647], [0.27067056647, 2.0]]),
+        np.atleast_2d([[0.0, 1.08268226589], [1.08268226589, 0.0]]),
+        np.atleast_2d([[2.0, 0.0], [0.0, 2.0]]),
     ]
 
     def test_eval(self, sum_kernel):
@@ -460,3 +462,177 @@ class TestProductOperationKernel():
         else:
             kwargs = {'x1': self.x1_vector, 'x2': self.x2_vector, 'hder': 0}
             pytest.raises(NotImplementedError, product_kernel, **kwargs)
+
+
+@pytest.mark.operator_kernels
+@pytest.mark.usefixtures('icm_kernel')
+class TestICMOperationKernel():
+
+    x1_vector = np.array([0.0, 1.0])
+    x2_vector = np.array([0.0, 1.0])
+    ref_cov = np.atleast_2d([
+        [1.0, 0.13533528324, 1.0, 0.13533528324],
+        [0.13533528324, 1.0, 0.13533528324, 1.0],
+        [1.0, 0.13533528324, 4.0, 0.54134113295],
+        [0.13533528324, 1.0, 0.54134113295, 4.0]
+    ])
+    ref_dcov = np.atleast_2d([
+        [0.0, 0.54134113295, 0.0, 0.54134113295],
+        [-0.54134113295, 0.0, -0.54134113295, 0.0],
+        [0.0, 0.54134113295, 0.0, 2.16536453179],
+        [-0.54134113295, 0.0, -2.16536453179, 0.0]
+    ])
+    ref_ddcov = np.atleast_2d([
+        [4.0, -1.62402339884, 4.0, -1.62402339884],
+        [-1.62402339884, 4.0, -1.62402339884, 4.0],
+        [4.0, -1.62402339884, 16.0, -6.49609359536],
+        [-1.62402339884, 4.0, -6.49609359536, 16.0]
+    ])
+    ref_hdcov = [
+        np.atleast_2d([
+            [2.0, 0.27067056647, 2.0, 0.27067056647],
+            [0.27067056647, 2.0, 0.27067056647, 2.0],
+            [2.0, 0.27067056647, 8.0, 1.08268226589],
+            [0.27067056647, 2.0, 1.08268226589, 8.0]
+        ]),
+        np.atleast_2d([
+            [0.0, 1.08268226589, 0.0, 1.08268226589],
+            [1.08268226589, 0.0, 1.08268226589, 0.0],
+            [0.0, 1.08268226589, 0.0, 4.33072906357],
+            [1.08268226589, 0.0, 4.33072906357, 0.0]
+        ]),
+        np.atleast_2d([
+            [2.0, 0.27067056647, 1.0, 0.13533528324],
+            [0.27067056647, 2.0, 0.13533528324, 1.0],
+            [1.0, 0.13533528324, 0.0, 0.0],
+            [0.13533528324, 1.0, 0.0, 0.0]
+        ]),
+        np.atleast_2d([
+            [0.0, 0.0, 0.5, 0.06766764162],
+            [0.0, 0.0, 0.06766764162, 0.5],
+            [0.5, 0.06766764162, 4.0, 0.54134113295],
+            [0.06766764162, 0.5, 0.54134113295, 4.0]
+        ]),
+        np.atleast_2d([
+            [0.0, 0.0, -1.73205080757, -0.23440758662],
+            [0.0, 0.0, -0.23440758662, -1.73205080757],
+            [-1.73205080757, -0.23440758662, 0.0, 0.0],
+            [-0.23440758662, -1.73205080757, 0.0, 0.0]
+        ]),
+    ]
+
+    def test_eval(self, icm_kernel):
+        assert check_kernel_evaluation(icm_kernel, self.x1_vector, self.x2_vector, 0, self.ref_cov)
+
+    def test_eval_first_derivative(self, icm_kernel):
+        assert check_kernel_evaluation(icm_kernel, self.x1_vector, self.x2_vector, 1, self.ref_dcov)
+
+    def test_eval_first_derivative_transpose(self, icm_kernel):
+        assert check_kernel_transposition(icm_kernel, self.x1_vector, self.x2_vector)
+
+    def test_eval_second_derivative(self, icm_kernel):
+        assert check_kernel_evaluation(icm_kernel, self.x1_vector, self.x2_vector, 2, self.ref_ddcov)
+
+    def test_eval_hyperparameter_derivatives(self, icm_kernel):
+        assert check_kernel_hyperparameter_derivatives(icm_kernel, self.x1_vector, self.x2_vector, self.ref_hdcov)
+
+    def test_output_covariance(self, coregion_kernel):
+        ref_bcov = np.atleast_2d([[1.0, 1.0], [1.0, 4.0]])
+        assert np.all(np.isclose(coregion_kernel.output_covariance(), ref_bcov))
+
+
+@pytest.mark.operator_kernels
+@pytest.mark.usefixtures('constant_kernel', 'noise_kernel', 'linear_kernel', 'sum_kernel', 'product_kernel')
+class TestKernelStructure():
+
+    x_vector = np.array([-1.0, 0.5, 2.0])
+    xd_vector = np.array([0.0, 1.5])
+
+    def test_structure_propagation(self, constant_kernel, noise_kernel, linear_kernel, sum_kernel, product_kernel):
+        assert constant_kernel.structure == 'lowrank'
+        assert noise_kernel.structure == 'diagonal'
+        assert linear_kernel.structure == 'lowrank'
+        assert product_kernel.structure == 'lowrank'
+        assert sum_kernel.structure == 'dense'
+        assert Sum_Kernel(linear_kernel, constant_kernel).structure == 'lowrank'
+        assert Product_Kernel(noise_kernel, noise_kernel).structure == 'diagonal'
+
+    def test_lowrank_factors(self, constant_kernel, linear_kernel, product_kernel):
+        for kk in [constant_kernel, linear_kernel, product_kernel, Sum_Kernel(linear_kernel, constant_kernel)]:
+            uf = kk.factors(self.x_vector)
+            ud = kk.factors(self.xd_vector, der=1)
+            assert np.all(np.isclose(uf @ uf.T, kk(self.x_vector, self.x_vector)))
+            assert np.all(np.isclose(ud @ uf.T, kk(self.x_vector, self.xd_vector, der=1)))
+            assert np.all(np.isclose(ud @ ud.T, kk(self.xd_vector, self.xd_vector, der=2)))
+
+    def test_diagonal_values(self, noise_kernel):
+        kk = Product_Kernel(noise_kernel, Noise_Kernel(0.5))
+        assert np.all(np.isclose(np.diag(kk.diagonal_values(self.x_vector)), kk(self.x_vector, self.x_vector)))
+        assert np.all(np.isclose(kk.diagonal_values(self.xd_vector, der=1), 0.0))
+
+    def test_structure_hyperparameter_derivatives(self, constant_kernel, noise_kernel, linear_kernel):
+        for kk in [Sum_Kernel(linear_kernel, constant_kernel), Product_Kernel(linear_kernel, Linear_Kernel(0.5))]:
+            for ihyp in range(kk.hyperparameters.size):
+                (uf, hf) = (kk.factors(self.x_vector), kk.factors(self.x_vector, hder=ihyp))
+                (ud, hd) = (kk.factors(self.xd_vector, der=1), kk.factors(self.xd_vector, der=1, hder=ihyp))
+                assert np.all(np.isclose(hf @ uf.T + uf @ hf.T, kk(self.x_vector, self.x_vector, hder=ihyp)))
+                assert np.all(np.isclose(hd @ ud.T + ud @ hd.T, kk(self.xd_vector, self.xd_vector, der=2, hder=ihyp)))
+        for kk in [Sum_Kernel(noise_kernel, Noise_Kernel(0.5)), Product_Kernel(noise_kernel, Noise_Kernel(0.5))]:
+            for ihyp in range(kk.hyperparameters.size):
+                assert np.all(np.isclose(np.diag(kk.diagonal_values(self.x_vector, hder=ihyp)), kk(self.x_vector, self.x_vector, hder=ihyp)))
+
+    def test_dense_kernel_has_no_factors(self, sum_kernel):
+        with pytest.raises(NotImplementedError):
+            sum_kernel.factors(self.x_vector)
+
+
+@pytest.mark.operator_kernels
+@pytest.mark.usefixtures('se_kernel', 'linear_kernel', 'noise_kernel')
+class TestOperatorKernelHyperparameterRouting():
+
+    x1_vector = np.array([-0.7, 0.1, 0.9])
+    x2_vector = np.array([-0.2, 0.4])
+
+    def finite_difference(self, kernel, x1, x2, der, ihyp, step=1.0e-6):
+        (kp, km) = (copy.copy(kernel), copy.copy(kernel))
+        (hp, hm) = (kernel.hyperparameters, kernel.hyperparameters)
+        hp[ihyp] += step
+        hm[ihyp] -= step
+        kp.hyperparameters = hp
+        km.hyperparameters = hm
+        return (kp(x1, x2, der=der) - km(x1, x2, der=der)) / (2.0 * step)
+
+    def test_hyperparameter_derivatives_match_finite_differences(self, se_kernel, linear_kernel, noise_kernel):
+        xx1 = np.stack((self.x1_vector, self.x1_vector[::-1]), axis=-1)
+        xx2 = np.stack((self.x2_vector, self.x2_vector + 0.3), axis=-1)
+        cases = [
+            (Sum_Kernel(se_kernel, linear_kernel, noise_kernel), self.x1_vector, self.x2_vector),
+            (Product_Kernel(se_kernel, linear_kernel, SE_Kernel(0.9, 1.1)), self.x1_vector, self.x2_vector),
+            (Symmetric_Kernel(se_kernel), self.x1_vector, self.x2_vector),
+            (ND_Sum_Kernel(se_kernel, linear_kernel), xx1, xx2),
+            (ND_Product_Kernel(se_kernel, linear_kernel), xx1, xx2),
+        ]
+        for (kernel, x1, x2) in cases:
+            nhyps = kernel.hyperparameters.size
+            for der in [0, 1]:
+                for ihyp in range(nhyps):
+                    assert np.allclose(kernel(x1, x2, der=der, hder=ihyp), self.finite_difference(kernel, x1, x2, der, ihyp), atol=1.0e-7)
+                assert np.all(kernel(x1, x2, der=der, hder=nhyps) == 0.0)
+
+    def test_nd_product_derivative_blocks(self, se_kernel, linear_kernel):
+        xx1 = np.stack((self.x1_vector, self.x1_vector[::-1]), axis=-1)
+        xx2 = np.stack((self.x2_vector, self.x2_vector + 0.3), axis=-1)
+        kernel = ND_Product_Kernel(se_kernel, linear_kernel)
+        kernels = [se_kernel, linear_kernel]
+        plain = [kk(xx1[:, ii], xx2[:, ii]) for (ii, kk) in enumerate(kernels)]
+        first = [kk(xx1[:, ii], xx2[:, ii], der=1) for (ii, kk) in enumerate(kernels)]
+        second = [kk(xx1[:, ii], xx2[:, ii], der=2) for (ii, kk) in enumerate(kernels)]
+        dcov = kernel(xx1, xx2, der=1)
+        ddcov = kernel(xx1, xx2, der=2)
+        assert dcov.shape == (xx2.shape[0], 2, xx1.shape[0])
+        assert np.allclose(dcov[:, 0, :], first[0] * plain[1])
+        assert np.allclose(dcov[:, 1, :], plain[0] * first[1])
+        assert np.allclose(ddcov[:, 0, 0, :], second[0] * plain[1])
+        assert np.allclose(ddcov[:, 1, 1, :], plain[0] * second[1])
+        assert np.allclose(ddcov[:, 0, 1, :], kernels[0](xx1[:, 0], xx2[:, 0], der=-1) * first[1])
+        assert np.allclose(ddcov[:, 1, 0, :], first[0] * kernels[1](xx1[:, 1], xx2[:, 1], der=-1))